@@ -17,7 +17,9 @@ import {
     View
 } from 'react-native';
 import { SafeAreaView } from 'react-native-safe-area-context';
-import { apiService as api } from '../../services/api';
+import { apiService as api, ChatScopeFilters } from '../../services/api';
+import { ChatSubscription, subscribeToChat } from '../../services/chatRealtime';
+import { useAuth } from '../context/auth';
 
 interface ChatParticipant {
   id: number;
@@ -87,9 +89,14 @@ interface MessagesResponse {
   success: boolean;
   messages: ChatMessage[];
   count: number;
+  has_more?: boolean;
 }
 
+// Messages are fetched newest-first in pages keyed on (chat_id, id)
+const MESSAGES_PAGE_SIZE = 50;
+
 export default function ChatsScreen() {
+  const { user } = useAuth();
   const [chats, setChats] = useState<Chat[]>([]);
   const [selectedChat, setSelectedChat] = useState<Chat | null>(null);
   const [messages, setMessages] = useState<ChatMessage[]>([]);
@@ -98,6 +105,8 @@ export default function ChatsScreen() {
   const [refreshing, setRefreshing] = useState(false);
   const [sendingMessage, setSendingMessage] = useState(false);
   const [messagesLoading, setMessagesLoading] = useState(false);
+  const [hasOlderMessages, setHasOlderMessages] = useState(false);
+  const [loadingOlderMessages, setLoadingOlderMessages] = useState(false);
   
   // Enhanced chat functionality state
   const [showNewChatModal, setShowNewChatModal] = useState(false);
@@ -139,6 +148,10 @@ export default function ChatsScreen() {
   const abortControllerRef = useRef<AbortController | null>(null);
   
   const messagesRef = useRef<FlatList>(null);
+  // Set while older messages are prepended so the list does not jump to the bottom
+  const skipAutoScrollRef = useRef(false);
+  const messagesStateRef = useRef<ChatMessage[]>([]);
+  messagesStateRef.current = messages;
 
   // Animation states for bouncing balls
   const ball1Anim = useRef(new Animated.Value(0)).current;
@@ -232,6 +245,40 @@ export default function ChatsScreen() {
     };
   }, []);
 
+  // Live updates for user-to-user chats instead of reloading the message list
+  useEffect(() => {
+    if (!selectedChat || messagesLoading) return;
+    if (selectedChat.type !== 'user_direct' && selectedChat.type !== 'workspace') return;
+
+    const lastMessageId = messagesStateRef.current.reduce((max, message) => Math.max(max, message.id), 0);
+    const subscription: ChatSubscription = subscribeToChat(selectedChat.id, lastMessageId, (incoming) => {
+      const isOwn = !!user && incoming.sender?.id === Number(user.id);
+      // Own messages are already shown optimistically by sendMessage
+      if (isOwn) return;
+
+      setMessages(prev => prev.some(message => message.id === incoming.id) ? prev : [
+        ...prev,
+        {
+          id: incoming.id,
+          content: incoming.content,
+          sender: incoming.sender ? { email: '', ...incoming.sender } : null,
+          is_own_message: false,
+          created_at: incoming.created_at,
+        },
+      ]);
+      setChats(prev => prev.map(chat =>
+        chat.id === selectedChat.id
+          ? { ...chat, last_message: incoming.content, updated_at: incoming.created_at }
+          : chat
+      ));
+    }, () => {
+      // Missed more than the server replays: reload the newest page instead of leaving a gap
+      loadMessages(selectedChat.id);
+    });
+
+    return () => subscription.close();
+  }, [selectedChat?.id, selectedChat?.type, messagesLoading]);
+
   // Filter data based on search query
   useEffect(() => {
     if (!searchQuery.trim()) {
@@ -528,15 +575,17 @@ export default function ChatsScreen() {
   const loadMessages = async (chatId: number) => {
     try {
       setMessagesLoading(true);
+      setHasOlderMessages(false);
       
       // Try the mobile messages endpoint first, but fall back to welcome message
       try {
-        const response = await api.getChatMessages(chatId);
+        const response = await api.getChatMessages(chatId, { limit: MESSAGES_PAGE_SIZE });
         
         if (response.success) {
           const messageData = response.messages || [];
           if (messageData.length > 0) {
             setMessages(messageData);
+            setHasOlderMessages(!!response.has_more);
             return;
           }
         }
@@ -570,6 +619,32 @@ export default function ChatsScreen() {
     }
   };
 
+  const loadOlderMessages = async () => {
+    if (!selectedChat || loadingOlderMessages || !hasOlderMessages || messages.length === 0) return;
+
+    try {
+      setLoadingOlderMessages(true);
+      const response = await api.getChatMessages(selectedChat.id, {
+        beforeId: messages[0].id,
+        limit: MESSAGES_PAGE_SIZE,
+      });
+
+      if (response.success) {
+        const olderMessages: ChatMessage[] = response.messages || [];
+        skipAutoScrollRef.current = olderMessages.length > 0;
+        setMessages(prev => {
+          const loadedIds = new Set(prev.map(message => message.id));
+          return [...olderMessages.filter(message => !loadedIds.has(message.id)), ...prev];
+        });
+        setHasOlderMessages(!!response.has_more);
+      }
+    } catch (error) {
+      console.error('Failed to load older messages:', error);
+    } finally {
+      setLoadingOlderMessages(false);
+    }
+  };
+
   const sendMessage = async () => {
     if (!selectedChat || !newMessage.trim()) return;
 
@@ -595,48 +670,29 @@ export default function ChatsScreen() {
       let response;
       
       if (selectedChat.type === 'ai_assistant' || selectedChat.type === 'document_focused' || selectedChat.type === 'bookmark_focused') {
-        // Build context for AI
+        // Retrieval scope is sent as structured filters; the server resolves it to a
+        // file-id set and restricts the vector search, so the prompt only carries the question
         let chatContext = userMessage.content;
+        let searchFilters: ChatScopeFilters = {};
         
         if (selectedChat.type === 'document_focused' && selectedChat.document_context) {
-          chatContext = `Document: ${selectedChat.document_context.name}\nQuestion: ${userMessage.content}`;
+          searchFilters = {
+            document_ids: [selectedChat.document_context.id],
+            context_type: 'document'
+          };
         } else if (selectedChat.type === 'bookmark_focused' && selectedChat.bookmark_context) {
-          chatContext = `Bookmark Collection: ${selectedChat.bookmark_context.name} (${selectedChat.bookmark_context.file_count} files)\nDescription: ${selectedChat.bookmark_context.description}\nQuestion: ${userMessage.content}`;
+          searchFilters = {
+            bookmark_id: selectedChat.bookmark_context.id,
+            context_type: 'bookmark'
+          };
         }
         
-        // Add mention context if available
+        // A mention narrows the scope for the rest of the chat session
         if (selectedMention) {
           console.log('📎 Persistent mention active:', selectedMention);
-          chatContext += `\n\nContext: This message mentions a ${selectedMention.type} called "${selectedMention.name}".`;
-          
-          if (selectedMention.type === 'bookmark' && selectedMention.data.file_count) {
-            chatContext += ` This bookmark contains ${selectedMention.data.file_count} files.`;
-            // Add specific instruction for bookmark-focused search
-            chatContext += ` IMPORTANT: Search and provide answers ONLY from documents within the "${selectedMention.name}" bookmark collection. Do not use information from other bookmarks or documents.`;
-          } else if (selectedMention.type === 'user' && selectedMention.data.email) {
-            chatContext += ` User email: ${selectedMention.data.email}.`;
-            // Focus on user-related content
-            chatContext += ` IMPORTANT: Focus on information related to this specific user when searching documents.`;
-          } else if (selectedMention.type === 'workspace' && selectedMention.data.member_count) {
-            chatContext += ` This workspace has ${selectedMention.data.member_count} members.`;
-            // Focus on workspace-specific content
-            chatContext += ` IMPORTANT: Search and provide answers ONLY from documents within the "${selectedMention.name}" workspace. Do not use information from other workspaces.`;
-          } else if (selectedMention.type === 'file' && selectedMention.data.category) {
-            chatContext += ` File category: ${selectedMention.data.category}.`;
-            // Focus on specific file
-            chatContext += ` IMPORTANT: Search and provide answers ONLY from the "${selectedMention.name}" document. Do not use information from other files.`;
-          }
-        }
-        
-        // Prepare filters for context-aware search
-        let searchFilters = {};
-        if (selectedMention) {
           if (selectedMention.type === 'bookmark') {
-            // Filter to only search within this bookmark's documents
-            const bookmarkDocumentIds = selectedMention.data.documents?.map((doc: any) => doc.id) || [];
             searchFilters = {
               bookmark_id: selectedMention.id,
-              document_ids: bookmarkDocumentIds,
               context_type: 'bookmark'
             };
           } else if (selectedMention.type === 'workspace') {
@@ -650,6 +706,7 @@ export default function ChatsScreen() {
               context_type: 'document'
             };
           } else if (selectedMention.type === 'user') {
+            chatContext += `\n\nContext: This message mentions the user "${selectedMention.name}"${selectedMention.data.email ? ` (${selectedMention.data.email})` : ''}.`;
             searchFilters = {
               user_id: selectedMention.id,
               context_type: 'user'
@@ -1205,7 +1262,26 @@ export default function ChatsScreen() {
                 <RefreshControl refreshing={refreshing} onRefresh={onRefresh} />
               }
               showsVerticalScrollIndicator={false}
-              onContentSizeChange={() => messagesRef.current?.scrollToEnd({ animated: true })}
+              onContentSizeChange={() => {
+                if (skipAutoScrollRef.current) {
+                  skipAutoScrollRef.current = false;
+                  return;
+                }
+                messagesRef.current?.scrollToEnd({ animated: true });
+              }}
+              ListHeaderComponent={hasOlderMessages ? (
+                <TouchableOpacity
+                  style={styles.loadOlderButton}
+                  onPress={loadOlderMessages}
+                  disabled={loadingOlderMessages}
+                >
+                  {loadingOlderMessages ? (
+                    <ActivityIndicator size="small" color="#007AFF" />
+                  ) : (
+                    <Text style={styles.loadOlderText}>Load older messages</Text>
+                  )}
+                </TouchableOpacity>
+              ) : null}
               keyboardShouldPersistTaps="handled"
               keyboardDismissMode="interactive"
               onTouchStart={() => setShowQuickChatTypes(false)}
@@ -1747,6 +1823,16 @@ const styles = StyleSheet.create({
   messagesContent: {
     paddingVertical: 8,
   },
+  loadOlderButton: {
+    alignSelf: 'center',
+    paddingVertical: 8,
+    paddingHorizontal: 16,
+    marginBottom: 8,
+  },
+  loadOlderText: {
+    color: '#007AFF',
+    fontSize: 14,
+  },
   messageContainer: {
     paddingHorizontal: 16,
     paddingVertical: 4,
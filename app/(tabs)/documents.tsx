@@ -19,7 +19,7 @@ import {
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { ExternalFilePicker } from '../../components/ExternalFilePicker';
 import { API_BASE_URL } from '../../constants/Config';
-import { apiClient } from '../../services/api';
+import { apiClient, FileSuggestion } from '../../services/api';
 import { ExternalFile } from '../../services/externalFileServices';
 import { useAuth } from '../context/auth';
 
@@ -48,6 +48,12 @@ interface ApiDocument {
 }
 
 type SortOption = 'name' | 'date' | 'size' | 'type';
+
+// Suggestions come from an in-memory index and can follow every keystroke;
+// the full (database) search waits until typing pauses
+const SUGGEST_DEBOUNCE_MS = 120;
+const SEARCH_DEBOUNCE_MS = 400;
+const SUGGESTION_LIMIT = 8;
 type FilterOption = 'all' | 'documents' | 'receipts' | 'forms' | 'unknown';
 
 export default function DocumentsScreen() {
@@ -56,6 +62,10 @@ export default function DocumentsScreen() {
   const [documents, setDocuments] = useState<Document[]>([]);
 
   const [searchQuery, setSearchQuery] = useState('');
+  const [debouncedQuery, setDebouncedQuery] = useState('');
+  const [suggestions, setSuggestions] = useState<FileSuggestion[]>([]);
+  // Set when a search is submitted or a suggestion picked; typing clears it
+  const [searchSubmitted, setSearchSubmitted] = useState(false);
   const [sortBy, setSortBy] = useState<SortOption>('date');
   const [filterBy, setFilterBy] = useState<FilterOption>('all');
   const [refreshing, setRefreshing] = useState(false);
@@ -207,13 +217,13 @@ export default function DocumentsScreen() {
   const loadDocuments = async () => {
     try {
       setLoading(true);
-      console.log('📂 Loading documents with filters:', { searchQuery, filterBy });
+      console.log('📂 Loading documents with filters:', { debouncedQuery, filterBy });
       
       // Map filter option to the expected backend parameter
       const categoryFilter = filterBy === 'all' ? undefined : filterBy;
       console.log('📂 Sending category filter:', categoryFilter);
       
-      const response = await apiClient.getFiles(1, 50, searchQuery || undefined, categoryFilter);
+      const response = await apiClient.getFiles(1, 50, debouncedQuery || undefined, categoryFilter);
       //console.log('📂 Documents API response:', response);
       
       if (response.success) {
@@ -291,7 +301,50 @@ export default function DocumentsScreen() {
     if (user) {
       loadDocuments();
     }
-  }, [user, searchQuery, filterBy]);
+  }, [user, debouncedQuery, filterBy]);
+
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedQuery(searchQuery.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
+
+  useEffect(() => {
+    const query = searchQuery.trim();
+    if (!user || !query || searchSubmitted) {
+      setSuggestions([]);
+      return;
+    }
+
+    // Abort the previous keystroke's request so a slow response cannot overwrite a newer one
+    const controller = new AbortController();
+    const timer = setTimeout(() => {
+      apiClient.suggestFiles(query, SUGGESTION_LIMIT, controller.signal)
+        .then(results => {
+          if (!controller.signal.aborted) setSuggestions(results);
+        })
+        .catch(() => setSuggestions([]));
+    }, SUGGEST_DEBOUNCE_MS);
+
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [user, searchQuery, searchSubmitted]);
+
+  const handleSearchChange = (text: string) => {
+    setSearchQuery(text);
+    setSearchSubmitted(false);
+  };
+
+  const runSearch = (query: string) => {
+    setSearchQuery(query);
+    setDebouncedQuery(query.trim());
+    setSuggestions([]);
+    setSearchSubmitted(true);
+  };
+
+  // Kept while typing pauses (the debounced search catches up) until a search is submitted or picked
+  const showSuggestions = suggestions.length > 0 && !searchSubmitted;
 
   const handleDocumentPress = (document: Document) => {
     if (document.status === 'processing') {
@@ -796,15 +849,37 @@ export default function DocumentsScreen() {
           style={styles.searchInput}
           placeholder="Search documents, tags, or categories..."
           value={searchQuery}
-          onChangeText={setSearchQuery}
+          onChangeText={handleSearchChange}
+          onSubmitEditing={() => runSearch(searchQuery)}
+          returnKeyType="search"
         />
         {searchQuery.length > 0 && (
-          <TouchableOpacity onPress={() => setSearchQuery('')}>
+          <TouchableOpacity onPress={() => runSearch('')}>
             <Ionicons name="close-circle" size={20} color="#666" />
           </TouchableOpacity>
         )}
       </View>
 
+      {/* Search-as-you-type suggestions */}
+      {showSuggestions && (
+        <View style={styles.suggestionsContainer}>
+          {suggestions.map(suggestion => (
+            <TouchableOpacity
+              key={suggestion.id}
+              style={styles.suggestionItem}
+              onPress={() => runSearch(suggestion.name)}
+            >
+              <Ionicons
+                name={getFileIcon(getFileTypeFromExtension(suggestion.name), 'processed', normalizeCategory(suggestion.kind)) as any}
+                size={16}
+                color="#666"
+              />
+              <Text style={styles.suggestionText} numberOfLines={1}>{suggestion.name}</Text>
+            </TouchableOpacity>
+          ))}
+        </View>
+      )}
+
       {/* Filters */}
       <View style={styles.filtersContainer}>
         <FlatList
@@ -977,6 +1052,26 @@ const styles = StyleSheet.create({
     fontSize: 16,
     color: '#333',
   },
+  suggestionsContainer: {
+    backgroundColor: '#fff',
+    marginHorizontal: 16,
+    marginTop: 4,
+    borderRadius: 8,
+    borderWidth: 1,
+    borderColor: '#e5e5e5',
+  },
+  suggestionItem: {
+    flexDirection: 'row',
+    alignItems: 'center',
+    paddingHorizontal: 12,
+    paddingVertical: 10,
+    gap: 8,
+  },
+  suggestionText: {
+    flex: 1,
+    fontSize: 15,
+    color: '#333',
+  },
   filtersContainer: {
     marginTop: 16,
   },
@@ -40,17 +40,44 @@ const api = {
     const data = await response.json();
     return { data };
   },
-  post: async (url: string, data: FormData, options?: any): Promise<{ data: any }> => {
-    const response = await fetch(`${API_BASE_URL}${url}`, {
-      method: 'POST',
-      body: data,
-      ...options,
-    });
-    const responseData = await response.json();
-    return { data: responseData };
-  },
 };
 
+// Files are sent to the bulk endpoint in batches, so the link is validated and
+// the File rows committed once per batch instead of once per file
+const UPLOAD_BATCH_SIZE = 25;
+
+const uploadBatch = (
+  url: string,
+  data: FormData,
+  fileCount: number,
+  onProgress: (progress: number) => void
+): Promise<{ data: any }> =>
+  new Promise((resolve, reject) => {
+    // fetch has no upload progress in React Native; XMLHttpRequest does
+    const xhr = new XMLHttpRequest();
+    xhr.open('POST', `${API_BASE_URL}${url}`);
+    xhr.setRequestHeader('X-Upload-Count', String(fileCount));
+    xhr.upload.onprogress = (event) => {
+      if (event.lengthComputable) {
+        onProgress(Math.round((event.loaded * 100) / event.total));
+      }
+    };
+    xhr.onload = () => {
+      try {
+        const responseData = JSON.parse(xhr.responseText);
+        if (xhr.status >= 400) {
+          reject(new Error(responseData.message || `Upload failed (${xhr.status})`));
+        } else {
+          resolve({ data: responseData });
+        }
+      } catch {
+        reject(new Error(`Upload failed (${xhr.status})`));
+      }
+    };
+    xhr.onerror = () => reject(new Error('Network error'));
+    xhr.send(data);
+  });
+
 export default function PublicUploadScreen() {
   const { token } = useLocalSearchParams<{ token: string }>();
   const router = useRouter();
@@ -140,58 +167,60 @@ export default function PublicUploadScreen() {
 
     setUploading(true);
     const newProgress: { [key: string]: number } = {};
+    selectedFiles.forEach((file, i) => {
+      newProgress[`${file.name}_${i}`] = 0;
+    });
+    setUploadProgress({ ...newProgress });
 
+    let uploaded = 0;
     try {
-      for (let i = 0; i < selectedFiles.length; i++) {
-        const file = selectedFiles[i];
-        const fileKey = `${file.name}_${i}`;
-        newProgress[fileKey] = 0;
-        setUploadProgress({ ...newProgress });
+      for (let start = 0; start < selectedFiles.length; start += UPLOAD_BATCH_SIZE) {
+        const batch = selectedFiles.slice(start, start + UPLOAD_BATCH_SIZE);
+        const batchKeys = batch.map((file, offset) => `${file.name}_${start + offset}`);
 
         const formData = new FormData();
-        formData.append('file', {
-          uri: file.uri,
-          name: file.name,
-          type: file.type,
-        } as any);
+        batch.forEach(file => {
+          formData.append('files', {
+            uri: file.uri,
+            name: file.name,
+            type: file.type,
+          } as any);
+        });
 
         try {
-          const response = await api.post(`/upload-to/${token}`, formData, {
-            headers: {
-              'Content-Type': 'multipart/form-data',
-            },
-            onUploadProgress: (progressEvent: any) => {
-              if (progressEvent.total) {
-                const progress = Math.round(
-                  (progressEvent.loaded * 100) / progressEvent.total
-                );
-                newProgress[fileKey] = progress;
-                setUploadProgress({ ...newProgress });
-              }
-            },
+          const response = await uploadBatch(`/upload-to/${token}/bulk`, formData, batch.length, (progress) => {
+            batchKeys.forEach(key => {
+              newProgress[key] = progress;
+            });
+            setUploadProgress({ ...newProgress });
           });
 
           if (response.data.success) {
-            newProgress[fileKey] = 100;
+            batchKeys.forEach(key => {
+              newProgress[key] = 100;
+            });
             setUploadProgress({ ...newProgress });
+            uploaded += response.data.uploaded || batch.length;
           }
-        } catch (fileError) {
-          console.error(`Failed to upload ${file.name}:`, fileError);
-          Alert.alert('Upload Error', `Failed to upload ${file.name}`);
+        } catch (batchError: any) {
+          console.error('Failed to upload batch:', batchError);
+          Alert.alert('Upload Error', batchError.message || 'Failed to upload files');
           break;
         }
       }
 
-      Alert.alert('Success', 'Files uploaded successfully!', [
-        { 
-          text: 'OK', 
-          onPress: () => {
-            setSelectedFiles([]);
-            setUploadProgress({});
-            loadUploadInfo(); // Refresh upload info
+      if (uploaded > 0) {
+        Alert.alert('Success', `${uploaded} ${uploaded === 1 ? 'file' : 'files'} uploaded successfully!`, [
+          {
+            text: 'OK',
+            onPress: () => {
+              setSelectedFiles([]);
+              setUploadProgress({});
+              loadUploadInfo(); // Refresh upload info
+            }
           }
-        }
-      ]);
+        ]);
+      }
     } catch (error) {
       console.error('Upload failed:', error);
       Alert.alert('Error', 'Failed to upload files');
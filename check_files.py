@@ -1,5 +1,6 @@
 from flask import Flask
 from shared import db, File, User
+from server.file_search import search_files
 import os
 
 # Create Flask app
@@ -42,32 +43,28 @@ with app.app_context():
             print('   ---')
             print()
             
-        # Search for any files with "assign" in the name
+        # Search for any files with "assign" in the name or text
         print('🔍 Searching specifically for assignment-related files...')
-        assignment_files = db.session.query(File).filter(
-            File.user_id == user.id,
-            File.original_filename.ilike('%assign%')
-        ).all()
-        
+        results, _ = search_files(user.id, 'assign', per_page=100)
+        assignment_files = [(db.session.get(File, r['file_id']), r) for r in results]
+
         if assignment_files:
             print(f'📋 Found {len(assignment_files)} assignment files:')
-            for file in assignment_files:
-                print(f'   - {file.original_filename} (ID: {file.id})')
+            for file, result in assignment_files:
+                print(f'   - {file.original_filename} (ID: {file.id}, matched in {result["matched_in"]})')
         else:
-            print('❌ No files found with "assign" in the name')
+            print('❌ No files found with "assign" in the name or text')
             
         # Also search for any files with common assignment keywords
         keywords = ['homework', 'hw', 'cosc', 'syllabus', 'assignment', 'project']
         for keyword in keywords:
-            keyword_files = db.session.query(File).filter(
-                File.user_id == user.id,
-                File.original_filename.ilike(f'%{keyword}%')
-            ).all()
-            
+            results, _ = search_files(user.id, keyword, per_page=100)
+            keyword_files = [(db.session.get(File, r['file_id']), r) for r in results]
+
             if keyword_files:
                 print(f'🔍 Files containing "{keyword}":')
-                for file in keyword_files:
-                    print(f'   - {file.original_filename} (ID: {file.id})')
+                for file, result in keyword_files:
+                    print(f'   - {file.original_filename} (ID: {file.id}, matched in {result["matched_in"]})')
                     
     else:
         print('❌ User francis not found') 
\ No newline at end of file
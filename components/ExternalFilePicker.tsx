@@ -51,7 +51,10 @@ export function ExternalFilePicker({
   const [selectedService, setSelectedService] = useState<'dropbox' | 'googledrive' | null>(null);
   const [files, setFiles] = useState<ExternalFile[]>([]);
   const [loading, setLoading] = useState(false);
-  const [importing, setImporting] = useState<string | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [importProgress, setImportProgress] = useState<Record<string, number>>({});
+  const [selectedFiles, setSelectedFiles] = useState<Record<string, ExternalFile>>({});
   const [currentPath, setCurrentPath] = useState<string>('');
   const [currentFolderId, setCurrentFolderId] = useState<string>('root');
   const [authenticated, setAuthenticated] = useState<Record<string, boolean>>({});
@@ -135,6 +138,7 @@ export function ExternalFilePicker({
 
       if (result.success && result.files) {
         setFiles(result.files);
+        setNextCursor(result.nextCursor || null);
       } else {
         Alert.alert('Error', result.error || 'Failed to load files');
       }
@@ -146,8 +150,42 @@ export function ExternalFilePicker({
     }
   };
 
+  const toggleFileSelection = (file: ExternalFile) => {
+    if (!externalFileService.canDownload(file)) return;
+    setSelectedFiles(prev => {
+      const next = { ...prev };
+      if (next[file.id]) {
+        delete next[file.id];
+      } else {
+        next[file.id] = file;
+      }
+      return next;
+    });
+  };
+
+  const loadMoreFiles = async () => {
+    if (!selectedService || !nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const result = selectedService === 'dropbox'
+        ? await externalFileService.getDropboxFiles(currentPath, nextCursor)
+        : await externalFileService.getGoogleDriveFiles(currentFolderId, nextCursor);
+
+      if (result.success && result.files) {
+        setFiles(prev => [...prev, ...result.files!]);
+        setNextCursor(result.nextCursor || null);
+      }
+    } catch (error) {
+      console.error('Error loading more files:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleFileSelect = (file: ExternalFile) => {
-    if (externalFileService.isFolder(file)) {
+    if (Object.keys(selectedFiles).length > 0 && externalFileService.canDownload(file)) {
+      toggleFileSelection(file);
+    } else if (externalFileService.isFolder(file)) {
       // Navigate into folder
       if (file.service === 'dropbox') {
         setCurrentPath(file.path_display || '');
@@ -158,43 +196,52 @@ export function ExternalFilePicker({
       }
     } else if (externalFileService.canDownload(file)) {
       // Import file
-      handleFileImport(file);
+      handleFilesImport([file]);
     }
   };
 
-  const handleFileImport = async (file: ExternalFile) => {
+  const handleFilesImport = async (filesToImport: ExternalFile[]) => {
+    if (filesToImport.length === 0) return;
     try {
-      setImporting(file.id);
-      
-      const result = await externalFileService.downloadFromExternalService(
-        file.service,
-        file.id,
-        file.name,
-        (progress) => {
-          console.log(`Import progress: ${progress}%`);
+      setSelectedFiles({});
+      setImportProgress(Object.fromEntries(filesToImport.map(file => [file.id, 0])));
+
+      const result = await externalFileService.importFiles(
+        filesToImport[0].service,
+        filesToImport,
+        (job) => {
+          setImportProgress(Object.fromEntries(job.files.map(file => [file.file_id, file.progress])));
         }
       );
 
+      const importedIds = new Set(
+        (result.job?.files || []).filter(file => file.status === 'done').map(file => file.file_id)
+      );
+      const imported = filesToImport.filter(file => importedIds.has(file.id));
+      imported.forEach(file => onFileImport(file));
+
       if (result.success) {
         Alert.alert(
-          'File imported successfully!',
-          `"${file.name}" has been added to your documents`
+          imported.length === 1 ? 'File imported successfully!' : 'Files imported successfully!',
+          imported.length === 1
+            ? `"${imported[0].name}" has been added to your documents`
+            : `${imported.length} files have been added to your documents`
         );
-        onFileImport(file);
         if (onImportSuccess) {
           onImportSuccess();
         }
-      } else {
+      }
+      if (result.error) {
         Alert.alert(
           'Import Failed',
-          result.error || 'Failed to import file'
+          result.error
         );
       }
     } catch (error: any) {
       console.error('File import error:', error);
       Alert.alert('Error', error.message || 'Failed to import file');
     } finally {
-      setImporting(null);
+      setImportProgress({});
     }
   };
 
@@ -214,6 +261,7 @@ export function ExternalFilePicker({
       // Go back to service selection
       setSelectedService(null);
       setFiles([]);
+      setSelectedFiles({});
       setCurrentPath('');
       setCurrentFolderId('root');
     }
@@ -237,11 +285,15 @@ export function ExternalFilePicker({
     </TouchableOpacity>
   );
 
+  const isImporting = Object.keys(importProgress).length > 0;
+  const selectedCount = Object.keys(selectedFiles).length;
+
   const renderFileItem = ({ item }: { item: ExternalFile }) => (
     <TouchableOpacity
-      style={styles.fileItem}
+      style={[styles.fileItem, selectedFiles[item.id] && styles.fileItemSelected]}
       onPress={() => handleFileSelect(item)}
-      disabled={importing === item.id}
+      onLongPress={() => toggleFileSelection(item)}
+      disabled={isImporting}
     >
       <View style={styles.fileContent}>
         <View style={styles.fileIcon}>
@@ -261,8 +313,10 @@ export function ExternalFilePicker({
             </Text>
           )}
         </View>
-        {importing === item.id ? (
-          <ActivityIndicator size="small" color="#3B82F6" />
+        {importProgress[item.id] !== undefined ? (
+          <Text style={styles.importProgressText}>{importProgress[item.id]}%</Text>
+        ) : selectedFiles[item.id] ? (
+          <Ionicons name="checkmark-circle" size={20} color="#3B82F6" />
         ) : (
           <Ionicons
             name={externalFileService.isFolder(item) ? 'chevron-forward' : 'download'}
@@ -310,6 +364,11 @@ export function ExternalFilePicker({
               renderItem={renderFileItem}
               contentContainerStyle={styles.fileList}
               showsVerticalScrollIndicator={false}
+              onEndReached={loadMoreFiles}
+              onEndReachedThreshold={0.5}
+              ListFooterComponent={
+                loadingMore ? <ActivityIndicator size="small" color="#3B82F6" style={styles.loadMoreIndicator} /> : null
+              }
               ListEmptyComponent={
                 <View style={styles.emptyContainer}>
                   <Ionicons name="folder-open-outline" size={48} color="#9CA3AF" />
@@ -327,6 +386,19 @@ export function ExternalFilePicker({
             />
           )}
         </View>
+
+        {selectedService && selectedCount > 0 && (
+          <TouchableOpacity
+            style={styles.importButton}
+            onPress={() => handleFilesImport(Object.values(selectedFiles))}
+            disabled={isImporting}
+          >
+            <Ionicons name="cloud-download" size={20} color="#FFFFFF" />
+            <Text style={styles.importButtonText}>
+              Import {selectedCount} {selectedCount === 1 ? 'file' : 'files'}
+            </Text>
+          </TouchableOpacity>
+        )}
       </SafeAreaView>
     </Modal>
   );
@@ -402,6 +474,30 @@ const styles = StyleSheet.create({
     marginBottom: 8,
     padding: 12,
   },
+  fileItemSelected: {
+    borderWidth: 1,
+    borderColor: '#3B82F6',
+  },
+  importProgressText: {
+    fontSize: 14,
+    fontWeight: '600',
+    color: '#3B82F6',
+  },
+  importButton: {
+    flexDirection: 'row',
+    alignItems: 'center',
+    justifyContent: 'center',
+    margin: 16,
+    paddingVertical: 14,
+    borderRadius: 12,
+    backgroundColor: '#3B82F6',
+  },
+  importButtonText: {
+    marginLeft: 8,
+    fontSize: 16,
+    fontWeight: '600',
+    color: '#FFFFFF',
+  },
   fileContent: {
     flexDirection: 'row',
     alignItems: 'center',
@@ -422,6 +518,9 @@ const styles = StyleSheet.create({
     fontSize: 14,
     color: '#6B7280',
   },
+  loadMoreIndicator: {
+    paddingVertical: 16,
+  },
   emptyContainer: {
     flex: 1,
     justifyContent: 'center',
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Script to create the index used for bookmark-scoped chat retrieval
+/chat/send resolves `bookmark_id` to file ids through BookmarkFile on every message
+"""
+
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'manager-francis', 'backend'))
+
+from model import init_models
+from shared import db, BookmarkFile
+from app import app
+from sqlalchemy import text
+
+INDEX_NAME = 'ix_bookmark_files_bookmark_id_file_id'
+
+def create_bookmark_file_index():
+    """Create a (bookmark_id, file_id) index so scope lookups are index-only scans"""
+
+    with app.app_context():
+        # Initialize models to ensure they're registered
+        models = init_models()
+
+        table_name = BookmarkFile.__table__.name
+        inspector = db.inspect(db.engine)
+        existing_indexes = [index['name'] for index in inspector.get_indexes(table_name)]
+
+        if INDEX_NAME in existing_indexes:
+            print(f"✅ Index {INDEX_NAME} already exists!")
+            return
+
+        try:
+            # CONCURRENTLY cannot run inside a transaction block
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                connection.execute(text(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} '
+                    f'ON {table_name} (bookmark_id, file_id)'
+                ))
+            print(f"✅ Created index {INDEX_NAME} on {table_name}")
+
+        except Exception as e:
+            print(f"❌ Error creating index: {str(e)}")
+            raise
+
+if __name__ == "__main__":
+    print("🚀 Creating bookmark file index...")
+
+    try:
+        create_bookmark_file_index()
+        print("\n✅ Index setup completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Setup failed: {str(e)}")
+        sys.exit(1)
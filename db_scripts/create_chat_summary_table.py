@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Script to create the chat_summaries table
+Stores the rolling summary of older turns used by server/chat_history.py
+"""
+
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'manager-francis', 'backend'))
+
+from shared import db
+from app import app
+from sqlalchemy import text
+
+def create_chat_summary_table():
+    """Create the chat_summaries table"""
+
+    with app.app_context():
+        inspector = db.inspect(db.engine)
+        if 'chat_summaries' in inspector.get_table_names():
+            print("✅ chat_summaries table already exists!")
+            return
+
+        try:
+            db.session.execute(text("""
+                CREATE TABLE IF NOT EXISTS chat_summaries (
+                    chat_kind VARCHAR(32) NOT NULL,
+                    chat_id INTEGER NOT NULL,
+                    summary TEXT NOT NULL DEFAULT '',
+                    summarized_through_id INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                    PRIMARY KEY (chat_kind, chat_id)
+                )
+            """))
+            db.session.commit()
+            print("✅ Successfully created chat_summaries table!")
+
+        except Exception as e:
+            print(f"❌ Error creating table: {str(e)}")
+            db.session.rollback()
+            raise
+
+if __name__ == "__main__":
+    print("🚀 Creating chat summary table...")
+
+    try:
+        create_chat_summary_table()
+        print("\n✅ Chat summary setup completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Setup failed: {str(e)}")
+        sys.exit(1)
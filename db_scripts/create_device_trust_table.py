@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Script to create the user_device_trust table
+Known devices and their trust expiry per user, read in one query by
+server/risk_engine.py when scoring Enhanced 2FA logins
+"""
+
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'manager-francis', 'backend'))
+
+from shared import db, User
+from app import app
+from sqlalchemy import text
+
+def create_device_trust_table():
+    """Create the user_device_trust table"""
+
+    with app.app_context():
+        inspector = db.inspect(db.engine)
+        if 'user_device_trust' in inspector.get_table_names():
+            print("✅ user_device_trust table already exists!")
+            return
+
+        try:
+            db.session.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS user_device_trust (
+                    user_id INTEGER NOT NULL REFERENCES {User.__table__.name} (id) ON DELETE CASCADE,
+                    device_fingerprint VARCHAR(255) NOT NULL,
+                    trusted_until TIMESTAMPTZ,
+                    last_seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    PRIMARY KEY (user_id, device_fingerprint)
+                )
+            """))
+            db.session.commit()
+            print("✅ Successfully created user_device_trust table!")
+
+        except Exception as e:
+            print(f"❌ Error creating table: {str(e)}")
+            db.session.rollback()
+            raise
+
+if __name__ == "__main__":
+    print("🚀 Creating device trust table...")
+
+    try:
+        create_device_trust_table()
+        print("\n✅ Device trust setup completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Setup failed: {str(e)}")
+        sys.exit(1)
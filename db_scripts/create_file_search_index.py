@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Script to create the file_search table behind ranked /files?search=
+Holds each file's name and extracted text with a stored tsvector (GIN) and a
+pg_trgm index on the name (server/file_search.py). Existing files are added
+by name; --content also fills their text from the Chroma chunks.
+
+    python db_scripts/create_file_search_index.py [--content]
+"""
+
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'manager-francis', 'backend'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared import db, File
+from app import app
+from sqlalchemy import text
+from server.file_search import NAME_CONFIG, SEARCH_TABLE, TEXT_CONFIG, backfill_content
+
+INDEXES = {
+    'ix_file_search_vector': (
+        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_file_search_vector '
+        f'ON {SEARCH_TABLE} USING gin (search_vector)'
+    ),
+    # Serves filename ILIKE '%term%' and similarity()
+    'ix_file_search_filename_trgm': (
+        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_file_search_filename_trgm '
+        f'ON {SEARCH_TABLE} USING gin (filename gin_trgm_ops)'
+    ),
+    'ix_file_search_user_id': (
+        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_file_search_user_id ON {SEARCH_TABLE} (user_id)'
+    ),
+}
+
+def create_file_search_table():
+    """Create the file_search table, its indexes, and entries for existing files"""
+
+    with app.app_context():
+        inspector = db.inspect(db.engine)
+
+        try:
+            if SEARCH_TABLE in inspector.get_table_names():
+                print(f"✅ {SEARCH_TABLE} table already exists")
+            else:
+                db.session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                # Filenames use the 'simple' config so names and codes are not stemmed away
+                db.session.execute(text(f"""
+                    CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} (
+                        file_id INTEGER PRIMARY KEY REFERENCES {File.__table__.name} (id) ON DELETE CASCADE,
+                        user_id INTEGER NOT NULL,
+                        filename TEXT NOT NULL DEFAULT '',
+                        content TEXT NOT NULL DEFAULT '',
+                        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                        search_vector TSVECTOR GENERATED ALWAYS AS (
+                            setweight(to_tsvector('{NAME_CONFIG}', filename), 'A') ||
+                            setweight(to_tsvector('{TEXT_CONFIG}', content), 'B')
+                        ) STORED
+                    )
+                """))
+                db.session.commit()
+                print(f"  ✓ {SEARCH_TABLE}")
+
+            result = db.session.execute(text(f"""
+                INSERT INTO {SEARCH_TABLE} (file_id, user_id, filename)
+                SELECT id, user_id, COALESCE(original_filename, filename, '') FROM {File.__table__.name}
+                ON CONFLICT (file_id) DO NOTHING
+            """))
+            db.session.commit()
+            print(f"  ✓ {result.rowcount} existing files added by name")
+
+        except Exception as e:
+            print(f"❌ Error creating table: {str(e)}")
+            db.session.rollback()
+            raise
+
+        existing_indexes = [index['name'] for index in db.inspect(db.engine).get_indexes(SEARCH_TABLE)]
+        for index_name, statement in INDEXES.items():
+            if index_name in existing_indexes:
+                print(f"✅ {index_name} already exists")
+                continue
+            # CONCURRENTLY cannot run inside a transaction block
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                connection.execute(text(statement))
+            print(f"  ✓ {index_name}")
+
+def backfill_from_chroma():
+    import chromadb
+    from server.chunk_reindex import COLLECTION_NAME
+
+    with app.app_context():
+        client = chromadb.PersistentClient(path='./manager-francis/backend/chroma_db')
+        filled = backfill_content(client.get_collection(COLLECTION_NAME))
+        print(f"  ✓ Text filled for {filled} files from their chunks")
+
+if __name__ == "__main__":
+    print("🚀 Creating file search index...")
+
+    try:
+        create_file_search_table()
+        if '--content' in sys.argv:
+            backfill_from_chroma()
+        print("\n✅ File search setup completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Setup failed: {str(e)}")
+        sys.exit(1)
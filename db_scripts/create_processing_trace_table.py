@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Script to create the file_processing_trace table
+One row per upload pipeline stage, written by server/pipeline_trace.py
+"""
+
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'manager-francis', 'backend'))
+
+from shared import db, File
+from app import app
+from sqlalchemy import text
+
+def create_processing_trace_table():
+    """Create the file_processing_trace table and its indexes"""
+
+    with app.app_context():
+        inspector = db.inspect(db.engine)
+        if 'file_processing_trace' in inspector.get_table_names():
+            print("✅ file_processing_trace table already exists!")
+            return
+
+        try:
+            db.session.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS file_processing_trace (
+                    id BIGSERIAL PRIMARY KEY,
+                    file_id INTEGER NOT NULL REFERENCES {File.__table__.name} (id) ON DELETE CASCADE,
+                    stage VARCHAR(16) NOT NULL,
+                    started_at TIMESTAMPTZ NOT NULL,
+                    duration_ms REAL NOT NULL,
+                    bytes_in BIGINT,
+                    chunks INTEGER,
+                    status VARCHAR(8) NOT NULL DEFAULT 'ok',
+                    error TEXT
+                )
+            """))
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS idx_processing_trace_file ON file_processing_trace (file_id)"
+            ))
+            # Reports scan recent rows only
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS idx_processing_trace_started ON file_processing_trace (started_at)"
+            ))
+            db.session.commit()
+            print("✅ Successfully created file_processing_trace table!")
+
+        except Exception as e:
+            print(f"❌ Error creating table: {str(e)}")
+            db.session.rollback()
+            raise
+
+if __name__ == "__main__":
+    print("🚀 Creating processing trace table...")
+
+    try:
+        create_processing_trace_table()
+        print("\n✅ Processing trace setup completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Setup failed: {str(e)}")
+        sys.exit(1)
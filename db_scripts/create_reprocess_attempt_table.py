@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Script to create the consistency_reprocess_attempt table
+One row per file the storage consistency checker sent back through
+processing (server/consistency.py), so a file with no extractable text is
+reprocessed once rather than on every run
+"""
+
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'manager-francis', 'backend'))
+
+from shared import db, File
+from app import app
+from sqlalchemy import text
+
+def create_reprocess_attempt_table():
+    """Create the consistency_reprocess_attempt table"""
+
+    with app.app_context():
+        inspector = db.inspect(db.engine)
+        if 'consistency_reprocess_attempt' in inspector.get_table_names():
+            print("✅ consistency_reprocess_attempt table already exists!")
+            return
+
+        try:
+            db.session.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS consistency_reprocess_attempt (
+                    file_id INTEGER PRIMARY KEY REFERENCES {File.__table__.name} (id) ON DELETE CASCADE,
+                    attempted_at TIMESTAMPTZ NOT NULL
+                )
+            """))
+            db.session.commit()
+            print("✅ Successfully created consistency_reprocess_attempt table!")
+
+        except Exception as e:
+            print(f"❌ Error creating table: {str(e)}")
+            db.session.rollback()
+            raise
+
+if __name__ == "__main__":
+    print("🚀 Creating reprocess attempt table...")
+
+    try:
+        create_reprocess_attempt_table()
+        print("\n✅ Reprocess attempt setup completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Setup failed: {str(e)}")
+        sys.exit(1)
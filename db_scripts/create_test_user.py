@@ -6,11 +6,12 @@ Script to create test user 'francis' with password 'password123'
 import os
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'manager-francis', 'backend'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from model import init_models
 from shared import db, User
 from app import app
-from werkzeug.security import generate_password_hash
+from server.password_hashing import password_hasher
 
 def create_test_user():
     """Create test user 'francis' with password 'password123'"""
@@ -30,7 +31,7 @@ def create_test_user():
             test_user = User(
                 username='francis',
                 email='francis@example.com',
-                password_hash=generate_password_hash('password123'),
+                password_hash=password_hasher.hash('password123'),
                 first_name='Francis',
                 last_name='Test',
                 is_active=True,
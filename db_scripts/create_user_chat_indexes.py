@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Script to create the indexes behind paginated user chat loading
+Adds a (chat_id, id) index on user_chat_messages for cursor pagination and a
+partial index on unread user_chat_notifications for the grouped unread counts
+"""
+
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'manager-francis', 'backend'))
+
+from model import init_models
+from shared import db
+from app import app
+from sqlalchemy import text
+
+INDEXES = {
+    # content stays out of INCLUDE: long messages would exceed the B-tree tuple size limit
+    'ix_user_chat_messages_chat_id_id': (
+        'user_chat_messages',
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_chat_messages_chat_id_id '
+        'ON user_chat_messages (chat_id, id DESC) INCLUDE (sender_id, message_type, created_at)'
+    ),
+    'ix_user_chat_notifications_unread': (
+        'user_chat_notifications',
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_chat_notifications_unread '
+        'ON user_chat_notifications (user_id, chat_id) WHERE is_read = FALSE'
+    ),
+}
+
+def create_user_chat_indexes():
+    """Create the user chat pagination and unread-count indexes"""
+
+    with app.app_context():
+        # Initialize models to ensure they're registered
+        models = init_models()
+
+        inspector = db.inspect(db.engine)
+        existing_tables = inspector.get_table_names()
+
+        for index_name, (table_name, statement) in INDEXES.items():
+            if table_name not in existing_tables:
+                print(f"⚠️  {table_name} does not exist - run create_user_chat_tables.py first")
+                continue
+
+            existing_indexes = [index['name'] for index in inspector.get_indexes(table_name)]
+            if index_name in existing_indexes:
+                print(f"✅ {index_name} already exists")
+                continue
+
+            try:
+                # CONCURRENTLY cannot run inside a transaction block
+                with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                    connection.execute(text(statement))
+                print(f"  ✓ {index_name}")
+
+            except Exception as e:
+                print(f"❌ Error creating {index_name}: {str(e)}")
+                raise
+
+if __name__ == "__main__":
+    print("🚀 Creating UserChat indexes...")
+
+    try:
+        create_user_chat_indexes()
+        print("\n✅ UserChat index setup completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Setup failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Report the slowest upload pipeline stages across recent uploads
+Reads file_processing_trace (server/pipeline_trace.py)
+
+    python db_scripts/processing_trace_report.py [hours] [file_id]
+"""
+
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'manager-francis', 'backend'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app import app
+from server.pipeline_trace import load_file_trace, load_recent_traces, summarize_stages, timeline
+
+def print_stage_report(hours):
+    rows = load_recent_traces(hours)
+    files = len({row['file_id'] for row in rows})
+    print(f"📊 {len(rows)} stage records from {files} uploads in the last {hours:g} h")
+    print("=" * 60)
+    if not rows:
+        print("⚠️ No traces recorded yet")
+        return
+
+    summary = summarize_stages(rows)
+    print(f"{'stage':10} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'total s':>9}")
+    for stage in summary:
+        print(f"{stage['stage']:10} {stage['count']:6} {stage['errors']:6} {stage['p50_ms']:9.1f} "
+              f"{stage['p95_ms']:9.1f} {stage['max_ms']:9.1f} {stage['total_ms'] / 1000:9.1f}")
+    print()
+    for stage in summary[:3]:
+        slowest = ', '.join(f"#{f['file_id']} ({f['duration_ms']:.0f} ms)" for f in stage['slowest_files'])
+        print(f"🐢 slowest {stage['stage']}: {slowest}")
+
+def print_file_timeline(file_id):
+    trace = timeline(load_file_trace(file_id))
+    print(f"📄 File {file_id}: {trace['total_ms']:.0f} ms, slowest stage {trace['slowest_stage']}")
+    print("=" * 60)
+    for stage in trace['stages']:
+        bar = '█' * max(1, int(stage['duration_ms'] / max(trace['total_ms'], 1) * 40))
+        extra = f" {stage['bytes_in']} B" if stage['bytes_in'] else ''
+        extra += f" {stage['chunks']} chunks" if stage['chunks'] else ''
+        status = '❌ ' + (stage['error'] or '') if stage['status'] == 'error' else ''
+        print(f"{stage['stage']:10} +{stage['offset_ms']:8.0f} ms {stage['duration_ms']:8.0f} ms {bar}{extra} {status}")
+
+if __name__ == "__main__":
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 24
+    file_id = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    try:
+        with app.app_context():
+            if file_id is not None:
+                print_file_timeline(file_id)
+            else:
+                print_stage_report(hours)
+    except Exception as e:
+        print(f"\n❌ Report failed: {str(e)}")
+        sys.exit(1)
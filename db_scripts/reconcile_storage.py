@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Reconcile File rows, uploads/ and the Chroma user_documents collection
+Reports drift between the three stores (server/consistency.py) and, with
+--repair, fixes it at a bounded rate: orphan chunks are deleted and orphan
+files are moved to uploads/.orphaned/. Rows without chunks are re-queued
+(once per file, see db_scripts/create_reprocess_attempt_table.py) only where
+the backend passes its processing pipeline as `reprocess`.
+
+    python db_scripts/reconcile_storage.py [--repair] [--rate 2] [--daemon]
+"""
+
+import json
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'manager-francis', 'backend'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import chromadb
+from app import app
+from server.chunk_reindex import COLLECTION_NAME
+from server.consistency import INTERVAL_SECONDS, REPAIR_RATE, ConsistencyChecker, run_daemon
+
+def print_report(report):
+    print(f"📊 Checked {report.rows_checked} rows, {report.chunks_checked} chunks, "
+          f"{report.disk_files_checked} files on disk in {report.elapsed_seconds:.1f}s")
+    print("=" * 60)
+    labels = {
+        'missing_on_disk': 'rows whose file is missing on disk (chunks remain)',
+        'missing_chunks': 'rows with no chunks in Chroma',
+        'no_text': 'rows still without chunks after reprocessing (no extractable text)',
+        'lost': 'rows with neither a file nor chunks',
+        'orphan_chunks': 'chunks whose File row no longer exists',
+        'unattributed_chunks': 'chunks with no file_id (left alone)',
+        'orphan_files': 'files on disk with no File row',
+    }
+    for kind, label in labels.items():
+        count = report.counts.get(kind, 0)
+        repaired = report.repaired.get(kind, 0)
+        print(f"{'✅' if count == 0 else '⚠️ '} {count:6} {label}" + (f" ({repaired} repaired)" if repaired else ''))
+        if count:
+            print(f"         e.g. {json.dumps(report.samples.get(kind, [])[:10])}")
+
+if __name__ == "__main__":
+    repair = '--repair' in sys.argv
+    rate = float(sys.argv[sys.argv.index('--rate') + 1]) if '--rate' in sys.argv else REPAIR_RATE
+
+    try:
+        with app.app_context():
+            client = chromadb.PersistentClient(path='./manager-francis/backend/chroma_db')
+            checker = ConsistencyChecker(collection=client.get_collection(COLLECTION_NAME),
+                                         upload_folder=app.config.get('UPLOAD_FOLDER', 'uploads'))
+            print(f"🔍 Reconciling storage{' with repairs at ' + str(rate) + '/s' if repair else ' (report only)'}...")
+            if '--daemon' in sys.argv:
+                run_daemon(checker, INTERVAL_SECONDS, repair=repair, repair_rate=rate, on_report=print_report)
+            else:
+                print_report(checker.run(repair=repair, repair_rate=rate))
+    except KeyboardInterrupt:
+        print("\n🛑 Stopped")
+    except Exception as e:
+        print(f"\n❌ Reconciliation failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,6 @@
+"""
+Backend-side helpers for the GrabDocs mobile API.
+
+These modules are imported by the Flask backend (manager-francis/backend),
+which provides the `shared` models and the Chroma `user_documents` collection.
+"""
@@ -0,0 +1,239 @@
+"""
+Semantic answer cache for /chat/send
+
+Near-identical questions about the same documents ("summarize Assignment 1")
+reuse a stored answer instead of running retrieval and generation again.
+An entry matches when the query embedding is within `similarity_threshold`
+(cosine) of the cached one, the scoped file-id set is the same and none of
+those files changed since the answer was generated.
+
+Freshness is checked on every read against version stamps taken from the
+database, so changes made by other workers or by bulk `query.delete()` are
+seen too: scoped answers compare each file's updated_at, unscoped answers a
+stamp of the owner's whole library (file count, newest id, latest update).
+
+    versions = file_versions(file_ids, user_id)
+    cached = answer_cache.lookup(user_id, embedding, file_ids, versions)
+    ...
+    answer_cache.store(user_id, embedding, file_ids, versions, response, citations, generation_ms)
+
+The SQLAlchemy listeners additionally drop entries in this process as soon as
+a File changes, which frees their memory early:
+
+    from server.answer_cache import answer_cache
+    answer_cache.register_invalidation_listeners(File)
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+SIMILARITY_THRESHOLD = float(os.getenv('ANSWER_CACHE_SIMILARITY', '0.95'))
+MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', '5000'))
+TTL_SECONDS = int(os.getenv('ANSWER_CACHE_TTL_SECONDS', str(24 * 3600)))
+# Unscoped answers draw on the whole library; keep them for much less time
+UNSCOPED_TTL_SECONDS = int(os.getenv('ANSWER_CACHE_UNSCOPED_TTL_SECONDS', '900'))
+# versions key holding the library stamp of unscoped entries (File ids start at 1)
+LIBRARY_VERSION_KEY = 0
+
+ScopeKey = Optional[FrozenSet[int]]
+
+
+def _normalize(vector: Sequence[float]) -> Tuple[float, ...]:
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return tuple(value / norm for value in vector)
+
+
+@dataclass
+class CachedAnswer:
+    response: str
+    citations: List[Dict[str, Any]]
+    embedding: Tuple[float, ...]
+    user_id: int
+    scope: ScopeKey
+    versions: Dict[int, str]
+    generation_ms: float
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+
+class AnswerCache:
+
+    def __init__(self, similarity_threshold: float = SIMILARITY_THRESHOLD,
+                 max_entries: int = MAX_ENTRIES, ttl_seconds: int = TTL_SECONDS,
+                 unscoped_ttl_seconds: int = UNSCOPED_TTL_SECONDS):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.unscoped_ttl_seconds = unscoped_ttl_seconds
+
+        self._entries: 'OrderedDict[int, CachedAnswer]' = OrderedDict()
+        self._buckets: Dict[Tuple[int, ScopeKey], Set[int]] = {}
+        # file id -> entries scoped to it; ('user', id) -> that user's unscoped entries
+        self._dependents: Dict[Any, Set[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.latency_saved_ms = 0.0
+
+    # ==================== LOOKUP / STORE ====================
+
+    def lookup(self, user_id: int, embedding: Sequence[float], file_ids: Optional[Set[int]],
+               versions: Dict[int, str]) -> Optional[CachedAnswer]:
+        """Return the best matching fresh answer, or None"""
+        query = _normalize(embedding)
+        scope = frozenset(file_ids) if file_ids is not None else None
+        now = time.time()
+
+        with self._lock:
+            best_id, best_score = None, self.similarity_threshold
+            ttl = self.ttl_seconds if scope is not None else min(self.ttl_seconds, self.unscoped_ttl_seconds)
+            for entry_id in list(self._buckets.get((user_id, scope), ())):
+                entry = self._entries[entry_id]
+                if now - entry.created_at > ttl:
+                    self._remove(entry_id)
+                    continue
+                if entry.versions != versions:
+                    # Stale by the database stamps; it can never match again
+                    self._remove(entry_id)
+                    self.invalidations += 1
+                    continue
+                score = sum(a * b for a, b in zip(query, entry.embedding))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            entry = self._entries[best_id]
+            self._entries.move_to_end(best_id)
+            entry.hits += 1
+            self.hits += 1
+            self.latency_saved_ms += entry.generation_ms
+            return entry
+
+    def store(self, user_id: int, embedding: Sequence[float], file_ids: Optional[Set[int]],
+              versions: Dict[int, str], response: str, citations: Optional[List[Dict[str, Any]]],
+              generation_ms: float) -> None:
+        scope = frozenset(file_ids) if file_ids is not None else None
+        entry = CachedAnswer(
+            response=response,
+            citations=list(citations or []),
+            embedding=_normalize(embedding),
+            user_id=user_id,
+            scope=scope,
+            versions=dict(versions),
+            generation_ms=generation_ms,
+        )
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._buckets.setdefault((user_id, scope), set()).add(entry_id)
+            for key in self._dependency_keys(entry):
+                self._dependents.setdefault(key, set()).add(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    # ==================== INVALIDATION ====================
+
+    @staticmethod
+    def _dependency_keys(entry: CachedAnswer) -> List[Any]:
+        if entry.scope is None:
+            return [('user', entry.user_id)]
+        return list(entry.scope)
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        bucket = self._buckets.get((entry.user_id, entry.scope))
+        if bucket is not None:
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[(entry.user_id, entry.scope)]
+        for key in self._dependency_keys(entry):
+            dependents = self._dependents.get(key)
+            if dependents is not None:
+                dependents.discard(entry_id)
+                if not dependents:
+                    del self._dependents[key]
+
+    def invalidate_file(self, file_id: int, user_id: Optional[int] = None) -> int:
+        """Drop every answer built from `file_id` (and the owner's unscoped answers)"""
+        with self._lock:
+            entry_ids = set(self._dependents.get(file_id, ()))
+            if user_id is not None:
+                entry_ids |= self._dependents.get(('user', user_id), set())
+            for entry_id in entry_ids:
+                self._remove(entry_id)
+            self.invalidations += len(entry_ids)
+            return len(entry_ids)
+
+    def register_invalidation_listeners(self, file_model) -> None:
+        """Invalidate on every File update (re-upload) or delete"""
+        from sqlalchemy import event
+
+        def _on_change(mapper, connection, target):
+            self.invalidate_file(target.id, getattr(target, 'user_id', None))
+
+        event.listen(file_model, 'after_update', _on_change)
+        event.listen(file_model, 'after_delete', _on_change)
+        event.listen(file_model, 'after_insert', _on_change)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._dependents.clear()
+
+    # ==================== METRICS ====================
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'latency_saved_ms': round(self.latency_saved_ms, 1),
+            }
+
+
+def file_versions(file_ids: Optional[Set[int]], user_id: Optional[int] = None) -> Dict[int, str]:
+    """
+    Version stamps for the scoped files; re-uploads bump File.updated_at and a
+    deleted file drops out. Unscoped requests get one stamp for the user's
+    whole library under LIBRARY_VERSION_KEY.
+    """
+    from shared import db, File
+    from sqlalchemy import func
+
+    version_column = getattr(File, 'updated_at', None) or File.created_at
+    if file_ids is None:
+        if user_id is None:
+            return {}
+        count, newest_id, latest = db.session.query(
+            func.count(File.id), func.max(File.id), func.max(version_column)
+        ).filter(File.user_id == user_id).one()
+        return {LIBRARY_VERSION_KEY: f'{count}:{newest_id}:{latest}'}
+    if not file_ids:
+        return {}
+
+    rows = db.session.query(File.id, version_column).filter(File.id.in_(list(file_ids))).all()
+    return {row[0]: str(row[1]) for row in rows}
+
+
+answer_cache = AnswerCache()
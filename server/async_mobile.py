@@ -0,0 +1,333 @@
+"""
+Async (ASGI) serving mode for the I/O-bound mobile endpoints
+
+Under WSGI every /api/v1/mobile request holds a worker for its whole
+lifetime, including the seconds spent waiting on Neon, Chroma, the LLM and
+Dropbox/Google Drive. A handful of long chat generations is enough to leave
+no worker for a document list. In this mode uvicorn serves an ASGI front
+app: the I/O-heavy routes run as coroutines on an async database engine
+(SQLAlchemy + asyncpg) and a shared async HTTP client (httpx), so a waiting
+request costs a suspended task instead of a thread, and every other route
+is passed through unchanged to the existing Flask app on a bounded thread
+pool.
+
+    # asgi.py
+    from app import app as flask_app
+    from server.async_mobile import create_mobile_asgi_app, default_routes
+    application = create_mobile_asgi_app(flask_app, default_routes(answer=generate_answer,
+                                                                   resolve_import=import_context))
+
+    uvicorn asgi:application --workers 4 --loop uvloop
+
+Routes that stay on Flask are bridged with a2wsgi (`pip install a2wsgi`).
+
+Handled natively:
+
+    POST /api/v1/mobile/chat/send                      answer(user, message, filters, resources)
+    GET  /api/v1/mobile/file/<id>/download             async row lookup, file streamed in chunks
+    POST /api/v1/mobile/external-import/<service>      resolve_import(user, service, resources)
+    GET  /api/v1/mobile/external-import/jobs/<job_id>
+
+Handlers authenticate with the session token (server/session_tokens.py) and
+answer in the same JSON shape as the Flask views. Authentication runs on a
+worker thread inside the Flask app context, since loading a user on a cache
+miss goes through Flask-SQLAlchemy.
+"""
+
+import asyncio
+import json
+import logging
+import mimetypes
+import os
+import re
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Pattern, Tuple
+from urllib.parse import parse_qs, quote
+
+ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', '20'))
+ASYNC_HTTP_TIMEOUT_SECONDS = float(os.getenv('ASYNC_HTTP_TIMEOUT_SECONDS', '120'))
+WSGI_FALLBACK_THREADS = int(os.getenv('WSGI_FALLBACK_THREADS', '16'))
+UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+MAX_JSON_BODY_BYTES = 1024 * 1024
+URL_PREFIX = '/api/v1/mobile'
+# Provider names (DropboxProvider.name, GoogleDriveProvider.name), as the app posts them
+IMPORT_SERVICES = ('dropbox', 'googledrive')
+
+logger = logging.getLogger(__name__)
+
+
+def async_database_url(url: str) -> str:
+    """postgresql://...?sslmode=require -> postgresql+asyncpg://...?ssl=require"""
+    url = re.sub(r'^postgres(ql)?(\+\w+)?://', 'postgresql+asyncpg://', url)
+    return url.replace('sslmode=', 'ssl=')
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+class ClientDisconnected(Exception):
+    """The client went away mid-request; nothing more can be sent"""
+
+
+# ==================== SHARED CLIENTS ====================
+
+class AsyncResources:
+    """Async database engine and HTTP client, opened at startup and shared by every request"""
+
+    def __init__(self, database_url: Optional[str] = None, pool_size: int = ASYNC_DB_POOL_SIZE,
+                 http_timeout: float = ASYNC_HTTP_TIMEOUT_SECONDS):
+        self.database_url = database_url or os.getenv('DATABASE_URL')
+        self.pool_size = pool_size
+        self.http_timeout = http_timeout
+        self.engine = None
+        self.http = None
+
+    async def startup(self) -> None:
+        import httpx
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        if self.database_url:
+            self.engine = create_async_engine(async_database_url(self.database_url), pool_size=self.pool_size,
+                                              max_overflow=self.pool_size // 2, pool_pre_ping=True)
+        self.http = httpx.AsyncClient(timeout=self.http_timeout)
+
+    async def shutdown(self) -> None:
+        if self.http is not None:
+            await self.http.aclose()
+        if self.engine is not None:
+            await self.engine.dispose()
+
+    async def fetch_one(self, sql: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        rows = await self.fetch_all(sql, params)
+        return rows[0] if rows else None
+
+    async def fetch_all(self, sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        from sqlalchemy import text
+
+        async with self.engine.connect() as connection:
+            result = await connection.execute(text(sql), params)
+            return [dict(row._mapping) for row in result]
+
+    async def fetch_file(self, file_id: int) -> Optional[Dict[str, Any]]:
+        from shared import File
+
+        return await self.fetch_one(
+            f'SELECT id, filename, original_filename, file_type, user_id FROM {File.__table__.name} WHERE id = :id',
+            {'id': file_id})
+
+
+# ==================== REQUESTS AND RESPONSES ====================
+
+class AsyncRequest:
+
+    def __init__(self, scope: Dict[str, Any], receive, params: Tuple[str, ...]):
+        self.scope = scope
+        self._receive = receive
+        self.params = params
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers') or []}
+        self.query = {k: v[0] for k, v in parse_qs((scope.get('query_string') or b'').decode()).items()}
+
+    async def body(self, limit: int = MAX_JSON_BODY_BYTES) -> bytes:
+        chunks, size = [], 0
+        while True:
+            event = await self._receive()
+            if event['type'] == 'http.disconnect':
+                raise ClientDisconnected('client disconnected')
+            chunk = event.get('body', b'')
+            size += len(chunk)
+            if size > limit:
+                raise RequestTooLarge('Request body too large')
+            chunks.append(chunk)
+            if not event.get('more_body'):
+                return b''.join(chunks)
+
+    async def json(self) -> Dict[str, Any]:
+        try:
+            data = json.loads(await self.body() or b'{}')
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+
+async def send_json(send, status: int, payload: Dict[str, Any], headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+    body = json.dumps(payload, default=str).encode()
+    await send({'type': 'http.response.start', 'status': status, 'headers': [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode()),
+        *(headers or []),
+    ]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+# handler(request, user, resources, send); user is the authenticated session user
+Handler = Callable[[AsyncRequest, Dict[str, Any], AsyncResources, Any], Awaitable[None]]
+Route = Tuple[str, Pattern, Handler]
+
+
+# ==================== HANDLERS ====================
+
+def chat_send_handler(answer: Callable[[Dict[str, Any], str, Optional[Dict[str, Any]], AsyncResources],
+                                       Awaitable[Dict[str, Any]]]) -> Handler:
+    """POST /chat/send; `answer` runs retrieval and the LLM call with resources.http"""
+
+    async def handle(request: AsyncRequest, user, resources: AsyncResources, send) -> None:
+        data = await request.json()
+        message = (data.get('message') or '').strip()
+        if not message:
+            await send_json(send, 400, {'success': False, 'message': 'Message is required'})
+            return
+        result = await answer(user, message, data.get('filters'), resources)
+        await send_json(send, 200, {'success': True, **result})
+
+    return handle
+
+
+async def download_handler(request: AsyncRequest, user, resources: AsyncResources, send) -> None:
+    """GET /file/<id>/download, streamed from the upload directory without buffering"""
+    row = await resources.fetch_file(int(request.params[0]))
+    if row is None or row['user_id'] != user['id']:
+        await send_json(send, 404, {'success': False, 'message': 'File not found'})
+        return
+    path = os.path.join(UPLOAD_FOLDER, str(user['id']), row['filename'])
+    if not os.path.isfile(path):
+        path = os.path.join(UPLOAD_FOLDER, row['filename'])
+    if not os.path.isfile(path):
+        await send_json(send, 404, {'success': False, 'message': 'File not found on server'})
+        return
+
+    name = row['original_filename'] or row['filename']
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', content_type.encode()),
+        (b'content-length', str(os.path.getsize(path)).encode()),
+        (b'content-disposition', f"attachment; filename*=UTF-8''{quote(name)}".encode()),
+    ]})
+    with open(path, 'rb') as handle:
+        while True:
+            chunk = await asyncio.to_thread(handle.read, DOWNLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+def external_import_handlers(resolve_import: Callable[[Dict[str, Any], str, AsyncResources], Awaitable[Optional[Dict[str, Any]]]],
+                             engine=None) -> Tuple[Handler, Handler]:
+    """
+    POST /external-import/<service> and GET /external-import/jobs/<id>.
+    `resolve_import` returns {'provider', 'access_token', 'dest_dir', 'on_file_done'}
+    for the user's connected account, or None when the service is not connected.
+    """
+    if engine is None:
+        from server.external_import import import_engine as engine
+
+    async def start(request: AsyncRequest, user, resources: AsyncResources, send) -> None:
+        files = (await request.json()).get('files') or []
+        if not files:
+            await send_json(send, 400, {'success': False, 'message': 'No files selected'})
+            return
+        context = await resolve_import(user, request.params[0], resources)
+        if context is None:
+            await send_json(send, 400, {'success': False, 'message': f'{request.params[0]} is not connected'})
+            return
+        job_id = engine.start(user['id'], context['provider'], context['access_token'], files,
+                              context['dest_dir'], on_file_done=context.get('on_file_done'))
+        await send_json(send, 202, {'success': True, 'job_id': job_id})
+
+    async def status(request: AsyncRequest, user, resources: AsyncResources, send) -> None:
+        job = engine.get_job(request.params[0], user['id'])
+        if job is None:
+            await send_json(send, 404, {'success': False, 'message': 'Import job not found'})
+            return
+        await send_json(send, 200, {'success': True, 'job': job})
+
+    return start, status
+
+
+def default_routes(answer=None, resolve_import=None, engine=None) -> List[Route]:
+    routes: List[Route] = [('GET', re.compile(rf'^{URL_PREFIX}/file/(\d+)/download$'), download_handler)]
+    if answer is not None:
+        routes.append(('POST', re.compile(rf'^{URL_PREFIX}/chat/send$'), chat_send_handler(answer)))
+    if resolve_import is not None:
+        start, status = external_import_handlers(resolve_import, engine)
+        routes.append(('GET', re.compile(rf'^{URL_PREFIX}/external-import/jobs/([A-Za-z0-9]+)$'), status))
+        services = '|'.join(re.escape(service) for service in IMPORT_SERVICES)
+        routes.append(('POST', re.compile(rf'^{URL_PREFIX}/external-import/({services})$'), start))
+    return routes
+
+
+# ==================== ASGI APP ====================
+
+def create_mobile_asgi_app(wsgi_app, routes: List[Route], resources: Optional[AsyncResources] = None,
+                           authenticator=None, fallback_threads: int = WSGI_FALLBACK_THREADS):
+    """ASGI app serving `routes` natively and everything else through `wsgi_app`"""
+    from a2wsgi import WSGIMiddleware
+
+    resources = resources or AsyncResources()
+    fallback = WSGIMiddleware(wsgi_app, workers=fallback_threads)
+    if authenticator is None:
+        from server.session_tokens import get_session_auth
+
+        authenticator = get_session_auth()
+
+    def authenticate(token: Optional[str]) -> Optional[Dict[str, Any]]:
+        # The default loader queries through Flask-SQLAlchemy, which needs the app context on this thread
+        context = wsgi_app.app_context() if hasattr(wsgi_app, 'app_context') else nullcontext()
+        with context:
+            return authenticator.authenticate(token)
+
+    def match(scope) -> Optional[Tuple[Handler, Tuple[str, ...]]]:
+        for method, pattern, handler in routes:
+            if scope['method'] == method:
+                found = pattern.match(scope['path'])
+                if found:
+                    return handler, found.groups()
+        return None
+
+    async def app(scope, receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            while True:
+                event = await receive()
+                if event['type'] == 'lifespan.startup':
+                    await resources.startup()
+                    await send({'type': 'lifespan.startup.complete'})
+                elif event['type'] == 'lifespan.shutdown':
+                    await resources.shutdown()
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+
+        found = match(scope) if scope['type'] == 'http' else None
+        if found is None:
+            await fallback(scope, receive, send)
+            return
+
+        handler, params = found
+        request = AsyncRequest(scope, receive, params)
+        started = False
+
+        async def tracked_send(message) -> None:
+            nonlocal started
+            started = started or message['type'] == 'http.response.start'
+            await send(message)
+
+        try:
+            # A cache hit is a signature check; a miss loads the user, so keep it off the loop
+            user = await asyncio.to_thread(authenticate, request.headers.get('authorization'))
+            if user is None:
+                await send_json(send, 401, {'success': False, 'message': 'Authentication required'})
+                return
+            await handler(request, user, resources, tracked_send)
+        except RequestTooLarge as e:
+            await send_json(send, 413, {'success': False, 'message': str(e)})
+        except ClientDisconnected:
+            return
+        except Exception:
+            logger.exception('Async handler error on %s', scope['path'])
+            if not started:
+                await send_json(send, 500, {'success': False, 'message': 'Internal server error'})
+
+    return app
@@ -0,0 +1,349 @@
+"""
+Bulk multi-file uploads for public upload links
+
+`/upload-to/<token>` took one file per request, so a batch of 100 receipts
+validated the link, checked the quota and committed 100 times.
+`/upload-to/<token>/bulk` takes many `files` parts in one multipart request:
+
+- the link is validated and its quota checked once
+- the body is parsed incrementally and each part is streamed straight to
+  its final path while being hashed (no temp-file copy of the body)
+- all File rows and the upload counter are committed in one transaction
+- processing is enqueued once for the whole batch
+
+Only the document and image types the app accepts (ALLOWED_UPLOAD_TYPES, the
+same list as FILE_UPLOAD in constants/Config.ts) are stored. Each part's
+extension, declared content type and leading bytes are checked before any of
+it is written; a part that fails is skipped and listed under `failed` while
+the rest of the batch is stored.
+
+    from server.bulk_upload import BulkUploadError, bulk_upload_to_link
+    try:
+        result = bulk_upload_to_link(token, request, upload_root, enqueue_batch=queue_processing)
+    except BulkUploadError as e:
+        return jsonify({'success': False, 'message': e.message}), e.status
+    return jsonify({'success': True, **result})
+"""
+
+import hashlib
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+BULK_UPLOAD_MAX_FILES = int(os.getenv('BULK_UPLOAD_MAX_FILES', '100'))
+BULK_UPLOAD_MAX_FILE_BYTES = int(os.getenv('BULK_UPLOAD_MAX_FILE_BYTES', str(50 * 1024 * 1024)))
+READ_CHUNK_SIZE = 64 * 1024
+# Bytes buffered from the start of each part to check its signature
+SNIFF_BYTES = 16
+
+_OLE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+_ZIP = b'PK\x03\x04'
+# extension -> (content types the client may declare, leading bytes; None for text)
+ALLOWED_UPLOAD_TYPES: Dict[str, Tuple[Tuple[str, ...], Optional[Tuple[bytes, ...]]]] = {
+    '.pdf': (('application/pdf',), (b'%PDF-',)),
+    '.doc': (('application/msword',), (_OLE,)),
+    '.docx': (('application/vnd.openxmlformats-officedocument.wordprocessingml.document',), (_ZIP,)),
+    '.xls': (('application/vnd.ms-excel',), (_OLE,)),
+    '.xlsx': (('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',), (_ZIP,)),
+    '.ppt': (('application/vnd.ms-powerpoint',), (_OLE,)),
+    '.pptx': (('application/vnd.openxmlformats-officedocument.presentationml.presentation',), (_ZIP,)),
+    '.txt': (('text/plain',), None),
+    '.csv': (('text/csv', 'text/plain', 'application/vnd.ms-excel'), None),
+    '.jpg': (('image/jpeg',), (b'\xff\xd8\xff',)),
+    '.jpeg': (('image/jpeg',), (b'\xff\xd8\xff',)),
+    '.png': (('image/png',), (b'\x89PNG\r\n\x1a\n',)),
+    '.gif': (('image/gif',), (b'GIF87a', b'GIF89a')),
+    '.webp': (('image/webp',), (b'RIFF',)),
+}
+# Clients that cannot tell send these; the extension and signature still have to match
+GENERIC_CONTENT_TYPES = ('', 'application/octet-stream')
+# Non-standard names some browsers and phone pickers declare
+CONTENT_TYPE_ALIASES = {
+    'image/jpg': 'image/jpeg',
+    'image/pjpeg': 'image/jpeg',
+    'image/x-png': 'image/png',
+    'application/x-pdf': 'application/pdf',
+    'application/csv': 'text/csv',
+    'text/x-csv': 'text/csv',
+}
+
+# Columns this module writes; checked once against the mapped tables
+UPLOAD_LINK_COLUMNS = ('is_active', 'expires_at', 'max_uploads', 'current_uploads')
+FILE_COLUMNS = ('upload_link_id', 'file_path')
+
+
+class BulkUploadError(Exception):
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@dataclass
+class StoredUpload:
+    original_filename: str
+    stored_filename: str
+    path: str
+    content_type: str
+    size: int
+    sha256: str
+
+
+@dataclass
+class RejectedUpload:
+    original_filename: str
+    message: str
+
+
+def _safe_filename(name: str) -> str:
+    name = re.sub(r'[^A-Za-z0-9._ -]', '_', os.path.basename(name or '')).strip(' .')
+    return name or 'upload'
+
+
+def normalize_content_type(content_type: str) -> str:
+    declared = (content_type or '').split(';')[0].strip().lower()
+    return CONTENT_TYPE_ALIASES.get(declared, declared)
+
+
+def check_upload_type(filename: str, content_type: str) -> None:
+    """Refuse a part whose extension is not allowed or whose declared type contradicts it"""
+    extension = os.path.splitext(filename)[1].lower()
+    allowed = ALLOWED_UPLOAD_TYPES.get(extension)
+    if allowed is None:
+        raise BulkUploadError(f'{filename}: file type not allowed', 415)
+    declared = normalize_content_type(content_type)
+    if declared not in GENERIC_CONTENT_TYPES and declared not in allowed[0]:
+        raise BulkUploadError(f'{filename}: content type {declared} does not match the file extension', 415)
+
+
+def check_upload_signature(filename: str, head: bytes) -> None:
+    """Refuse a part whose first bytes are not what its extension says"""
+    signatures = ALLOWED_UPLOAD_TYPES[os.path.splitext(filename)[1].lower()][1]
+    if signatures is None:
+        matches = b'\x00' not in head
+    elif filename.lower().endswith('.webp'):
+        matches = head.startswith(b'RIFF') and head[8:12] == b'WEBP'
+    else:
+        matches = head.startswith(signatures)
+    if not matches:
+        raise BulkUploadError(f'{filename}: contents do not match the file type', 415)
+
+
+def _boundary(content_type: str) -> bytes:
+    match = re.search(r'boundary="?([^";]+)"?', content_type or '')
+    if not content_type.startswith('multipart/form-data') or not match:
+        raise BulkUploadError('Expected a multipart/form-data body')
+    return match.group(1).encode('latin-1')
+
+
+# ==================== STREAMING PARSE ====================
+
+def stream_multipart_files(stream: BinaryIO, content_type: str, dest_dir: str,
+                           max_files: int = BULK_UPLOAD_MAX_FILES,
+                           max_file_bytes: int = BULK_UPLOAD_MAX_FILE_BYTES
+                           ) -> Tuple[List[StoredUpload], List[RejectedUpload]]:
+    """
+    Parse the request body incrementally and write every `files` part to
+    `dest_dir` as it arrives. A part that is not an allowed type is skipped
+    and returned as rejected; a part that breaks a limit aborts the whole
+    upload and everything written so far is removed.
+    """
+    from werkzeug.sansio.multipart import Data, Epilogue, File, MultipartDecoder, NeedData
+
+    decoder = MultipartDecoder(_boundary(content_type))
+    os.makedirs(dest_dir, exist_ok=True)
+    stored: List[StoredUpload] = []
+    rejected: List[RejectedUpload] = []
+    out = None
+    digest = None
+    # Start of the current part, held until its signature is checked
+    head: Optional[bytes] = None
+
+    try:
+        while True:
+            event = decoder.next_event()
+            if isinstance(event, NeedData):
+                decoder.receive_data(stream.read(READ_CHUNK_SIZE) or None)
+            elif isinstance(event, File) and event.name == 'files':
+                if len(stored) + len(rejected) >= max_files:
+                    raise BulkUploadError(f'At most {max_files} files per request', 413)
+                original = _safe_filename(event.filename)
+                content_type = normalize_content_type(event.headers.get('content-type')) or 'application/octet-stream'
+                try:
+                    check_upload_type(original, content_type)
+                except BulkUploadError as e:
+                    # Its data events are dropped until the next part starts
+                    rejected.append(RejectedUpload(original, e.message))
+                    continue
+                stored_name = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}_{original}"
+                stored.append(StoredUpload(original, stored_name, os.path.join(dest_dir, stored_name),
+                                           content_type, 0, ''))
+                out = open(stored[-1].path, 'wb')
+                digest = hashlib.sha256()
+                head = b''
+            elif isinstance(event, Data) and out is not None:
+                current = stored[-1]
+                data = event.data
+                if head is not None:
+                    head += data
+                    if len(head) < SNIFF_BYTES and event.more_data:
+                        continue
+                    try:
+                        check_upload_signature(current.original_filename, head[:SNIFF_BYTES])
+                    except BulkUploadError as e:
+                        out.close()
+                        out, head = None, None
+                        os.remove(stored.pop().path)
+                        rejected.append(RejectedUpload(current.original_filename, e.message))
+                        continue
+                    data, head = head, None
+                out.write(data)
+                digest.update(data)
+                current.size += len(data)
+                if current.size > max_file_bytes:
+                    raise BulkUploadError(f'{current.original_filename} exceeds the '
+                                          f'{max_file_bytes // (1024 * 1024)} MB limit', 413)
+                if not event.more_data:
+                    out.close()
+                    out = None
+                    current.sha256 = digest.hexdigest()
+            elif isinstance(event, Epilogue):
+                break
+    except ValueError as e:
+        # Truncated or malformed body
+        _remove_uploads(stored, out)
+        raise BulkUploadError(f'Invalid multipart body: {e}') from e
+    except BaseException:
+        _remove_uploads(stored, out)
+        raise
+
+    if out is not None:
+        _remove_uploads(stored, out)
+        raise BulkUploadError('Invalid multipart body: unterminated file part')
+    return stored, rejected
+
+
+def _remove_uploads(stored: List[StoredUpload], out=None) -> None:
+    if out is not None:
+        out.close()
+    for upload in stored:
+        if os.path.exists(upload.path):
+            os.remove(upload.path)
+
+
+# ==================== BULK UPLOAD ====================
+
+_checked_schema = False
+
+
+def _require_columns() -> None:
+    """Fail loudly, once, if UploadLink or File lack the columns written here"""
+    global _checked_schema
+    if _checked_schema:
+        return
+    from shared import File, UploadLink
+
+    missing = [f'{model.__tablename__}.{name}'
+               for model, names in ((UploadLink, UPLOAD_LINK_COLUMNS), (File, FILE_COLUMNS))
+               for name in names if name not in model.__table__.columns]
+    if missing:
+        raise RuntimeError(f"Bulk upload needs columns that do not exist: {', '.join(missing)}")
+    _checked_schema = True
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Stored timestamps are UTC; naive ones are read as such"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _check_quota(link, incoming: int) -> None:
+    current = link.current_uploads or 0
+    if link.max_uploads and current + incoming > link.max_uploads:
+        raise BulkUploadError(f'Upload limit reached: {link.max_uploads - current} of {link.max_uploads} '
+                              'uploads left', 409)
+
+
+def validate_upload_link(token: str, incoming: int):
+    """Look the link up once and check it is active, unexpired and has room"""
+    from shared import UploadLink
+
+    _require_columns()
+    link = UploadLink.query.filter_by(token=token).first()
+    if link is None or not link.is_active:
+        raise BulkUploadError('Upload link not found', 404)
+    if link.expires_at and _as_utc(link.expires_at) < datetime.now(timezone.utc):
+        raise BulkUploadError('Upload link has expired', 410)
+    _check_quota(link, incoming)
+    return link
+
+
+def bulk_upload_to_link(token: str, request, upload_root: str,
+                        enqueue_batch: Optional[Callable[[List[int]], None]] = None) -> Dict[str, Any]:
+    """
+    Handle POST /upload-to/<token>/bulk. The client sends the number of files
+    in `X-Upload-Count` so an over-quota batch is refused before any bytes
+    are read; the count is re-checked under a row lock before committing.
+    """
+    from shared import db, File, UploadLink
+
+    try:
+        declared = int(request.headers.get('X-Upload-Count', '0'))
+    except ValueError:
+        declared = 0
+    if declared > BULK_UPLOAD_MAX_FILES:
+        raise BulkUploadError(f'At most {BULK_UPLOAD_MAX_FILES} files per request', 413)
+    link = validate_upload_link(token, declared)
+    link_id, owner_id = link.id, link.user_id
+    # Release the connection while the body streams in
+    db.session.rollback()
+
+    dest_dir = os.path.join(upload_root, str(owner_id))
+    stored, rejected = stream_multipart_files(request.stream, request.headers.get('Content-Type', ''), dest_dir)
+    if not stored:
+        if rejected:
+            raise BulkUploadError(f'No files were uploaded: {rejected[0].message}', 415)
+        raise BulkUploadError('No files were uploaded')
+
+    try:
+        link = db.session.query(UploadLink).filter_by(id=link_id).with_for_update().one()
+        _check_quota(link, len(stored))
+
+        rows = [
+            File(
+                user_id=owner_id,
+                filename=upload.stored_filename,
+                original_filename=upload.original_filename,
+                file_type=upload.content_type,
+                file_size=upload.size,
+                file_path=upload.path,
+                upload_link_id=link_id,
+            )
+            for upload in stored
+        ]
+        db.session.add_all(rows)
+        link.current_uploads = (link.current_uploads or 0) + len(rows)
+        db.session.commit()
+    except BaseException:
+        db.session.rollback()
+        _remove_uploads(stored)
+        raise
+
+    file_ids = [row.id for row in rows]
+    if enqueue_batch is not None:
+        enqueue_batch(file_ids)
+
+    return {
+        'uploaded': len(rows),
+        'files': [
+            {'id': row.id, 'original_filename': upload.original_filename, 'file_size': upload.size,
+             'sha256': upload.sha256}
+            for row, upload in zip(rows, stored)
+        ],
+        'failed': [{'original_filename': r.original_filename, 'message': r.message} for r in rejected],
+        'current_uploads': link.current_uploads,
+    }
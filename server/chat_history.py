@@ -0,0 +1,158 @@
+"""
+Rolling summaries and windowed history for long chats
+
+Instead of replaying a whole conversation into the model, each chat keeps a
+stored summary of its older turns (table `chat_summaries`, created by
+db_scripts/create_chat_summary_table.py) plus a window of the most recent
+unsummarized messages. Once more than `HISTORY_WINDOW + SUMMARIZE_BATCH`
+turns are unsummarized, the oldest `SUMMARIZE_BATCH` are folded into the
+summary, so the prompt and the history loaded per request stay bounded
+however long the chat gets. `load_message_window` serves the same windowed
+reads for the message list endpoints.
+
+A request folds at most MAX_SUMMARIES_PER_REQUEST batches, since each is a
+model call. A chat with a longer backlog (history from before summaries
+existed) is served from the last stored summary plus its newest turns, and
+the next requests keep folding the backlog.
+"""
+
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+HISTORY_WINDOW = int(os.getenv('CHAT_HISTORY_WINDOW', '12'))
+SUMMARIZE_BATCH = int(os.getenv('CHAT_SUMMARIZE_BATCH', '20'))
+MAX_SUMMARIES_PER_REQUEST = int(os.getenv('CHAT_MAX_SUMMARIES_PER_REQUEST', '2'))
+MAX_SUMMARY_CHARS = 4000
+
+# summarize_fn(previous_summary, messages) -> new summary
+SummarizeFn = Callable[[str, List[Dict[str, Any]]], str]
+
+
+def load_message_window(chat_id: int, limit: int = HISTORY_WINDOW, before_id: Optional[int] = None) -> List[Any]:
+    """The newest `limit` UserChatMessage rows (older than `before_id`), oldest first"""
+    from shared import db, UserChatMessage
+
+    query = db.session.query(UserChatMessage).filter(UserChatMessage.chat_id == chat_id)
+    if before_id is not None:
+        query = query.filter(UserChatMessage.id < before_id)
+    rows = query.order_by(UserChatMessage.id.desc()).limit(limit).all()
+    return list(reversed(rows))
+
+
+def get_summary(chat_id: int, chat_kind: str = 'user_chat') -> Tuple[str, int]:
+    """(summary, id of the last message folded into it)"""
+    from shared import db
+    from sqlalchemy import text
+
+    row = db.session.execute(
+        text('SELECT summary, summarized_through_id FROM chat_summaries '
+             'WHERE chat_kind = :kind AND chat_id = :chat_id'),
+        {'kind': chat_kind, 'chat_id': chat_id},
+    ).first()
+    if row is None:
+        return '', 0
+    return row.summary or '', row.summarized_through_id or 0
+
+
+def save_summary(chat_id: int, summary: str, through_id: int, chat_kind: str = 'user_chat') -> None:
+    """
+    Upsert in its own transaction, so the request's session is not committed
+    mid-request. A summary never replaces one that covers more of the chat:
+    a slow summarizer finishing after a newer one is dropped.
+    """
+    from shared import db
+    from sqlalchemy import text
+
+    with db.engine.begin() as conn:
+        conn.execute(
+            text('INSERT INTO chat_summaries (chat_kind, chat_id, summary, summarized_through_id, updated_at) '
+                 'VALUES (:kind, :chat_id, :summary, :through_id, NOW()) '
+                 'ON CONFLICT (chat_kind, chat_id) DO UPDATE SET summary = EXCLUDED.summary, '
+                 'summarized_through_id = EXCLUDED.summarized_through_id, updated_at = NOW() '
+                 'WHERE chat_summaries.summarized_through_id < EXCLUDED.summarized_through_id'),
+            {'kind': chat_kind, 'chat_id': chat_id, 'summary': summary[:MAX_SUMMARY_CHARS], 'through_id': through_id},
+        )
+
+
+def _message_dict(message: Any) -> Dict[str, Any]:
+    if isinstance(message, dict):
+        return message
+    return {
+        'id': message.id,
+        'role': getattr(message, 'role', None) or f"user:{getattr(message, 'sender_id', '')}",
+        'content': message.content,
+    }
+
+
+def compact_history(
+    chat_id: int,
+    summarize_fn: SummarizeFn,
+    load_after: Callable[[int, int], List[Any]],
+    chat_kind: str = 'user_chat',
+    load_latest: Optional[Callable[[int], List[Any]]] = None,
+    max_summaries: int = MAX_SUMMARIES_PER_REQUEST,
+    get_fn: Callable[[int, str], Tuple[str, int]] = get_summary,
+    save_fn: Callable[[int, str, int, str], None] = save_summary,
+) -> Tuple[str, int, List[Dict[str, Any]]]:
+    """
+    Fold turns older than the window into the stored summary.
+
+    `load_after(after_id, limit)` returns messages with id > after_id, oldest
+    first; `load_latest(limit)` the newest `limit` messages, oldest first.
+    Returns (summary, summarized_through_id, unsummarized messages); there are
+    never more than HISTORY_WINDOW + SUMMARIZE_BATCH of the latter. At most
+    `max_summaries` batches are folded; if a backlog remains, the messages are
+    the newest HISTORY_WINDOW turns (the oldest unsummarized ones without
+    `load_latest`) and the rest is left for the next request.
+    """
+    summary, through_id = get_fn(chat_id, chat_kind)
+
+    folded = 0
+    while True:
+        pending = [_message_dict(message) for message in
+                   load_after(through_id, HISTORY_WINDOW + SUMMARIZE_BATCH + 1)]
+        if len(pending) <= HISTORY_WINDOW + SUMMARIZE_BATCH:
+            return summary, through_id, pending
+        if folded >= max_summaries:
+            break
+
+        batch = pending[:SUMMARIZE_BATCH]
+        summary = summarize_fn(summary, batch)
+        through_id = batch[-1]['id']
+        save_fn(chat_id, summary, through_id, chat_kind)
+        folded += 1
+
+    # Backlog left for later requests: serve the last summary and the newest turns
+    if load_latest is None:
+        return summary, through_id, pending[:HISTORY_WINDOW + SUMMARIZE_BATCH]
+    latest = [_message_dict(message) for message in load_latest(HISTORY_WINDOW)]
+    return summary, through_id, [message for message in latest if message['id'] > through_id]
+
+
+def build_history_context(
+    chat_id: int,
+    summarize_fn: SummarizeFn,
+    load_after: Optional[Callable[[int, int], List[Any]]] = None,
+    chat_kind: str = 'user_chat',
+    load_latest: Optional[Callable[[int], List[Any]]] = None,
+) -> Dict[str, Any]:
+    """
+    Stored summary plus the unsummarized turns, ready to prepend to the prompt.
+
+    For AI chats pass loaders over the chat-history model; by default
+    UserChatMessage rows of `chat_id` are used.
+    """
+    if load_after is None:
+        def load_after(after_id: int, limit: int) -> List[Any]:
+            from shared import db, UserChatMessage
+            return db.session.query(UserChatMessage).filter(
+                UserChatMessage.chat_id == chat_id,
+                UserChatMessage.id > after_id,
+            ).order_by(UserChatMessage.id).limit(limit).all()
+
+        if load_latest is None:
+            def load_latest(limit: int) -> List[Any]:
+                return load_message_window(chat_id, limit)
+
+    summary, through_id, messages = compact_history(chat_id, summarize_fn, load_after, chat_kind, load_latest)
+    return {'summary': summary, 'messages': messages, 'summarized_through_id': through_id}
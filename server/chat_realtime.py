@@ -0,0 +1,356 @@
+"""
+Real-time delivery for user chats over WebSocket and SSE
+
+An ASGI app (served by uvicorn next to the Flask app) keeps one lightweight
+asyncio task per connection instead of a worker thread, so a single node can
+hold thousands of idle chat connections.
+
+    /api/v1/mobile/chats/<id>/ws       WebSocket (the mobile app)
+    /api/v1/mobile/chats/<id>/events   Server-Sent Events (web)
+
+New messages are published per chat through a pluggable backend: in-process
+by default, Redis pub/sub (REALTIME_REDIS_URL) when several nodes or the WSGI
+workers must reach the same subscribers. On reconnect a client passes the last
+id it saw (`since_id` or the SSE Last-Event-ID header) and receives the
+messages it missed from the database before live delivery resumes. At most
+BACKFILL_LIMIT messages are replayed; if more were missed, a `truncated`
+event carrying the last replayed id follows them and the client reloads the
+chat over the REST endpoints.
+
+Publishing from Flask after a message is committed:
+
+    from server.chat_realtime import hub
+    hub.publish_threadsafe(chat.id, message.to_dict())
+
+When the Flask workers run in their own processes (gunicorn), the hub's event
+loop is not running there and publish_threadsafe publishes straight to Redis;
+REALTIME_REDIS_URL must be set for those messages to reach subscribers.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from urllib.parse import parse_qs
+
+QUEUE_SIZE = int(os.getenv('REALTIME_QUEUE_SIZE', '100'))
+HEARTBEAT_SECONDS = int(os.getenv('REALTIME_HEARTBEAT_SECONDS', '15'))
+BACKFILL_LIMIT = 200
+REDIS_CHANNEL_PREFIX = 'chat:'
+
+logger = logging.getLogger(__name__)
+
+_ROUTE = re.compile(r'^/api/v1/mobile/chats/(\d+)/(ws|events)$')
+
+# authorize(scope, chat_id) -> user id, or None to reject
+Authorize = Callable[[Dict[str, Any], int], Awaitable[Optional[int]]]
+# backfill(chat_id, after_id, limit) -> messages with id > after_id, oldest first (sync, run in a thread)
+Backfill = Callable[[int, int, int], List[Dict[str, Any]]]
+
+
+# ==================== PUB/SUB BACKENDS ====================
+
+class InMemoryBackend:
+    """Single-process backend: publishing delivers straight to local subscribers"""
+
+    def __init__(self):
+        self._deliver: Optional[Callable[[int, Dict[str, Any]], None]] = None
+
+    async def start(self, deliver: Callable[[int, Dict[str, Any]], None]) -> None:
+        self._deliver = deliver
+
+    async def publish(self, chat_id: int, message: Dict[str, Any]) -> None:
+        if self._deliver is not None:
+            self._deliver(chat_id, message)
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+
+class RedisBackend:
+    """Multi-node backend over Redis pub/sub; needs the `redis` package unless a client is given"""
+
+    def __init__(self, url: Optional[str] = None, client=None):
+        if client is None:
+            import redis.asyncio as redis
+
+            client = redis.from_url(url)
+        self._redis = client
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Callable[[int, Dict[str, Any]], None]) -> None:
+        pubsub = self._redis.pubsub()
+        await pubsub.psubscribe(f'{REDIS_CHANNEL_PREFIX}*')
+        self._pubsub = pubsub
+
+        async def listen() -> None:
+            async for item in pubsub.listen():
+                if item.get('type') != 'pmessage':
+                    continue
+                channel = item['channel'].decode() if isinstance(item['channel'], bytes) else item['channel']
+                deliver(int(channel[len(REDIS_CHANNEL_PREFIX):]), json.loads(item['data']))
+
+        self._listener = asyncio.create_task(listen())
+
+    async def publish(self, chat_id: int, message: Dict[str, Any]) -> None:
+        await self._redis.publish(f'{REDIS_CHANNEL_PREFIX}{chat_id}', json.dumps(message, default=str))
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+        await self._redis.close()
+
+
+def publish_to_redis(client, chat_id: int, message: Dict[str, Any]) -> None:
+    """Blocking publish on the channel RedisBackend listens to, for processes without an event loop"""
+    client.publish(f'{REDIS_CHANNEL_PREFIX}{chat_id}', json.dumps(message, default=str))
+
+
+# ==================== HUB ====================
+
+class Subscription:
+    __slots__ = ('chat_id', 'queue', 'overflowed')
+
+    def __init__(self, chat_id: int, queue_size: int):
+        self.chat_id = chat_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+
+class ChatHub:
+    """Per-chat fan-out to the connections on this node"""
+
+    def __init__(self, backend=None, queue_size: int = QUEUE_SIZE, redis_url: Optional[str] = None):
+        self.redis_url = redis_url or os.getenv('REALTIME_REDIS_URL')
+        if backend is None:
+            if not self.redis_url and (os.getenv('APP_ENV') or os.getenv('FLASK_ENV') or '').lower() == 'production':
+                logger.warning('REALTIME_REDIS_URL is not set; messages only reach connections on the '
+                               'process that published them')
+            backend = RedisBackend(self.redis_url) if self.redis_url else InMemoryBackend()
+        self.backend = backend
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_redis = None
+        self.delivered = 0
+        self.dropped = 0
+        self.undeliverable = 0
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        await self.backend.start(self._deliver)
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+        self._loop = None
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def subscribe(self, chat_id: int) -> Subscription:
+        subscription = Subscription(chat_id, self.queue_size)
+        self._subscribers.setdefault(chat_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.chat_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.chat_id]
+
+    async def publish(self, chat_id: int, message: Dict[str, Any]) -> None:
+        await self.backend.publish(chat_id, message)
+
+    def publish_threadsafe(self, chat_id: int, message: Dict[str, Any]) -> None:
+        """
+        Publish from a WSGI worker thread: through the hub's loop when it runs
+        in this process, otherwise synchronously to Redis.
+        """
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.publish(chat_id, message), loop)
+            return
+
+        if not self.redis_url:
+            self.undeliverable += 1
+            logger.warning('Realtime hub is not running in this process and REALTIME_REDIS_URL is not set; '
+                           'message %s for chat %s was not published', message.get('id'), chat_id)
+            return
+
+        if self._sync_redis is None:
+            import redis
+            self._sync_redis = redis.from_url(self.redis_url)
+        try:
+            publish_to_redis(self._sync_redis, chat_id, message)
+        except Exception as exc:
+            # The message is committed; clients pick it up on their next backfill
+            self.undeliverable += 1
+            logger.warning('Realtime publish to Redis failed for chat %s: %s', chat_id, exc)
+
+    def _deliver(self, chat_id: int, message: Dict[str, Any]) -> None:
+        for subscription in list(self._subscribers.get(chat_id, ())):
+            try:
+                subscription.queue.put_nowait(message)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                # A stalled client is disconnected and backfills on reconnect
+                subscription.overflowed = True
+                self.dropped += 1
+
+
+hub = ChatHub()
+
+
+# ==================== ASGI APP ====================
+
+def _since_id(scope: Dict[str, Any]) -> int:
+    headers = dict(scope.get('headers') or [])
+    query = parse_qs((scope.get('query_string') or b'').decode())
+    raw = headers.get(b'last-event-id', b'').decode() or (query.get('since_id') or ['0'])[0]
+    try:
+        return max(0, int(raw))
+    except ValueError:
+        return 0
+
+
+async def _next_event(subscription: Subscription, disconnect: asyncio.Task) -> Optional[Dict[str, Any]]:
+    """Next message for the subscriber, {} on heartbeat timeout, None once the client is gone"""
+    getter = asyncio.ensure_future(subscription.queue.get())
+    done, _ = await asyncio.wait({getter, disconnect}, timeout=HEARTBEAT_SECONDS,
+                                 return_when=asyncio.FIRST_COMPLETED)
+    if getter.done():
+        return getter.result()
+    getter.cancel()
+    if disconnect in done:
+        return None
+    return {}
+
+
+def create_realtime_app(authorize: Authorize, backfill: Backfill, chat_hub: Optional[ChatHub] = None):
+    """Build the ASGI app; `authorize` and `backfill` come from the backend"""
+    chat_hub = chat_hub or hub
+
+    async def stream(chat_id: int, since_id: int, send_event, send_truncated, wait_disconnect) -> None:
+        # Subscribe before backfilling so nothing published in between is lost
+        subscription = chat_hub.subscribe(chat_id)
+        disconnect = asyncio.ensure_future(wait_disconnect())
+        try:
+            last_id = since_id
+            if since_id:
+                # One extra row tells whether the client missed more than we replay
+                missed = await asyncio.to_thread(backfill, chat_id, since_id, BACKFILL_LIMIT + 1)
+                for message in missed[:BACKFILL_LIMIT]:
+                    await send_event(message)
+                    last_id = max(last_id, int(message.get('id') or 0))
+                if len(missed) > BACKFILL_LIMIT:
+                    await send_truncated(last_id)
+
+            while not subscription.overflowed:
+                message = await _next_event(subscription, disconnect)
+                if message is None:
+                    return
+                if not message:
+                    await send_event(None)
+                    continue
+                if int(message.get('id') or 0) <= last_id:
+                    continue
+                await send_event(message)
+                last_id = int(message.get('id') or 0)
+        finally:
+            disconnect.cancel()
+            chat_hub.unsubscribe(subscription)
+
+    async def serve_websocket(scope, receive, send, chat_id: int) -> None:
+        event = await receive()
+        if event['type'] != 'websocket.connect':
+            return
+        if await authorize(scope, chat_id) is None:
+            await send({'type': 'websocket.close', 'code': 4401})
+            return
+        await send({'type': 'websocket.accept'})
+
+        async def wait_disconnect() -> None:
+            while (await receive())['type'] != 'websocket.disconnect':
+                pass
+
+        async def send_event(message: Optional[Dict[str, Any]]) -> None:
+            payload = {'type': 'ping'} if message is None else {'type': 'message', 'message': message}
+            await send({'type': 'websocket.send', 'text': json.dumps(payload, default=str)})
+
+        async def send_truncated(through_id: int) -> None:
+            payload = {'type': 'truncated', 'through_id': through_id}
+            await send({'type': 'websocket.send', 'text': json.dumps(payload)})
+
+        await stream(chat_id, _since_id(scope), send_event, send_truncated, wait_disconnect)
+        await send({'type': 'websocket.close', 'code': 1000})
+
+    async def serve_sse(scope, receive, send, chat_id: int) -> None:
+        if await authorize(scope, chat_id) is None:
+            await send({'type': 'http.response.start', 'status': 401,
+                        'headers': [(b'content-type', b'application/json')]})
+            await send({'type': 'http.response.body', 'body': b'{"success": false, "message": "Unauthorized"}'})
+            return
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+
+        async def wait_disconnect() -> None:
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        async def send_event(message: Optional[Dict[str, Any]]) -> None:
+            if message is None:
+                body = b': ping\n\n'
+            else:
+                body = f"id: {message.get('id')}\nevent: message\ndata: {json.dumps(message, default=str)}\n\n".encode()
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+        async def send_truncated(through_id: int) -> None:
+            body = f"event: truncated\ndata: {json.dumps({'through_id': through_id})}\n\n".encode()
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+        await stream(chat_id, _since_id(scope), send_event, send_truncated, wait_disconnect)
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    async def app(scope, receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            while True:
+                event = await receive()
+                if event['type'] == 'lifespan.startup':
+                    await chat_hub.start()
+                    await send({'type': 'lifespan.startup.complete'})
+                elif event['type'] == 'lifespan.shutdown':
+                    await chat_hub.stop()
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+
+        match = _ROUTE.match(scope.get('path', ''))
+        if match is None:
+            if scope['type'] == 'http':
+                await send({'type': 'http.response.start', 'status': 404, 'headers': []})
+                await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        chat_id, transport = int(match.group(1)), match.group(2)
+        if scope['type'] == 'websocket' and transport == 'ws':
+            await serve_websocket(scope, receive, send, chat_id)
+        elif scope['type'] == 'http' and transport == 'events':
+            await serve_sse(scope, receive, send, chat_id)
+
+    return app
@@ -0,0 +1,153 @@
+"""
+Structured retrieval scopes for /chat/send
+
+The app sends `filters` with `bookmark_id`, `workspace_id` and/or
+`document_ids`. They are resolved here to the set of File ids the user may
+search, and that set is pushed into the Chroma query so retrieval never looks
+outside the scope. Every lookup is limited to what the caller owns or is a
+member of; a scope that resolves to nothing searches nothing.
+
+    file_ids = resolve_scope_file_ids(user['id'], data.get('filters'))
+    results = scoped_query(collection, file_ids, query_texts=[question], n_results=8)
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+SCOPE_KEYS = ('bookmark_id', 'workspace_id', 'document_ids')
+
+logger = logging.getLogger(__name__)
+
+
+def _as_int_list(value: Any) -> list:
+    if value is None:
+        return []
+    if not isinstance(value, (list, tuple, set)):
+        value = [value]
+    ids = []
+    for item in value:
+        try:
+            ids.append(int(item))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+def has_scope(filters: Optional[Dict[str, Any]]) -> bool:
+    return bool(filters) and any(filters.get(key) not in (None, [], '') for key in SCOPE_KEYS)
+
+
+# ==================== SOURCES ====================
+
+_file_has_workspace_id: Optional[bool] = None
+
+
+def file_has_workspace_id(file_model) -> bool:
+    """Checked on the first workspace scope; a missing column is logged once per process"""
+    global _file_has_workspace_id
+    if _file_has_workspace_id is None:
+        _file_has_workspace_id = hasattr(file_model, 'workspace_id')
+        if not _file_has_workspace_id:
+            logger.warning('File has no workspace_id column; workspace scopes match nothing')
+    return _file_has_workspace_id
+
+
+class SqlScopeSource:
+    """Scope lookups against the backend's SQLAlchemy models, limited to the caller"""
+
+    def bookmark_file_ids(self, user_id: int, bookmark_ids: List[int]) -> Set[int]:
+        from shared import db, Bookmark, BookmarkFile
+
+        # Served by the (bookmark_id, file_id) index from db_scripts/create_bookmark_file_index.py
+        rows = db.session.query(BookmarkFile.file_id).join(
+            Bookmark, Bookmark.id == BookmarkFile.bookmark_id
+        ).filter(
+            BookmarkFile.bookmark_id.in_(bookmark_ids),
+            Bookmark.user_id == user_id,
+            Bookmark.is_active.is_(True),
+        ).all()
+        return {row.file_id for row in rows}
+
+    def workspace_file_ids(self, user_id: int, workspace_ids: List[int]) -> Set[int]:
+        from shared import db, File, Workspace, WorkspaceMember
+
+        if not file_has_workspace_id(File):
+            return set()
+
+        # Only workspaces the caller owns or belongs to
+        member_of = db.session.query(WorkspaceMember.workspace_id).filter(
+            WorkspaceMember.workspace_id.in_(workspace_ids), WorkspaceMember.user_id == user_id)
+        owned = db.session.query(Workspace.id).filter(Workspace.id.in_(workspace_ids), Workspace.owner_id == user_id)
+        allowed = {row[0] for row in member_of.union(owned).all()}
+        if not allowed:
+            return set()
+        rows = db.session.query(File.id).filter(File.workspace_id.in_(allowed)).all()
+        return {row.id for row in rows}
+
+    def document_file_ids(self, user_id: int, document_ids: List[int]) -> Set[int]:
+        from shared import db, File
+
+        rows = db.session.query(File.id).filter(File.id.in_(document_ids), File.user_id == user_id).all()
+        return {row.id for row in rows}
+
+
+def resolve_scope_file_ids(user_id: int, filters: Optional[Dict[str, Any]], source=None) -> Optional[Set[int]]:
+    """
+    Resolve chat filters to the user's File ids in scope.
+
+    Returns None when the request is unscoped (search the whole library) and
+    an empty set when the scope matches nothing, including scopes whose ids
+    are invalid or not the caller's. Several scopes intersect.
+    """
+    if not has_scope(filters):
+        return None
+
+    source = source or SqlScopeSource()
+    lookups = (
+        ('bookmark_id', source.bookmark_file_ids),
+        ('workspace_id', source.workspace_file_ids),
+        ('document_ids', source.document_file_ids),
+    )
+
+    file_ids: Optional[Set[int]] = None
+    for key, lookup in lookups:
+        if filters.get(key) in (None, [], ''):
+            continue
+        ids = _as_int_list(filters.get(key))
+        scope = lookup(user_id, ids) if ids else set()
+        file_ids = scope if file_ids is None else file_ids & scope
+        if not file_ids:
+            return set()
+    return file_ids if file_ids is not None else set()
+
+
+# ==================== CHROMA ====================
+
+def chroma_where(file_ids: Optional[Iterable[int]], base: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Build the `where` filter for collection.query() restricted to `file_ids`"""
+    clauses = [base] if base else []
+    if file_ids is not None:
+        ids = sorted(file_ids)
+        if not ids:
+            # Chroma rejects {'$in': []}; callers short-circuit via scoped_query()
+            raise ValueError('empty scope has no where clause')
+        clauses.append({'file_id': ids[0]} if len(ids) == 1 else {'file_id': {'$in': ids}})
+
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {'$and': clauses}
+
+
+def empty_query_result(queries: int = 1) -> Dict[str, List[list]]:
+    """What collection.query() returns when nothing matches"""
+    return {key: [[] for _ in range(queries)] for key in ('ids', 'documents', 'metadatas', 'distances')}
+
+
+def scoped_query(collection, file_ids: Optional[Set[int]], base: Optional[Dict[str, Any]] = None, **kwargs):
+    """collection.query() limited to `file_ids`; an empty scope returns no results without querying"""
+    if file_ids is not None and not file_ids:
+        queries = len(kwargs.get('query_texts') or kwargs.get('query_embeddings') or [None])
+        return empty_query_result(queries)
+    return collection.query(where=chroma_where(file_ids, base), **kwargs)
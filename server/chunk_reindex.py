@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Incremental re-chunking for re-uploaded documents
+
+Every chunk in the `user_documents` collection carries a `content_hash` next to
+its `file_id`. When a new version of a file is processed, its chunks are diffed
+against the stored ones: only new chunks are embedded, unchanged chunks are
+re-pointed to the new version, and removed chunks are deleted in one batch.
+
+Run directly to backfill `content_hash` on chunks indexed before this existed.
+"""
+
+import hashlib
+import re
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+COLLECTION_NAME = 'user_documents'
+HASH_KEY = 'content_hash'
+BACKFILL_BATCH_SIZE = 500
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def chunk_content_hash(text: str) -> str:
+    """Hash a chunk's text, ignoring whitespace-only differences"""
+    normalized = _WHITESPACE.sub(' ', text or '').strip()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class ReindexPlan:
+    """What has to happen to the stored chunks of a file for a new version"""
+    to_embed: List[Dict[str, Any]] = field(default_factory=list)    # {'index', 'text', 'hash'}
+    to_repoint: List[Dict[str, Any]] = field(default_factory=list)  # {'id', 'index', 'hash'}
+    to_delete: List[str] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            'embedded': len(self.to_embed),
+            'reused': len(self.to_repoint),
+            'deleted': len(self.to_delete),
+        }
+
+
+def plan_reindex(existing: Sequence[Dict[str, Any]], new_chunks: Sequence[str]) -> ReindexPlan:
+    """
+    Diff the new chunk texts against the existing chunks.
+
+    `existing` holds {'id', 'hash'} entries for the chunks currently stored for
+    the file. Repeated chunks (headers, footers) are matched one-for-one so
+    that the stored chunk count always equals the new chunk count.
+    """
+    available = defaultdict(list)
+    for chunk in existing:
+        available[chunk['hash']].append(chunk['id'])
+
+    plan = ReindexPlan()
+    for index, text in enumerate(new_chunks):
+        content_hash = chunk_content_hash(text)
+        if available[content_hash]:
+            plan.to_repoint.append({
+                'id': available[content_hash].pop(0),
+                'index': index,
+                'hash': content_hash,
+            })
+        else:
+            plan.to_embed.append({'index': index, 'text': text, 'hash': content_hash})
+
+    for ids in available.values():
+        plan.to_delete.extend(ids)
+    return plan
+
+
+def _existing_chunks(collection, file_id) -> List[Dict[str, Any]]:
+    """Load the ids and hashes of a file's chunks, hashing any legacy chunk text"""
+    stored = collection.get(where={'file_id': file_id}, include=['metadatas', 'documents'])
+    chunks = []
+    for chunk_id, metadata, document in zip(stored['ids'], stored['metadatas'], stored['documents']):
+        content_hash = (metadata or {}).get(HASH_KEY) or chunk_content_hash(document)
+        chunks.append({'id': chunk_id, 'hash': content_hash})
+    return chunks
+
+
+def apply_reindex(
+    collection,
+    file_id,
+    new_chunks: Sequence[str],
+    base_metadata: Optional[Dict[str, Any]] = None,
+    new_file_id=None,
+    embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+) -> ReindexPlan:
+    """
+    Bring the chunks stored for `file_id` in line with `new_chunks`.
+
+    When the re-upload created a new File row, pass its id as `new_file_id` and
+    the reused chunks are re-pointed to it. `embed_fn` embeds only the new
+    chunks; without it the collection's own embedding function is used.
+    """
+    target_file_id = new_file_id if new_file_id is not None else file_id
+    metadata = dict(base_metadata or {})
+    metadata['file_id'] = target_file_id
+
+    plan = plan_reindex(_existing_chunks(collection, file_id), new_chunks)
+
+    if plan.to_embed:
+        texts = [chunk['text'] for chunk in plan.to_embed]
+        add_kwargs = {
+            'ids': [
+                f"{target_file_id}_{chunk['hash'][:16]}_{uuid.uuid4().hex[:8]}"
+                for chunk in plan.to_embed
+            ],
+            'documents': texts,
+            'metadatas': [
+                {**metadata, 'chunk_index': chunk['index'], HASH_KEY: chunk['hash']}
+                for chunk in plan.to_embed
+            ],
+        }
+        if embed_fn is not None:
+            add_kwargs['embeddings'] = embed_fn(texts)
+        collection.add(**add_kwargs)
+
+    if plan.to_repoint:
+        collection.update(
+            ids=[chunk['id'] for chunk in plan.to_repoint],
+            metadatas=[
+                {**metadata, 'chunk_index': chunk['index'], HASH_KEY: chunk['hash']}
+                for chunk in plan.to_repoint
+            ],
+        )
+
+    # Removed chunks go last: if embedding or the add fails, the old version stays searchable
+    if plan.to_delete:
+        collection.delete(ids=plan.to_delete)
+
+    return plan
+
+
+def backfill_content_hashes(collection, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Add `content_hash` to every chunk that does not have one yet"""
+    updated = 0
+    offset = 0
+    while True:
+        batch = collection.get(limit=batch_size, offset=offset, include=['metadatas', 'documents'])
+        if not batch['ids']:
+            break
+
+        ids, metadatas = [], []
+        for chunk_id, metadata, document in zip(batch['ids'], batch['metadatas'], batch['documents']):
+            metadata = metadata or {}
+            if HASH_KEY not in metadata:
+                ids.append(chunk_id)
+                metadatas.append({**metadata, HASH_KEY: chunk_content_hash(document)})
+
+        if ids:
+            collection.update(ids=ids, metadatas=metadatas)
+            updated += len(ids)
+        offset += len(batch['ids'])
+    return updated
+
+
+if __name__ == "__main__":
+    import chromadb
+
+    client = chromadb.PersistentClient(path='./manager-francis/backend/chroma_db')
+    collection = client.get_collection(COLLECTION_NAME)
+    print(f'📊 {COLLECTION_NAME} collection: {collection.count()} total chunks')
+
+    try:
+        count = backfill_content_hashes(collection)
+        print(f'✅ Added content hashes to {count} chunks')
+    except Exception as e:
+        print(f'❌ Error: {e}')
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Micro-batching for file_kind classification
+
+Uploads that arrive together (e.g. dozens of files posted to
+/upload-links/<id>/files) are collected for up to `max_wait_ms` or
+`max_batch_size` items and classified with a single model call. A batch
+is sent at most `max_wait_ms` after its oldest item was submitted, and
+batches run on a small pool so the next one fills while a slow model call is
+still in flight. A batch is only taken once a pool worker is free: while
+every worker is busy, items keep queueing and the next batch grows towards
+`max_batch_size` instead of piling up as small batches behind the pool.
+
+The backend registers its batched model call once at startup:
+
+    from server.classification_batcher import configure_file_kind_batcher
+    configure_file_kind_batcher(classify_documents_batch)
+
+where `classify_documents_batch(items)` takes a list of
+{'filename', 'mime_type', 'text'} dicts and returns one label per item.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+FILE_KINDS = ('Document', 'Receipt', 'Form')
+DEFAULT_FILE_KIND = 'Document'
+
+MAX_BATCH_SIZE = int(os.getenv('CLASSIFY_MAX_BATCH_SIZE', '16'))
+MAX_WAIT_MS = int(os.getenv('CLASSIFY_MAX_WAIT_MS', '50'))
+# Model calls in flight at once
+MAX_CONCURRENT_BATCHES = int(os.getenv('CLASSIFY_MAX_CONCURRENT_BATCHES', '4'))
+# Text sent to the model per document; the start of a file is enough to tell its kind
+MAX_TEXT_CHARS = 2000
+
+
+class MicroBatcher:
+    """Collects submitted items and hands them to `batch_fn` in groups"""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: int = MAX_WAIT_MS,
+        name: str = 'micro-batcher',
+        max_concurrent_batches: int = MAX_CONCURRENT_BATCHES,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        # (item, future, monotonic submit time), oldest first
+        self._queue: List[Tuple[Any, Future, float]] = []
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_batches, thread_name_prefix=name)
+        # One permit per pool worker, held from taking a batch until it has run
+        self._free_workers = threading.Semaphore(max_concurrent_batches)
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, item: Any) -> Future:
+        future: Future = Future()
+        with self._condition:
+            self._queue.append((item, future, time.monotonic()))
+            self._condition.notify()
+        return future
+
+    def __call__(self, item: Any, timeout: Optional[float] = None) -> Any:
+        return self.submit(item).result(timeout=timeout)
+
+    @property
+    def queue_depth(self) -> int:
+        with self._condition:
+            return len(self._queue)
+
+    def _next_batch(self) -> List[Tuple[Any, Future, float]]:
+        with self._condition:
+            while not self._queue:
+                self._condition.wait()
+
+            # The oldest item bounds how long the batch may keep filling
+            deadline = self._queue[0][2] + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = self._queue[:self.max_batch_size]
+            del self._queue[:self.max_batch_size]
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            self._free_workers.acquire()
+            self._executor.submit(self._execute, self._next_batch())
+
+    def _execute(self, batch: List[Tuple[Any, Future, float]]) -> None:
+        try:
+            self._complete(batch)
+        finally:
+            self._free_workers.release()
+
+    def _complete(self, batch: List[Tuple[Any, Future, float]]) -> None:
+        items = [item for item, _, _ in batch]
+        try:
+            results = list(self.batch_fn(items))
+            if len(results) != len(items):
+                raise ValueError(f'batch_fn returned {len(results)} results for {len(items)} items')
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+
+def normalize_file_kind(label: Optional[str]) -> str:
+    """Map model output ('receipt', 'Forms', ...) onto the stored File.file_kind values"""
+    label = (label or '').strip().lower().rstrip('s')
+    for kind in FILE_KINDS:
+        if kind.lower() == label:
+            return kind
+    return DEFAULT_FILE_KIND
+
+
+_file_kind_batcher: Optional[MicroBatcher] = None
+
+
+def configure_file_kind_batcher(batch_fn: Callable[[List[dict]], Sequence[str]], **kwargs) -> MicroBatcher:
+    global _file_kind_batcher
+    _file_kind_batcher = MicroBatcher(batch_fn, name='file-kind-classifier', **kwargs)
+    return _file_kind_batcher
+
+
+def file_kind_queue_depth() -> int:
+    return _file_kind_batcher.queue_depth if _file_kind_batcher is not None else 0
+
+
+def classify_file_kind(text: str, filename: str = '', mime_type: str = '', timeout: Optional[float] = 30) -> str:
+    """Classify one upload; concurrent callers share a batched model call"""
+    if _file_kind_batcher is None:
+        raise RuntimeError('configure_file_kind_batcher() has not been called')
+
+    item = {'filename': filename, 'mime_type': mime_type, 'text': (text or '')[:MAX_TEXT_CHARS]}
+    return normalize_file_kind(_file_kind_batcher(item, timeout=timeout))
@@ -0,0 +1,406 @@
+"""
+Reconciliation between File rows, uploads/ and the Chroma user_documents collection
+
+The three stores drift apart: rows whose file is gone from disk, rows that
+never got chunks (or lost them when ChromaDB was reset), chunks whose File
+row was deleted, and files on disk that no row points to. The checker
+streams all three in batches, so memory stays bounded by the batch size
+rather than the library size:
+
+1. File rows in id order (keyset pagination): each batch is checked against
+   disk with one stat per row and against Chroma with one `$in` lookup
+2. Chroma chunks page by page: the distinct file ids of a page are looked up
+   in one `id IN (...)` query to find orphan chunks, which are deleted once
+   the scan is over so the pages still to read do not shift
+3. uploads/ directory by directory in name order: each batch of paths is
+   looked up in one `filename IN (...)` query and matched on the full
+   relative path (uploads/<user_id>/<name>) to find orphan files
+
+Items younger than GRACE_SECONDS are skipped: an upload may be on disk before
+its row commits, and a new row has no chunks until processing finishes.
+Chunks carry no timestamp, so chunks of file ids above the newest row older
+than the grace window are skipped too: their row may not be committed yet.
+Chunks without a file_id are counted but never treated as orphans.
+
+With repair enabled, at most `repair_rate` fixes per second are applied:
+orphan chunks are deleted, rows without chunks whose file is still on disk
+are sent back through processing (`reprocess(file_id)`), and orphan files
+are moved to uploads/.orphaned/ rather than deleted. A row is reprocessed
+once: the attempt is recorded (db_scripts/create_reprocess_attempt_table.py)
+and a row that still has no chunks afterwards, typically a file with no
+extractable text, is reported as no_text. Once a row is seen with chunks its
+attempt is cleared, so it is reprocessed again if it loses them later. Rows
+whose file is lost are only reported.
+
+    python db_scripts/reconcile_storage.py                  # report only
+    python db_scripts/reconcile_storage.py --repair --rate 2
+    python db_scripts/reconcile_storage.py --daemon         # every CONSISTENCY_INTERVAL_SECONDS
+"""
+
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
+BATCH_SIZE = int(os.getenv('CONSISTENCY_BATCH_SIZE', '500'))
+GRACE_SECONDS = int(os.getenv('CONSISTENCY_GRACE_SECONDS', '900'))
+REPAIR_RATE = float(os.getenv('CONSISTENCY_REPAIR_RATE', '2'))
+INTERVAL_SECONDS = int(os.getenv('CONSISTENCY_INTERVAL_SECONDS', '3600'))
+QUARANTINE_DIR = '.orphaned'
+SKIP_SUFFIXES = ('.part',)
+REPORT_SAMPLE_SIZE = 100
+REPROCESS_TABLE = 'consistency_reprocess_attempt'
+
+
+@dataclass
+class FileRow:
+    id: int
+    user_id: int
+    filename: str
+    created_at: float   # epoch seconds
+
+
+@dataclass
+class ConsistencyReport:
+    rows_checked: int = 0
+    chunks_checked: int = 0
+    disk_files_checked: int = 0
+    # Counts, with up to REPORT_SAMPLE_SIZE examples each
+    counts: Dict[str, int] = field(default_factory=lambda: {
+        'missing_on_disk': 0, 'missing_chunks': 0, 'no_text': 0, 'lost': 0, 'orphan_chunks': 0,
+        'unattributed_chunks': 0, 'orphan_files': 0})
+    samples: Dict[str, List[Any]] = field(default_factory=dict)
+    repaired: Dict[str, int] = field(default_factory=dict)
+    elapsed_seconds: float = 0.0
+
+    def add(self, kind: str, item: Any, count: int = 1) -> None:
+        self.counts[kind] = self.counts.get(kind, 0) + count
+        sample = self.samples.setdefault(kind, [])
+        if len(sample) < REPORT_SAMPLE_SIZE:
+            sample.append(item)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'rows_checked': self.rows_checked,
+            'chunks_checked': self.chunks_checked,
+            'disk_files_checked': self.disk_files_checked,
+            'counts': dict(self.counts),
+            'samples': {k: list(v) for k, v in self.samples.items()},
+            'repaired': dict(self.repaired),
+            'elapsed_seconds': round(self.elapsed_seconds, 2),
+        }
+
+
+# ==================== SOURCES ====================
+
+class SqlFileSource:
+    """File rows from Postgres via the backend's SQLAlchemy models"""
+
+    def iter_batches(self, batch_size: int) -> Iterator[List[FileRow]]:
+        from shared import db, File
+
+        after = 0
+        while True:
+            rows = (db.session.query(File.id, File.user_id, File.filename, File.created_at)
+                    .filter(File.id > after).order_by(File.id).limit(batch_size).all())
+            if not rows:
+                return
+            yield [FileRow(r.id, r.user_id, r.filename or '', r.created_at.timestamp() if r.created_at else 0.0)
+                   for r in rows]
+            after = rows[-1].id
+            db.session.expire_all()
+
+    def existing_ids(self, ids: Sequence[int]) -> Set[int]:
+        from shared import db, File
+
+        return {row.id for row in db.session.query(File.id).filter(File.id.in_(list(ids))).all()}
+
+    def existing_paths(self, paths: Sequence[str]) -> Set[str]:
+        """The relative upload paths (see upload_path_key) that some File row points to"""
+        from shared import db, File
+
+        keys = {path: upload_path_key(path) for path in paths}
+        names = sorted({key[1] for key in keys.values() if key is not None})
+        if not names:
+            return set()
+        rows = db.session.query(File.user_id, File.filename).filter(File.filename.in_(names)).all()
+        return matching_paths(keys, ((row.user_id, row.filename) for row in rows))
+
+    def reprocess_attempted(self, ids: Sequence[int]) -> Set[int]:
+        from shared import db
+        from sqlalchemy import bindparam, text
+
+        rows = db.session.execute(
+            text(f'SELECT file_id FROM {REPROCESS_TABLE} WHERE file_id IN :ids').bindparams(
+                bindparam('ids', expanding=True)),
+            {'ids': list(ids)}).fetchall()
+        return {row.file_id for row in rows}
+
+    def record_reprocess_attempt(self, file_id: int) -> None:
+        from shared import db
+        from sqlalchemy import text
+
+        with db.engine.begin() as conn:
+            conn.execute(text(
+                f'INSERT INTO {REPROCESS_TABLE} (file_id, attempted_at) VALUES (:file_id, NOW()) '
+                'ON CONFLICT (file_id) DO UPDATE SET attempted_at = NOW()'
+            ), {'file_id': file_id})
+
+    def clear_reprocess_attempts(self, ids: Sequence[int]) -> None:
+        from shared import db
+        from sqlalchemy import bindparam, text
+
+        with db.engine.begin() as conn:
+            conn.execute(
+                text(f'DELETE FROM {REPROCESS_TABLE} WHERE file_id IN :ids').bindparams(
+                    bindparam('ids', expanding=True)),
+                {'ids': list(ids)})
+
+
+def upload_path_key(relative: str) -> Optional[Tuple[Optional[int], str]]:
+    """
+    (user_id, name) for uploads/<user_id>/<name>, (None, name) for a file at
+    the top of uploads/ (the layout before per-user directories), None for
+    anything else
+    """
+    parts = relative.replace(os.sep, '/').split('/')
+    if len(parts) == 1:
+        return None, parts[0]
+    if len(parts) == 2 and parts[0].isdigit():
+        return int(parts[0]), parts[1]
+    return None
+
+
+def matching_paths(keys: Dict[str, Optional[Tuple[Optional[int], str]]],
+                   rows: Iterable[Tuple[int, str]]) -> Set[str]:
+    """Paths from `keys` that a (user_id, filename) row points to; top-level files match by name"""
+    owned = set()
+    names = set()
+    for user_id, filename in rows:
+        owned.add((user_id, filename))
+        names.add(filename)
+    return {path for path, key in keys.items()
+            if key is not None and (key in owned if key[0] is not None else key[1] in names)}
+
+
+def file_path(upload_folder: str, row: FileRow) -> Optional[str]:
+    """Where the row's file lives: uploads/<user_id>/<name> or uploads/<name>"""
+    for path in (os.path.join(upload_folder, str(row.user_id), row.filename),
+                 os.path.join(upload_folder, row.filename)):
+        if row.filename and os.path.isfile(path):
+            return path
+    return None
+
+
+def iter_disk_batches(upload_folder: str, batch_size: int, min_age: float) -> Iterator[List[str]]:
+    """Paths under uploads/ in name order, one directory listing in memory at a time"""
+    cutoff = time.time() - min_age
+    batch: List[str] = []
+    stack = [upload_folder]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name, reverse=True)
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.name == QUARANTINE_DIR or entry.name.startswith('.'):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif not entry.name.endswith(SKIP_SUFFIXES) and entry.stat().st_mtime < cutoff:
+                batch.append(entry.path)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+
+def _chunk_file_id(metadata: Optional[Dict[str, Any]]) -> Optional[int]:
+    try:
+        return int((metadata or {}).get('file_id'))
+    except (TypeError, ValueError):
+        return None
+
+
+# ==================== REPAIR BUDGET ====================
+
+class RepairBudget:
+    """At most `rate` repairs per second, and `limit` per run"""
+
+    def __init__(self, rate: float, limit: Optional[int] = None):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.limit = limit
+        self.used = 0
+        self._next_at = 0.0
+
+    def take(self) -> bool:
+        if self.limit is not None and self.used >= self.limit:
+            return False
+        now = time.monotonic()
+        if now < self._next_at:
+            time.sleep(self._next_at - now)
+        self._next_at = max(now, self._next_at) + self.interval
+        self.used += 1
+        return True
+
+
+# ==================== CHECKER ====================
+
+class ConsistencyChecker:
+
+    def __init__(self, files=None, collection=None, upload_folder: str = UPLOAD_FOLDER,
+                 reprocess: Optional[Callable[[int], None]] = None, batch_size: int = BATCH_SIZE,
+                 grace_seconds: float = GRACE_SECONDS):
+        self.files = files or SqlFileSource()
+        self.collection = collection
+        self.upload_folder = upload_folder
+        self.reprocess = reprocess
+        self.batch_size = batch_size
+        self.grace_seconds = grace_seconds
+
+    def run(self, repair: bool = False, repair_rate: float = REPAIR_RATE,
+            max_repairs: Optional[int] = None) -> ConsistencyReport:
+        report = ConsistencyReport()
+        budget = RepairBudget(repair_rate, max_repairs) if repair else None
+        start = time.perf_counter()
+        settled_id = self._check_rows(report, budget)
+        if self.collection is not None:
+            self._check_chunks(report, budget, settled_id)
+        self._check_disk(report, budget)
+        report.elapsed_seconds = time.perf_counter() - start
+        return report
+
+    def _repair(self, report: ConsistencyReport, budget: Optional[RepairBudget], kind: str,
+                action: Callable[[], None]) -> None:
+        if budget is None or not budget.take():
+            return
+        try:
+            action()
+            report.repaired[kind] = report.repaired.get(kind, 0) + 1
+        except Exception as e:
+            print(f"⚠️ Repair of {kind} failed: {e}")
+
+    def _chunk_counts(self, ids: List[int]) -> Dict[int, int]:
+        if self.collection is None:
+            return {}
+        # Older chunks stored file_id as a string, so match both forms
+        stored = self.collection.get(where={'$or': [{'file_id': {'$in': ids}},
+                                                    {'file_id': {'$in': [str(i) for i in ids]}}]},
+                                     include=['metadatas'])
+        counts: Dict[int, int] = {}
+        for metadata in stored['metadatas']:
+            file_id = _chunk_file_id(metadata)
+            if file_id is not None:
+                counts[file_id] = counts.get(file_id, 0) + 1
+        return counts
+
+    def _reprocess(self, file_id: int) -> None:
+        self.reprocess(file_id)
+        self.files.record_reprocess_attempt(file_id)
+
+    def _check_rows(self, report: ConsistencyReport, budget: Optional[RepairBudget]) -> int:
+        """Check every settled row; returns the highest settled row id"""
+        cutoff = time.time() - self.grace_seconds
+        settled_id = 0
+        for batch in self.files.iter_batches(self.batch_size):
+            batch = [row for row in batch if row.created_at < cutoff]
+            report.rows_checked += len(batch)
+            if not batch:
+                continue
+            settled_id = max(settled_id, max(row.id for row in batch))
+            chunk_counts = self._chunk_counts([row.id for row in batch])
+            without_chunks = []
+            # Only a repair run clears attempts; a report-only run writes nothing
+            with_chunks = [row.id for row in batch if chunk_counts.get(row.id, 0) > 0] if budget is not None else []
+            for row in batch:
+                on_disk = file_path(self.upload_folder, row) is not None
+                has_chunks = self.collection is None or chunk_counts.get(row.id, 0) > 0
+                if not on_disk and not has_chunks:
+                    report.add('lost', row.id)
+                elif not on_disk:
+                    report.add('missing_on_disk', row.id)
+                elif not has_chunks:
+                    without_chunks.append(row.id)
+            if not without_chunks and not with_chunks:
+                continue
+
+            attempted = self.files.reprocess_attempted(without_chunks + with_chunks)
+            processed = [file_id for file_id in with_chunks if file_id in attempted]
+            if processed:
+                self.files.clear_reprocess_attempts(processed)
+            for file_id in without_chunks:
+                if file_id in attempted:
+                    # Processed again and still no chunks: nothing to extract, do not retry every run
+                    report.add('no_text', file_id)
+                    continue
+                report.add('missing_chunks', file_id)
+                if self.reprocess is not None:
+                    self._repair(report, budget, 'missing_chunks', lambda file_id=file_id: self._reprocess(file_id))
+        return settled_id
+
+    def _check_chunks(self, report: ConsistencyReport, budget: Optional[RepairBudget], settled_id: int) -> None:
+        orphans: List[List[str]] = []
+        offset = 0
+        while True:
+            page = self.collection.get(limit=self.batch_size, offset=offset, include=['metadatas'])
+            if not page['ids']:
+                break
+            offset += len(page['ids'])
+            report.chunks_checked += len(page['ids'])
+            by_file: Dict[Optional[int], List[str]] = {}
+            for chunk_id, metadata in zip(page['ids'], page['metadatas']):
+                by_file.setdefault(_chunk_file_id(metadata), []).append(chunk_id)
+            unattributed = by_file.pop(None, [])
+            if unattributed:
+                report.add('unattributed_chunks', unattributed[0], count=len(unattributed))
+            # Ids above the newest settled row may belong to rows that are not committed yet
+            by_file = {fid: ids for fid, ids in by_file.items() if fid <= settled_id}
+            known = self.files.existing_ids(list(by_file)) if by_file else set()
+
+            for file_id, chunk_ids in by_file.items():
+                if file_id in known:
+                    continue
+                report.add('orphan_chunks', file_id, count=len(chunk_ids))
+                if budget is not None:
+                    orphans.append(chunk_ids)
+
+        for chunk_ids in orphans:
+            self._repair(report, budget, 'orphan_chunks', lambda ids=chunk_ids: self.collection.delete(ids=ids))
+
+    def _check_disk(self, report: ConsistencyReport, budget: Optional[RepairBudget]) -> None:
+        quarantine = os.path.join(self.upload_folder, QUARANTINE_DIR)
+        for paths in iter_disk_batches(self.upload_folder, self.batch_size, self.grace_seconds):
+            report.disk_files_checked += len(paths)
+            relative_paths = {path: os.path.relpath(path, self.upload_folder) for path in paths}
+            known = self.files.existing_paths(sorted(relative_paths.values()))
+            for path, relative in relative_paths.items():
+                if relative in known:
+                    continue
+                report.add('orphan_files', relative)
+
+                def move(path=path, relative=relative) -> None:
+                    target = os.path.join(quarantine, relative)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(path, target)
+
+                self._repair(report, budget, 'orphan_files', move)
+
+
+def run_daemon(checker: ConsistencyChecker, interval_seconds: float = INTERVAL_SECONDS,
+               repair: bool = False, repair_rate: float = REPAIR_RATE, stop: Optional[threading.Event] = None,
+               on_report: Optional[Callable[[ConsistencyReport], None]] = None) -> None:
+    """Re-run the check every `interval_seconds` until `stop` is set"""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            report = checker.run(repair=repair, repair_rate=repair_rate)
+            if on_report is not None:
+                on_report(report)
+        except Exception as e:
+            print(f"❌ Consistency check failed: {e}")
+        stop.wait(interval_seconds)
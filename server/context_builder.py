@@ -0,0 +1,177 @@
+"""
+Token-budgeted context assembly for /chat/send
+
+Retrieved chunks are deduplicated (overlapping windows from the same file),
+re-ranked with a cheap local scorer that mixes vector similarity with query
+term overlap, and packed greedily into a token budget. Citations are built
+from the packed chunks only, so every citation points at text the model saw.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+TOKEN_BUDGET = int(os.getenv('CHAT_CONTEXT_TOKEN_BUDGET', '3000'))
+# Share of the final score taken by vector similarity; the rest is lexical
+VECTOR_WEIGHT = float(os.getenv('CHAT_CONTEXT_VECTOR_WEIGHT', '0.6'))
+DUPLICATE_CONTAINMENT = 0.6
+SHINGLE_SIZE = 5
+EXCERPT_CHARS = 200
+
+_WORD = re.compile(r'\w+')
+_STOPWORDS = frozenset(
+    'a an and are as at be by for from has have in is it of on or that the this to was were what when '
+    'where which who why with about does do how me my i you your'.split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token, close enough for budgeting English prompts"""
+    return max(1, math.ceil(len(text or '') / 4))
+
+
+@dataclass
+class ContextResult:
+    context: str
+    chunks: List[Dict[str, Any]]
+    citations: List[Dict[str, Any]]
+    candidate_tokens: int
+    context_tokens: int
+    duplicates_dropped: int
+    over_budget_dropped: int
+    stats: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.candidate_tokens - self.context_tokens
+
+
+def _words(text: str) -> List[str]:
+    return [word.lower() for word in _WORD.findall(text or '')]
+
+
+def _shingles(words: Sequence[str]) -> Set[Tuple[str, ...]]:
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _similarity(chunk: Dict[str, Any]) -> float:
+    """Vector similarity in [0, 1] from either a score or a Chroma distance"""
+    if chunk.get('score') is not None:
+        return max(0.0, min(1.0, float(chunk['score'])))
+    if chunk.get('distance') is not None:
+        return 1.0 / (1.0 + float(chunk['distance']))
+    return 0.0
+
+
+def deduplicate(chunks: Sequence[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """Drop chunks mostly contained in a better-ranked chunk of the same file"""
+    kept: List[Tuple[Dict[str, Any], Set[Tuple[str, ...]]]] = []
+    dropped = 0
+    for chunk in sorted(chunks, key=_similarity, reverse=True):
+        shingles = _shingles(_words(chunk.get('text', '')))
+        duplicate = False
+        for other, other_shingles in kept:
+            if other.get('file_id') != chunk.get('file_id') or not shingles:
+                continue
+            overlap = len(shingles & other_shingles) / len(shingles)
+            if overlap >= DUPLICATE_CONTAINMENT:
+                duplicate = True
+                break
+        if duplicate:
+            dropped += 1
+        else:
+            kept.append((chunk, shingles))
+    return [chunk for chunk, _ in kept], dropped
+
+
+def rerank(query: str, chunks: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """BM25-style query-term overlap blended with vector similarity"""
+    query_terms = [word for word in _words(query) if word not in _STOPWORDS]
+    documents = [Counter(_words(chunk.get('text', ''))) for chunk in chunks]
+    if not chunks:
+        return []
+
+    average_length = sum(sum(doc.values()) for doc in documents) / len(documents) or 1.0
+    document_frequency = Counter(term for doc in documents for term in set(query_terms) if term in doc)
+
+    lexical_scores = []
+    for doc in documents:
+        length = sum(doc.values())
+        score = 0.0
+        for term in set(query_terms):
+            frequency = doc.get(term, 0)
+            if not frequency:
+                continue
+            idf = math.log(1 + (len(documents) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+            score += idf * frequency * 2.2 / (frequency + 1.2 * (0.25 + 0.75 * length / average_length))
+        lexical_scores.append(score)
+
+    top_lexical = max(lexical_scores) or 1.0
+    ranked = []
+    for chunk, lexical in zip(chunks, lexical_scores):
+        combined = VECTOR_WEIGHT * _similarity(chunk) + (1 - VECTOR_WEIGHT) * lexical / top_lexical
+        ranked.append({**chunk, 'rank_score': round(combined, 4)})
+    ranked.sort(key=lambda chunk: chunk['rank_score'], reverse=True)
+    return ranked
+
+
+def build_context(query: str, chunks: Sequence[Dict[str, Any]], token_budget: Optional[int] = None) -> ContextResult:
+    """
+    Assemble the prompt context for `query`.
+
+    Each chunk is a dict with 'text', 'file_id', an optional 'filename' and
+    either 'score' (similarity) or 'distance' (as returned by Chroma).
+    """
+    budget = token_budget or TOKEN_BUDGET
+    candidate_tokens = sum(estimate_tokens(chunk.get('text', '')) for chunk in chunks)
+
+    unique, duplicates = deduplicate(chunks)
+    ranked = rerank(query, unique)
+
+    packed, used, skipped = [], 0, 0
+    for chunk in ranked:
+        tokens = estimate_tokens(chunk.get('text', ''))
+        if used + tokens > budget:
+            # Keep trying: a smaller, lower-ranked chunk may still fit
+            skipped += 1
+            continue
+        packed.append(chunk)
+        used += tokens
+
+    sections = []
+    citations = []
+    for chunk in packed:
+        source = chunk.get('filename') or f"File {chunk.get('file_id')}"
+        sections.append(f"[{source}]\n{chunk.get('text', '').strip()}")
+        citations.append({
+            'source_type': 'document',
+            'source_name': source,
+            'file_id': chunk.get('file_id'),
+            'excerpt': chunk.get('text', '').strip()[:EXCERPT_CHARS],
+            'confidence': chunk['rank_score'],
+        })
+
+    result = ContextResult(
+        context='\n\n'.join(sections),
+        chunks=packed,
+        citations=citations,
+        candidate_tokens=candidate_tokens,
+        context_tokens=used,
+        duplicates_dropped=duplicates,
+        over_budget_dropped=skipped,
+    )
+    result.stats = {
+        'candidate_chunks': len(chunks),
+        'context_chunks': len(packed),
+        'candidate_tokens': candidate_tokens,
+        'context_tokens': used,
+        'tokens_saved': result.tokens_saved,
+        'duplicates_dropped': duplicates,
+        'over_budget_dropped': skipped,
+    }
+    return result
@@ -0,0 +1,428 @@
+"""
+Background import of Dropbox / Google Drive files
+
+The mobile external-download endpoints used to call download_dropbox_file() /
+download_google_drive_file() inline, one file per request, buffering each
+download in memory. An ImportEngine job takes every selected file at once and
+downloads them on a bounded thread pool. Each response body is streamed in
+chunks straight to the user's upload directory while it is hashed, so memory
+stays flat regardless of file size. Transient failures (timeouts, 429, 5xx)
+are retried with exponential backoff and jitter, and per-file progress is
+saved to a job store for the app to poll. The store is Redis
+(EXTERNAL_IMPORT_REDIS_URL) when the API runs several workers, so any worker
+can answer the poll and jobs outlive the worker that ran them; a job whose
+worker stopped updating it is reported as interrupted.
+
+Native Google Docs, Sheets and Slides have no file content to download and
+are exported instead (see GOOGLE_EXPORT_FORMATS); pass each file's
+`mime_type` from the listing so no metadata request is needed.
+
+    from server.external_import import DropboxProvider, import_engine
+    job_id = import_engine.start(user.id, DropboxProvider(), access_token, files, upload_dir,
+                                 on_file_done=register_imported_file)
+    import_engine.get_job(job_id, user.id)   # -> progress dict, or None
+
+`on_file_done(user_id, item)` runs on the worker once a file is on disk; the
+backend uses it to create the File row and queue processing.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+IMPORT_CONCURRENCY = int(os.getenv('EXTERNAL_IMPORT_CONCURRENCY', '4'))
+IMPORT_MAX_RETRIES = int(os.getenv('EXTERNAL_IMPORT_MAX_RETRIES', '3'))
+IMPORT_BACKOFF_SECONDS = float(os.getenv('EXTERNAL_IMPORT_BACKOFF_SECONDS', '1'))
+CHUNK_SIZE = 256 * 1024
+JOB_RETENTION_SECONDS = 3600
+# Progress is saved at most this often per file; status changes are saved immediately
+PROGRESS_SAVE_SECONDS = 0.5
+# A running job not updated for this long lost its worker
+STALE_JOB_SECONDS = int(os.getenv('EXTERNAL_IMPORT_STALE_SECONDS', '300'))
+
+GOOGLE_APPS_PREFIX = 'application/vnd.google-apps.'
+# Google-native type -> (export mime type, extension)
+GOOGLE_EXPORT_FORMATS = {
+    'application/vnd.google-apps.document': (
+        'application/vnd.openxmlformats-officedocument.wordprocessingml.document', '.docx'),
+    'application/vnd.google-apps.spreadsheet': ('text/csv', '.csv'),
+    'application/vnd.google-apps.presentation': ('application/pdf', '.pdf'),
+    'application/vnd.google-apps.drawing': ('application/pdf', '.pdf'),
+}
+
+logger = logging.getLogger(__name__)
+
+
+class TransientImportError(Exception):
+    """A failure worth retrying (network error, rate limit, provider 5xx)"""
+
+
+# ==================== PROVIDERS ====================
+
+def _check_response(response) -> None:
+    if response.status_code == 429 or response.status_code >= 500:
+        raise TransientImportError(f'HTTP {response.status_code}')
+    response.raise_for_status()
+
+
+class _HttpProvider(ABC):
+    name = ''
+
+    @abstractmethod
+    def _request(self, access_token: str, file_id: str, mime_type: Optional[str] = None):
+        """Start the streaming download of `file_id` and return the response"""
+
+    def stored_name(self, name: str, mime_type: Optional[str] = None) -> str:
+        return name
+
+    def open_stream(self, access_token: str, file_id: str, mime_type: Optional[str] = None) -> Iterator[bytes]:
+        import requests
+
+        try:
+            response = self._request(access_token, file_id, mime_type)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise TransientImportError(str(e)) from e
+        _check_response(response)
+        try:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                if chunk:
+                    yield chunk
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise TransientImportError(str(e)) from e
+        finally:
+            response.close()
+
+
+class DropboxProvider(_HttpProvider):
+    name = 'dropbox'
+    url = 'https://content.dropboxapi.com/2/files/download'
+
+    def _request(self, access_token: str, file_id: str, mime_type: Optional[str] = None):
+        import requests
+
+        return requests.post(self.url, stream=True, timeout=(10, 60), headers={
+            'Authorization': f'Bearer {access_token}',
+            'Dropbox-API-Arg': json.dumps({'path': file_id}),
+        })
+
+
+class GoogleDriveProvider(_HttpProvider):
+    name = 'googledrive'
+    url = 'https://www.googleapis.com/drive/v3/files/{file_id}'
+
+    def _mime_type(self, access_token: str, file_id: str) -> Optional[str]:
+        import requests
+
+        response = requests.get(self.url.format(file_id=file_id), params={'fields': 'mimeType'}, timeout=(10, 30),
+                                headers={'Authorization': f'Bearer {access_token}'})
+        _check_response(response)
+        return response.json().get('mimeType')
+
+    def stored_name(self, name: str, mime_type: Optional[str] = None) -> str:
+        export = GOOGLE_EXPORT_FORMATS.get(mime_type or '')
+        if export and not name.lower().endswith(export[1]):
+            return name + export[1]
+        return name
+
+    def _request(self, access_token: str, file_id: str, mime_type: Optional[str] = None):
+        import requests
+
+        headers = {'Authorization': f'Bearer {access_token}'}
+        mime_type = mime_type or self._mime_type(access_token, file_id)
+        if mime_type and mime_type.startswith(GOOGLE_APPS_PREFIX):
+            # Native Google files have no content for alt=media; export them
+            if mime_type not in GOOGLE_EXPORT_FORMATS:
+                raise ValueError(f'{mime_type} cannot be exported')
+            return requests.get(f'{self.url.format(file_id=file_id)}/export',
+                                params={'mimeType': GOOGLE_EXPORT_FORMATS[mime_type][0]},
+                                stream=True, timeout=(10, 60), headers=headers)
+        return requests.get(self.url.format(file_id=file_id), params={'alt': 'media'}, stream=True,
+                            timeout=(10, 60), headers=headers)
+
+
+class FakeProvider:
+    """
+    Local provider for tests: serves deterministic bytes per file id with a
+    per-chunk delay, and fails the first `fail_times[file_id]` attempts.
+    """
+    name = 'fake'
+
+    def __init__(self, sizes: Dict[str, int], chunk_delay: float = 0.0,
+                 fail_times: Optional[Dict[str, int]] = None, chunk_size: int = CHUNK_SIZE):
+        self.sizes = sizes
+        self.chunk_delay = chunk_delay
+        self.fail_times = dict(fail_times or {})
+        self.chunk_size = chunk_size
+        self.attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def content(self, file_id: str) -> bytes:
+        seed = hashlib.sha256(file_id.encode()).digest()
+        size = self.sizes[file_id]
+        return (seed * (size // len(seed) + 1))[:size]
+
+    def stored_name(self, name: str, mime_type: Optional[str] = None) -> str:
+        return name
+
+    def open_stream(self, access_token: str, file_id: str, mime_type: Optional[str] = None) -> Iterator[bytes]:
+        with self._lock:
+            attempt = self.attempts[file_id] = self.attempts.get(file_id, 0) + 1
+        data = self.content(file_id)
+        for start in range(0, len(data), self.chunk_size):
+            if attempt <= self.fail_times.get(file_id, 0) and start >= len(data) // 2:
+                raise TransientImportError('connection reset')
+            time.sleep(self.chunk_delay)
+            yield data[start:start + self.chunk_size]
+
+
+# ==================== JOBS ====================
+
+@dataclass
+class ImportItem:
+    file_id: str
+    name: str
+    size: Optional[int] = None
+    mime_type: Optional[str] = None
+    status: str = 'queued'  # queued | downloading | retrying | done | failed
+    bytes_done: int = 0
+    attempts: int = 0
+    sha256: Optional[str] = None
+    stored_path: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def progress(self) -> int:
+        if self.status == 'done':
+            return 100
+        if not self.size:
+            return 0
+        return min(99, int(self.bytes_done * 100 / self.size))
+
+
+@dataclass
+class ImportJob:
+    id: str
+    user_id: int
+    service: str
+    items: List[ImportItem]
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def status(self) -> str:
+        if any(item.status not in ('done', 'failed') for item in self.items):
+            return 'running'
+        return 'failed' if all(item.status == 'failed' for item in self.items) else 'completed'
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'service': self.service,
+            'status': self.status,
+            'completed': sum(item.status == 'done' for item in self.items),
+            'failed': sum(item.status == 'failed' for item in self.items),
+            'total': len(self.items),
+            'files': [
+                {**{k: v for k, v in asdict(item).items() if k != 'stored_path'}, 'progress': item.progress}
+                for item in self.items
+            ],
+        }
+
+    def to_state(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'ImportJob':
+        return cls(**{**state, 'items': [ImportItem(**item) for item in state['items']]})
+
+
+# ==================== JOB STORES ====================
+
+class InMemoryJobStore:
+    """Jobs of this process only (tests, local development, a single worker)"""
+
+    def __init__(self, retention_seconds: int = JOB_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def save(self, job: ImportJob) -> None:
+        state = job.to_state()
+        with self._lock:
+            cutoff = time.time() - self.retention_seconds
+            for job_id in [j for j, s in self._jobs.items() if s['finished_at'] and s['finished_at'] < cutoff]:
+                del self._jobs[job_id]
+            self._jobs[job.id] = state
+
+    def load(self, job_id: str) -> Optional[ImportJob]:
+        with self._lock:
+            state = self._jobs.get(job_id)
+        return ImportJob.from_state(state) if state is not None else None
+
+    def jobs(self) -> List[ImportJob]:
+        with self._lock:
+            states = list(self._jobs.values())
+        return [ImportJob.from_state(state) for state in states]
+
+
+class RedisJobStore:
+    """Jobs shared by every worker, expiring after the retention period. Needs the `redis` package"""
+
+    def __init__(self, url: str, retention_seconds: int = JOB_RETENTION_SECONDS):
+        import redis
+
+        self._redis = redis.from_url(url)
+        self.retention_seconds = retention_seconds
+
+    def save(self, job: ImportJob) -> None:
+        pipe = self._redis.pipeline()
+        pipe.set(f'import:job:{job.id}', json.dumps(job.to_state()), ex=self.retention_seconds)
+        pipe.zadd('import:jobs', {job.id: job.created_at})
+        pipe.zremrangebyscore('import:jobs', 0, time.time() - self.retention_seconds)
+        pipe.execute()
+
+    def load(self, job_id: str) -> Optional[ImportJob]:
+        raw = self._redis.get(f'import:job:{job_id}')
+        return ImportJob.from_state(json.loads(raw)) if raw else None
+
+    def jobs(self) -> List[ImportJob]:
+        job_ids = [j.decode() if isinstance(j, bytes) else j for j in self._redis.zrange('import:jobs', 0, -1)]
+        if not job_ids:
+            return []
+        raws = self._redis.mget([f'import:job:{job_id}' for job_id in job_ids])
+        return [ImportJob.from_state(json.loads(raw)) for raw in raws if raw]
+
+
+def _safe_filename(name: str) -> str:
+    name = re.sub(r'[^A-Za-z0-9._ -]', '_', os.path.basename(name)).strip(' .')
+    return name or 'imported_file'
+
+
+class ImportEngine:
+
+    def __init__(self, max_workers: int = IMPORT_CONCURRENCY, max_retries: int = IMPORT_MAX_RETRIES,
+                 backoff_seconds: float = IMPORT_BACKOFF_SECONDS, store=None):
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        if store is None:
+            redis_url = os.getenv('EXTERNAL_IMPORT_REDIS_URL')
+            store = RedisJobStore(redis_url) if redis_url else InMemoryJobStore()
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='external-import')
+        # Serializes saves so an older snapshot of a job never overwrites a newer one
+        self._lock = threading.Lock()
+
+    def start(self, user_id: int, provider, access_token: str, files: List[Dict[str, Any]], dest_dir: str,
+              on_file_done: Optional[Callable[[int, ImportItem], None]] = None) -> str:
+        """Queue every file and return the job id immediately"""
+        os.makedirs(dest_dir, exist_ok=True)
+        items = [ImportItem(file_id=str(f['id']), name=f.get('name') or str(f['id']), size=f.get('size'),
+                            mime_type=f.get('mime_type'))
+                 for f in files]
+        job = ImportJob(id=uuid.uuid4().hex, user_id=user_id, service=provider.name, items=items)
+        self._save(job)
+
+        for item in items:
+            self._executor.submit(self._run_item, job, item, provider, access_token, dest_dir, on_file_done)
+        return job.id
+
+    def _save(self, job: ImportJob) -> None:
+        with self._lock:
+            job.updated_at = time.time()
+            self.store.save(job)
+
+    def get_job(self, job_id: str, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        job = self.store.load(job_id)
+        if job is None or (user_id is not None and job.user_id != user_id):
+            return None
+        if job.status == 'running' and time.time() - job.updated_at > STALE_JOB_SECONDS:
+            # The worker running it stopped (restart, crash); its files will not finish
+            for item in job.items:
+                if item.status not in ('done', 'failed'):
+                    item.status = 'failed'
+                    item.error = 'import interrupted'
+        return job.to_dict()
+
+    def stats(self) -> Dict[str, Any]:
+        """Files per status across retained jobs; queued + downloading + retrying is the backlog"""
+        jobs = self.store.jobs()
+        counts = {'jobs': len(jobs), 'queued': 0, 'downloading': 0, 'retrying': 0, 'done': 0, 'failed': 0}
+        for job in jobs:
+            for item in job.items:
+                counts[item.status] = counts.get(item.status, 0) + 1
+        return counts
+
+    def _download(self, job: ImportJob, item: ImportItem, provider, access_token: str, dest_path: str) -> None:
+        """Stream one attempt to a temp file, hashing as the bytes arrive"""
+        digest = hashlib.sha256()
+        item.bytes_done = 0
+        tmp_path = f'{dest_path}.part'
+        saved_at = time.monotonic()
+        try:
+            with open(tmp_path, 'wb') as out:
+                for chunk in provider.open_stream(access_token, item.file_id, item.mime_type):
+                    out.write(chunk)
+                    digest.update(chunk)
+                    item.bytes_done += len(chunk)
+                    if time.monotonic() - saved_at >= PROGRESS_SAVE_SECONDS:
+                        self._save(job)
+                        saved_at = time.monotonic()
+            os.replace(tmp_path, dest_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        item.sha256 = digest.hexdigest()
+        item.size = item.size or item.bytes_done
+
+    def _run_item(self, job: ImportJob, item: ImportItem, provider, access_token: str, dest_dir: str,
+                  on_file_done: Optional[Callable[[int, ImportItem], None]]) -> None:
+        item.name = provider.stored_name(item.name, item.mime_type)
+        dest_path = os.path.join(dest_dir, f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}_"
+                                           f"{_safe_filename(item.name)}")
+        try:
+            while True:
+                item.attempts += 1
+                item.status = 'downloading'
+                self._save(job)
+                try:
+                    self._download(job, item, provider, access_token, dest_path)
+                    break
+                except TransientImportError as e:
+                    if item.attempts > self.max_retries:
+                        raise
+                    item.status = 'retrying'
+                    item.error = str(e)
+                    self._save(job)
+                    delay = self.backoff_seconds * 2 ** (item.attempts - 1)
+                    time.sleep(delay + random.uniform(0, delay / 2))
+
+            item.stored_path = dest_path
+            item.error = None
+            if on_file_done is not None:
+                on_file_done(job.user_id, item)
+            item.status = 'done'
+        except Exception as e:
+            if item.stored_path and os.path.exists(item.stored_path):
+                os.remove(item.stored_path)
+            item.stored_path = None
+            item.status = 'failed'
+            item.error = str(e)
+            logger.warning('Import of %s from %s failed: %s', item.name, job.service, e)
+        finally:
+            if job.status != 'running':
+                job.finished_at = time.time()
+            self._save(job)
+
+
+import_engine = ImportEngine()
@@ -0,0 +1,343 @@
+"""
+Cached, incremental Dropbox / Google Drive folder listings
+
+get_dropbox_files() / get_google_drive_files() re-listed the whole remote
+folder every time the ExternalFilePicker opened. ListingCache keeps each
+user's folder listings for LISTING_TTL_SECONDS and remembers the provider's
+change cursor (Dropbox list_folder cursor, Drive changes page token):
+
+- fresh entry              -> served from memory, no provider call
+- stale entry with cursor  -> only the changes since the cursor are fetched
+- no entry / no cursor     -> full listing, following provider pagination
+
+The app pages through the cached listing with `paginate()`. Its cursor is
+the sort key of the last file returned rather than an offset, so a listing
+refreshed between two pages neither repeats nor skips the files that were
+there all along.
+
+    from server.external_listing import DropboxLister, listing_cache, paginate
+    files = listing_cache.get_listing(user.id, DropboxLister(), access_token, path)
+    return jsonify({'success': True, **paginate(files, request_json.get('cursor'))})
+"""
+
+import base64
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+LISTING_TTL_SECONDS = int(os.getenv('EXTERNAL_LISTING_TTL_SECONDS', '300'))
+LISTING_CACHE_MAX_ENTRIES = int(os.getenv('EXTERNAL_LISTING_CACHE_MAX_ENTRIES', '2000'))
+PROVIDER_PAGE_SIZE = 500
+DEFAULT_PAGE_SIZE = 100
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ListingPage:
+    files: Dict[str, Dict[str, Any]]
+    next_page_token: Optional[str] = None
+    cursor: Optional[str] = None
+
+
+@dataclass
+class ChangeSet:
+    upserts: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    removed: List[str] = field(default_factory=list)
+    cursor: Optional[str] = None
+
+
+# ==================== PROVIDERS ====================
+
+class DropboxLister:
+    """files/list_folder; the same cursor pages the listing and returns later changes"""
+    name = 'dropbox'
+    api = 'https://api.dropboxapi.com/2/files'
+
+    def _post(self, access_token: str, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        import requests
+
+        response = requests.post(f'{self.api}/{endpoint}', json=payload, timeout=30,
+                                 headers={'Authorization': f'Bearer {access_token}'})
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def _normalize(entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'id': entry.get('id'),
+            'name': entry.get('name'),
+            'type': 'folder' if entry.get('.tag') == 'folder' else 'file',
+            'path_display': entry.get('path_display'),
+            'size': entry.get('size'),
+            'modified': entry.get('server_modified'),
+        }
+
+    def _collect(self, data: Dict[str, Any], changes: ChangeSet) -> None:
+        for entry in data.get('entries', []):
+            key = entry.get('path_lower') or entry.get('path_display', '').lower()
+            if entry.get('.tag') == 'deleted':
+                changes.removed.append(key)
+            else:
+                changes.upserts[key] = self._normalize(entry)
+
+    def list_folder(self, access_token: str, folder: str, page_token: Optional[str] = None) -> ListingPage:
+        if page_token:
+            data = self._post(access_token, 'list_folder/continue', {'cursor': page_token})
+        else:
+            data = self._post(access_token, 'list_folder', {'path': folder or '', 'limit': PROVIDER_PAGE_SIZE})
+        changes = ChangeSet()
+        self._collect(data, changes)
+        cursor = data.get('cursor')
+        return ListingPage(changes.upserts, cursor if data.get('has_more') else None, cursor)
+
+    def list_changes(self, access_token: str, folder: str, cursor: str) -> ChangeSet:
+        changes = ChangeSet(cursor=cursor)
+        while True:
+            data = self._post(access_token, 'list_folder/continue', {'cursor': changes.cursor})
+            self._collect(data, changes)
+            changes.cursor = data.get('cursor')
+            if not data.get('has_more'):
+                return changes
+
+
+class GoogleDriveLister:
+    """files.list paged by pageToken; deltas from changes.list filtered to the folder"""
+    name = 'googledrive'
+    api = 'https://www.googleapis.com/drive/v3'
+    file_fields = 'id,name,mimeType,size,modifiedTime,parents,trashed'
+
+    def _get(self, access_token: str, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        import requests
+
+        response = requests.get(f'{self.api}/{endpoint}', params=params, timeout=30,
+                                headers={'Authorization': f'Bearer {access_token}'})
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def _normalize(item: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'id': item['id'],
+            'name': item.get('name'),
+            'type': 'folder' if item.get('mimeType') == 'application/vnd.google-apps.folder' else 'file',
+            'size': int(item['size']) if item.get('size') else None,
+            'modified': item.get('modifiedTime'),
+            # Passed back to the import so native Google files are exported
+            'mime_type': item.get('mimeType'),
+        }
+
+    def list_folder(self, access_token: str, folder: str, page_token: Optional[str] = None) -> ListingPage:
+        folder = folder or 'root'
+        cursor = None
+        if page_token is None:
+            # Take the change token before listing so nothing in between is missed
+            cursor = self._get(access_token, 'changes/startPageToken', {})['startPageToken']
+        params = {
+            'q': f"'{folder}' in parents and trashed = false",
+            'pageSize': PROVIDER_PAGE_SIZE,
+            'fields': f'nextPageToken,files({self.file_fields})',
+        }
+        if page_token:
+            params['pageToken'] = page_token
+        data = self._get(access_token, 'files', params)
+        files = {item['id']: self._normalize(item) for item in data.get('files', [])}
+        return ListingPage(files, data.get('nextPageToken'), cursor)
+
+    def list_changes(self, access_token: str, folder: str, cursor: str) -> ChangeSet:
+        folder = folder or 'root'
+        if folder == 'root':
+            # 'root' is an alias; changes report the real root id in parents
+            folder = self._get(access_token, 'files/root', {'fields': 'id'})['id']
+        changes = ChangeSet()
+        page_token = cursor
+        while True:
+            data = self._get(access_token, 'changes', {
+                'pageToken': page_token,
+                'pageSize': PROVIDER_PAGE_SIZE,
+                'fields': f'nextPageToken,newStartPageToken,changes(fileId,removed,file({self.file_fields}))',
+            })
+            for change in data.get('changes', []):
+                item = change.get('file') or {}
+                if change.get('removed') or item.get('trashed') or folder not in (item.get('parents') or []):
+                    changes.removed.append(change['fileId'])
+                else:
+                    changes.upserts[change['fileId']] = self._normalize(item)
+            if data.get('newStartPageToken'):
+                changes.cursor = data['newStartPageToken']
+                return changes
+            page_token = data['nextPageToken']
+
+
+class FakeLister:
+    """Local provider stub: folders are dicts of id -> file, edits are recorded as changes"""
+    name = 'fake'
+
+    def __init__(self, folders: Dict[str, Dict[str, Dict[str, Any]]], page_size: int = PROVIDER_PAGE_SIZE):
+        self.folders = folders
+        self.page_size = page_size
+        self.calls = {'list_folder': 0, 'list_changes': 0}
+        self._log: List[Tuple[str, str, Optional[Dict[str, Any]]]] = []
+
+    def put(self, folder: str, file: Dict[str, Any]) -> None:
+        self.folders.setdefault(folder, {})[file['id']] = file
+        self._log.append((folder, file['id'], file))
+
+    def remove(self, folder: str, file_id: str) -> None:
+        self.folders.get(folder, {}).pop(file_id, None)
+        self._log.append((folder, file_id, None))
+
+    def list_folder(self, access_token: str, folder: str, page_token: Optional[str] = None) -> ListingPage:
+        self.calls['list_folder'] += 1
+        items = sorted(self.folders.get(folder, {}).items())
+        start = int(page_token or 0)
+        page = dict(items[start:start + self.page_size])
+        more = start + self.page_size < len(items)
+        return ListingPage(page, str(start + self.page_size) if more else None, str(len(self._log)))
+
+    def list_changes(self, access_token: str, folder: str, cursor: str) -> ChangeSet:
+        self.calls['list_changes'] += 1
+        changes = ChangeSet(cursor=str(len(self._log)))
+        for changed_folder, file_id, file in self._log[int(cursor):]:
+            if changed_folder != folder:
+                continue
+            if file is None:
+                changes.upserts.pop(file_id, None)
+                changes.removed.append(file_id)
+            else:
+                changes.upserts[file_id] = file
+        return changes
+
+
+# ==================== CACHE ====================
+
+@dataclass
+class _Listing:
+    files: Dict[str, Dict[str, Any]]
+    cursor: Optional[str]
+    fetched_at: float
+
+
+def _sort_key(file: Dict[str, Any]) -> Tuple[bool, str, str]:
+    # The id breaks ties between same-named files so the order is total
+    return file.get('type') != 'folder', (file.get('name') or '').lower(), str(file.get('id', ''))
+
+
+def _sorted_files(files: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Folders first, then by name, like the provider UIs"""
+    return sorted(files.values(), key=_sort_key)
+
+
+class ListingCache:
+
+    def __init__(self, ttl_seconds: float = LISTING_TTL_SECONDS, max_entries: int = LISTING_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[int, str, str], _Listing]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.delta_refreshes = 0
+        self.misses = 0
+
+    def _full_listing(self, lister, access_token: str, folder: str) -> _Listing:
+        files: Dict[str, Dict[str, Any]] = {}
+        page = lister.list_folder(access_token, folder)
+        cursor = page.cursor
+        files.update(page.files)
+        while page.next_page_token:
+            page = lister.list_folder(access_token, folder, page.next_page_token)
+            files.update(page.files)
+            # Dropbox hands out a new cursor with every page; keep the latest
+            cursor = page.cursor or cursor
+        return _Listing(files, cursor, time.monotonic())
+
+    def get_listing(self, user_id: int, lister, access_token: str, folder: str = '',
+                    force_refresh: bool = False) -> List[Dict[str, Any]]:
+        key = (user_id, lister.name, folder or '')
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if not force_refresh and time.monotonic() - entry.fetched_at < self.ttl_seconds:
+                    self.hits += 1
+                    return _sorted_files(entry.files)
+
+        refreshed = None
+        if entry is not None and entry.cursor:
+            try:
+                changes = lister.list_changes(access_token, folder, entry.cursor)
+                files = dict(entry.files)
+                for removed in changes.removed:
+                    files.pop(removed, None)
+                files.update(changes.upserts)
+                refreshed = _Listing(files, changes.cursor or entry.cursor, time.monotonic())
+                with self._lock:
+                    self.delta_refreshes += 1
+            except Exception as e:
+                # An expired cursor falls back to a full listing
+                logger.warning('Delta listing failed for %s, relisting: %s', lister.name, e)
+
+        if refreshed is None:
+            refreshed = self._full_listing(lister, access_token, folder)
+            with self._lock:
+                self.misses += 1
+
+        with self._lock:
+            self._entries[key] = refreshed
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return _sorted_files(refreshed.files)
+
+    def invalidate(self, user_id: int, service: Optional[str] = None) -> None:
+        """Drop a user's listings, e.g. when a service is disconnected"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id and (service is None or k[1] == service)]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.delta_refreshes + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'delta_refreshes': self.delta_refreshes,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / requests, 3) if requests else 0.0,
+        }
+
+
+def _encode_cursor(file: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(_sort_key(file)).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Optional[Tuple[bool, str, str]]:
+    try:
+        is_file, name, file_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return bool(is_file), str(name), str(file_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def paginate(files: List[Dict[str, Any]], cursor: Optional[str] = None,
+             limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Slice a sorted listing for the app: the page starts after the file the
+    cursor names, wherever it now sits. `next_cursor` is None on the last page.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+    start = bisect.bisect_right([_sort_key(f) for f in files], after) if after is not None else 0
+    page = files[start:start + limit]
+    return {
+        'files': page,
+        'next_cursor': _encode_cursor(page[-1]) if page and start + limit < len(files) else None,
+        'total': len(files),
+    }
+
+
+listing_cache = ListingCache()
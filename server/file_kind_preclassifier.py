@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Cheap local pre-classifier for File.file_kind
+
+Two local tiers run before the heavyweight model:
+
+1. A rules engine over filename, MIME type and tell-tale text (totals and tax
+   lines for receipts, field labels and blanks for forms).
+2. A hashed-feature logistic regression trained on labelled File rows.
+
+Only uploads neither tier is confident about are escalated to
+classification_batcher.classify_file_kind().
+
+    python -m server.file_kind_preclassifier train    # fit and save the model
+    python -m server.file_kind_preclassifier report   # accuracy/latency per tier
+"""
+
+import json
+import math
+import os
+import re
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .classification_batcher import FILE_KINDS, classify_file_kind, normalize_file_kind
+
+MODEL_PATH = Path(os.getenv('FILE_KIND_MODEL_PATH', 'file_kind_model.json'))
+CONFIDENCE_THRESHOLD = float(os.getenv('FILE_KIND_CONFIDENCE_THRESHOLD', '0.85'))
+HASH_BITS = 18
+MAX_TEXT_CHARS = 4000
+
+_TOKEN = re.compile(r'[a-z][a-z0-9]+')
+_MONEY = re.compile(r'[$€£]\s?\d+[.,]\d{2}\b|\b\d+\.\d{2}\b')
+_RECEIPT_LINES = re.compile(r'\b(sub\s?total|total|tax|vat|gst|change due|amount paid|cash|visa|mastercard)\b', re.I)
+_FORM_LABELS = re.compile(r'^\s*(name|date of birth|dob|address|phone|email|signature|ssn|date)\s*:', re.I | re.M)
+_FORM_BLANKS = re.compile(r'_{5,}|\[\s\]|☐')
+
+_NAME_TOKEN = re.compile(r'[a-z0-9]+')
+_RECEIPT_NAMES = {'receipt', 'invoice', 'bill', 'order'}
+_FORM_NAMES = {'form', 'application', 'registration', 'questionnaire', 'w9', 'intake'}
+# A filename alone is a hint, not proof: 1 - e^-1 ≈ 0.63 stays below the threshold
+# until the text agrees
+NAME_SCORE = 1.0
+
+
+# ==================== RULES TIER ====================
+
+def _name_words(name: str) -> set:
+    """Whole filename words, singular: 'W-9 Forms.pdf' -> {'w', '9', 'w9', 'form', 'pdf'}"""
+    words = set(_NAME_TOKEN.findall(name)) | set(_NAME_TOKEN.findall(name.replace('-', '')))
+    return {word[:-1] if len(word) > 3 and word.endswith('s') else word for word in words}
+
+
+def rules_classify(filename: str, mime_type: str, text: str) -> Tuple[str, float]:
+    """Score obvious signals; returns (file_kind, confidence)"""
+    name = (filename or '').lower()
+    text = (text or '')[:MAX_TEXT_CHARS]
+
+    receipt_score = 0.0
+    form_score = 0.0
+
+    name_words = _name_words(name)
+    if name_words & _RECEIPT_NAMES:
+        receipt_score += NAME_SCORE
+    if name_words & _FORM_NAMES:
+        form_score += NAME_SCORE
+
+    receipt_lines = len(_RECEIPT_LINES.findall(text))
+    money = len(_MONEY.findall(text))
+    receipt_score += min(receipt_lines, 4) * 0.5 + min(money, 6) * 0.25
+
+    form_score += min(len(_FORM_LABELS.findall(text)), 6) * 0.5
+    form_score += min(len(_FORM_BLANKS.findall(text)), 6) * 0.35
+    if mime_type == 'application/pdf' and 'fillable' in name:
+        form_score += 1.0
+
+    best_kind, best_score = max((('Receipt', receipt_score), ('Form', form_score)), key=lambda pair: pair[1])
+    other_score = min(receipt_score, form_score)
+    margin = best_score - other_score
+    if best_score < 1.0:
+        # Long text with no receipt/form signals is almost always a plain document
+        confidence = 0.9 if len(text) > 1500 else 0.5
+        return 'Document', confidence
+    return best_kind, 1.0 - math.exp(-margin)
+
+
+# ==================== LINEAR TIER ====================
+
+def _hash(feature: str) -> int:
+    return zlib.crc32(feature.encode('utf-8')) & ((1 << HASH_BITS) - 1)
+
+
+def extract_features(filename: str, mime_type: str, text: str) -> Dict[int, float]:
+    """Hashed bag of filename tokens, MIME type, text tokens and rule signals"""
+    features: Dict[int, float] = {}
+
+    def add(feature: str, value: float = 1.0) -> None:
+        index = _hash(feature)
+        features[index] = features.get(index, 0.0) + value
+
+    add('bias')
+    add(f'mime={(mime_type or "").lower()}')
+    for token in _TOKEN.findall((filename or '').lower()):
+        add(f'name={token}')
+
+    tokens = _TOKEN.findall((text or '')[:MAX_TEXT_CHARS].lower())
+    if tokens:
+        weight = 1.0 / math.sqrt(len(tokens))
+        for token in tokens:
+            add(f'w={token}', weight)
+    add('receipt_lines', min(len(_RECEIPT_LINES.findall(text or '')), 10) / 10)
+    add('money', min(len(_MONEY.findall(text or '')), 10) / 10)
+    add('form_labels', min(len(_FORM_LABELS.findall(text or '')), 10) / 10)
+    add('form_blanks', min(len(_FORM_BLANKS.findall(text or '')), 10) / 10)
+    return features
+
+
+class HashedLinearModel:
+    """Multinomial logistic regression over sparse hashed features"""
+
+    def __init__(self, weights: Optional[Dict[str, Dict[int, float]]] = None):
+        self.weights = weights or {kind: {} for kind in FILE_KINDS}
+
+    def predict_proba(self, features: Dict[int, float]) -> Dict[str, float]:
+        scores = {
+            kind: sum(self.weights[kind].get(index, 0.0) * value for index, value in features.items())
+            for kind in FILE_KINDS
+        }
+        top = max(scores.values())
+        exps = {kind: math.exp(score - top) for kind, score in scores.items()}
+        total = sum(exps.values())
+        return {kind: value / total for kind, value in exps.items()}
+
+    def predict(self, features: Dict[int, float]) -> Tuple[str, float]:
+        probabilities = self.predict_proba(features)
+        kind = max(probabilities, key=probabilities.get)
+        return kind, probabilities[kind]
+
+    def fit(self, samples: Sequence[Tuple[Dict[int, float], str]], epochs: int = 8,
+            learning_rate: float = 0.5, l2: float = 1e-5) -> 'HashedLinearModel':
+        for epoch in range(epochs):
+            rate = learning_rate / (1 + epoch)
+            for features, label in samples:
+                probabilities = self.predict_proba(features)
+                for kind in FILE_KINDS:
+                    gradient = probabilities[kind] - (1.0 if kind == label else 0.0)
+                    weights = self.weights[kind]
+                    for index, value in features.items():
+                        current = weights.get(index, 0.0)
+                        weights[index] = current - rate * (gradient * value + l2 * current)
+        return self
+
+    def save(self, path: Path = MODEL_PATH) -> None:
+        path.write_text(json.dumps({kind: {str(k): round(v, 6) for k, v in w.items() if abs(v) > 1e-6}
+                                    for kind, w in self.weights.items()}))
+
+    @classmethod
+    def load(cls, path: Path = MODEL_PATH) -> Optional['HashedLinearModel']:
+        if not path.exists():
+            return None
+        raw = json.loads(path.read_text())
+        return cls({kind: {int(k): v for k, v in raw.get(kind, {}).items()} for kind in FILE_KINDS})
+
+
+_model: Optional[HashedLinearModel] = None
+_model_loaded = False
+
+
+def _get_model() -> Optional[HashedLinearModel]:
+    global _model, _model_loaded
+    if not _model_loaded:
+        _model = HashedLinearModel.load()
+        _model_loaded = True
+    return _model
+
+
+# ==================== CASCADE ====================
+
+def classify_local(filename: str, mime_type: str, text: str) -> Tuple[str, float, str]:
+    """Best local answer as (file_kind, confidence, tier)"""
+    kind, confidence = rules_classify(filename, mime_type, text)
+    if confidence >= CONFIDENCE_THRESHOLD:
+        return kind, confidence, 'rules'
+
+    model = _get_model()
+    if model is not None:
+        model_kind, model_confidence = model.predict(extract_features(filename, mime_type, text))
+        if model_confidence > confidence:
+            return model_kind, model_confidence, 'linear'
+    return kind, confidence, 'rules'
+
+
+def classify(filename: str, mime_type: str, text: str) -> Tuple[str, str]:
+    """Classify an upload, escalating to the heavyweight model only when unsure; returns (file_kind, tier)"""
+    kind, confidence, tier = classify_local(filename, mime_type, text)
+    if confidence >= CONFIDENCE_THRESHOLD:
+        return kind, tier
+    return classify_file_kind(text, filename=filename, mime_type=mime_type), 'model'
+
+
+# ==================== TRAINING / REPORT ====================
+
+def load_chunk_texts(collection, batch_size: int = 1000) -> Dict[int, str]:
+    """
+    The start of each file's text, rebuilt from its Chroma chunks in
+    chunk_index order; only the first MAX_TEXT_CHARS are kept per file
+    """
+    pieces: Dict[int, List[Tuple[int, str]]] = {}
+    offset = 0
+    while True:
+        page = collection.get(limit=batch_size, offset=offset, include=['documents', 'metadatas'])
+        if not page['ids']:
+            break
+        offset += len(page['ids'])
+        for document, metadata in zip(page['documents'], page['metadatas']):
+            metadata = metadata or {}
+            try:
+                file_id = int(metadata.get('file_id'))
+            except (TypeError, ValueError):
+                continue
+            pieces.setdefault(file_id, []).append((metadata.get('chunk_index', 0), document or ''))
+
+    texts = {}
+    for file_id, chunks in pieces.items():
+        text = ''
+        for _, document in sorted(chunks, key=lambda chunk: chunk[0]):
+            text += document + '\n'
+            if len(text) >= MAX_TEXT_CHARS:
+                break
+        texts[file_id] = text[:MAX_TEXT_CHARS]
+    return texts
+
+
+def load_labelled_files() -> List[Tuple[int, str, str, str, str]]:
+    """
+    (id, filename, mime_type, text, file_kind) for every classified File row.
+    File has no text column; the text is rebuilt from the file's chunks in
+    the Chroma user_documents collection.
+    """
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'manager-francis', 'backend'))
+    import chromadb
+    from app import app
+    from shared import db, File
+
+    from .chunk_reindex import COLLECTION_NAME
+
+    client = chromadb.PersistentClient(path='./manager-francis/backend/chroma_db')
+    texts = load_chunk_texts(client.get_collection(COLLECTION_NAME))
+
+    rows = []
+    with app.app_context():
+        result = (db.session.query(File.id, File.original_filename, File.filename, File.file_type, File.file_kind)
+                  .filter(File.file_kind.isnot(None)).order_by(File.id).yield_per(500))
+        for row in result:
+            rows.append((row.id, row.original_filename or row.filename or '', row.file_type or '',
+                         texts.get(row.id, ''), normalize_file_kind(row.file_kind)))
+    return rows
+
+
+def _split(rows: Iterable[tuple]) -> Tuple[List[tuple], List[tuple]]:
+    """Deterministic 80/20 split on File.id"""
+    train, test = [], []
+    for row in rows:
+        (test if row[0] % 5 == 0 else train).append(row)
+    return train, test
+
+
+def _evaluate(name: str, predict, rows: List[tuple]) -> None:
+    correct = confident = confident_correct = 0
+    start = time.perf_counter()
+    for _, filename, mime_type, text, label in rows:
+        kind, confidence = predict(filename, mime_type, text)
+        correct += kind == label
+        if confidence >= CONFIDENCE_THRESHOLD:
+            confident += 1
+            confident_correct += kind == label
+    elapsed_us = (time.perf_counter() - start) * 1e6 / max(len(rows), 1)
+
+    total = max(len(rows), 1)
+    print(f'   {name:<8} accuracy {correct / total:6.1%} | '
+          f'confident {confident / total:6.1%} (accuracy {confident_correct / max(confident, 1):6.1%}) | '
+          f'{elapsed_us:8.1f} µs/file')
+
+
+def train() -> None:
+    rows = load_labelled_files()
+    train_rows, _ = _split(rows)
+    print(f'📚 Training on {len(train_rows)} labelled files...')
+    samples = [(extract_features(f, m, t), label) for _, f, m, t, label in train_rows]
+    HashedLinearModel().fit(samples).save()
+    print(f'✅ Saved model to {MODEL_PATH}')
+
+
+def report() -> None:
+    rows = load_labelled_files()
+    train_rows, test_rows = _split(rows)
+    print(f'📊 {len(test_rows)} held-out files (threshold {CONFIDENCE_THRESHOLD})')
+
+    model = HashedLinearModel.load() or HashedLinearModel().fit(
+        [(extract_features(f, m, t), label) for _, f, m, t, label in train_rows])
+
+    _evaluate('rules', rules_classify, test_rows)
+    _evaluate('linear', lambda f, m, t: model.predict(extract_features(f, m, t)), test_rows)
+    _evaluate('cascade', lambda f, m, t: classify_local(f, m, t)[:2], test_rows)
+
+    escalated = sum(1 for _, f, m, t, _ in test_rows if classify_local(f, m, t)[1] < CONFIDENCE_THRESHOLD)
+    print(f'   ⬆️  {escalated}/{len(test_rows)} files would be escalated to the heavyweight model')
+
+
+if __name__ == "__main__":
+    commands = {'train': train, 'report': report}
+    command = sys.argv[1] if len(sys.argv) > 1 else 'report'
+    if command not in commands:
+        print('Usage: python -m server.file_kind_preclassifier [train|report]')
+        sys.exit(1)
+
+    try:
+        commands[command]()
+    except Exception as e:
+        print(f'❌ Error: {e}')
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,194 @@
+"""
+Ranked full-text search over file names and extracted text
+
+/files?search= used to filter with original_filename.ilike('%term%'), a
+sequential scan over the user's files that only ever matched names. Search
+now runs against file_search (db_scripts/create_file_search_index.py):
+
+- search_vector, a stored tsvector of the filename (weight A, 'simple'
+  config, so names and codes are not stemmed) and the extracted text
+  (weight B, 'english'), behind a GIN index
+- a pg_trgm GIN index on the filename, so substring matches ('%assign%')
+  still use an index
+
+Every File has an entry from the moment its row is inserted, so a new
+upload, or one whose extraction fails or finds no text, is still found by
+name. Listeners on File keep the entry in step, inside the flush that writes
+the row; the extracted text is added once extraction finishes and commits
+with the caller's session:
+
+    # app startup, next to suggest_index.register_invalidation_listeners(File)
+    from server.file_search import register_index_listeners
+    register_index_listeners(File)      # insert: name-only entry; rename: new name; delete: cascades
+
+    # shared_file_processing_pipeline, after text extraction succeeds
+    from server.file_search import index_file_text, search_files
+    index_file_text(file.id, extraction.text)
+    db.session.commit()
+
+    results, total = search_files(user.id, request.args['search'], page, per_page)
+    # -> [{'file_id', 'rank', 'matched_in': 'content' | 'filename', 'snippet'}], total
+
+The last search term is matched as a prefix, so partial words match too.
+Queries are parsed with both configs and OR'd, so unstemmed filename terms
+and stemmed content terms both match.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+SEARCH_TABLE = 'file_search'
+TEXT_CONFIG = 'english'
+NAME_CONFIG = 'simple'
+# tsvector values are capped at 1 MB; the start of a document carries most of its terms
+MAX_INDEXED_CHARS = 500_000
+MAX_QUERY_TERMS = 8
+MIN_TRIGRAM_CHARS = 3
+BACKFILL_BATCH_SIZE = 200
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def build_tsquery(query: str) -> Optional[str]:
+    """'lease agre' -> 'lease & agre:*' (terms are word characters only, so the string is safe for to_tsquery)"""
+    terms = _TERM.findall((query or '').lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+
+
+def _like_pattern(query: str) -> str:
+    escaped = query.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _display_name(target) -> str:
+    return getattr(target, 'original_filename', None) or getattr(target, 'filename', None) or ''
+
+
+def register_index_listeners(file_model) -> None:
+    """Write a name-only entry when a File is inserted and update it when the file is renamed"""
+    from sqlalchemy import event, inspect
+    from sqlalchemy import text as sql
+
+    def _on_insert(mapper, connection, target):
+        connection.execute(sql(
+            f'INSERT INTO {SEARCH_TABLE} (file_id, user_id, filename) VALUES (:file_id, :user_id, :filename) '
+            'ON CONFLICT (file_id) DO NOTHING'
+        ), {'file_id': target.id, 'user_id': target.user_id, 'filename': _display_name(target)})
+
+    def _on_update(mapper, connection, target):
+        state = inspect(target)
+        if not any(state.attrs[name].history.has_changes()
+                   for name in ('original_filename', 'filename') if name in state.attrs):
+            return
+        connection.execute(sql(f'UPDATE {SEARCH_TABLE} SET filename = :filename, updated_at = NOW() '
+                               'WHERE file_id = :file_id'),
+                           {'file_id': target.id, 'filename': _display_name(target)})
+
+    event.listen(file_model, 'after_insert', _on_insert)
+    event.listen(file_model, 'after_update', _on_update)
+
+
+def index_file_text(file_id: int, text: Optional[str]) -> None:
+    """
+    Store a file's extracted text on its entry in the caller's session;
+    search_vector is recomputed by Postgres when the caller commits
+    """
+    from shared import db
+    from sqlalchemy import text as sql
+
+    db.session.execute(sql(
+        f'UPDATE {SEARCH_TABLE} SET content = :content, updated_at = NOW() WHERE file_id = :file_id'
+    ), {
+        'file_id': file_id,
+        # NUL bytes are not allowed in Postgres text
+        'content': (text or '')[:MAX_INDEXED_CHARS].replace('\x00', ''),
+    })
+
+
+def search_files(user_id: int, query: str, page: int = 1, per_page: int = 20,
+                 file_kind: Optional[str] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    The user's files matching `query`, best first. A file matches on its
+    tsvector or on a filename substring; rank is ts_rank_cd (filename terms
+    weigh more) plus the filename's trigram similarity to the query.
+    Snippets are computed for the returned page only.
+    """
+    from shared import db, File
+    from sqlalchemy import text as sql
+
+    tsquery = build_tsquery(query)
+    if tsquery is None:
+        return [], 0
+    use_trigram = len(query.strip()) >= MIN_TRIGRAM_CHARS
+    kind_filter = 'AND f.file_kind = :file_kind' if file_kind else ''
+    name_match = 'OR s.filename ILIKE :pattern' if use_trigram else ''
+
+    rows = db.session.execute(sql(f"""
+        WITH q AS (SELECT to_tsquery('{NAME_CONFIG}', :tsquery) || to_tsquery('{TEXT_CONFIG}', :tsquery) AS tsq),
+        matches AS (
+            SELECT s.file_id, s.search_vector @@ q.tsq AS text_match,
+                   ts_rank_cd(s.search_vector, q.tsq) + {'similarity(s.filename, :raw)' if use_trigram else '0'} AS rank,
+                   count(*) OVER () AS total
+            FROM {SEARCH_TABLE} s
+            JOIN {File.__table__.name} f ON f.id = s.file_id, q
+            WHERE s.user_id = :user_id {kind_filter}
+              AND (s.search_vector @@ q.tsq {name_match})
+            ORDER BY rank DESC, s.file_id DESC
+            LIMIT :limit OFFSET :offset
+        )
+        SELECT m.file_id, m.rank, m.total, m.text_match,
+               s.filename ILIKE :pattern AS name_match,
+               ts_headline('{TEXT_CONFIG}', left(s.content, 20000), q.tsq,
+                           'MaxWords=18, MinWords=6, MaxFragments=1, StartSel=<b>, StopSel=</b>') AS snippet
+        FROM matches m JOIN {SEARCH_TABLE} s ON s.file_id = m.file_id, q
+        ORDER BY m.rank DESC, m.file_id DESC
+    """), {
+        'tsquery': tsquery,
+        'raw': query.strip(),
+        'pattern': _like_pattern(query),
+        'user_id': user_id,
+        'file_kind': file_kind,
+        'limit': per_page,
+        'offset': (max(page, 1) - 1) * per_page,
+    }).fetchall()
+
+    results = [{
+        'file_id': row.file_id,
+        'rank': round(float(row.rank), 4),
+        'matched_in': 'filename' if row.name_match else 'content',
+        'snippet': row.snippet if row.text_match and not row.name_match else None,
+    } for row in rows]
+    return results, (rows[0].total if rows else 0)
+
+
+def text_from_chunks(documents: Sequence[str], metadatas: Sequence[Optional[Dict[str, Any]]]) -> str:
+    """Rebuild a file's text from its stored chunks, in chunk_index order"""
+    ordered = sorted(zip(metadatas, documents), key=lambda pair: (pair[0] or {}).get('chunk_index', 0))
+    return '\n'.join(document or '' for _, document in ordered)
+
+
+def backfill_content(collection, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Fill content for entries indexed before the pipeline wrote it, from the Chroma chunks; commits per batch"""
+    from shared import db
+    from sqlalchemy import text as sql
+
+    filled = 0
+    after = 0
+    while True:
+        rows = db.session.execute(sql(
+            f"SELECT file_id FROM {SEARCH_TABLE} "
+            "WHERE file_id > :after AND content = '' ORDER BY file_id LIMIT :limit"
+        ), {'after': after, 'limit': batch_size}).fetchall()
+        if not rows:
+            return filled
+        after = rows[-1].file_id
+        for row in rows:
+            # Older chunks stored file_id as a string
+            stored = collection.get(where={'$or': [{'file_id': row.file_id}, {'file_id': str(row.file_id)}]},
+                                    include=['documents', 'metadatas'])
+            if stored['ids']:
+                index_file_text(row.file_id, text_from_chunks(stored['documents'], stored['metadatas']))
+                filled += 1
+        db.session.commit()
@@ -0,0 +1,297 @@
+"""
+Search-as-you-type suggestions from an in-memory per-user prefix index
+
+The documents screen asks for suggestions on every keystroke, so typing must
+not reach Postgres. Each user's filenames and file kinds are tokenized into
+a sorted array of (token, rank, position); a prefix lookup is a bisect plus a
+walk over the matching range. Short or common prefixes ('in', 'invoice')
+match large parts of a library, so their top results are computed when the
+index is built.
+
+An index is built from one query on first use and dropped when a change to
+one of the user's files (insert, update or delete) commits, or after
+INDEX_TTL_SECONDS, for changes made by other workers; the next keystroke
+rebuilds it. Changes are noted at flush time and applied on commit, so an
+index rebuilt between the flush and the commit cannot cache uncommitted
+state, and a rolled-back change invalidates nothing.
+
+    from server.file_suggest import suggest_index
+    suggest_index.register_invalidation_listeners(File)
+    suggest_index.init_app(app)   # GET /api/v1/mobile/files/suggest?q=lea&limit=8
+
+    suggest_index.suggest(user_id, 'lease ag')
+    # -> [{'id': 42, 'name': 'Lease agreement.pdf', 'kind': 'documents'}, ...]
+"""
+
+import heapq
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+MAX_USERS = int(os.getenv('SUGGEST_INDEX_MAX_USERS', '2000'))
+INDEX_TTL_SECONDS = int(os.getenv('SUGGEST_INDEX_TTL_SECONDS', '300'))
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+# Prefixes matching more postings than this get their ranked results precomputed
+HOT_PREFIX_POSTINGS = 128
+HOT_LIST_SIZE = 64
+# session.info key holding the user ids whose files changed in the open transaction
+PENDING_KEY = 'suggest_index_pending_users'
+
+# Letters and digits; '_', '-' and '.' separate tokens in filenames
+_TOKEN = re.compile(r'[^\W_]+', re.UNICODE)
+
+# Lower sorts first: a match on the first word of the name, then any other
+# word of the name, then the file kind
+FIRST_WORD, NAME_WORD, KIND = 0, 1, 2
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall((text or '').lower())
+
+
+@dataclass
+class SuggestEntry:
+    id: int
+    name: str
+    kind: Optional[str]
+    tokens: Tuple[str, ...]
+    kind_tokens: Tuple[str, ...]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'id': self.id, 'name': self.name, 'kind': self.kind}
+
+
+class UserPrefixIndex:
+    """One user's files, searchable by token prefix; immutable once built"""
+
+    def __init__(self, files: Sequence[Tuple[int, str, Optional[str]]]):
+        self.built_at = time.time()
+        # Files are addressed by position, newest first: sorting by position
+        # sorts by recency, and bit i of a mask is the i-th newest file
+        self.entries: List[SuggestEntry] = []
+        for file_id, name, kind in sorted(files, key=lambda f: f[0], reverse=True):
+            self.entries.append(SuggestEntry(file_id, name, kind, tuple(tokenize(name)), tuple(tokenize(kind))))
+
+        postings: List[Tuple[str, int, int]] = []
+        for position, entry in enumerate(self.entries):
+            seen = set()
+            for index, token in enumerate(entry.tokens + entry.kind_tokens):
+                if token not in seen:
+                    seen.add(token)
+                    rank = FIRST_WORD if index == 0 else NAME_WORD if index < len(entry.tokens) else KIND
+                    postings.append((token, rank, position))
+        postings.sort()
+        self.tokens = [posting[0] for posting in postings]
+        # (rank, position) sorts best first: better match, then newest
+        self.keys = [(posting[1], posting[2]) for posting in postings]
+
+        # Ranked positions and masks for every prefix whose range is too long to scan per keystroke
+        self.hot: Dict[str, Tuple[List[int], int]] = {}
+        for token in dict.fromkeys(self.tokens):
+            for length in range(1, len(token) + 1):
+                prefix = token[:length]
+                if prefix in self.hot:
+                    continue
+                start, end = self._range(prefix)
+                if end - start <= HOT_PREFIX_POSTINGS:
+                    break
+                ranked = _ranked_positions(heapq.nsmallest(HOT_LIST_SIZE * 2, self.keys[start:end]))
+                self.hot[prefix] = (ranked[:HOT_LIST_SIZE], self._mask(start, end))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _range(self, prefix: str) -> Tuple[int, int]:
+        start = bisect_left(self.tokens, prefix)
+        return start, bisect_left(self.tokens, prefix + '\uffff', start)
+
+    def _mask(self, start: int, end: int) -> int:
+        bits = bytearray(len(self.entries) // 8 + 1)
+        for _, position in self.keys[start:end]:
+            bits[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(bits, 'little')
+
+    def _prefix_mask(self, prefix: str) -> int:
+        hot = self.hot.get(prefix)
+        return hot[1] if hot is not None else self._mask(*self._range(prefix))
+
+    def _prefix_positions(self, prefix: str, limit: int) -> List[int]:
+        """Positions of files with a token starting with `prefix`, best first"""
+        hot = self.hot.get(prefix)
+        if hot is not None and limit <= len(hot[0]):
+            return hot[0][:limit]
+        start, end = self._range(prefix)
+        return _ranked_positions(sorted(self.keys[start:end]))[:limit]
+
+    def suggest(self, query: str, limit: int = DEFAULT_LIMIT) -> List[SuggestEntry]:
+        """
+        Files whose tokens start with every query term. A single term is
+        ranked by where it matched, then by recency; several terms by recency.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        if len(terms) == 1:
+            return [self.entries[position] for position in self._prefix_positions(terms[0], limit)]
+
+        mask = self._prefix_mask(terms[0])
+        for term in terms[1:]:
+            if not mask:
+                break
+            mask &= self._prefix_mask(term)
+        results = []
+        while mask and len(results) < limit:
+            lowest = mask & -mask
+            results.append(self.entries[lowest.bit_length() - 1])
+            mask ^= lowest
+        return results
+
+
+def _ranked_positions(keys: List[Tuple[int, int]]) -> List[int]:
+    """Positions from sorted (rank, position) keys, each at its best rank"""
+    seen = set()
+    return [key[1] for key in keys if not (key[1] in seen or seen.add(key[1]))]
+
+
+def load_user_files(user_id: int) -> List[Tuple[int, str, Optional[str]]]:
+    """(id, display name, file_kind) for each of the user's files"""
+    from shared import db, File
+
+    rows = (db.session.query(File.id, File.original_filename, File.filename, File.file_kind)
+            .filter(File.user_id == user_id).all())
+    return [(row.id, row.original_filename or row.filename or '', row.file_kind) for row in rows]
+
+
+# ==================== INDEX CACHE ====================
+
+class SuggestIndex:
+
+    def __init__(self, loader: Optional[Callable[[int], Sequence[Tuple[int, str, Optional[str]]]]] = None,
+                 max_users: int = MAX_USERS, ttl_seconds: int = INDEX_TTL_SECONDS):
+        self.loader = loader or load_user_files
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+
+        self._indexes: 'OrderedDict[int, UserPrefixIndex]' = OrderedDict()
+        # Bumped on invalidation so a build that raced a change is not cached
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.builds = 0
+        self.invalidations = 0
+        self.build_ms = 0.0
+
+    def get(self, user_id: int) -> UserPrefixIndex:
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and time.time() - index.built_at < self.ttl_seconds:
+                self._indexes.move_to_end(user_id)
+                self.hits += 1
+                return index
+            generation = self._generations.get(user_id, 0)
+
+        start = time.perf_counter()
+        index = UserPrefixIndex(self.loader(user_id))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self.builds += 1
+            self.build_ms += elapsed_ms
+            if self._generations.get(user_id, 0) == generation:
+                self._indexes[user_id] = index
+                self._indexes.move_to_end(user_id)
+                while len(self._indexes) > self.max_users:
+                    self._indexes.popitem(last=False)
+        return index
+
+    def suggest(self, user_id: int, query: str, limit: int = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        limit = max(1, min(limit, MAX_LIMIT))
+        return [entry.as_dict() for entry in self.get(user_id).suggest(query, limit)]
+
+    # ==================== INVALIDATION ====================
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            if self._indexes.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def note_change(self, session, user_id: int) -> None:
+        """Remember that `user_id`'s files changed in the session's open transaction"""
+        session.info.setdefault(PENDING_KEY, set()).add(user_id)
+
+    def commit_changes(self, session) -> None:
+        for user_id in session.info.pop(PENDING_KEY, ()):
+            self.invalidate_user(user_id)
+
+    def discard_changes(self, session) -> None:
+        session.info.pop(PENDING_KEY, None)
+
+    def register_invalidation_listeners(self, file_model, session_class=None) -> None:
+        """
+        Drop the owner's index once a File insert, update (rename,
+        re-classification) or delete commits; `session_class` defaults to
+        every SQLAlchemy Session
+        """
+        from sqlalchemy import event
+        from sqlalchemy.orm import Session, object_session
+
+        def _on_change(mapper, connection, target):
+            user_id = getattr(target, 'user_id', None)
+            session = object_session(target)
+            if user_id is not None and session is not None:
+                self.note_change(session, user_id)
+
+        event.listen(file_model, 'after_insert', _on_change)
+        event.listen(file_model, 'after_update', _on_change)
+        event.listen(file_model, 'after_delete', _on_change)
+        event.listen(session_class or Session, 'after_commit', self.commit_changes)
+        event.listen(session_class or Session, 'after_rollback', self.discard_changes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+    # ==================== ENDPOINT ====================
+
+    def init_app(self, app, url_prefix: str = '/api/v1/mobile') -> None:
+        """Register GET <prefix>/files/suggest?q=&limit= for the signed-in user"""
+        from flask import g, jsonify, request
+
+        @app.route(f'{url_prefix}/files/suggest', methods=['GET'])
+        def suggest_files():
+            user = getattr(g, 'session_user', None)
+            if user is None:
+                return jsonify({'success': False, 'message': 'Authentication required'}), 401
+            try:
+                limit = int(request.args.get('limit', DEFAULT_LIMIT))
+            except ValueError:
+                limit = DEFAULT_LIMIT
+            query = request.args.get('q', '')
+            return jsonify({'success': True, 'query': query,
+                            'suggestions': self.suggest(user['id'], query, limit)})
+
+    # ==================== METRICS ====================
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.builds
+            return {
+                'users': len(self._indexes),
+                'files': sum(len(index) for index in self._indexes.values()),
+                'hits': self.hits,
+                'builds': self.builds,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'avg_build_ms': round(self.build_ms / self.builds, 2) if self.builds else 0.0,
+            }
+
+
+suggest_index = SuggestIndex()
@@ -0,0 +1,397 @@
+"""
+Prometheus metrics for the mobile backend
+
+Request latency per endpoint, upload pipeline stage timings, Chroma query
+latency, DB pool usage, queue depths and cache hit rates, exposed in the
+Prometheus text format on /metrics.
+
+Counters and histograms are sharded per thread: each thread updates its own
+list of cells, so recording a sample takes no lock and never contends with
+other workers. A scrape sums the shards. Gauges for state that lives
+elsewhere (pool sizes, cache stats, queue depths) are read by collectors at
+scrape time, so they cost nothing per request.
+
+Metrics are kept per process. Under gunicorn with several workers each
+/metrics response covers only the worker that served it, so scrape every
+worker (one target per worker port) or run a single worker with threads.
+
+    from server import metrics
+    metrics.init_app(app)                              # request histograms + /metrics
+    metrics.register_default_collectors(db.engine)     # pool, caches, queues
+
+    with metrics.stage_timer('ocr'):
+        text = extract_text(path)
+    with metrics.chroma_timer('query'):
+        results = collection.query(...)
+
+Set METRICS_TOKEN to require `Authorization: Bearer <token>` on /metrics.
+"""
+
+import bisect
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+CHROMA_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+PIPELINE_STAGES = ('store', 'ocr', 'classify', 'chunk', 'embed', 'index')
+
+# A sample: (metric name suffix, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    escaped = (k + '="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+               for k, v in labels.items())
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+# ==================== PER-THREAD SHARDS ====================
+
+class _Shards:
+    """
+    One list of cells per thread. Only the owning thread writes its list; the
+    lock is taken once per thread, when its list is created. When a thread
+    exits, its counts are folded into a base list and its shard is dropped, so
+    short-lived threads do not accumulate shards.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._base = [0.0] * size
+        # (weak reference to the owning thread, its cells)
+        self._all: List[Tuple[weakref.ref, List[float]]] = []
+        self._lock = threading.Lock()
+
+    def mine(self) -> List[float]:
+        try:
+            return self._local.cells
+        except AttributeError:
+            cells = [0.0] * self._size
+            self._local.cells = cells
+            with self._lock:
+                self._fold_dead()
+                self._all.append((weakref.ref(threading.current_thread()), cells))
+            return cells
+
+    def _fold_dead(self) -> None:
+        """Move the counts of exited threads into the base list; caller holds the lock"""
+        live = []
+        for owner, cells in self._all:
+            thread = owner()
+            if thread is not None and thread.is_alive():
+                live.append((owner, cells))
+            else:
+                for i, value in enumerate(cells):
+                    self._base[i] += value
+        self._all = live
+
+    def shard_count(self) -> int:
+        with self._lock:
+            return len(self._all)
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            self._fold_dead()
+            shards = [self._base] + [cells for _, cells in self._all]
+            return [sum(column) for column in zip(*shards)]
+
+
+# ==================== METRIC TYPES ====================
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: Any):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}')
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> Iterator[Sample]:
+        for key, child in list(self._children.items()):
+            yield from child.samples(dict(zip(self.labelnames, key)))
+
+
+class _CounterChild:
+    __slots__ = ('_shards',)
+
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._shards.mine()[0] += amount
+
+    def value(self) -> float:
+        return self._shards.totals()[0]
+
+    def samples(self, labels: Dict[str, str]) -> Iterator[Sample]:
+        yield '_total', labels, self.value()
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class _HistogramChild:
+    __slots__ = ('_buckets', '_shards')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        # one cell per bucket plus +Inf, then sum and count
+        self._shards = _Shards(len(buckets) + 3)
+
+    def observe(self, value: float) -> None:
+        cells = self._shards.mine()
+        cells[bisect.bisect_left(self._buckets, value)] += 1
+        cells[-2] += value
+        cells[-1] += 1
+
+    def samples(self, labels: Dict[str, str]) -> Iterator[Sample]:
+        totals = self._shards.totals()
+        cumulative = 0.0
+        for bound, count in zip(self._buckets + (float('inf'),), totals):
+            cumulative += count
+            yield '_bucket', {**labels, 'le': _format_value(bound)}, cumulative
+        yield '_sum', labels, totals[-2]
+        yield '_count', labels, totals[-1]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = REQUEST_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+
+# ==================== REGISTRY ====================
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        # collector() -> [(name, help, type, [(labels, value)])], read at scrape time
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = REQUEST_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4"""
+        lines: List[str] = []
+        for metric in list(self._metrics):
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for suffix, labels, value in metric.samples():
+                lines.append(f'{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+
+        for collector in list(self._collectors):
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"⚠️ Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+                continue
+            for name, documentation, kind, samples in families:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    'grabdocs_http_request_duration_seconds', 'Request latency by endpoint', ('method', 'endpoint', 'status'))
+pipeline_stage_duration = registry.histogram(
+    'grabdocs_pipeline_stage_duration_seconds', 'Upload processing time per pipeline stage', ('stage',),
+    STAGE_BUCKETS)
+pipeline_stage_failures = registry.counter(
+    'grabdocs_pipeline_stage_failures', 'Upload pipeline stages that raised', ('stage',))
+chroma_query_duration = registry.histogram(
+    'grabdocs_chroma_query_duration_seconds', 'Chroma user_documents call latency', ('operation',),
+    CHROMA_BUCKETS)
+
+
+@contextmanager
+def _timed(histogram: Histogram, *labels: str, failures: Optional[Counter] = None) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        if failures is not None:
+            failures.labels(*labels).inc()
+        raise
+    finally:
+        histogram.labels(*labels).observe(time.perf_counter() - start)
+
+
+def stage_timer(stage: str):
+    """
+    Time one shared_file_processing_pipeline stage (store, ocr, classify, chunk,
+    embed, index). PipelineTrace.stage already calls this; use it directly only
+    for stages that are not traced.
+    """
+    return _timed(pipeline_stage_duration, stage, failures=pipeline_stage_failures)
+
+
+def chroma_timer(operation: str):
+    """Time one Chroma call (query, add, delete, get)"""
+    return _timed(chroma_query_duration, operation)
+
+
+# ==================== COLLECTORS ====================
+
+def _gauge(name: str, documentation: str, value: float, labels: Optional[Dict[str, str]] = None):
+    return name, documentation, 'gauge', [(labels or {}, value)]
+
+
+def _stats_families(prefix: str, stats: Dict[str, Any]):
+    """Numeric entries of a module's stats() dict as gauges"""
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        yield _gauge(f'grabdocs_{prefix}_{key}', f'{prefix} {key.replace("_", " ")}', value)
+
+
+def db_pool_collector(engine):
+    """SQLAlchemy QueuePool usage: size, checked out, overflow"""
+
+    def collect():
+        pool = engine.pool
+        for attribute in ('size', 'checkedin', 'checkedout', 'overflow'):
+            reader = getattr(pool, attribute, None)
+            if callable(reader):
+                yield _gauge(f'grabdocs_db_pool_{attribute}', f'Database pool {attribute}', reader())
+
+    return collect
+
+
+def stats_collector(prefix: str, stats: Callable[[], Dict[str, Any]]):
+    """Expose any object's stats() (answer cache, listing cache, session auth, ...)"""
+
+    def collect():
+        return list(_stats_families(prefix, stats()))
+
+    collect.__name__ = f'{prefix}_collector'
+    return collect
+
+
+def register_default_collectors(engine=None, fanout=None, target: Optional[MetricsRegistry] = None) -> None:
+    """Pool stats, cache hit rates and queue depths of the server/ singletons"""
+    target = target or registry
+    if engine is not None:
+        target.register_collector(db_pool_collector(engine))
+
+    from server.answer_cache import answer_cache
+    from server.external_import import import_engine
+    from server.external_listing import listing_cache
+    from server.password_hashing import password_hasher
+    from server.rate_limiter import rate_limiter
+    from server.session_tokens import session_auth_stats
+
+    for prefix, stats in (('answer_cache', answer_cache.stats), ('listing_cache', listing_cache.stats),
+                          ('session_auth', session_auth_stats), ('rate_limiter', rate_limiter.stats),
+                          ('password_hasher', password_hasher.stats), ('external_import', import_engine.stats)):
+        target.register_collector(stats_collector(prefix, stats))
+    if fanout is not None:
+        target.register_collector(stats_collector('notification_fanout', lambda: fanout.stats.as_dict()))
+
+    def queues():
+        from server.chat_realtime import hub
+        from server.classification_batcher import file_kind_queue_depth
+
+        yield _gauge('grabdocs_classification_queue_depth', 'Uploads waiting for a file_kind batch',
+                     file_kind_queue_depth())
+        yield _gauge('grabdocs_realtime_connections', 'Open chat WebSocket/SSE connections', hub.connection_count)
+        yield ('grabdocs_realtime_messages', 'Chat messages delivered to or dropped for subscribers', 'counter',
+               [({'outcome': 'delivered'}, hub.delivered), ({'outcome': 'dropped'}, hub.dropped)])
+
+    target.register_collector(queues)
+
+
+# ==================== FLASK ====================
+
+def init_app(app, path: str = '/metrics', target: Optional[MetricsRegistry] = None) -> None:
+    """Record a latency sample per request and serve the registry on `path`"""
+    from flask import Response, g, request
+
+    target = target or registry
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started_at = time.perf_counter()
+
+    @app.after_request
+    def record_request_duration(response):
+        started = getattr(g, 'metrics_started_at', None)
+        if started is not None and request.path != path:
+            # The route template keeps label cardinality bounded (/file/<int:file_id>, not /file/123)
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            http_request_duration.labels(request.method, endpoint, response.status_code).observe(
+                time.perf_counter() - started)
+        return response
+
+    @app.route(path)
+    def metrics_endpoint():
+        if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(target.render(), mimetype='text/plain; version=0.0.4')
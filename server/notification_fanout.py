@@ -0,0 +1,378 @@
+"""
+Batched notification fan-out for workspace chats
+
+Sending one message in a busy workspace chat used to mean one
+user_chat_notifications INSERT and one push request per participant. Here
+messages are queued and flushed every `window_ms`:
+
+- all notification rows collected in the window go out as one multi-row INSERT
+- pushes are coalesced per recipient and chat ("3 new messages in General")
+- push deliveries are sent to Expo in chunks of up to 100 per request
+
+    from server.notification_fanout import NotificationFanout
+    fanout = NotificationFanout(token_lookup=push_tokens_for_users, app=app)
+    fanout.enqueue(chat.id, chat.name, message.id, sender.id, sender.username,
+                   message.content, recipient_ids)
+
+A batch whose database write or push request fails is retried with
+exponential backoff (RETRY_BASE_SECONDS, doubling up to RETRY_MAX_SECONDS)
+and given up after MAX_ATTEMPTS. Rows that were written are not written
+again when only the push failed, and of the pushes only the Expo chunks that
+failed are sent again, so nobody gets the same notification twice.
+
+EXPO_PUSH_URL can point at a local stand-in for testing.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+WINDOW_MS = int(os.getenv('NOTIFICATION_WINDOW_MS', '1000'))
+MAX_PENDING_ROWS = int(os.getenv('NOTIFICATION_MAX_PENDING_ROWS', '5000'))
+EXPO_PUSH_URL = os.getenv('EXPO_PUSH_URL', 'https://exp.host/--/api/v2/push/send')
+EXPO_BATCH_SIZE = 100
+PREVIEW_CHARS = 120
+MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', '5'))
+RETRY_BASE_SECONDS = float(os.getenv('NOTIFICATION_RETRY_BASE_SECONDS', '1'))
+RETRY_MAX_SECONDS = float(os.getenv('NOTIFICATION_RETRY_MAX_SECONDS', '60'))
+
+logger = logging.getLogger(__name__)
+
+# token_lookup(user_ids) -> {user_id: [expo push tokens]}
+TokenLookup = Callable[[Sequence[int]], Dict[int, List[str]]]
+
+
+# ==================== WRITERS / SENDERS ====================
+
+def bulk_insert_notifications(rows: List[Dict[str, Any]]) -> None:
+    """Insert all rows with a single multi-VALUES statement"""
+    from shared import db
+    from sqlalchemy import column, insert, table
+
+    notifications = table('user_chat_notifications', column('user_id'), column('chat_id'),
+                          column('message_id'), column('is_read'))
+    db.session.execute(insert(notifications).values(rows))
+    db.session.commit()
+
+
+class PushSendError(Exception):
+    """Some chunks of a send failed; `unsent` holds their messages, the rest were delivered"""
+
+    def __init__(self, unsent: List[Dict[str, Any]], cause: Exception):
+        super().__init__(f'{len(unsent)} push messages unsent: {cause}')
+        self.unsent = unsent
+
+
+class ExpoPushSender:
+    """Sends push messages to the Expo push service in chunks of 100"""
+
+    def __init__(self, url: str = EXPO_PUSH_URL, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+        self.requests_sent = 0
+
+    def _post(self, chunk: List[Dict[str, Any]]) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(chunk).encode('utf-8'),
+            headers={'Content-Type': 'application/json', 'Accept': 'application/json'},
+            method='POST',
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def send(self, messages: List[Dict[str, Any]]) -> None:
+        """Send every chunk; raises PushSendError naming the messages of the chunks that failed"""
+        unsent: List[Dict[str, Any]] = []
+        error: Optional[Exception] = None
+        for start in range(0, len(messages), EXPO_BATCH_SIZE):
+            chunk = messages[start:start + EXPO_BATCH_SIZE]
+            try:
+                self._post(chunk)
+            except Exception as e:
+                unsent.extend(chunk)
+                error = e
+                continue
+            self.requests_sent += 1
+        if unsent:
+            raise PushSendError(unsent, error)
+
+
+class RecordingPushSender:
+    """Local push stand-in: records batches instead of delivering them"""
+
+    def __init__(self):
+        self.batches: List[List[Dict[str, Any]]] = []
+
+    @property
+    def requests_sent(self) -> int:
+        return sum((len(batch) + EXPO_BATCH_SIZE - 1) // EXPO_BATCH_SIZE for batch in self.batches)
+
+    def send(self, messages: List[Dict[str, Any]]) -> None:
+        self.batches.append(list(messages))
+
+
+# ==================== FAN-OUT ENGINE ====================
+
+@dataclass
+class _PendingPush:
+    chat_name: str
+    sender_name: str
+    preview: str
+    count: int = 0
+    last_message_id: int = 0
+
+
+@dataclass
+class _Batch:
+    rows: List[Dict[str, Any]]
+    pushes: 'OrderedDict[Tuple[int, int], _PendingPush]'
+    # Push messages built from `pushes` and not yet delivered
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    attempts: int = 0
+    retry_at: float = 0.0
+    error: Optional[str] = field(default=None, repr=False)
+
+
+@dataclass
+class FanoutStats:
+    messages: int = 0
+    notification_rows: int = 0
+    db_writes: int = 0
+    push_messages: int = 0
+    flushes: int = 0
+    errors: int = 0
+    retries: int = 0
+    dropped_rows: int = 0
+    dropped_pushes: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        per_message = lambda value: round(value / self.messages, 3) if self.messages else 0.0
+        return {
+            'messages': self.messages,
+            'notification_rows': self.notification_rows,
+            'db_writes': self.db_writes,
+            'db_writes_per_message': per_message(self.db_writes),
+            'push_messages': self.push_messages,
+            'push_messages_per_message': per_message(self.push_messages),
+            'flushes': self.flushes,
+            'errors': self.errors,
+            'retries': self.retries,
+            'dropped_rows': self.dropped_rows,
+            'dropped_pushes': self.dropped_pushes,
+        }
+
+
+class NotificationFanout:
+
+    def __init__(
+        self,
+        token_lookup: TokenLookup,
+        push_sender=None,
+        writer: Callable[[List[Dict[str, Any]]], None] = bulk_insert_notifications,
+        window_ms: int = WINDOW_MS,
+        max_pending_rows: int = MAX_PENDING_ROWS,
+        app=None,
+        start: bool = True,
+        max_attempts: int = MAX_ATTEMPTS,
+        retry_base_seconds: float = RETRY_BASE_SECONDS,
+        retry_max_seconds: float = RETRY_MAX_SECONDS,
+    ):
+        self.token_lookup = token_lookup
+        self.push_sender = push_sender or ExpoPushSender()
+        self.writer = writer
+        self.window = window_ms / 1000.0
+        self.max_pending_rows = max_pending_rows
+        self.app = app
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.stats = FanoutStats()
+
+        self._rows: List[Dict[str, Any]] = []
+        self._pushes: 'OrderedDict[Tuple[int, int], _PendingPush]' = OrderedDict()
+        self._first_pending_at: Optional[float] = None
+        # Failed batches waiting for their next attempt, oldest first
+        self._retries: List[_Batch] = []
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._worker: Optional[threading.Thread] = None
+        if start:
+            self._worker = threading.Thread(target=self._run, name='notification-fanout', daemon=True)
+            self._worker.start()
+
+    def enqueue(self, chat_id: int, chat_name: str, message_id: int, sender_id: int, sender_name: str,
+                content: str, recipient_ids: Iterable[int]) -> None:
+        """Queue notifications for everyone in the chat except the sender"""
+        preview = (content or '')[:PREVIEW_CHARS]
+        with self._condition:
+            self.stats.messages += 1
+            for user_id in recipient_ids:
+                if user_id == sender_id:
+                    continue
+                self._rows.append({'user_id': user_id, 'chat_id': chat_id,
+                                   'message_id': message_id, 'is_read': False})
+                pending = self._pushes.get((user_id, chat_id))
+                if pending is None:
+                    pending = self._pushes[(user_id, chat_id)] = _PendingPush(chat_name, sender_name, preview)
+                pending.count += 1
+                pending.last_message_id = message_id
+                pending.sender_name = sender_name
+                pending.preview = preview
+
+            # Wake the worker to start the window, or to flush early when full
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+                self._condition.notify()
+            elif len(self._rows) >= self.max_pending_rows:
+                self._condition.notify()
+
+    def _take_pending(self) -> Tuple[List[Dict[str, Any]], 'OrderedDict[Tuple[int, int], _PendingPush]']:
+        rows, pushes = self._rows, self._pushes
+        self._rows, self._pushes = [], OrderedDict()
+        self._first_pending_at = None
+        return rows, pushes
+
+    def _build_push_messages(self, pushes: 'OrderedDict[Tuple[int, int], _PendingPush]') -> List[Dict[str, Any]]:
+        tokens = self.token_lookup(sorted({user_id for user_id, _ in pushes}))
+        messages = []
+        for (user_id, chat_id), pending in pushes.items():
+            if pending.count == 1:
+                title, body = f'{pending.sender_name} in {pending.chat_name}', pending.preview
+            else:
+                title, body = pending.chat_name, f'{pending.count} new messages'
+            for token in tokens.get(user_id, []):
+                messages.append({
+                    'to': token,
+                    'title': title,
+                    'body': body,
+                    'sound': 'default',
+                    'channelId': 'team_chat',
+                    'data': {'type': 'chat_message', 'chat_id': chat_id, 'message_id': pending.last_message_id},
+                })
+        return messages
+
+    def _deliver(self, batch: _Batch) -> None:
+        """Write the rows, then send the pushes; raises with the batch left holding what is not yet done"""
+        if batch.rows:
+            self.writer(batch.rows)
+            self.stats.db_writes += 1
+            self.stats.notification_rows += len(batch.rows)
+            batch.rows = []
+
+        if batch.pushes:
+            batch.messages = self._build_push_messages(batch.pushes)
+            batch.pushes = OrderedDict()
+
+        if batch.messages:
+            try:
+                self.push_sender.send(batch.messages)
+            except PushSendError as e:
+                # Only the failed chunks are retried
+                self.stats.push_messages += len(batch.messages) - len(e.unsent)
+                batch.messages = e.unsent
+                raise
+            self.stats.push_messages += len(batch.messages)
+            batch.messages = []
+
+    def _attempt(self, batch: _Batch) -> bool:
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    self._deliver(batch)
+            else:
+                self._deliver(batch)
+            return True
+        except Exception as e:
+            batch.attempts += 1
+            batch.error = str(e)
+            self.stats.errors += 1
+            return False
+
+    def _schedule_retry(self, batch: _Batch) -> None:
+        if batch.attempts >= self.max_attempts:
+            self.stats.dropped_rows += len(batch.rows)
+            self.stats.dropped_pushes += len(batch.pushes) + len(batch.messages)
+            logger.error('Notification fan-out gave up after %d attempts (%d rows, %d pushes unsent): %s',
+                         batch.attempts, len(batch.rows), len(batch.pushes) + len(batch.messages), batch.error)
+            return
+        delay = min(self.retry_base_seconds * 2 ** (batch.attempts - 1), self.retry_max_seconds)
+        batch.retry_at = time.monotonic() + delay
+        logger.warning('Notification fan-out flush failed (attempt %d, retrying in %.1fs): %s',
+                       batch.attempts, delay, batch.error)
+        with self._condition:
+            self._retries.append(batch)
+            self._condition.notify()
+
+    def _take_due_retries(self, force: bool = False) -> List[_Batch]:
+        now = time.monotonic()
+        with self._condition:
+            due = [batch for batch in self._retries if force or batch.retry_at <= now]
+            self._retries = [batch for batch in self._retries if not (force or batch.retry_at <= now)]
+        return due
+
+    def flush(self, force_retries: bool = False) -> None:
+        """Deliver the pending batch and any failed batches whose backoff has passed"""
+        batches = self._take_due_retries(force_retries)
+        self.stats.retries += len(batches)
+        with self._condition:
+            rows, pushes = self._take_pending()
+        if rows:
+            batches.append(_Batch(rows, pushes))
+
+        for batch in batches:
+            if self._attempt(batch):
+                self.stats.flushes += 1
+            else:
+                self._schedule_retry(batch)
+
+    @property
+    def pending_retries(self) -> int:
+        with self._condition:
+            return len(self._retries)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    deadlines = [batch.retry_at for batch in self._retries]
+                    if self._first_pending_at is not None:
+                        if len(self._rows) >= self.max_pending_rows:
+                            break
+                        deadlines.append(self._first_pending_at + self.window)
+                    if not deadlines:
+                        self._condition.wait()
+                        continue
+                    remaining = min(deadlines) - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                stopped = self._stopped
+            # On shutdown, failed batches get one last attempt without waiting out their backoff
+            self.flush(force_retries=stopped)
+            if stopped:
+                return
+
+    def close(self) -> None:
+        """Flush what is pending and stop the worker"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._worker is not None:
+            self._worker.join()
+        else:
+            self.flush(force_retries=True)
+        with self._condition:
+            unsent = self._retries
+            self._retries = []
+        for batch in unsent:
+            self.stats.dropped_rows += len(batch.rows)
+            self.stats.dropped_pushes += len(batch.pushes) + len(batch.messages)
+            logger.error('Notification fan-out stopped with %d rows and %d pushes unsent: %s',
+                         len(batch.rows), len(batch.pushes) + len(batch.messages), batch.error)
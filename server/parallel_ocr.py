@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Parallel multi-page OCR for scanned uploads
+
+Documents are split into page images, uncached pages are OCR'd across a
+process pool sized to the available cores, and page text is yielded as soon
+as each page finishes so chunking can start before the whole scan is done.
+OCR output is cached on disk by the SHA-256 of the page image together with
+the language, tesseract config, render DPI and tesseract version, and the
+cache is pruned by age and total size.
+
+Requires Pillow and pytesseract; PDFs additionally need PyMuPDF (fitz).
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+OCR_CACHE_DIR = Path(os.getenv('OCR_CACHE_DIR', 'ocr_cache'))
+OCR_LANGUAGE = os.getenv('OCR_LANGUAGE', 'eng')
+OCR_CONFIG = os.getenv('OCR_CONFIG', '')
+OCR_CACHE_MAX_BYTES = int(os.getenv('OCR_CACHE_MAX_BYTES', str(1024 ** 3)))
+OCR_CACHE_MAX_AGE_DAYS = int(os.getenv('OCR_CACHE_MAX_AGE_DAYS', '30'))
+# Prune after this many cache writes
+OCR_CACHE_PRUNE_EVERY = 200
+PDF_RENDER_DPI = 300
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_engine_version: Optional[str] = None
+_cache_lock = threading.Lock()
+_writes_since_prune = 0
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Share one pool across requests instead of forking per upload"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        return _executor
+
+
+def split_pages(data: bytes, mime_type: str = '') -> List[bytes]:
+    """Split a PDF or (multi-frame) image into one PNG per page"""
+    if mime_type == 'application/pdf' or data[:5] == b'%PDF-':
+        try:
+            import fitz
+        except ImportError:
+            raise ImportError('PyMuPDF is required to OCR PDF uploads (pip install pymupdf)')
+
+        pages = []
+        with fitz.open(stream=data, filetype='pdf') as document:
+            for page in document:
+                pixmap = page.get_pixmap(dpi=PDF_RENDER_DPI)
+                pages.append(pixmap.tobytes('png'))
+        return pages
+
+    from PIL import Image, ImageSequence
+
+    pages = []
+    with Image.open(io.BytesIO(data)) as image:
+        for frame in ImageSequence.Iterator(image):
+            buffer = io.BytesIO()
+            frame.convert('RGB').save(buffer, format='PNG')
+            pages.append(buffer.getvalue())
+    return pages
+
+
+def page_hash(page: bytes) -> str:
+    return hashlib.sha256(page).hexdigest()
+
+
+def engine_version() -> str:
+    """Installed tesseract version; cached text from another version is not reused"""
+    global _engine_version
+    if _engine_version is None:
+        try:
+            import pytesseract
+            _engine_version = str(pytesseract.get_tesseract_version())
+        except Exception:
+            _engine_version = 'unknown'
+    return _engine_version
+
+
+def cache_key(digest: str, language: str = OCR_LANGUAGE, config: str = OCR_CONFIG,
+              dpi: int = PDF_RENDER_DPI, version: Optional[str] = None) -> str:
+    """Key for a page's OCR text: the image plus everything that changes the output"""
+    parts = [digest, language, config, str(dpi), version or engine_version()]
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _cache_path(key: str) -> Path:
+    return OCR_CACHE_DIR / key[:2] / f'{key}.txt'
+
+
+def _read_cache(key: str) -> Optional[str]:
+    path = _cache_path(key)
+    try:
+        text = path.read_text(encoding='utf-8')
+    except FileNotFoundError:
+        return None
+    # Reads refresh the mtime so pruning drops the least recently used pages first
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return text
+
+
+def _write_cache(key: str, text: str) -> None:
+    global _writes_since_prune
+    path = _cache_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A unique temp name per writer; two workers caching the same page both replace atomically
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+            handle.write(text)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+    with _cache_lock:
+        _writes_since_prune += 1
+        due = _writes_since_prune >= OCR_CACHE_PRUNE_EVERY
+        if due:
+            _writes_since_prune = 0
+    if due:
+        prune_cache()
+
+
+def prune_cache(max_bytes: int = OCR_CACHE_MAX_BYTES, max_age_days: int = OCR_CACHE_MAX_AGE_DAYS,
+                cache_dir: Optional[Path] = None) -> int:
+    """Delete entries older than `max_age_days`, then the least recently used beyond `max_bytes`"""
+    cache_dir = cache_dir or OCR_CACHE_DIR
+    cutoff = time.time() - max_age_days * 86400
+    entries = []
+    removed = 0
+    for path in cache_dir.glob('*/*'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        # Leftover temp files from a crashed writer
+        stale_tmp = path.suffix == '.tmp' and stat.st_mtime < time.time() - 3600
+        if stat.st_mtime < cutoff or stale_tmp:
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+        elif path.suffix == '.txt':
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+    return removed
+
+
+def _ocr_page(page: bytes, language: str, config: str = OCR_CONFIG) -> str:
+    """Worker entry point; runs in a pool process"""
+    import pytesseract
+    from PIL import Image
+
+    with Image.open(io.BytesIO(page)) as image:
+        return pytesseract.image_to_string(image, lang=language, config=config)
+
+
+def iter_page_text(
+    source: Union[bytes, List[bytes]],
+    mime_type: str = '',
+    language: str = OCR_LANGUAGE,
+    config: str = OCR_CONFIG,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) pairs in completion order.
+
+    `source` is either the raw upload or an already-split list of page images.
+    Cached pages are yielded first, then pages as their OCR finishes.
+    """
+    pages = split_pages(source, mime_type) if isinstance(source, bytes) else source
+
+    pending = {}
+    for page_number, page in enumerate(pages, 1):
+        key = cache_key(page_hash(page), language, config)
+        cached = _read_cache(key)
+        if cached is not None:
+            yield page_number, cached
+        else:
+            pending[page_number] = (key, page)
+
+    if not pending:
+        return
+
+    executor = _get_executor()
+    futures = {
+        executor.submit(_ocr_page, page, language, config): (page_number, key)
+        for page_number, (key, page) in pending.items()
+    }
+    for future in as_completed(futures):
+        page_number, key = futures[future]
+        text = future.result()
+        _write_cache(key, text)
+        yield page_number, text
+
+
+def ocr_document(source: Union[bytes, List[bytes]], mime_type: str = '', language: str = OCR_LANGUAGE,
+                 config: str = OCR_CONFIG) -> str:
+    """OCR every page in parallel and return the text in page order"""
+    texts = dict(iter_page_text(source, mime_type, language, config))
+    return '\n\n'.join(texts[page_number] for page_number in sorted(texts))
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) < 2:
+        print('Usage: python -m server.parallel_ocr <scan.pdf|scan.tiff>')
+        sys.exit(1)
+
+    data = Path(sys.argv[1]).read_bytes()
+    start = time.perf_counter()
+    pages = split_pages(data)
+    print(f'📄 {len(pages)} pages, {os.cpu_count()} workers')
+
+    for page_number, text in iter_page_text(pages):
+        print(f'   ✓ page {page_number}: {len(text)} chars ({time.perf_counter() - start:.2f}s)')
+    print(f'✅ OCR finished in {time.perf_counter() - start:.2f}s')
@@ -0,0 +1,186 @@
+"""
+Password hashing with explicit, benchmarked parameters
+
+Hashes used to be created with werkzeug's generate_password_hash defaults, so
+the CPU cost of a login depended on whichever werkzeug release created the
+stored hash, and /login hashing competed with every other request for the
+worker. Here the method and cost are pinned (PASSWORD_HASH_METHOD, see
+calibrate() for picking them on the production hardware), hashing runs on a
+small dedicated pool so concurrent logins queue there instead of occupying
+request workers or an event loop, and a successful login with an outdated
+hash stores a fresh one with the current parameters.
+
+Stored hashes stay in werkzeug's format ("scrypt:N:r:p$salt$hash" or
+"pbkdf2:sha256:iterations$salt$hash"), so existing users keep logging in.
+
+    from server.password_hashing import password_hasher
+    user.password_hash = password_hasher.hash('password123')
+    if password_hasher.verify_and_update(user, password):   # rehashes if stale; caller commits
+        ...
+    ok = await password_hasher.verify_async(user.password_hash, password)
+
+    python -m server.password_hashing 250     # suggest parameters for ~250 ms
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# scrypt N=2^15, r=8, p=1: 32 MiB and roughly 100-150 ms per hash; re-run calibrate() on new hardware
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 2)))
+SALT_LENGTH = 16
+
+
+def parse_method(password_hash: str) -> Tuple[str, List[int]]:
+    """('scrypt', [N, r, p]) or ('pbkdf2:sha256', [iterations]) from a werkzeug hash or method"""
+    method = password_hash.split('$', 1)[0]
+    name, _, params = method.partition(':')
+    if name == 'pbkdf2':
+        digest, _, iterations = params.partition(':')
+        return f'pbkdf2:{digest or "sha256"}', [int(iterations)] if iterations else []
+    return name, [int(p) for p in params.split(':') if p]
+
+
+class PasswordHasher:
+
+    def __init__(self, method: str = PASSWORD_HASH_METHOD, max_workers: int = PASSWORD_HASH_WORKERS):
+        self.method = method
+        self._target = parse_method(method)
+        # Both hashlib.scrypt and pbkdf2_hmac release the GIL, so threads give real parallelism
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password-hash')
+        # Unknown usernames are checked against this so they take as long as real ones
+        self._dummy_hash: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hashes = 0
+        self.verifications = 0
+        self.rehashes = 0
+
+    # ---------- synchronous API (runs on the pool, blocks the caller) ----------
+
+    def hash(self, password: str) -> str:
+        return self.submit_hash(password).result()
+
+    def verify(self, password_hash: Optional[str], password: str) -> bool:
+        return self.submit_verify(password_hash, password).result()
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        try:
+            return parse_method(password_hash) != self._target
+        except ValueError:
+            return True
+
+    def verify_and_update(self, user, password: str, commit: bool = False) -> bool:
+        """
+        Check a login password against user.password_hash (user may be None) and
+        set a hash with the current parameters if the old one is outdated. The
+        caller's session commits it with the rest of the login; commit=True
+        writes it straight away in a transaction of its own instead.
+        """
+        stored = getattr(user, 'password_hash', None) if user is not None else None
+        if not self.verify(stored, password):
+            return False
+        if self.needs_rehash(stored):
+            user.password_hash = self.hash(password)
+            with self._lock:
+                self.rehashes += 1
+            if commit:
+                self._store_hash(user)
+        return True
+
+    @staticmethod
+    def _store_hash(user) -> None:
+        from shared import db
+
+        table = type(user).__table__
+        with db.engine.begin() as conn:
+            conn.execute(table.update().where(table.c.id == user.id).values(password_hash=user.password_hash))
+
+    # ---------- pool submission ----------
+
+    def submit_hash(self, password: str) -> 'Future[str]':
+        return self._executor.submit(self._hash, password)
+
+    def submit_verify(self, password_hash: Optional[str], password: str) -> 'Future[bool]':
+        return self._executor.submit(self._verify, password_hash, password)
+
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.wrap_future(self.submit_hash(password))
+
+    async def verify_async(self, password_hash: Optional[str], password: str) -> bool:
+        return await asyncio.wrap_future(self.submit_verify(password_hash, password))
+
+    def _hash(self, password: str) -> str:
+        with self._lock:
+            self.hashes += 1
+        return generate_password_hash(password, method=self.method, salt_length=SALT_LENGTH)
+
+    def _verify(self, password_hash: Optional[str], password: str) -> bool:
+        with self._lock:
+            self.verifications += 1
+        if not password_hash:
+            if self._dummy_hash is None:
+                self._dummy_hash = generate_password_hash('dummy-password', method=self.method)
+            check_password_hash(self._dummy_hash, password)
+            return False
+        try:
+            return check_password_hash(password_hash, password)
+        except ValueError:
+            # Unknown or corrupt hash format
+            return False
+
+    def stats(self) -> Dict:
+        return {'method': self.method, 'hashes': self.hashes, 'verifications': self.verifications,
+                'rehashes': self.rehashes}
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+# ==================== CALIBRATION ====================
+
+def time_method(method: str, rounds: int = 3) -> float:
+    """Median seconds to hash once with `method` on this machine"""
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        generate_password_hash('calibration-password', method=method)
+        samples.append(time.perf_counter() - start)
+    return sorted(samples)[len(samples) // 2]
+
+
+def calibrate(target_ms: float = 250.0, max_memory_mib: int = 64) -> Dict[str, float]:
+    """
+    Largest scrypt N (r=8, p=1) within `target_ms` and the memory cap, plus
+    the PBKDF2-SHA256 iteration count for the same time.
+    """
+    n, results = 2 ** 14, {}
+    while True:
+        seconds = time_method(f'scrypt:{n}:8:1')
+        results[f'scrypt:{n}:8:1'] = seconds
+        next_memory_mib = 128 * (n * 2) * 8 / 2 ** 20
+        if seconds * 2 > target_ms / 1000 or next_memory_mib > max_memory_mib:
+            break
+        n *= 2
+    per_iteration = time_method('pbkdf2:sha256:100000') / 100000
+    iterations = max(1000, int(target_ms / 1000 / per_iteration / 1000) * 1000)
+    pbkdf2 = f'pbkdf2:sha256:{iterations}'
+    results[pbkdf2] = time_method(pbkdf2)
+    return results
+
+
+password_hasher = PasswordHasher()
+
+
+if __name__ == '__main__':
+    target = float(sys.argv[1]) if len(sys.argv) > 1 else 250.0
+    print(f"🔑 Timing password hash parameters (target {target:.0f} ms per hash)")
+    for method, seconds in calibrate(target).items():
+        print(f"  {method:28} {seconds * 1000:7.1f} ms")
+    print(f"  current PASSWORD_HASH_METHOD: {PASSWORD_HASH_METHOD}")
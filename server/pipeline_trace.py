@@ -0,0 +1,198 @@
+"""
+Per-file stage tracing for shared_file_processing_pipeline
+
+Each upload records one row per pipeline stage (store, ocr, classify, chunk,
+embed, index) in file_processing_trace: when the stage started, how long it
+took, the bytes and chunks it handled and whether it failed. Rows are
+buffered on the trace and written with a single INSERT when the pipeline
+finishes (or fails), so tracing adds one statement per upload, in its own
+transaction so the pipeline's session is left alone. Every stage is timed
+through metrics.stage_timer, which feeds the
+grabdocs_pipeline_stage_duration_seconds histogram on /metrics; a traced
+stage must not be wrapped in stage_timer as well, or it is counted twice.
+
+    from server.pipeline_trace import trace_file
+    with trace_file(file.id) as trace:
+        with trace.stage('store', bytes_in=len(data)):
+            save(data)
+        with trace.stage('chunk') as stage:
+            chunks = chunk(text)
+            stage.chunks = len(chunks)
+
+    GET /api/v1/mobile/file/<id>/processing-trace       the file's timeline
+    python db_scripts/processing_trace_report.py 24     slowest stages, last 24 h
+
+Table: db_scripts/create_processing_trace_table.py
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from . import metrics
+
+TRACE_TABLE = 'file_processing_trace'
+REPORT_MAX_ROWS = 50000
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StageRecord:
+    file_id: int
+    stage: str
+    started_at: datetime
+    duration_ms: float = 0.0
+    bytes_in: Optional[int] = None
+    chunks: Optional[int] = None
+    status: str = 'ok'   # ok | error
+    error: Optional[str] = None
+
+
+def insert_trace_rows(rows: List[Dict[str, Any]]) -> None:
+    """All stages of one file in a single multi-VALUES statement"""
+    from shared import db
+    from sqlalchemy import column, insert, table
+
+    trace = table(TRACE_TABLE, *(column(name) for name in rows[0]))
+    with db.engine.begin() as conn:
+        conn.execute(insert(trace).values(rows))
+
+
+class PipelineTrace:
+
+    def __init__(self, file_id: int, writer: Optional[Callable[[List[Dict[str, Any]]], None]] = insert_trace_rows):
+        self.file_id = file_id
+        self.writer = writer
+        self.records: List[StageRecord] = []
+
+    @contextmanager
+    def stage(self, name: str, bytes_in: Optional[int] = None) -> Iterator[StageRecord]:
+        """Time one stage; set .bytes_in / .chunks on the yielded record as they become known"""
+        record = StageRecord(self.file_id, name, datetime.now(timezone.utc), bytes_in=bytes_in)
+        start = time.perf_counter()
+        try:
+            # stage_timer records the histogram sample and the failure count
+            with metrics.stage_timer(name):
+                yield record
+        except Exception as e:
+            record.status = 'error'
+            record.error = str(e)[:500]
+            raise
+        finally:
+            record.duration_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.records.append(record)
+
+    def flush(self) -> None:
+        if not self.records or self.writer is None:
+            return
+        rows, self.records = [asdict(r) for r in self.records], []
+        try:
+            self.writer(rows)
+        except Exception:
+            # Tracing must never fail an upload
+            logger.warning('Could not write processing trace for file %s', self.file_id, exc_info=True)
+
+
+@contextmanager
+def trace_file(file_id: int, writer=insert_trace_rows) -> Iterator[PipelineTrace]:
+    trace = PipelineTrace(file_id, writer)
+    try:
+        yield trace
+    finally:
+        trace.flush()
+
+
+# ==================== READING TRACES ====================
+
+def timeline(rows: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """A file's stages in start order with offsets from the first stage"""
+    rows = sorted(rows, key=lambda r: r['started_at'])
+    if not rows:
+        return {'stages': [], 'total_ms': 0.0, 'slowest_stage': None}
+    first = rows[0]['started_at']
+    stages = [{
+        'stage': r['stage'],
+        'offset_ms': round((r['started_at'] - first).total_seconds() * 1000, 2),
+        'duration_ms': r['duration_ms'],
+        'bytes_in': r.get('bytes_in'),
+        'chunks': r.get('chunks'),
+        'status': r['status'],
+        'error': r.get('error'),
+    } for r in rows]
+    end_ms = max(s['offset_ms'] + s['duration_ms'] for s in stages)
+    return {
+        'stages': stages,
+        'total_ms': round(end_ms, 2),
+        'slowest_stage': max(stages, key=lambda s: s['duration_ms'])['stage'],
+    }
+
+
+def _percentile(values: List[float], p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def summarize_stages(rows: Sequence[Dict[str, Any]], slowest_files: int = 5) -> List[Dict[str, Any]]:
+    """Per-stage count, p50/p95/max and the slowest files, slowest stage (by total time) first"""
+    by_stage: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_stage.setdefault(row['stage'], []).append(row)
+
+    summary = []
+    for stage, stage_rows in by_stage.items():
+        durations = sorted(r['duration_ms'] for r in stage_rows)
+        slowest = sorted(stage_rows, key=lambda r: r['duration_ms'], reverse=True)[:slowest_files]
+        summary.append({
+            'stage': stage,
+            'count': len(durations),
+            'errors': sum(r['status'] == 'error' for r in stage_rows),
+            'total_ms': round(sum(durations), 1),
+            'p50_ms': _percentile(durations, 0.5),
+            'p95_ms': _percentile(durations, 0.95),
+            'max_ms': durations[-1],
+            'slowest_files': [{'file_id': r['file_id'], 'duration_ms': r['duration_ms'], 'bytes_in': r.get('bytes_in')}
+                              for r in slowest],
+        })
+    return sorted(summary, key=lambda s: s['total_ms'], reverse=True)
+
+
+def load_file_trace(file_id: int) -> List[Dict[str, Any]]:
+    from shared import db
+    from sqlalchemy import text
+
+    result = db.session.execute(text(
+        'SELECT file_id, stage, started_at, duration_ms, bytes_in, chunks, status, error '
+        f'FROM {TRACE_TABLE} WHERE file_id = :file_id ORDER BY started_at'
+    ), {'file_id': file_id})
+    return [dict(row._mapping) for row in result]
+
+
+def load_recent_traces(hours: float = 24, limit: int = REPORT_MAX_ROWS) -> List[Dict[str, Any]]:
+    from shared import db
+    from sqlalchemy import text
+
+    result = db.session.execute(text(
+        'SELECT file_id, stage, started_at, duration_ms, bytes_in, chunks, status, error '
+        f'FROM {TRACE_TABLE} WHERE started_at >= :since ORDER BY started_at DESC LIMIT :limit'
+    ), {'since': datetime.now(timezone.utc) - timedelta(hours=hours), 'limit': limit})
+    return [dict(row._mapping) for row in result]
+
+
+def init_app(app, url_prefix: str = '/api/v1/mobile') -> None:
+    """Register GET <prefix>/file/<id>/processing-trace for the file's owner"""
+    from flask import g, jsonify
+
+    @app.route(f'{url_prefix}/file/<int:file_id>/processing-trace', methods=['GET'])
+    def file_processing_trace(file_id: int):
+        from shared import db, File
+
+        user = getattr(g, 'session_user', None)
+        if user is None:
+            return jsonify({'success': False, 'message': 'Authentication required'}), 401
+        file = db.session.get(File, file_id)
+        if file is None or file.user_id != user['id']:
+            return jsonify({'success': False, 'message': 'File not found'}), 404
+        return jsonify({'success': True, 'file_id': file_id, **timeline(load_file_trace(file_id))})
@@ -0,0 +1,266 @@
+"""
+Sliding-window rate limiting for the OTP and login endpoints
+
+Attack traffic against /auth/request-otp, /auth/verify-otp,
+/auth/login-with-phone and /login used to reach the database and the SMS
+provider unchecked. init_app() installs a before_request hook that checks
+every attempt against per-user, per-phone, per-IP and per-device limits and
+answers 429 (with Retry-After) before the view runs.
+
+Counting uses the sliding window counter approximation: the previous fixed
+window's count, weighted by how much of it still overlaps the sliding
+window, plus the current window's count. That is O(1) state per key. Only
+allowed attempts are counted, so a client that keeps retrying while limited
+is let in again once its earlier attempts age out. Attempts in flight at the
+same moment are not serialized and may overshoot a limit by their number.
+Counters live in memory by default; set RATE_LIMIT_REDIS_URL to share them
+across workers and nodes.
+
+Password logins are limited per (username, IP) so nobody can lock a known
+user out from one address; the per-username rule alone has a much higher
+ceiling and only stops guessing spread across many addresses.
+
+Behind proxies, set RATE_LIMIT_PROXY_HOPS to the number of proxies that
+append to X-Forwarded-For; the client address is the entry the outermost of
+them added, counted from the right. Entries further left are supplied by
+the client and are ignored.
+
+    from server import rate_limiter
+    rate_limiter.init_app(app)
+"""
+
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+CLEANUP_EVERY = 10000
+# RATE_LIMIT_TRUST_PROXY=true is the older spelling of one hop
+PROXY_HOPS = int(os.getenv('RATE_LIMIT_PROXY_HOPS') or
+                 ('1' if os.getenv('RATE_LIMIT_TRUST_PROXY', 'false').lower() == 'true' else '0'))
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    key_kind: str  # user | user_ip | phone | ip | device
+    limit: int
+    window_seconds: int
+
+
+@dataclass
+class RateLimitDecision:
+    allowed: bool
+    retry_after: int = 0
+    rule: Optional[RateLimitRule] = None
+    current: float = 0.0
+
+
+# Limits per endpoint; every applicable key must be within its limit
+POLICIES: Dict[str, List[RateLimitRule]] = {
+    'request_otp': [
+        RateLimitRule('phone', 3, 600),
+        RateLimitRule('device', 5, 600),
+        RateLimitRule('ip', 10, 600),
+    ],
+    'verify_otp': [
+        RateLimitRule('phone', 5, 600),
+        RateLimitRule('device', 10, 600),
+        RateLimitRule('ip', 30, 600),
+    ],
+    'login_with_phone': [
+        RateLimitRule('phone', 10, 900),
+        RateLimitRule('device', 20, 900),
+        RateLimitRule('ip', 30, 900),
+    ],
+    'login': [
+        RateLimitRule('user_ip', 10, 900),
+        RateLimitRule('user', 200, 900),
+        RateLimitRule('device', 20, 900),
+        RateLimitRule('ip', 50, 900),
+    ],
+}
+
+ENDPOINT_PATHS = {
+    '/api/v1/mobile/auth/request-otp': 'request_otp',
+    '/api/v1/mobile/auth/verify-otp': 'verify_otp',
+    '/api/v1/mobile/auth/login-with-phone': 'login_with_phone',
+    '/api/v1/mobile/login': 'login',
+    '/api/v1/mobile/auth/login': 'login',
+}
+
+
+# ==================== STORES ====================
+
+class InMemoryStore:
+    """Per-process counters: (window index, count, previous window count) per key"""
+
+    def __init__(self):
+        self._windows: Dict[str, Tuple[int, int, int]] = {}
+        self._lock = threading.Lock()
+        self._ops = 0
+
+    def _window(self, key: str, index: int) -> Tuple[int, int]:
+        stored_index, current, previous = self._windows.get(key, (index, 0, 0))
+        if stored_index != index:
+            previous = current if stored_index == index - 1 else 0
+            current = 0
+        return current, previous
+
+    def counts(self, key: str, window_seconds: int, now: float) -> Tuple[int, int]:
+        """(current window count, previous window count), without counting a hit"""
+        with self._lock:
+            return self._window(key, int(now // window_seconds))
+
+    def add(self, key: str, window_seconds: int, now: float) -> None:
+        """Count one allowed attempt"""
+        index = int(now // window_seconds)
+        with self._lock:
+            current, previous = self._window(key, index)
+            self._windows[key] = (index, current + 1, previous)
+
+            self._ops += 1
+            if self._ops % CLEANUP_EVERY == 0:
+                self._cleanup(now)
+
+    def _cleanup(self, now: float) -> None:
+        # Keys idle for two windows carry no weight any more
+        for key in [k for k, (index, _, _) in self._windows.items()
+                    if index < int(now // int(k.rsplit(':', 1)[1])) - 1]:
+            del self._windows[key]
+
+
+class RedisStore:
+    """Shared counters in Redis: one MGET per check, INCR + EXPIRE pipelined per allowed attempt"""
+
+    def __init__(self, url: str):
+        import redis
+
+        self._redis = redis.from_url(url)
+
+    def counts(self, key: str, window_seconds: int, now: float) -> Tuple[int, int]:
+        index = int(now // window_seconds)
+        current, previous = self._redis.mget(f'rl:{key}:{index}', f'rl:{key}:{index - 1}')
+        return int(current or 0), int(previous or 0)
+
+    def add(self, key: str, window_seconds: int, now: float) -> None:
+        current_key = f'rl:{key}:{int(now // window_seconds)}'
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.incr(current_key)
+        pipe.expire(current_key, window_seconds * 2)
+        pipe.execute()
+
+
+# ==================== LIMITER ====================
+
+class RateLimiter:
+
+    def __init__(self, store=None, policies: Optional[Dict[str, List[RateLimitRule]]] = None):
+        if store is None:
+            redis_url = os.getenv('RATE_LIMIT_REDIS_URL')
+            store = RedisStore(redis_url) if redis_url else InMemoryStore()
+        self.store = store
+        self.policies = policies or POLICIES
+        self.allowed = 0
+        self.rejected = 0
+
+    def check(self, endpoint: str, keys: Dict[str, Optional[str]], now: Optional[float] = None) -> RateLimitDecision:
+        """Check this attempt against every rule of the endpoint; it is counted only if allowed"""
+        now = now if now is not None else time.time()
+        worst = RateLimitDecision(True)
+        counted = []
+        for rule in self.policies.get(endpoint, []):
+            value = keys.get(rule.key_kind)
+            if not value:
+                continue
+            key = f'{endpoint}:{rule.key_kind}:{str(value).lower()}:{rule.window_seconds}'
+            counted.append((key, rule.window_seconds))
+            current, previous = self.store.counts(key, rule.window_seconds, now)
+            elapsed = now % rule.window_seconds
+            # This attempt included
+            estimated = previous * (rule.window_seconds - elapsed) / rule.window_seconds + current + 1
+            if estimated > rule.limit:
+                retry_after = self._retry_after(rule, current, previous, elapsed)
+                if worst.allowed or retry_after > worst.retry_after:
+                    worst = RateLimitDecision(False, retry_after, rule, estimated)
+
+        if worst.allowed:
+            for key, window_seconds in counted:
+                self.store.add(key, window_seconds, now)
+            self.allowed += 1
+        else:
+            self.rejected += 1
+        return worst
+
+    @staticmethod
+    def _retry_after(rule: RateLimitRule, current: int, previous: int, elapsed: float) -> int:
+        """Seconds until one more attempt would fit under the limit; counts exclude the attempt"""
+        window = rule.window_seconds
+        if current + 1 > rule.limit or previous == 0:
+            # Only the next window clears it
+            return max(1, math.ceil(window - elapsed))
+        # previous * (window - t) / window + current + 1 <= limit
+        t = window - (rule.limit - current - 1) * window / previous
+        return max(1, math.ceil(t - elapsed))
+
+    def stats(self) -> Dict[str, Any]:
+        return {'allowed': self.allowed, 'rejected': self.rejected}
+
+
+def client_ip(request, proxy_hops: Optional[int] = None) -> str:
+    """The address the outermost trusted proxy saw, as werkzeug's ProxyFix(x_for=hops) picks it"""
+    hops = PROXY_HOPS if proxy_hops is None else proxy_hops
+    if hops > 0:
+        forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.remote_addr or ''
+
+
+def request_keys(request) -> Dict[str, Optional[str]]:
+    """Limit keys from the request body: the app and the web client name fields differently"""
+    data = request.get_json(silent=True) or {}
+    phone = data.get('phoneNumber') or data.get('phone') or data.get('phone_number')
+    if phone:
+        phone = ''.join(ch for ch in str(phone) if ch.isdigit() or ch == '+')
+    user = data.get('username') or data.get('email')
+    ip = client_ip(request)
+    return {
+        'user': user,
+        'user_ip': f'{user}|{ip}' if user else None,
+        'phone': phone,
+        'ip': ip,
+        'device': data.get('device_fingerprint') or request.headers.get('X-Device-Fingerprint'),
+    }
+
+
+def init_app(app, limiter: Optional[RateLimiter] = None,
+             paths: Optional[Dict[str, str]] = None,
+             key_func: Callable[[Any], Dict[str, Optional[str]]] = request_keys) -> RateLimiter:
+    from flask import jsonify, request
+
+    limiter = limiter or rate_limiter
+    paths = paths or ENDPOINT_PATHS
+
+    @app.before_request
+    def enforce_rate_limits():
+        endpoint = paths.get(request.path.rstrip('/'))
+        if endpoint is None or request.method != 'POST':
+            return None
+        decision = limiter.check(endpoint, key_func(request))
+        if decision.allowed:
+            return None
+        response = jsonify({
+            'success': False,
+            'message': 'Too many attempts. Please try again later.',
+            'retry_after': decision.retry_after,
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(decision.retry_after)
+        return response
+
+    return limiter
+
+
+rate_limiter = RateLimiter()
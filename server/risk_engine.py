@@ -0,0 +1,361 @@
+"""
+Server-side risk scoring for Enhanced 2FA logins
+
+The app's calculateRiskScore (services/deviceSecurity.ts) scores a login from
+device trust, time since the last login, recent failures and time of day.
+Doing that on the server with the same weights used to mean a device-history
+query, a failed-attempt count and a last-login lookup on every login. Here
+each user's device trust and last login are loaded once into an in-process
+profile (one indexed query, then kept up to date by login events) and failed
+attempts are counted in sliding windows per user and per IP, so scoring is a
+few dictionary reads.
+
+    from server.risk_engine import risk_engine
+    assessment = risk_engine.assess(user.id, data.get('device_fingerprint'), request.remote_addr)
+    if assessment.requires_2fa: ...                      # send the SMS OTP
+    risk_engine.record_failure(user_id, ip)              # wrong password
+    risk_engine.record_success(user.id, fingerprint, remember_device=True)
+
+Device trust persists in user_device_trust (db_scripts/create_device_trust_table.py).
+The app's risk_context is client-supplied and is not trusted for scoring.
+
+With several workers, set RISK_REDIS_URL: failure windows are then counted in
+Redis, so attempts spread across workers add up, and each user has a profile
+version there that revoking devices bumps, so every worker reloads the
+profile on its next login. Cached profiles also expire after
+RISK_PROFILE_TTL_SECONDS.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+FAILURE_WINDOW_SECONDS = int(os.getenv('RISK_FAILURE_WINDOW_SECONDS', '900'))
+DEVICE_TRUST_DAYS = int(os.getenv('RISK_DEVICE_TRUST_DAYS', '30'))
+PROFILE_CACHE_MAX_ENTRIES = int(os.getenv('RISK_PROFILE_CACHE_MAX_ENTRIES', '100000'))
+PROFILE_TTL_SECONDS = int(os.getenv('RISK_PROFILE_TTL_SECONDS', '60'))
+LOW_RISK_MAX = 30
+MEDIUM_RISK_MAX = 60
+
+
+# ==================== SLIDING WINDOW COUNTER ====================
+
+class SlidingWindowCounter:
+    """
+    Per-key event counts over the last `window_seconds`, kept as a ring of
+    `buckets` sub-windows: adding and counting cost O(buckets) regardless of
+    traffic. Least recently touched keys are evicted beyond `max_keys`.
+    """
+
+    def __init__(self, window_seconds: int = FAILURE_WINDOW_SECONDS, buckets: int = 15,
+                 max_keys: int = PROFILE_CACHE_MAX_ENTRIES):
+        self.bucket_seconds = window_seconds / buckets
+        self.buckets = buckets
+        self.max_keys = max_keys
+        self._rings: 'OrderedDict[str, Tuple[List[int], List[int]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key: str, amount: int = 1, now: Optional[float] = None) -> int:
+        slot = int((now if now is not None else time.time()) / self.bucket_seconds)
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is None:
+                ring = self._rings[key] = ([-1] * self.buckets, [0] * self.buckets)
+                while len(self._rings) > self.max_keys:
+                    self._rings.popitem(last=False)
+            else:
+                self._rings.move_to_end(key)
+            slots, counts = ring
+            index = slot % self.buckets
+            if slots[index] != slot:
+                slots[index], counts[index] = slot, 0
+            counts[index] += amount
+            return self._sum(ring, slot)
+
+    def count(self, key: str, now: Optional[float] = None) -> int:
+        slot = int((now if now is not None else time.time()) / self.bucket_seconds)
+        with self._lock:
+            ring = self._rings.get(key)
+            return self._sum(ring, slot) if ring is not None else 0
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._rings.pop(key, None)
+
+    def _sum(self, ring: Tuple[List[int], List[int]], slot: int) -> int:
+        slots, counts = ring
+        oldest = slot - self.buckets + 1
+        return sum(c for s, c in zip(slots, counts) if s >= oldest)
+
+
+class RedisWindowCounter:
+    """
+    SlidingWindowCounter shared by every worker: one Redis key per key and
+    sub-window, expiring with the window. Adding is one pipelined round trip,
+    counting one MGET.
+    """
+
+    def __init__(self, client, prefix: str, window_seconds: int = FAILURE_WINDOW_SECONDS, buckets: int = 15):
+        self._redis = client
+        self.prefix = prefix
+        self.bucket_seconds = window_seconds / buckets
+        self.buckets = buckets
+
+    def _keys(self, key: str, now: Optional[float]) -> List[str]:
+        slot = int((now if now is not None else time.time()) / self.bucket_seconds)
+        return [f'{self.prefix}:{key}:{s}' for s in range(slot - self.buckets + 1, slot + 1)]
+
+    def add(self, key: str, amount: int = 1, now: Optional[float] = None) -> int:
+        keys = self._keys(key, now)
+        pipe = self._redis.pipeline()
+        pipe.incrby(keys[-1], amount)
+        pipe.expire(keys[-1], int(self.bucket_seconds * (self.buckets + 1)) + 1)
+        pipe.mget(keys)
+        return sum(int(c) for c in pipe.execute()[2] if c)
+
+    def count(self, key: str, now: Optional[float] = None) -> int:
+        return sum(int(c) for c in self._redis.mget(self._keys(key, now)) if c)
+
+    def reset(self, key: str) -> None:
+        self._redis.delete(*self._keys(key, None))
+
+
+class RedisProfileVersions:
+    """Per-user profile version; a worker's cached profile is stale once the version moved"""
+
+    def __init__(self, client):
+        self._redis = client
+
+    def get(self, user_id: int) -> int:
+        return int(self._redis.get(f'risk:profile_version:{user_id}') or 0)
+
+    def bump(self, user_id: int) -> None:
+        self._redis.incr(f'risk:profile_version:{user_id}')
+
+
+# ==================== PROFILES ====================
+
+@dataclass
+class UserRiskProfile:
+    trusted_until: Dict[str, float] = field(default_factory=dict)  # fingerprint -> epoch seconds
+    last_login_at: Optional[float] = None
+
+
+@dataclass
+class RiskAssessment:
+    score: int
+    level: str
+    factors: Dict[str, int]
+
+    @property
+    def requires_2fa(self) -> bool:
+        return self.level != 'LOW'
+
+    def as_dict(self) -> Dict:
+        return {'score': self.score, 'level': self.level, 'factors': self.factors,
+                'requires_2fa': self.requires_2fa}
+
+
+def utc_timestamp(value) -> float:
+    """Epoch seconds for a DB datetime; naive values are stored in UTC, not server local time"""
+    from datetime import timezone
+
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def load_profile_from_db(user_id: int) -> Optional[UserRiskProfile]:
+    """One query: the user's last login plus their known devices"""
+    from shared import db, User
+    from sqlalchemy import text
+
+    last_login = 'u.last_login' if hasattr(User, 'last_login') else 'NULL'
+    rows = db.session.execute(text(
+        f'SELECT {last_login} AS last_login, d.device_fingerprint, d.trusted_until '
+        f'FROM {User.__table__.name} u LEFT JOIN user_device_trust d ON d.user_id = u.id '
+        'WHERE u.id = :user_id'
+    ), {'user_id': user_id}).fetchall()
+    if not rows:
+        return None
+    profile = UserRiskProfile(last_login_at=utc_timestamp(rows[0].last_login) if rows[0].last_login else None)
+    for row in rows:
+        if row.device_fingerprint:
+            profile.trusted_until[row.device_fingerprint] = utc_timestamp(row.trusted_until) if row.trusted_until else 0.0
+    return profile
+
+
+def save_device_trust_to_db(user_id: int, fingerprint: str, trusted_until: Optional[float]) -> None:
+    """Upsert in its own transaction; the caller's session is left alone"""
+    from datetime import datetime, timezone
+
+    from shared import db
+    from sqlalchemy import text
+
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            'INSERT INTO user_device_trust (user_id, device_fingerprint, trusted_until, last_seen_at) '
+            'VALUES (:user_id, :fingerprint, :trusted_until, NOW()) '
+            'ON CONFLICT (user_id, device_fingerprint) DO UPDATE SET '
+            'trusted_until = COALESCE(EXCLUDED.trusted_until, user_device_trust.trusted_until), last_seen_at = NOW()'
+        ), {
+            'user_id': user_id,
+            'fingerprint': fingerprint,
+            'trusted_until': datetime.fromtimestamp(trusted_until, timezone.utc) if trusted_until else None,
+        })
+
+
+def clear_device_trust_in_db(user_id: int) -> None:
+    from shared import db
+    from sqlalchemy import text
+
+    with db.engine.begin() as conn:
+        conn.execute(text('DELETE FROM user_device_trust WHERE user_id = :user_id'), {'user_id': user_id})
+
+
+# ==================== ENGINE ====================
+
+class RiskEngine:
+
+    def __init__(self, load_profile: Callable[[int], Optional[UserRiskProfile]] = load_profile_from_db,
+                 save_device_trust: Optional[Callable[[int, str, Optional[float]], None]] = save_device_trust_to_db,
+                 clear_device_trust: Optional[Callable[[int], None]] = clear_device_trust_in_db,
+                 failure_window_seconds: int = FAILURE_WINDOW_SECONDS, max_profiles: int = PROFILE_CACHE_MAX_ENTRIES,
+                 profile_ttl_seconds: int = PROFILE_TTL_SECONDS, redis_client=None):
+        self.load_profile = load_profile
+        self.save_device_trust = save_device_trust
+        self.clear_device_trust = clear_device_trust
+        self.max_profiles = max_profiles
+        self.profile_ttl_seconds = profile_ttl_seconds
+        if redis_client is None and os.getenv('RISK_REDIS_URL'):
+            import redis
+            redis_client = redis.from_url(os.getenv('RISK_REDIS_URL'))
+        if redis_client is not None:
+            self.user_failures = RedisWindowCounter(redis_client, 'risk:fail:user', failure_window_seconds)
+            self.ip_failures = RedisWindowCounter(redis_client, 'risk:fail:ip', failure_window_seconds)
+            self.versions: Optional[RedisProfileVersions] = RedisProfileVersions(redis_client)
+        else:
+            self.user_failures = SlidingWindowCounter(failure_window_seconds)
+            self.ip_failures = SlidingWindowCounter(failure_window_seconds)
+            self.versions = None
+        # user id -> (profile, loaded at, version); None caches a missing user so repeated lookups stay cheap
+        self._profiles: 'OrderedDict[int, Tuple[Optional[UserRiskProfile], float, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.profile_loads = 0
+
+    def _profile(self, user_id: int) -> Optional[UserRiskProfile]:
+        version = self.versions.get(user_id) if self.versions is not None else 0
+        with self._lock:
+            entry = self._profiles.get(user_id)
+            if entry is not None and entry[2] == version and time.monotonic() - entry[1] < self.profile_ttl_seconds:
+                self._profiles.move_to_end(user_id)
+                return entry[0]
+        profile = self.load_profile(user_id)
+        with self._lock:
+            self.profile_loads += 1
+            self._profiles[user_id] = (profile, time.monotonic(), version)
+            self._profiles.move_to_end(user_id)
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        return profile
+
+    def assess(self, user_id: Optional[int], fingerprint: Optional[str], ip: Optional[str],
+               local_hour: Optional[int] = None, now: Optional[float] = None) -> RiskAssessment:
+        """Score a login attempt 0-100 with the app's weights"""
+        now = now if now is not None else time.time()
+        profile = self._profile(user_id) if user_id is not None else None
+        factors: Dict[str, int] = {}
+
+        # Device trust (0-40)
+        trusted_until = (profile.trusted_until.get(fingerprint) if profile and fingerprint else None)
+        if trusted_until is None:
+            factors['device'] = 40
+        elif trusted_until < now:
+            factors['device'] = 25  # seen before, trust expired or never granted
+
+        # Time since last login (0-25)
+        if profile is None or profile.last_login_at is None:
+            factors['last_login'] = 20
+        else:
+            days = (now - profile.last_login_at) / 86400
+            if days > 90:
+                factors['last_login'] = 25
+            elif days > 30:
+                factors['last_login'] = 15
+            elif days > 7:
+                factors['last_login'] = 5
+
+        # Recent failures for this account (0-20)
+        failures = self.user_failures.count(str(user_id), now) if user_id is not None else 0
+        if failures > 5:
+            factors['failed_attempts'] = 20
+        elif failures > 2:
+            factors['failed_attempts'] = 10
+        elif failures > 0:
+            factors['failed_attempts'] = 5
+
+        # Failures from this IP across all accounts: credential stuffing (0-30)
+        ip_failures = self.ip_failures.count(ip, now) if ip else 0
+        if ip_failures > 20:
+            factors['ip_failures'] = 30
+        elif ip_failures > 5:
+            factors['ip_failures'] = 15
+
+        # Time of day in the user's timezone (0-10)
+        if local_hour is not None:
+            if local_hour < 6 or local_hour > 23:
+                factors['time_of_day'] = 10
+            elif local_hour < 8 or local_hour > 22:
+                factors['time_of_day'] = 5
+
+        score = min(sum(factors.values()), 100)
+        level = 'LOW' if score <= LOW_RISK_MAX else 'MEDIUM' if score <= MEDIUM_RISK_MAX else 'HIGH'
+        return RiskAssessment(score, level, factors)
+
+    def record_failure(self, user_id: Optional[int], ip: Optional[str], now: Optional[float] = None) -> None:
+        if user_id is not None:
+            self.user_failures.add(str(user_id), now=now)
+        if ip:
+            self.ip_failures.add(ip, now=now)
+
+    def record_success(self, user_id: int, fingerprint: Optional[str], remember_device: bool = False,
+                       now: Optional[float] = None) -> None:
+        """Update the cached profile in place and persist device trust"""
+        now = now if now is not None else time.time()
+        self.user_failures.reset(str(user_id))
+        profile = self._profile(user_id)
+        if profile is None:
+            return
+        profile.last_login_at = now
+        if fingerprint:
+            trusted_until = now + DEVICE_TRUST_DAYS * 86400 if remember_device else None
+            if trusted_until is not None:
+                profile.trusted_until[fingerprint] = trusted_until
+            else:
+                profile.trusted_until.setdefault(fingerprint, 0.0)  # known, not trusted
+            if self.save_device_trust is not None:
+                self.save_device_trust(user_id, fingerprint, trusted_until)
+            if trusted_until is not None:
+                self._invalidate(user_id, keep=profile)
+
+    def revoke_devices(self, user_id: int) -> None:
+        """Drop all device trust for the user (/devices/revoke-all), in every worker"""
+        if self.clear_device_trust is not None:
+            self.clear_device_trust(user_id)
+        self._invalidate(user_id)
+
+    def _invalidate(self, user_id: int, keep: Optional[UserRiskProfile] = None) -> None:
+        """Make other workers reload the profile; this one keeps `keep` if given, already up to date"""
+        if self.versions is not None:
+            self.versions.bump(user_id)
+        with self._lock:
+            if keep is None:
+                self._profiles.pop(user_id, None)
+            elif self.versions is not None:
+                self._profiles[user_id] = (keep, time.monotonic(), self.versions.get(user_id))
+
+
+risk_engine = RiskEngine()
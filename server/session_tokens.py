@@ -0,0 +1,318 @@
+"""
+Signed session tokens with cached user resolution
+
+Every /api/v1/mobile/* request used to load the session user from Neon before
+doing any work. Requests now carry a short-lived HMAC-signed token
+(`Authorization: Bearer ...`) whose claims name the user and session, so
+authenticating is a signature check, a revocation lookup and an in-process
+LRU hit:
+
+- tokens expire after SESSION_TOKEN_TTL_SECONDS; past half their life a
+  fresh one is returned in the `X-Session-Token` response header
+- /logout revokes the token's session id until it would have expired anyway
+- /devices/revoke-all sets a per-user "not before" time, rejecting every
+  token issued earlier, and drops the cached user
+- the revocation list lives in Redis (SESSION_REDIS_URL) so every worker
+  sees a revoke immediately; without it, revocations are per process, which
+  is refused when APP_ENV (or FLASK_ENV) is 'production'. The shared
+  authenticator is built on first use (get_session_auth(), init_app), so the
+  error surfaces there rather than when this module is imported
+- a refreshed token is only issued for a session that is still valid, so a
+  request racing /logout or revoke-all cannot hand out a new token
+
+    from server import session_tokens
+    session_tokens.init_app(app)                  # sets g.session_user per request
+    auth = session_tokens.get_session_auth()
+    token = auth.issue(user.id, device_id)             # at login
+    auth.logout(g.session_user['_claims'])             # at /logout
+    auth.revoke_all(user.id)                           # at /devices/revoke-all
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+SESSION_TOKEN_TTL_SECONDS = int(os.getenv('SESSION_TOKEN_TTL_SECONDS', '3600'))
+USER_CACHE_TTL_SECONDS = int(os.getenv('SESSION_USER_CACHE_TTL_SECONDS', '300'))
+USER_CACHE_MAX_ENTRIES = int(os.getenv('SESSION_USER_CACHE_MAX_ENTRIES', '10000'))
+REFRESH_HEADER = 'X-Session-Token'
+
+logger = logging.getLogger(__name__)
+
+
+def _is_production() -> bool:
+    return (os.getenv('APP_ENV') or os.getenv('FLASK_ENV') or '').lower() == 'production'
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+# ==================== REVOCATION STORES ====================
+
+class InMemoryRevocations:
+    """Single-process revocation list (tests, local development)"""
+
+    def __init__(self):
+        self._sessions: Dict[str, float] = {}
+        self._not_before: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def revoke_session(self, session_id: str, expires_at: float) -> None:
+        with self._lock:
+            now = time.time()
+            # Expired entries can go; their tokens are rejected by expiry already
+            for sid in [s for s, exp in self._sessions.items() if exp < now]:
+                del self._sessions[sid]
+            self._sessions[session_id] = expires_at
+
+    def revoke_user(self, user_id: int, not_before: float) -> None:
+        with self._lock:
+            self._not_before[user_id] = max(not_before, self._not_before.get(user_id, 0.0))
+
+    def status(self, session_id: str, user_id: int) -> Tuple[bool, float]:
+        """(session revoked, user's not-before time)"""
+        return session_id in self._sessions, self._not_before.get(user_id, 0.0)
+
+
+class RedisRevocations:
+    """Shared revocation list; one MGET per request. Needs the `redis` package unless a client is given"""
+
+    def __init__(self, url: Optional[str] = None, token_ttl: int = SESSION_TOKEN_TTL_SECONDS, client=None):
+        if client is None:
+            import redis
+
+            client = redis.from_url(url)
+        self._redis = client
+        self.token_ttl = token_ttl
+
+    def revoke_session(self, session_id: str, expires_at: float) -> None:
+        ttl = max(1, int(expires_at - time.time()) + 1)
+        self._redis.set(f'session:revoked:{session_id}', 1, ex=ttl)
+
+    def revoke_user(self, user_id: int, not_before: float) -> None:
+        # Keep the key as long as any earlier token could still be valid
+        self._redis.set(f'session:not_before:{user_id}', repr(not_before), ex=self.token_ttl + 60)
+
+    def status(self, session_id: str, user_id: int) -> Tuple[bool, float]:
+        revoked, not_before = self._redis.mget(f'session:revoked:{session_id}', f'session:not_before:{user_id}')
+        return revoked is not None, float(not_before) if not_before else 0.0
+
+
+# ==================== AUTHENTICATOR ====================
+
+class SessionAuthenticator:
+
+    def __init__(self, secret: Optional[str] = None, load_user: Optional[Callable[[int], Optional[Dict]]] = None,
+                 revocations=None, token_ttl: int = SESSION_TOKEN_TTL_SECONDS,
+                 user_cache_ttl: int = USER_CACHE_TTL_SECONDS, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self._secret = (secret or os.getenv('SESSION_TOKEN_SECRET') or os.getenv('SECRET_KEY') or '').encode()
+        self.load_user = load_user or load_user_from_db
+        if revocations is None:
+            redis_url = os.getenv('SESSION_REDIS_URL')
+            if redis_url:
+                revocations = RedisRevocations(redis_url, token_ttl)
+            elif _is_production():
+                raise RuntimeError('SESSION_REDIS_URL must be set in production: without it a logout or '
+                                   'revoke-all only takes effect in the worker that handled it')
+            else:
+                logger.warning('SESSION_REDIS_URL is not set; session revocations are per process')
+                revocations = InMemoryRevocations()
+        self.revocations = revocations
+        self.token_ttl = token_ttl
+        self.user_cache_ttl = user_cache_ttl
+        self.max_entries = max_entries
+        self._users: 'OrderedDict[int, Tuple[Dict[str, Any], float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def _sign(self, payload: bytes) -> bytes:
+        if not self._secret:
+            raise RuntimeError('SESSION_TOKEN_SECRET or SECRET_KEY must be set')
+        return hmac.new(self._secret, payload, hashlib.sha256).digest()
+
+    def issue(self, user_id: int, device_id: Optional[str] = None, session_id: Optional[str] = None) -> str:
+        """Token for a new login; pass the old session id when refreshing"""
+        now = time.time()
+        claims = {
+            'uid': int(user_id),
+            'sid': session_id or secrets.token_urlsafe(16),
+            'dev': device_id,
+            'iat': now,
+            'exp': now + self.token_ttl,
+        }
+        payload = json.dumps(claims, separators=(',', ':')).encode()
+        return f'{_b64encode(payload)}.{_b64encode(self._sign(payload))}'
+
+    def verify(self, token: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Claims of a valid, unexpired, unrevoked token, else None"""
+        if not token:
+            return None
+        if token.startswith('Bearer '):
+            token = token[len('Bearer '):]
+        try:
+            payload_part, signature_part = token.split('.', 1)
+            payload = _b64decode(payload_part)
+            if not hmac.compare_digest(self._sign(payload), _b64decode(signature_part)):
+                return None
+            claims = json.loads(payload)
+        except (ValueError, TypeError):
+            return None
+        except RuntimeError as e:
+            # No signing secret configured: no token can be valid
+            logger.error('Session token rejected: %s', e)
+            return None
+
+        if claims.get('exp', 0) < time.time() or not self._still_valid(claims):
+            return None
+        return claims
+
+    def _still_valid(self, claims: Dict[str, Any]) -> bool:
+        """Neither the session nor every session of the user was revoked after `claims` were issued"""
+        session_revoked, not_before = self.revocations.status(claims['sid'], claims['uid'])
+        return not session_revoked and claims['iat'] > not_before
+
+    def _cached_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and time.monotonic() - entry[1] < self.user_cache_ttl:
+                self._users.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        user = self.load_user(user_id)
+        if user is None:
+            return None
+        with self._lock:
+            self._users[user_id] = (user, time.monotonic())
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_entries:
+                self._users.popitem(last=False)
+        return user
+
+    def authenticate(self, token: Optional[str]) -> Optional[Dict[str, Any]]:
+        """The user for a request's token, without a database round trip when cached"""
+        claims = self.verify(token)
+        if claims is None:
+            self.rejected += 1
+            return None
+        user = self._cached_user(claims['uid'])
+        if user is None or user.get('is_active') is False:
+            self.rejected += 1
+            return None
+        return {**user, 'session_id': claims['sid'], 'device_id': claims.get('dev'), '_claims': claims}
+
+    def refreshed_token(self, claims: Dict[str, Any]) -> Optional[str]:
+        """A replacement token once the current one is past half its lifetime"""
+        if time.time() - claims['iat'] < self.token_ttl / 2:
+            return None
+        # Checked again: the request itself may have been /logout or /devices/revoke-all
+        if not self._still_valid(claims):
+            return None
+        return self.issue(claims['uid'], claims.get('dev'), claims['sid'])
+
+    def logout(self, claims: Dict[str, Any]) -> None:
+        """Revoke this session only; the user's other devices stay signed in"""
+        self.revocations.revoke_session(claims['sid'], time.time() + self.token_ttl)
+
+    def revoke_all(self, user_id: int) -> None:
+        """Reject every token issued so far for the user (/devices/revoke-all)"""
+        self.revocations.revoke_user(user_id, time.time())
+        self.invalidate_user(user_id)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def register_invalidation_listeners(self, user_model) -> None:
+        """Drop the cached user whenever its row changes (deactivation, profile edits)"""
+        from sqlalchemy import event
+
+        def invalidate(mapper, connection, target) -> None:
+            self.invalidate_user(target.id)
+
+        event.listen(user_model, 'after_update', invalidate)
+        event.listen(user_model, 'after_delete', invalidate)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'cached_users': len(self._users),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'rejected': self.rejected,
+        }
+
+
+def init_app(app, authenticator: Optional[SessionAuthenticator] = None, url_prefix: str = '/api/v1/mobile') -> None:
+    """
+    Resolve the token once per mobile request into `g.session_user` (None when
+    missing or revoked) and attach a refreshed token to the response when due.
+    """
+    from flask import g, request
+
+    authenticator = authenticator or get_session_auth()
+
+    @app.before_request
+    def resolve_session_user():
+        g.session_user = None
+        if request.path.startswith(url_prefix):
+            g.session_user = authenticator.authenticate(request.headers.get('Authorization'))
+
+    @app.after_request
+    def refresh_session_token(response):
+        user = getattr(g, 'session_user', None)
+        if user is not None:
+            token = authenticator.refreshed_token(user['_claims'])
+            if token:
+                response.headers[REFRESH_HEADER] = token
+        return response
+
+
+def load_user_from_db(user_id: int) -> Optional[Dict[str, Any]]:
+    from shared import db, User
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'is_active': getattr(user, 'is_active', True),
+    }
+
+
+_session_auth: Optional[SessionAuthenticator] = None
+_session_auth_lock = threading.Lock()
+
+
+def get_session_auth() -> SessionAuthenticator:
+    """The process-wide authenticator, built on first use"""
+    global _session_auth
+    if _session_auth is None:
+        with _session_auth_lock:
+            if _session_auth is None:
+                _session_auth = SessionAuthenticator()
+    return _session_auth
+
+
+def session_auth_stats() -> Dict[str, Any]:
+    """Stats of the process-wide authenticator, without building it"""
+    return _session_auth.stats() if _session_auth is not None else {}
@@ -0,0 +1,75 @@
+"""
+Paginated message loading and unread counts for user-to-user chats
+
+`/chats/<id>/messages?before_id=&limit=` pages backwards through
+user_chat_messages on (chat_id, id), so opening a chat costs one index range
+scan of `limit` rows regardless of how many messages it holds. Unread counts
+for the chat list come from one grouped query over user_chat_notifications
+instead of a count per chat. Both are served by the indexes created in
+db_scripts/create_user_chat_indexes.py.
+"""
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from .chat_history import load_message_window
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def parse_page_args(args: Dict[str, Any]) -> Dict[str, Optional[int]]:
+    """Read `before_id` / `limit` from request.args, clamping the page size"""
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        limit = DEFAULT_PAGE_SIZE
+    try:
+        before_id = int(args['before_id']) if args.get('before_id') else None
+    except (TypeError, ValueError):
+        before_id = None
+    return {'limit': max(1, min(limit, MAX_PAGE_SIZE)), 'before_id': before_id}
+
+
+def paginate_chat_messages(chat_id: int, before_id: Optional[int] = None,
+                           limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    One page of messages, oldest first.
+
+    One extra row is fetched to tell whether older messages remain; the id of
+    the first returned message is the cursor for the next "load older" call.
+    """
+    rows = load_message_window(chat_id, limit + 1, before_id)
+    has_more = len(rows) > limit
+    if has_more:
+        rows = rows[1:]
+    return {
+        'messages': rows,
+        'has_more': has_more,
+        'next_before_id': rows[0].id if has_more and rows else None,
+    }
+
+
+def unread_query(user_id: int, chat_ids: Optional[Iterable[int]] = None) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """(sql, params) for the grouped unread count; None when `chat_ids` is empty"""
+    sql = ('SELECT chat_id, COUNT(*) AS unread FROM user_chat_notifications '
+           'WHERE user_id = :user_id AND is_read = FALSE')
+    params: Dict[str, Any] = {'user_id': user_id}
+    if chat_ids is not None:
+        chat_ids = list(chat_ids)
+        if not chat_ids:
+            return None
+        sql += ' AND chat_id = ANY(:chat_ids)'
+        params['chat_ids'] = chat_ids
+    return sql + ' GROUP BY chat_id', params
+
+
+def unread_counts(user_id: int, chat_ids: Optional[Iterable[int]] = None) -> Dict[int, int]:
+    """Unread notifications per chat for `user_id`, in a single grouped query"""
+    from shared import db
+    from sqlalchemy import text
+
+    query = unread_query(user_id, chat_ids)
+    if query is None:
+        return {}
+    sql, params = query
+    return {row.chat_id: row.unread for row in db.session.execute(text(sql), params)}
@@ -19,6 +19,24 @@ interface ApiResponse<T = any> {
   }>;
   files?: any[];
   forms?: any[];
+  messages?: any[];
+  has_more?: boolean;
+}
+
+// Retrieval scope for /chat/send, resolved server-side to a set of file ids
+export interface ChatScopeFilters {
+  bookmark_id?: number;
+  workspace_id?: number;
+  document_ids?: number[];
+  user_id?: number;
+  context_type?: 'bookmark' | 'workspace' | 'document' | 'user';
+}
+
+// Search-as-you-type match from the in-memory filename index
+export interface FileSuggestion {
+  id: number;
+  name: string;
+  kind?: string | null;
 }
 
 interface AuthResponse {
@@ -53,6 +71,7 @@ const MOBILE_ENDPOINTS = {
   
   // Files
   FILES: '/api/v1/mobile/files',
+  FILES_SUGGEST: '/api/v1/mobile/files/suggest',
   UPLOAD: '/api/v1/mobile/upload',
   FILE_BY_ID: (id: number) => `/api/v1/mobile/file/${id}`,
   FILE_DOWNLOAD: (id: number) => `/api/v1/mobile/file/${id}/download`,
@@ -155,7 +174,18 @@ class ApiService {
     );
 
     this.client.interceptors.response.use(
-      (response) => response,
+      async (response) => {
+        // The server re-issues the session token once it is past half its lifetime
+        const refreshedToken = response.headers?.['x-session-token'];
+        if (refreshedToken) {
+          try {
+            await secureStorage.setItem(STORAGE_KEYS.AUTH_TOKEN, refreshedToken);
+          } catch (error) {
+            console.warn('Failed to store refreshed auth token:', error);
+          }
+        }
+        return response;
+      },
       async (error) => {
         if (error.response?.status === 401) {
           await this.clearAuthData();
@@ -398,6 +428,19 @@ class ApiService {
     }
   }
 
+  async suggestFiles(query: string, limit = 8, signal?: AbortSignal): Promise<FileSuggestion[]> {
+    try {
+      const response = await this.client.get(MOBILE_ENDPOINTS.FILES_SUGGEST, {
+        params: { q: query, limit },
+        signal,
+      });
+      return response.data?.suggestions || [];
+    } catch (error: any) {
+      if (axios.isCancel(error)) return [];
+      throw new Error(error.response?.data?.message || 'Failed to fetch suggestions');
+    }
+  }
+
   async uploadFile(file: FormData, onProgress?: (progress: number) => void): Promise<ApiResponse> {
     try {
       console.log('🔄 Attempting file upload...');
@@ -457,7 +500,7 @@ class ApiService {
 
   // ==================== MOBILE CHAT ====================
 
-  async sendChatMessage(message: string, filters?: any, signal?: AbortSignal): Promise<ApiResponse> {
+  async sendChatMessage(message: string, filters?: ChatScopeFilters, signal?: AbortSignal): Promise<ApiResponse> {
     try {
       const payload: any = { message };
       if (filters) {
@@ -651,9 +694,14 @@ class ApiService {
     }
   }
 
-  async getChatMessages(chatId: number): Promise<ApiResponse> {
+  async getChatMessages(chatId: number, options: { beforeId?: number; limit?: number } = {}): Promise<ApiResponse> {
     try {
-      const response = await this.client.get(MOBILE_ENDPOINTS.CHAT_MESSAGES(chatId));
+      // Cursor pagination: newest page by default, then pages older than `beforeId`
+      const params: Record<string, number> = {};
+      if (options.beforeId) params.before_id = options.beforeId;
+      if (options.limit) params.limit = options.limit;
+
+      const response = await this.client.get(MOBILE_ENDPOINTS.CHAT_MESSAGES(chatId), { params });
       return response.data;
     } catch (error: any) {
       console.error('Get chat messages error:', error);
@@ -0,0 +1,112 @@
+import { API_BASE_URL, STORAGE_KEYS } from '../constants/Config';
+import { secureStorage } from '../utils/storage';
+
+// Live delivery for user chats over the backend's real-time WebSocket channel.
+// On reconnect the last seen message id is sent as `since_id` so the server
+// backfills anything missed while the socket was down. If more was missed than
+// the server replays, a `truncated` event follows and onTruncated should reload
+// the chat.
+
+const RECONNECT_BASE_DELAY = 1000;
+const RECONNECT_MAX_DELAY = 30000;
+
+export interface RealtimeChatMessage {
+  id: number;
+  chat_id?: number;
+  content: string;
+  sender: { id: number; username: string; email?: string } | null;
+  is_own_message?: boolean;
+  created_at: string;
+}
+
+type MessageHandler = (message: RealtimeChatMessage) => void;
+type TruncatedHandler = (throughId: number) => void;
+
+const toWebSocketUrl = (path: string) => API_BASE_URL.replace(/^http/, 'ws') + path;
+
+export class ChatSubscription {
+  private socket: WebSocket | null = null;
+  private reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+  private attempts = 0;
+  private closed = false;
+
+  constructor(
+    private chatId: number,
+    private lastMessageId: number,
+    private onMessage: MessageHandler,
+    private onTruncated?: TruncatedHandler
+  ) {
+    this.connect();
+  }
+
+  private async connect() {
+    if (this.closed) return;
+
+    const token = await secureStorage.getItem(STORAGE_KEYS.AUTH_TOKEN);
+    const url = toWebSocketUrl(`/api/v1/mobile/chats/${this.chatId}/ws?since_id=${this.lastMessageId}`);
+
+    // React Native accepts headers as a third argument; browsers send cookies instead
+    const SocketWithHeaders = WebSocket as any;
+    const socket: WebSocket = new SocketWithHeaders(url, undefined, token ? {
+      headers: { Authorization: `Bearer ${token}`, 'X-Platform': 'android' },
+    } : undefined);
+    this.socket = socket;
+
+    socket.onopen = () => {
+      this.attempts = 0;
+    };
+
+    socket.onmessage = (event) => {
+      try {
+        const payload = JSON.parse(event.data);
+        if (payload.type === 'truncated') {
+          this.onTruncated?.(payload.through_id);
+          return;
+        }
+        if (payload.type !== 'message' || !payload.message) return;
+
+        const message: RealtimeChatMessage = payload.message;
+        if (message.id > this.lastMessageId) {
+          this.lastMessageId = message.id;
+        }
+        this.onMessage(message);
+      } catch (error) {
+        console.warn('Invalid realtime payload:', error);
+      }
+    };
+
+    socket.onclose = (event) => {
+      this.socket = null;
+      // 4401: not allowed in this chat, retrying will not help
+      if (this.closed || event.code === 4401) return;
+      this.scheduleReconnect();
+    };
+
+    socket.onerror = () => {
+      socket.close();
+    };
+  }
+
+  private scheduleReconnect() {
+    const delay = Math.min(RECONNECT_BASE_DELAY * 2 ** this.attempts, RECONNECT_MAX_DELAY);
+    this.attempts += 1;
+    this.reconnectTimer = setTimeout(() => this.connect(), delay);
+  }
+
+  close() {
+    this.closed = true;
+    if (this.reconnectTimer) {
+      clearTimeout(this.reconnectTimer);
+      this.reconnectTimer = null;
+    }
+    this.socket?.close();
+    this.socket = null;
+  }
+}
+
+export const subscribeToChat = (
+  chatId: number,
+  lastMessageId: number,
+  onMessage: MessageHandler,
+  onTruncated?: TruncatedHandler
+) => new ChatSubscription(chatId, lastMessageId, onMessage, onTruncated);
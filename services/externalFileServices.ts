@@ -11,11 +11,14 @@ export interface ExternalFile {
   size?: number;
   modified?: string;
   downloadUrl?: string;
+  // Google Drive only; Docs/Sheets/Slides are exported to a format chosen by type
+  mime_type?: string;
 }
 
 export interface ExternalFileResult {
   success: boolean;
   files?: ExternalFile[];
+  nextCursor?: string | null;
   error?: string;
 }
 
@@ -24,6 +27,26 @@ export interface AuthResult {
   error?: string;
 }
 
+export interface ImportFileProgress {
+  file_id: string;
+  name: string;
+  status: 'queued' | 'downloading' | 'retrying' | 'done' | 'failed';
+  progress: number;
+  attempts: number;
+  error?: string | null;
+}
+
+export interface ImportJobStatus {
+  job_id: string;
+  status: 'running' | 'completed' | 'failed';
+  completed: number;
+  failed: number;
+  total: number;
+  files: ImportFileProgress[];
+}
+
+const IMPORT_POLL_INTERVAL = 1000;
+
 class ExternalFileService {
   private authTokens: Map<string, string> = new Map();
 
@@ -143,7 +166,9 @@ class ExternalFileService {
     }
   }
 
-  async getDropboxFiles(path?: string): Promise<ExternalFileResult> {
+  // Listings are cached server-side; `cursor` pages through a folder and
+  // `refresh` asks the server to check the provider for changes right away
+  async getDropboxFiles(path?: string, cursor?: string | null, refresh = false): Promise<ExternalFileResult> {
     try {
       const token = this.authTokens.get('dropbox');
       if (!token) {
@@ -152,7 +177,9 @@ class ExternalFileService {
 
       const response = await apiService.client.post('/api/v1/mobile/external-files/dropbox', {
         access_token: token,
-        path: path || ''
+        path: path || '',
+        cursor,
+        refresh
       });
 
       if (response.data.success && response.data.files) {
@@ -166,7 +193,7 @@ class ExternalFileService {
           modified: file.modified
         }));
 
-        return { success: true, files };
+        return { success: true, files, nextCursor: response.data.next_cursor };
       } else {
         return { success: false, error: response.data.error || 'Failed to load Dropbox files' };
       }
@@ -176,7 +203,7 @@ class ExternalFileService {
     }
   }
 
-  async getGoogleDriveFiles(folderId?: string): Promise<ExternalFileResult> {
+  async getGoogleDriveFiles(folderId?: string, cursor?: string | null, refresh = false): Promise<ExternalFileResult> {
     try {
       const token = this.authTokens.get('googledrive');
       if (!token) {
@@ -185,7 +212,9 @@ class ExternalFileService {
 
       const response = await apiService.client.post('/api/v1/mobile/external-files/googledrive', {
         access_token: token,
-        folder_id: folderId || 'root'
+        folder_id: folderId || 'root',
+        cursor,
+        refresh
       });
 
       if (response.data.success && response.data.files) {
@@ -195,10 +224,11 @@ class ExternalFileService {
           service: 'googledrive' as const,
           type: file.type,
           size: file.size,
-          modified: file.modified
+          modified: file.modified,
+          mime_type: file.mime_type
         }));
 
-        return { success: true, files };
+        return { success: true, files, nextCursor: response.data.next_cursor };
       } else {
         return { success: false, error: response.data.error || 'Failed to load Google Drive files' };
       }
@@ -260,6 +290,48 @@ class ExternalFileService {
     }
   }
 
+  // Imports run as a background job on the server: files download in parallel
+  // and the job is polled for per-file progress until every file has finished
+  async importFiles(
+    service: 'dropbox' | 'googledrive',
+    files: ExternalFile[],
+    onProgress?: (job: ImportJobStatus) => void
+  ): Promise<{ success: boolean; job?: ImportJobStatus; error?: string }> {
+    try {
+      const token = this.authTokens.get(service);
+      if (!token) {
+        return { success: false, error: `Not authenticated with ${this.getServiceName(service)}` };
+      }
+
+      const response = await apiService.client.post(`/api/v1/mobile/external-import/${service}`, {
+        access_token: token,
+        files: files.map(file => ({ id: file.id, name: file.name, size: file.size, mime_type: file.mime_type })),
+      });
+
+      if (!response.data.success || !response.data.job_id) {
+        return { success: false, error: response.data.error || 'Failed to start import' };
+      }
+
+      const jobId = response.data.job_id;
+      while (true) {
+        await new Promise(resolve => setTimeout(resolve, IMPORT_POLL_INTERVAL));
+        const statusResponse = await apiService.client.get(`/api/v1/mobile/external-import/jobs/${jobId}`);
+        const job: ImportJobStatus = statusResponse.data.job;
+        if (!statusResponse.data.success || !job) {
+          return { success: false, error: statusResponse.data.error || 'Import status unavailable' };
+        }
+
+        onProgress?.(job);
+        if (job.status !== 'running') {
+          return { success: job.completed > 0, job, error: job.failed ? `${job.failed} file(s) failed to import` : undefined };
+        }
+      }
+    } catch (error: any) {
+      console.error('External import error:', error);
+      return { success: false, error: error.message || 'Import failed' };
+    }
+  }
+
   formatFileSize(bytes: number): string {
     if (bytes === 0) return '0 B';
     const k = 1024;
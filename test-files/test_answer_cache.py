@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test for the semantic answer cache
+Checks similarity matching, scope separation, that a change seen only
+through the database version stamps (another worker, a bulk delete) makes
+cached answers miss, and the shorter TTL for unscoped answers.
+
+    python test-files/test_answer_cache.py
+"""
+
+import math
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.answer_cache import LIBRARY_VERSION_KEY, AnswerCache
+
+QUESTION = [1.0, 0.0, 0.0]
+NEAR = [0.99, math.sqrt(1 - 0.99 ** 2), 0.0]
+OTHER = [0.0, 1.0, 0.0]
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def main():
+    print("🧪 Answer cache matching and invalidation")
+    print("=" * 60)
+    ok = True
+
+    cache = AnswerCache(similarity_threshold=0.95)
+    scoped_versions = {1: 'v1', 2: 'v1'}
+    cache.store(10, QUESTION, {1, 2}, scoped_versions, 'Scoped answer', [], 1200.0)
+
+    hit = cache.lookup(10, NEAR, {1, 2}, scoped_versions)
+    ok &= check("a near-identical question hits", hit is not None and hit.response == 'Scoped answer')
+    ok &= check("a different question misses", cache.lookup(10, OTHER, {1, 2}, scoped_versions) is None)
+    ok &= check("another scope misses", cache.lookup(10, QUESTION, {1}, {1: 'v1'}) is None)
+    ok &= check("another user misses", cache.lookup(11, QUESTION, {1, 2}, scoped_versions) is None)
+
+    # Worker B re-uploads file 2; worker A's listeners never fire, the DB stamp changes
+    ok &= check("a re-upload seen only in the version stamps misses",
+                cache.lookup(10, QUESTION, {1, 2}, {1: 'v1', 2: 'v2'}) is None
+                and cache.stats()['entries'] == 0)
+
+    library = {LIBRARY_VERSION_KEY: '40:77:2026-10-01'}
+    cache.store(10, QUESTION, None, library, 'Unscoped answer', [], 900.0)
+    ok &= check("an unscoped answer hits while the library is unchanged",
+                cache.lookup(10, QUESTION, None, library) is not None)
+    # A bulk query.delete() fires no mapper events, but the library stamp moves
+    ok &= check("a bulk delete changes the library stamp and misses",
+                cache.lookup(10, QUESTION, None, {LIBRARY_VERSION_KEY: '35:77:2026-10-01'}) is None)
+
+    cache.store(10, QUESTION, {3}, {3: 'v1'}, 'File 3 answer', [], 500.0)
+    cache.store(10, OTHER, None, library, 'Another unscoped', [], 500.0)
+    dropped = cache.invalidate_file(3, user_id=10)
+    ok &= check("a local file change drops scoped and the owner's unscoped entries",
+                dropped == 2 and cache.stats()['entries'] == 0)
+
+    short = AnswerCache(ttl_seconds=3600, unscoped_ttl_seconds=0)
+    short.store(10, QUESTION, None, library, 'Unscoped', [], 100.0)
+    short.store(10, QUESTION, {1}, {1: 'v1'}, 'Scoped', [], 100.0)
+    time.sleep(0.01)
+    ok &= check("unscoped answers expire on their shorter TTL",
+                short.lookup(10, QUESTION, None, library) is None
+                and short.lookup(10, QUESTION, {1}, {1: 'v1'}) is not None)
+
+    print(f"📊 {cache.stats()}")
+    return ok
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Answer cache test passed!" if success else "❌ Answer cache test failed!")
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test for the async mobile serving mode's request handling
+Drives the ASGI app directly (no server) with a stand-in for the Flask app:
+the session authenticator's user loader only works inside the app context,
+as load_user_from_db does under Flask-SQLAlchemy. Checks that authentication
+gets that context on its worker thread, that a failing lookup answers 500
+instead of escaping, and that other routes pass through to the WSGI app.
+Needs a2wsgi.
+
+    python test-files/test_async_mobile.py
+"""
+
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+from contextlib import contextmanager
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.async_mobile import create_mobile_asgi_app, default_routes, send_json
+from server.session_tokens import InMemoryRevocations, SessionAuthenticator
+
+_context = threading.local()
+
+
+class FlaskLikeApp:
+    """WSGI app with Flask's app_context(); counts the requests it served"""
+
+    def __init__(self):
+        self.requests = 0
+
+    @contextmanager
+    def app_context(self):
+        _context.active = True
+        try:
+            yield
+        finally:
+            _context.active = False
+
+    def __call__(self, environ, start_response):
+        self.requests += 1
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return [json.dumps({'success': True, 'documents': []}).encode()]
+
+
+def load_user(user_id):
+    if not getattr(_context, 'active', False):
+        raise RuntimeError('Working outside of application context.')
+    if user_id == 13:
+        raise ConnectionError('database unavailable')
+    return {'id': user_id, 'username': f'user{user_id}', 'is_active': True}
+
+
+async def whoami(request, user, resources, send):
+    await send_json(send, 200, {'success': True, 'user_id': user['id']})
+
+
+class RecordingEngine:
+    """Stands in for import_engine; records which provider each job was started for"""
+
+    def __init__(self):
+        self.started = []
+
+    def start(self, user_id, provider, access_token, files, dest_dir, on_file_done=None):
+        self.started.append(provider)
+        return f'job{len(self.started)}'
+
+
+async def resolve_import(user, service, resources):
+    return {'provider': service, 'access_token': 'token', 'dest_dir': '/tmp'}
+
+
+async def call(app, path, token=None, method='GET', payload=None):
+    headers = [(b'authorization', f'Bearer {token}'.encode())] if token else []
+    body = json.dumps(payload).encode() if payload is not None else b''
+    if payload is not None:
+        headers.append((b'content-type', b'application/json'))
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'headers': headers,
+             'http_version': '1.1', 'scheme': 'http', 'server': ('test', 80), 'client': ('127.0.0.1', 1),
+             'root_path': ''}
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    status = next(m['status'] for m in sent if m['type'] == 'http.response.start')
+    body = b''.join(m.get('body', b'') for m in sent if m['type'] == 'http.response.body')
+    return status, json.loads(body or b'{}')
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+async def run():
+    flask_app = FlaskLikeApp()
+    auth = SessionAuthenticator(secret='test', load_user=load_user, revocations=InMemoryRevocations())
+    routes = [('GET', re.compile(r'^/api/v1/mobile/whoami$'), whoami)]
+    app = create_mobile_asgi_app(flask_app, routes, authenticator=auth)
+
+    status, body = await call(app, '/api/v1/mobile/whoami', auth.issue(7))
+    ok = check("user loaded inside the app context on the worker thread", status == 200 and body['user_id'] == 7)
+    status, body = await call(app, '/api/v1/mobile/whoami')
+    ok &= check("missing token answers 401", status == 401)
+    status, body = await call(app, '/api/v1/mobile/whoami', auth.issue(13))
+    ok &= check("failing user lookup answers 500 JSON", status == 500 and body['success'] is False)
+    status, body = await call(app, '/api/v1/mobile/documents', auth.issue(7))
+    ok &= check("other routes reach the WSGI app", status == 200 and flask_app.requests == 1)
+
+    engine = RecordingEngine()
+    import_app = create_mobile_asgi_app(FlaskLikeApp(), default_routes(resolve_import=resolve_import, engine=engine),
+                                        authenticator=auth)
+    files = {'files': [{'id': 'f1', 'name': 'a.pdf'}]}
+    for service in ('dropbox', 'googledrive'):
+        status, body = await call(import_app, f'/api/v1/mobile/external-import/{service}', auth.issue(7), 'POST', files)
+        ok &= check(f"{service} imports are served natively", status == 202 and engine.started[-1] == service)
+    return ok
+
+
+def main():
+    print("=" * 60)
+    print("🧪 Async mobile app test")
+    print("=" * 60)
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Async mobile app test passed!" if success else "❌ Async mobile app test failed!")
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Throughput comparison: WSGI workers vs the async serving mode
+Drives the same endpoint mix (chat/send, file downloads, external-import
+starts, and document lists) at two uvicorn servers for the same duration:
+
+  WSGI   every route runs on a pool of WSGI_THREADS blocking workers, as with
+         the current sync gunicorn setup
+  ASGI   server/async_mobile.py serves chat/send, downloads and imports as
+         coroutines; documents fall through to the same WSGI pool
+
+Neon round trips and LLM generations are simulated with fixed delays
+(time.sleep on the WSGI side, asyncio.sleep on the async side). Needs uvicorn
+and a2wsgi.
+
+    python test-files/test_async_serving_load.py [clients] [seconds]
+"""
+
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import server.async_mobile as async_mobile
+from server.async_mobile import create_mobile_asgi_app, default_routes
+from server.external_import import FakeProvider, ImportEngine
+from server.session_tokens import InMemoryRevocations, SessionAuthenticator
+
+HOST = "127.0.0.1"
+PORT = 8766
+CLIENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+SECONDS = float(sys.argv[2]) if len(sys.argv) > 2 else 8
+WSGI_THREADS = 8
+DB_ROUND_TRIP = 0.03
+LLM_SECONDS = 1.5
+FILE_BYTES = 512 * 1024
+MIX = [('chat', 0.2), ('download', 0.1), ('import', 0.05), ('documents', 0.65)]
+
+upload_dir = tempfile.mkdtemp(prefix='async-serving-')
+import_dir = os.path.join(upload_dir, 'imported')
+engine = ImportEngine(max_workers=2)
+provider = FakeProvider({'doc-1': 4096})
+auth = SessionAuthenticator(secret='bench', revocations=InMemoryRevocations(),
+                            load_user=lambda user_id: {'id': user_id, 'username': 'bench', 'is_active': True})
+TOKEN = auth.issue(1)
+
+
+# ==================== WSGI (current setup) ====================
+
+def wsgi_app(environ, start_response):
+    path, method = environ['PATH_INFO'], environ['REQUEST_METHOD']
+    status, payload, body = '200 OK', None, None
+    if path == '/api/v1/mobile/chat/send' and method == 'POST':
+        time.sleep(DB_ROUND_TRIP + LLM_SECONDS)
+        payload = {'success': True, 'response': 'answer'}
+    elif path.endswith('/download'):
+        time.sleep(DB_ROUND_TRIP)
+        with open(os.path.join(upload_dir, '1', 'report.pdf'), 'rb') as handle:
+            body = handle.read()
+    elif path.startswith('/api/v1/mobile/external-import/'):
+        time.sleep(DB_ROUND_TRIP)
+        job_id = engine.start(1, provider, 'token', [{'id': 'doc-1', 'name': 'doc.pdf'}], import_dir)
+        status, payload = '202 Accepted', {'success': True, 'job_id': job_id}
+    elif path == '/api/v1/mobile/documents':
+        time.sleep(DB_ROUND_TRIP)
+        payload = {'success': True, 'documents': [{'id': i} for i in range(20)]}
+    else:
+        status, payload = '404 Not Found', {'success': False}
+    body = body if body is not None else json.dumps(payload).encode()
+    start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+    return [body]
+
+
+# ==================== ASGI mode ====================
+
+class SimulatedResources:
+    """Stands in for AsyncResources: an async DB round trip per query"""
+
+    async def startup(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def fetch_file(self, file_id):
+        await asyncio.sleep(DB_ROUND_TRIP)
+        return {'id': file_id, 'filename': 'report.pdf', 'original_filename': 'report.pdf',
+                'file_type': 'pdf', 'user_id': 1}
+
+
+async def answer(user, message, filters, resources):
+    await asyncio.sleep(DB_ROUND_TRIP + LLM_SECONDS)
+    return {'response': 'answer'}
+
+
+async def resolve_import(user, service, resources):
+    await asyncio.sleep(DB_ROUND_TRIP)
+    return {'provider': provider, 'access_token': 'token', 'dest_dir': import_dir}
+
+
+def build_asgi_app():
+    async_mobile.UPLOAD_FOLDER = upload_dir
+    routes = default_routes(answer=answer, resolve_import=resolve_import, engine=engine)
+    return create_mobile_asgi_app(wsgi_app, routes, resources=SimulatedResources(), authenticator=auth,
+                                  fallback_threads=WSGI_THREADS)
+
+
+# ==================== LOAD ====================
+
+REQUESTS = {
+    'chat': ('POST', '/api/v1/mobile/chat/send', {'message': 'Summarize my lease'}),
+    'download': ('GET', '/api/v1/mobile/file/1/download', None),
+    'import': ('POST', '/api/v1/mobile/external-import/dropbox', {'files': [{'id': 'doc-1', 'name': 'doc.pdf'}]}),
+    'documents': ('GET', '/api/v1/mobile/documents', None),
+}
+
+
+async def request(kind):
+    method, path, payload = REQUESTS[kind]
+    body = json.dumps(payload).encode() if payload is not None else b''
+    reader, writer = await asyncio.open_connection(HOST, PORT)
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {HOST}\r\nAuthorization: Bearer {TOKEN}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    status = int(response.split(b' ', 2)[1])
+    if status >= 400:
+        raise RuntimeError(f"{kind}: HTTP {status}")
+
+
+async def drive(app, label):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host=HOST, port=PORT, log_level="warning", backlog=2048))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    latencies = {kind: [] for kind, _ in MIX}
+    errors = 0
+    deadline = time.perf_counter() + SECONDS
+    rng = random.Random(5)
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            kind = rng.choices([k for k, _ in MIX], [w for _, w in MIX])[0]
+            start = time.perf_counter()
+            try:
+                await request(kind)
+                latencies[kind].append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(CLIENTS)))
+    elapsed = time.perf_counter() - start
+    server.should_exit = True
+    await server_task
+
+    completed = sum(len(v) for v in latencies.values())
+    print(f"📊 {label}: {completed / elapsed:6.1f} req/s ({completed} done, {errors} errors)")
+    for kind, samples in latencies.items():
+        samples.sort()
+        if samples:
+            print(f"   {kind:10} n={len(samples):5}  p50 {samples[len(samples) // 2] * 1000:7.0f} ms  "
+                  f"p95 {samples[int(len(samples) * 0.95)] * 1000:7.0f} ms")
+    return completed / elapsed, latencies, errors
+
+
+async def main():
+    try:
+        import uvicorn  # noqa: F401
+        from a2wsgi import WSGIMiddleware
+    except ImportError:
+        print("❌ uvicorn and a2wsgi are required: pip install uvicorn a2wsgi")
+        return False
+
+    os.makedirs(os.path.join(upload_dir, '1'), exist_ok=True)
+    with open(os.path.join(upload_dir, '1', 'report.pdf'), 'wb') as handle:
+        handle.write(os.urandom(FILE_BYTES))
+
+    print(f"🧪 {CLIENTS} clients for {SECONDS:.0f}s per mode, {WSGI_THREADS} WSGI threads, "
+          f"LLM {LLM_SECONDS}s, DB {DB_ROUND_TRIP * 1000:.0f} ms")
+    print("=" * 60)
+    try:
+        wsgi_rps, wsgi_latencies, wsgi_errors = await drive(WSGIMiddleware(wsgi_app, workers=WSGI_THREADS), "WSGI")
+        asgi_rps, asgi_latencies, asgi_errors = await drive(build_asgi_app(), "ASGI")
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+    def p95(samples):
+        return samples[int(len(samples) * 0.95)] if samples else float('inf')
+
+    print(f"\n📊 {asgi_rps / wsgi_rps:.1f}x throughput; documents p95 "
+          f"{p95(wsgi_latencies['documents']) * 1000:.0f} ms -> {p95(asgi_latencies['documents']) * 1000:.0f} ms")
+    return (asgi_errors == 0 and asgi_rps > wsgi_rps
+            and p95(asgi_latencies['documents']) < p95(wsgi_latencies['documents']))
+
+
+if __name__ == "__main__":
+    success = asyncio.run(main())
+    print("\n" + "=" * 60)
+    print("✅ Async serving comparison passed!" if success else "❌ Async serving comparison failed!")
+    if not success:
+        sys.exit(1)
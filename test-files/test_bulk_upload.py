@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test for the streamed bulk upload parser behind /upload-to/<token>/bulk
+Builds one multipart body with 100 receipts, streams it to disk the way the
+endpoint does, and checks sizes, hashes, limits, per-part file type
+validation, expiry of timezone-aware links and cleanup of partial uploads. Needs werkzeug
+(installed with Flask).
+
+    python test-files/test_bulk_upload.py
+"""
+
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.bulk_upload import BulkUploadError, _as_utc, stream_multipart_files
+
+BOUNDARY = 'grabdocs-bulk-test'
+CONTENT_TYPE = f'multipart/form-data; boundary={BOUNDARY}'
+RECEIPTS = 100
+
+
+JPEG_HEADER = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00'
+
+
+def build_body(files, content_type='image/jpeg'):
+    parts = [f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="note"\r\n\r\nmonthly receipts\r\n'.encode()]
+    for name, data, *declared in files:
+        parts.append(
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="files"; filename="{name}"\r\n'
+            f'Content-Type: {declared[0] if declared else content_type}\r\n\r\n'.encode() + data + b'\r\n'
+        )
+    parts.append(f'--{BOUNDARY}--\r\n'.encode())
+    return b''.join(parts)
+
+
+def main():
+    files = [(f'receipt_{i:03d}.jpg', JPEG_HEADER + os.urandom(150_000 + i)) for i in range(RECEIPTS)]
+    body = build_body(files)
+    print(f"🧪 {RECEIPTS} receipts in one {len(body) / (1024 * 1024):.1f} MB request")
+    print("=" * 60)
+    ok = True
+
+    with tempfile.TemporaryDirectory() as dest_dir:
+        start = time.perf_counter()
+        stored, _ = stream_multipart_files(io.BytesIO(body), CONTENT_TYPE, dest_dir)
+        elapsed = time.perf_counter() - start
+        print(f"📊 Parsed and stored {len(stored)} files in {elapsed * 1000:.0f} ms "
+              f"({len(body) / (1024 * 1024) / elapsed:.0f} MB/s)")
+
+        for upload, (name, data) in zip(stored, files):
+            with open(upload.path, 'rb') as f:
+                on_disk = f.read()
+            if upload.original_filename != name or on_disk != data or upload.sha256 != hashlib.sha256(data).hexdigest():
+                print(f"❌ {name} was not stored intact")
+                ok = False
+                break
+        if len(stored) != RECEIPTS:
+            print(f"❌ Expected {RECEIPTS} files, got {len(stored)}")
+            ok = False
+
+    pdf = b'%PDF-1.7\n' + os.urandom(2000)
+    for label, kwargs, payload in [
+        ('too many files', {'max_files': 50}, body),
+        ('file over size limit', {'max_file_bytes': 100_000}, body),
+        ('truncated body', {}, body[:len(body) // 2]),
+    ]:
+        with tempfile.TemporaryDirectory() as dest_dir:
+            try:
+                stream_multipart_files(io.BytesIO(payload), CONTENT_TYPE, dest_dir, **kwargs)
+                print(f"❌ {label}: accepted")
+                ok = False
+            except BulkUploadError as e:
+                leftovers = os.listdir(dest_dir)
+                print(f"{'✅' if not leftovers else '❌'} {label}: rejected ({e.status}), {len(leftovers)} files left behind")
+                ok = ok and not leftovers
+
+    for label, payload in [
+        ('disallowed extension', build_body([('ok.jpg', JPEG_HEADER), ('photo.heic', b'\x00\x00\x00\x18ftypheic'),
+                                             ('run.exe', b'MZ' + pdf)], 'application/octet-stream')),
+        ('content type contradicts extension', build_body([('ok.jpg', JPEG_HEADER), ('invoice.pdf', pdf, 'text/html')])),
+        ('contents do not match extension', build_body([('ok.jpg', JPEG_HEADER), ('fake.jpg', b'<html>' + pdf)])),
+        ('binary in a text file', build_body([('ok.jpg', JPEG_HEADER), ('notes.txt', b'hello\x00world', 'text/plain')])),
+    ]:
+        with tempfile.TemporaryDirectory() as dest_dir:
+            stored, rejected = stream_multipart_files(io.BytesIO(payload), CONTENT_TYPE, dest_dir)
+            kept = [upload.original_filename for upload in stored]
+            leftovers = sorted(os.listdir(dest_dir))
+            passed = (kept == ['ok.jpg'] and len(rejected) >= 1 and 'ok.jpg' not in [r.original_filename for r in rejected]
+                      and leftovers == [os.path.basename(upload.path) for upload in stored])
+            print(f"{'✅' if passed else '❌'} {label}: {[r.original_filename for r in rejected]} reported, "
+                  f"rest of the batch stored")
+            ok = ok and passed
+
+    mixed = build_body([('invoice.pdf', pdf), ('notes.txt', b'plain notes'), ('tiny.csv', b'a')],
+                       'application/octet-stream')
+    with tempfile.TemporaryDirectory() as dest_dir:
+        stored, _ = stream_multipart_files(io.BytesIO(mixed), CONTENT_TYPE, dest_dir)
+        accepted = [upload.original_filename for upload in stored] == ['invoice.pdf', 'notes.txt', 'tiny.csv']
+        print(f"{'✅' if accepted else '❌'} allowed types with a generic content type stored")
+        ok = ok and accepted
+
+    aliased = build_body([('scan.jpg', JPEG_HEADER, 'image/jpg'), ('logo.png', b'\x89PNG\r\n\x1a\n', 'image/x-png')])
+    with tempfile.TemporaryDirectory() as dest_dir:
+        stored, rejected = stream_multipart_files(io.BytesIO(aliased), CONTENT_TYPE, dest_dir)
+        normalized = not rejected and [upload.content_type for upload in stored] == ['image/jpeg', 'image/png']
+        print(f"{'✅' if normalized else '❌'} image/jpg and image/x-png accepted as image/jpeg and image/png")
+        ok = ok and normalized
+
+    now = datetime.now(timezone.utc)
+    expiry_ok = (_as_utc(now.replace(tzinfo=None) - timedelta(hours=1)) < now
+                 and _as_utc((now + timedelta(hours=1)).astimezone(timezone(timedelta(hours=-5)))) > now)
+    print(f"{'✅' if expiry_ok else '❌'} naive and timezone-aware expiry times compare as UTC")
+    ok = ok and expiry_ok
+
+    print(f"📨 Round trips for {RECEIPTS} receipts: 1 link lookup + {-(-RECEIPTS // 25)} bulk requests "
+          f"(was {RECEIPTS + 1})")
+    return ok
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Bulk upload test passed!" if success else "❌ Bulk upload test failed!")
+    if not success:
+        sys.exit(1)
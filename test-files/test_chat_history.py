@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test for rolling chat summaries
+Checks that a request folds at most MAX_SUMMARIES_PER_REQUEST batches, that
+a long backlog is served from the last summary plus the newest turns, and
+that later requests keep folding until the history fits the window.
+
+    python test-files/test_chat_history.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server import chat_history
+from server.chat_history import HISTORY_WINDOW, SUMMARIZE_BATCH, compact_history
+
+
+class ListChat:
+    """Messages and the stored summary of one chat, in memory"""
+
+    def __init__(self, count):
+        self.messages = [{'id': i * 3, 'role': 'user', 'content': f'message {i}'} for i in range(1, count + 1)]
+        self.summary = ('', 0)
+        self.summarize_calls = 0
+        self.saves = 0
+
+    def load_after(self, after_id, limit):
+        return [m for m in self.messages if m['id'] > after_id][:limit]
+
+    def load_latest(self, limit):
+        return self.messages[-limit:]
+
+    def summarize(self, previous, batch):
+        self.summarize_calls += 1
+        return f"{previous}+{batch[0]['id']}..{batch[-1]['id']}"
+
+    def get(self, chat_id, kind):
+        return self.summary
+
+    def save(self, chat_id, summary, through_id, kind):
+        self.saves += 1
+        self.summary = (summary, through_id)
+
+    def compact(self, max_summaries=2):
+        self.summarize_calls = 0
+        return compact_history(1, self.summarize, self.load_after, load_latest=self.load_latest,
+                               max_summaries=max_summaries, get_fn=self.get, save_fn=self.save)
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def test_short_chat():
+    print("\n🧪 Short chat")
+    chat = ListChat(HISTORY_WINDOW + SUMMARIZE_BATCH)
+    summary, through_id, messages = chat.compact()
+    ok = check("no summary needed", chat.summarize_calls == 0 and through_id == 0 and summary == '')
+    ok &= check("all messages returned", len(messages) == HISTORY_WINDOW + SUMMARIZE_BATCH)
+    return ok
+
+
+def test_backlog_is_capped():
+    print("\n🧪 Long backlog")
+    chat = ListChat(400)
+    summary, through_id, messages = chat.compact(max_summaries=2)
+    print(f"📊 summarized through {through_id}, {len(messages)} messages returned")
+    ok = check("at most two model calls in the request", chat.summarize_calls == 2 and chat.saves == 2)
+    ok &= check("summary stored through the second batch", chat.summary == (summary, chat.messages[2 * SUMMARIZE_BATCH - 1]['id']))
+    ok &= check("newest turns served", messages == chat.messages[-HISTORY_WINDOW:])
+
+    requests, calls = 1, [chat.summarize_calls]
+    while len(chat.load_after(chat.summary[1], 10_000)) > HISTORY_WINDOW + SUMMARIZE_BATCH:
+        chat.compact(max_summaries=2)
+        calls.append(chat.summarize_calls)
+        requests += 1
+    summary, through_id, messages = chat.compact(max_summaries=2)
+    ok &= check(f"backlog folded over {requests} requests, two calls each at most", max(calls) <= 2)
+    ok &= check("history then fits the window", len(messages) <= HISTORY_WINDOW + SUMMARIZE_BATCH
+                and messages[-1] == chat.messages[-1] and messages[0]['id'] > through_id)
+    summarized = [m for m in chat.messages if m['id'] <= through_id]
+    ok &= check("every message summarized once", summary.count('..') * SUMMARIZE_BATCH == len(summarized)
+                and len(summarized) + len(messages) == len(chat.messages))
+    return ok
+
+
+def test_without_latest_loader():
+    print("\n🧪 No latest loader")
+    chat = ListChat(200)
+    summary, through_id, messages = compact_history(1, chat.summarize, chat.load_after, max_summaries=1,
+                                                    get_fn=chat.get, save_fn=chat.save)
+    ok = check("one model call", chat.summarize_calls == 1)
+    ok &= check("result stays bounded", len(messages) == HISTORY_WINDOW + SUMMARIZE_BATCH)
+    ok &= check("messages follow the summary", messages[0]['id'] > through_id)
+    return ok
+
+
+def test_build_context_loaders():
+    print("\n🧪 Loaders passed to build_history_context")
+    passed = []
+    original = chat_history.compact_history
+    chat_history.compact_history = lambda chat_id, summarize, load_after, kind, load_latest: (
+        passed.append((load_after, load_latest)) or ('', 0, []))
+    try:
+        chat = ListChat(10)
+        chat_history.build_history_context(1, chat.summarize, load_latest=chat.load_latest)
+        chat_history.build_history_context(1, chat.summarize, chat.load_after, 'ai_chat')
+    finally:
+        chat_history.compact_history = original
+    ok = check("a caller's latest loader is used with the default message loader",
+               passed[0][1] == chat.load_latest and passed[0][0] is not None)
+    ok &= check("a custom message loader gets no default latest loader", passed[1] == (chat.load_after, None))
+    return ok
+
+
+def main():
+    print("=" * 60)
+    print("🧪 Chat history compaction test")
+    print("=" * 60)
+    results = [test_short_chat(), test_backlog_is_capped(), test_without_latest_loader(), test_build_context_loaders()]
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Chat history compaction test passed!" if success else "❌ Chat history compaction test failed!")
+    if not success:
+        sys.exit(1)
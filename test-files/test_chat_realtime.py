@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Test for real-time chat delivery
+Drives the ASGI app directly (no server needed): a reconnect that missed more
+than BACKFILL_LIMIT messages gets a `truncated` event, and publishing from a
+process whose hub loop is not running goes to Redis instead of being dropped,
+and a hub on the Redis backend starts, delivers and stops cleanly.
+
+    python test-files/test_chat_realtime.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.chat_realtime import BACKFILL_LIMIT, ChatHub, InMemoryBackend, RedisBackend, create_realtime_app
+
+MESSAGES = [{'id': i, 'content': f'm{i}'} for i in range(1, 501)]
+
+
+async def allow_all(scope, chat_id):
+    return 1
+
+
+def list_backfill(chat_id, after_id, limit):
+    return [m for m in MESSAGES if m['id'] > after_id][:limit]
+
+
+class RecordingRedis:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, data):
+        self.published.append((channel, json.loads(data)))
+
+
+class FakePubSub:
+    """The parts of redis.asyncio's PubSub the backend uses, fed by FakeAsyncRedis.publish"""
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.patterns = []
+        self.closed = False
+
+    async def psubscribe(self, pattern):
+        self.patterns.append(pattern)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeAsyncRedis:
+    def __init__(self):
+        self.pubsubs = []
+        self.closed = False
+
+    def pubsub(self):
+        self.pubsubs.append(FakePubSub())
+        return self.pubsubs[-1]
+
+    async def publish(self, channel, data):
+        for pubsub in self.pubsubs:
+            await pubsub.queue.put({'type': 'pmessage', 'channel': channel.encode(), 'data': data})
+
+    async def close(self):
+        self.closed = True
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+async def open_websocket(app, since_id):
+    """Connect, collect what the server sends until it goes quiet, then disconnect"""
+    inbox: asyncio.Queue = asyncio.Queue()
+    await inbox.put({'type': 'websocket.connect'})
+    sent = []
+
+    async def send(event):
+        if event['type'] == 'websocket.send':
+            sent.append(json.loads(event['text']))
+
+    scope = {'type': 'websocket', 'path': '/api/v1/mobile/chats/1/ws',
+             'query_string': f'since_id={since_id}'.encode(), 'headers': []}
+    task = asyncio.create_task(app(scope, inbox.get, send))
+    previous = -1
+    while len(sent) != previous:
+        previous = len(sent)
+        await asyncio.sleep(0.05)
+    await inbox.put({'type': 'websocket.disconnect'})
+    await asyncio.wait_for(task, 2)
+    return sent
+
+
+async def test_backfill():
+    print("\n🧪 Backfill on reconnect")
+    hub = ChatHub(InMemoryBackend())
+    app = create_realtime_app(allow_all, list_backfill, hub)
+
+    sent = await open_websocket(app, since_id=10)
+    messages = [e['message']['id'] for e in sent if e['type'] == 'message']
+    truncated = [e for e in sent if e['type'] == 'truncated']
+    ok = check(f"{BACKFILL_LIMIT} messages replayed", messages == list(range(11, 11 + BACKFILL_LIMIT)))
+    ok &= check("truncated event carries the last replayed id",
+                len(truncated) == 1 and truncated[0]['through_id'] == 10 + BACKFILL_LIMIT)
+    ok &= check("truncated comes after the replay", sent[-1]['type'] == 'truncated')
+
+    sent = await open_websocket(app, since_id=len(MESSAGES) - 5)
+    ok &= check("short backfill is not truncated",
+                [e['type'] for e in sent] == ['message'] * 5)
+    return ok
+
+
+def test_publish_without_loop():
+    print("\n🧪 Publishing without the hub loop")
+    hub = ChatHub(InMemoryBackend(), redis_url='redis://localhost:6379/0')
+    hub._sync_redis = RecordingRedis()
+    hub.publish_threadsafe(7, {'id': 1, 'content': 'hi'})
+    ok = check("published to Redis synchronously", hub._sync_redis.published == [('chat:7', {'id': 1, 'content': 'hi'})])
+
+    hub = ChatHub(InMemoryBackend())
+    hub.redis_url = None    # whatever REALTIME_REDIS_URL says
+    hub.publish_threadsafe(7, {'id': 2})
+    ok &= check("no loop and no Redis is counted, not silent", hub.undeliverable == 1)
+    return ok
+
+
+async def test_publish_with_loop():
+    print("\n🧪 Publishing through the running hub")
+    hub = ChatHub(InMemoryBackend())
+    await hub.start()
+    subscription = hub.subscribe(3)
+    await asyncio.to_thread(hub.publish_threadsafe, 3, {'id': 9})
+    message = await asyncio.wait_for(subscription.queue.get(), 1)
+    await hub.stop()
+    return check("delivered to the local subscriber", message == {'id': 9})
+
+
+async def test_redis_backend():
+    print("\n🧪 Hub on the Redis backend")
+    client = FakeAsyncRedis()
+    backend = RedisBackend(client=client)
+    hub = ChatHub(backend)
+    await hub.start()
+    subscription = hub.subscribe(5)
+    await hub.publish(5, {'id': 11})
+    message = await asyncio.wait_for(subscription.queue.get(), 1)
+    ok = check("delivered through pub/sub", message == {'id': 11} and client.pubsubs[0].patterns == ['chat:*'])
+    listener = backend._listener
+    await hub.stop()
+    ok &= check("stop cancels the listener and closes the connection",
+                listener.done() and client.pubsubs[0].closed and client.closed)
+    return ok
+
+
+def main():
+    print("=" * 60)
+    print("🧪 Chat realtime test")
+    print("=" * 60)
+    results = [asyncio.run(test_backfill()), test_publish_without_loop(), asyncio.run(test_publish_with_loop()),
+               asyncio.run(test_redis_backend())]
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Chat realtime test passed!" if success else "❌ Chat realtime test failed!")
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Load test for the real-time chat channel
+Opens thousands of idle SSE connections against one uvicorn node running
+server/chat_realtime.py, then publishes one message per chat and measures how
+long fan-out to every connection takes. Needs uvicorn installed.
+
+    python test-files/test_chat_realtime_load.py [connections] [chats]
+"""
+
+import asyncio
+import os
+import resource
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.chat_realtime import ChatHub, InMemoryBackend, create_realtime_app
+
+HOST = "127.0.0.1"
+PORT = 8765
+CONNECTIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+CHATS = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+
+async def allow_all(scope, chat_id):
+    return 1
+
+
+def no_backfill(chat_id, after_id, limit):
+    return []
+
+
+async def open_client(chat_id):
+    reader, writer = await asyncio.open_connection(HOST, PORT)
+    writer.write(
+        f"GET /api/v1/mobile/chats/{chat_id}/events HTTP/1.1\r\n"
+        f"Host: {HOST}\r\nAccept: text/event-stream\r\n\r\n".encode()
+    )
+    await writer.drain()
+    status = await reader.readline()
+    if b"200" not in status:
+        raise RuntimeError(f"Unexpected response: {status!r}")
+    return reader, writer
+
+
+async def wait_for_message(reader):
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("connection closed")
+        if line.startswith(b"event: message"):
+            return time.perf_counter()
+
+
+async def main():
+    try:
+        import uvicorn
+    except ImportError:
+        print("❌ uvicorn is required: pip install uvicorn")
+        return False
+
+    # Each connection is a file descriptor
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, CONNECTIONS * 2 + 256)), hard))
+
+    hub = ChatHub(InMemoryBackend())
+    app = create_realtime_app(allow_all, no_backfill, hub)
+    server = uvicorn.Server(uvicorn.Config(app, host=HOST, port=PORT, log_level="warning", backlog=4096))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    print(f"🧪 Opening {CONNECTIONS} idle SSE connections across {CHATS} chats")
+    print("=" * 60)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    clients = []
+    for offset in range(0, CONNECTIONS, 500):
+        batch = [open_client(i % CHATS) for i in range(offset, min(offset + 500, CONNECTIONS))]
+        clients.extend(await asyncio.gather(*batch))
+    print(f"✅ Connected {len(clients)} clients in {time.perf_counter() - start:.2f}s")
+
+    # Let the server finish registering subscriptions
+    while hub.connection_count < CONNECTIONS:
+        await asyncio.sleep(0.05)
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"📊 Server + clients RSS grew by {(rss_after - rss_before) / 1024:.1f} MB "
+          f"(~{(rss_after - rss_before) / max(CONNECTIONS, 1):.1f} KB per connection incl. client side)")
+
+    waiters = [asyncio.create_task(wait_for_message(reader)) for reader, _ in clients]
+    publish_start = time.perf_counter()
+    for chat_id in range(CHATS):
+        await hub.publish(chat_id, {"id": 1, "chat_id": chat_id, "content": "load test"})
+    received = await asyncio.gather(*waiters)
+
+    latencies = sorted(t - publish_start for t in received)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"📨 Fan-out to {len(latencies)} connections: p50 {p50:.1f} ms, p99 {p99:.1f} ms, "
+          f"max {latencies[-1] * 1000:.1f} ms")
+    print(f"   delivered={hub.delivered} dropped={hub.dropped}")
+
+    for _, writer in clients:
+        writer.close()
+    server.should_exit = True
+    await server_task
+    return hub.dropped == 0
+
+
+if __name__ == "__main__":
+    success = asyncio.run(main())
+    print("\n" + "=" * 60)
+    print("✅ Load test passed!" if success else "❌ Load test failed!")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test for chat retrieval scopes
+Checks scope intersection, that invalid or foreign ids give an empty scope
+(never the whole library), and that an empty scope returns no results
+without sending Chroma an empty `$in`.
+
+    python test-files/test_chat_scope.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.chat_scope import chroma_where, resolve_scope_file_ids, scoped_query
+
+
+class DictScopeSource:
+    """Scope lookups over in-memory rows, limited to the caller like the SQL source"""
+
+    def __init__(self):
+        self.files = {1: 10, 2: 10, 3: 10, 4: 20, 5: 20}          # file id -> owner
+        self.bookmarks = {100: (10, {1, 2}), 200: (20, {4})}        # bookmark -> (owner, files)
+        self.workspaces = {7: ({10}, {2, 3}), 8: ({20}, {4, 5})}    # workspace -> (members, files)
+
+    def bookmark_file_ids(self, user_id, ids):
+        return set().union(*[files for b, (owner, files) in self.bookmarks.items() if b in ids and owner == user_id])
+
+    def workspace_file_ids(self, user_id, ids):
+        return set().union(*[files for w, (members, files) in self.workspaces.items()
+                             if w in ids and user_id in members])
+
+    def document_file_ids(self, user_id, ids):
+        return {i for i in ids if self.files.get(i) == user_id}
+
+
+class RecordingCollection:
+    def __init__(self):
+        self.wheres = []
+
+    def query(self, where=None, **kwargs):
+        self.wheres.append(where)
+        return {'ids': [['c1']], 'documents': [['text']], 'metadatas': [[{}]], 'distances': [[0.1]]}
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def main():
+    print("🧪 Scope resolution and empty scopes")
+    print("=" * 60)
+    source = DictScopeSource()
+    ok = True
+
+    def resolve(filters, user_id=10):
+        return resolve_scope_file_ids(user_id, filters, source)
+
+    ok &= check("no filters searches the whole library", resolve(None) is None and resolve({}) is None)
+    ok &= check("a bookmark scope resolves to its files", resolve({'bookmark_id': 100}) == {1, 2})
+    ok &= check("scopes intersect", resolve({'bookmark_id': 100, 'workspace_id': 7}) == {2})
+    ok &= check("another user's workspace gives an empty scope", resolve({'workspace_id': 8}) == set())
+    ok &= check("another user's documents give an empty scope", resolve({'document_ids': [4, 5]}) == set())
+    ok &= check("invalid ids give an empty scope, not the whole library",
+                resolve({'document_ids': ['abc']}) == set() and resolve({'workspace_id': 'x'}) == set())
+    ok &= check("a disjoint intersection is empty", resolve({'bookmark_id': 100, 'document_ids': [3]}) == set())
+
+    ok &= check("one file uses an equality filter", chroma_where({3}) == {'file_id': 3})
+    ok &= check("a base filter is combined with $and",
+                chroma_where({1, 2}, {'user_id': 10}) == {'$and': [{'user_id': 10}, {'file_id': {'$in': [1, 2]}}]})
+    try:
+        chroma_where(set())
+        rejected = False
+    except ValueError:
+        rejected = True
+    ok &= check("an empty id set never becomes {'$in': []}", rejected)
+
+    collection = RecordingCollection()
+    empty = scoped_query(collection, set(), query_texts=['a', 'b'], n_results=5)
+    ok &= check("an empty scope returns no results without querying",
+                not collection.wheres and empty['ids'] == [[], []])
+    scoped_query(collection, None, query_texts=['a'])
+    scoped_query(collection, {1, 2}, query_texts=['a'])
+    ok &= check("unscoped and scoped queries reach Chroma",
+                collection.wheres == [None, {'file_id': {'$in': [1, 2]}}])
+    return ok
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Chat scope test passed!" if success else "❌ Chat scope test failed!")
+    if not success:
+        sys.exit(1)
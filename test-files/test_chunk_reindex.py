@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test for incremental re-chunking
+Checks the chunk diff for a re-uploaded document (unchanged chunks reused,
+repeated chunks matched one-for-one, removed chunks deleted) and that a
+failed embedding leaves the previous version's chunks in place.
+
+    python test-files/test_chunk_reindex.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.chunk_reindex import HASH_KEY, apply_reindex, chunk_content_hash, plan_reindex
+
+
+class DictCollection:
+    """The parts of a Chroma collection apply_reindex uses"""
+
+    def __init__(self):
+        self.chunks = {}  # id -> (document, metadata)
+        self.calls = []
+
+    def get(self, where=None, include=None):
+        selected = [(i, c) for i, c in self.chunks.items() if c[1].get('file_id') == where['file_id']]
+        return {'ids': [i for i, _ in selected], 'documents': [c[0] for _, c in selected],
+                'metadatas': [c[1] for _, c in selected]}
+
+    def add(self, ids, documents, metadatas, embeddings=None):
+        self.calls.append('add')
+        for chunk_id, document, metadata in zip(ids, documents, metadatas):
+            self.chunks[chunk_id] = (document, metadata)
+
+    def update(self, ids, metadatas):
+        self.calls.append('update')
+        for chunk_id, metadata in zip(ids, metadatas):
+            self.chunks[chunk_id] = (self.chunks[chunk_id][0], metadata)
+
+    def delete(self, ids):
+        self.calls.append('delete')
+        for chunk_id in ids:
+            del self.chunks[chunk_id]
+
+
+def store(collection, file_id, texts):
+    for index, text in enumerate(texts):
+        collection.chunks[f'{file_id}_{index}'] = (text, {'file_id': file_id, 'chunk_index': index,
+                                                          HASH_KEY: chunk_content_hash(text)})
+
+
+def texts_for(collection, file_id):
+    stored = collection.get(where={'file_id': file_id})
+    ordered = sorted(zip(stored['metadatas'], stored['documents']), key=lambda pair: pair[0]['chunk_index'])
+    # Reused chunks keep their stored text, which may differ in whitespace
+    return [' '.join(document.split()) for _, document in ordered]
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def main():
+    print("🧪 Re-upload diff and apply order")
+    print("=" * 60)
+    ok = True
+
+    old = ['Header', 'Intro', 'Body one', 'Header', 'Footer']
+    new = ['Header', 'Intro  ', 'Body two', 'Header', 'Header', 'Appendix']
+    existing = [{'id': f'c{i}', 'hash': chunk_content_hash(t)} for i, t in enumerate(old)]
+    plan = plan_reindex(existing, new)
+    ok &= check("whitespace-only changes are reused", any(c['id'] == 'c1' for c in plan.to_repoint))
+    ok &= check("repeated chunks are matched one-for-one",
+                sorted(c['id'] for c in plan.to_repoint) == ['c0', 'c1', 'c3']
+                and [c['text'] for c in plan.to_embed] == ['Body two', 'Header', 'Appendix'])
+    ok &= check("removed chunks are deleted", sorted(plan.to_delete) == ['c2', 'c4'])
+
+    collection = DictCollection()
+    store(collection, 7, old)
+    applied = apply_reindex(collection, 7, new, embed_fn=lambda texts: [[0.0]] * len(texts))
+    ok &= check("stored chunks match the new version", texts_for(collection, 7) == [' '.join(t.split()) for t in new])
+    ok &= check("new chunks are added before removed ones are deleted",
+                collection.calls == ['add', 'update', 'delete'] and applied.summary()['embedded'] == 3)
+
+    collection = DictCollection()
+    store(collection, 8, old)
+
+    def failing_embed(texts):
+        raise RuntimeError('embedding service unavailable')
+
+    try:
+        apply_reindex(collection, 8, new, embed_fn=failing_embed)
+        raised = False
+    except RuntimeError:
+        raised = True
+    ok &= check("a failed embedding leaves the old chunks in place",
+                raised and texts_for(collection, 8) == old and 'delete' not in collection.calls)
+
+    collection = DictCollection()
+    store(collection, 9, old)
+    apply_reindex(collection, 9, new, new_file_id=10)
+    ok &= check("reused chunks are re-pointed to the new File row",
+                texts_for(collection, 10) == [' '.join(t.split()) for t in new] and texts_for(collection, 9) == [])
+    return ok
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Chunk reindex test passed!" if success else "❌ Chunk reindex test failed!")
+    if not success:
+        sys.exit(1)
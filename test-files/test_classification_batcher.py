@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test for file_kind micro-batching
+Checks that concurrent submissions share model calls, that a lone item is
+sent within max_wait_ms of being submitted even while a slow batch is still
+running, that a failing batch fails only its own items, and that under load
+batches grow instead of queueing behind a busy pool.
+
+    python test-files/test_classification_batcher.py
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.classification_batcher import MicroBatcher, normalize_file_kind
+
+MAX_WAIT_MS = 50
+SLOW_BATCH_SECONDS = 0.5
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def main():
+    print("🧪 Micro-batcher grouping and latency bounds")
+    print("=" * 60)
+    ok = True
+
+    calls = []
+
+    def batch_fn(items):
+        calls.append(len(items))
+        if any(item == 'slow' for item in items):
+            time.sleep(SLOW_BATCH_SECONDS)
+        if any(item == 'fail' for item in items):
+            raise RuntimeError('model error')
+        return [f'label:{item}' for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=16, max_wait_ms=MAX_WAIT_MS)
+
+    futures = [batcher.submit(f'doc{i}') for i in range(40)]
+    results = [f.result(timeout=5) for f in futures]
+    ok &= check("40 concurrent items go out in full batches of 16",
+                results == [f'label:doc{i}' for i in range(40)] and calls[:2] == [16, 16] and len(calls) == 3)
+
+    # A lone item queued while a slow batch runs must not wait for it
+    slow = batcher.submit('slow')
+    time.sleep(MAX_WAIT_MS / 1000 * 2)
+    start = time.monotonic()
+    lone = batcher.submit('lone')
+    lone.result(timeout=5)
+    latency_ms = (time.monotonic() - start) * 1000
+    slow.result(timeout=5)
+    print(f"📊 Lone item answered in {latency_ms:.0f} ms while a {SLOW_BATCH_SECONDS * 1000:.0f} ms batch ran")
+    ok &= check("a lone item is bounded by max_wait, not by the running batch", latency_ms < MAX_WAIT_MS + 40)
+
+    # The wait is measured from submission, not from when the collector wakes
+    late = []
+    barrier = threading.Event()
+
+    done_at = {}
+
+    def submit_spread():
+        barrier.wait()
+        for i in range(5):
+            future = batcher.submit(f'spread{i}')
+            future.add_done_callback(lambda f, i=i: done_at.setdefault(i, time.monotonic()))
+            late.append((time.monotonic(), future))
+            time.sleep(0.02)
+
+    thread = threading.Thread(target=submit_spread)
+    thread.start()
+    barrier.set()
+    thread.join()
+    first_submitted, first_future = late[0]
+    first_future.result(timeout=5)
+    waited_ms = (done_at[0] - first_submitted) * 1000
+    ok &= check("the oldest item sets the deadline", waited_ms < MAX_WAIT_MS + 40)
+
+    failed, fine = batcher.submit('fail'), None
+    time.sleep(MAX_WAIT_MS / 1000 * 2)
+    fine = batcher.submit('fine')
+    try:
+        failed.result(timeout=5)
+        raised = False
+    except RuntimeError:
+        raised = True
+    ok &= check("a failing batch fails only its own items", raised and fine.result(timeout=5) == 'label:fine')
+
+    # Saturated pool: items keep arriving while the only worker is busy
+    sizes = []
+
+    def busy_fn(items):
+        sizes.append(len(items))
+        time.sleep(0.05)
+        return items
+
+    saturated = MicroBatcher(busy_fn, max_batch_size=16, max_wait_ms=5, max_concurrent_batches=1)
+    backlog = 0
+    trickle = []
+    for i in range(80):
+        trickle.append(saturated.submit(i))
+        backlog = max(backlog, saturated._executor._work_queue.qsize())
+        time.sleep(0.003)
+    [f.result(timeout=10) for f in trickle]
+    print(f"📊 Saturated pool: batch sizes {sizes}")
+    ok &= check("with every worker busy, batches grow and nothing queues in the pool",
+                backlog == 0 and max(sizes) >= 12 and len(sizes) < 80 / 4)
+
+    ok &= check("labels are normalized", normalize_file_kind(' Receipts ') == 'Receipt'
+                and normalize_file_kind('invoice') == 'Document')
+    return ok
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Classification batcher test passed!" if success else "❌ Classification batcher test failed!")
+    if not success:
+        sys.exit(1)
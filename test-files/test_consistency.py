@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Test for the storage consistency checker
+Builds a library where the three stores disagree (rows without files, rows
+without chunks, chunks without rows, files without rows), checks that every
+case is reported, that chunks without a file id and chunks of rows still in
+flight are left alone, that orphan files are matched on their full path,
+that rows are reprocessed only once, that repairs are applied within the
+rate budget, and that the checker's memory does not grow with the library
+size.
+
+    python test-files/test_consistency.py [files]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.consistency import ConsistencyChecker, FileRow, matching_paths, upload_path_key
+
+FILES = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+OLD = time.time() - 86400
+
+
+class ListFileSource:
+    """File rows held in a list, read in id order like the SQL source"""
+
+    def __init__(self, rows):
+        self.rows = sorted(rows, key=lambda r: r.id)
+        self.ids = {r.id for r in self.rows}
+        self.attempted = set()
+        self.queries = 0
+
+    def iter_batches(self, batch_size):
+        for start in range(0, len(self.rows), batch_size):
+            self.queries += 1
+            yield self.rows[start:start + batch_size]
+
+    def existing_ids(self, ids):
+        self.queries += 1
+        return {i for i in ids if i in self.ids}
+
+    def existing_paths(self, paths):
+        self.queries += 1
+        keys = {path: upload_path_key(path) for path in paths}
+        names = {key[1] for key in keys.values() if key is not None}
+        return matching_paths(keys, ((r.user_id, r.filename) for r in self.rows if r.filename in names))
+
+    def reprocess_attempted(self, ids):
+        self.queries += 1
+        return {i for i in ids if i in self.attempted}
+
+    def record_reprocess_attempt(self, file_id):
+        self.attempted.add(file_id)
+
+    def clear_reprocess_attempts(self, ids):
+        self.attempted.difference_update(ids)
+
+
+class ListCollection:
+    """The parts of a Chroma collection the checker uses"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks  # [(id, metadata)]
+        self.calls = 0
+
+    def get(self, where=None, limit=None, offset=0, include=None):
+        self.calls += 1
+        if where is not None:
+            wanted = {value for clause in where['$or'] for value in clause['file_id']['$in']}
+            selected = [c for c in self.chunks if c[1].get('file_id') in wanted]
+        else:
+            selected = self.chunks[offset:offset + limit]
+        return {'ids': [c[0] for c in selected], 'metadatas': [c[1] for c in selected]}
+
+    def delete(self, ids):
+        drop = set(ids)
+        self.chunks = [c for c in self.chunks if c[0] not in drop]
+
+
+def build_library(root, count):
+    rows, chunks = [], []
+    expected = {'missing_on_disk': set(), 'missing_chunks': set(), 'lost': set(),
+                'orphan_chunks': set(), 'orphan_files': set()}
+    users = max(1, count // 100)  # about 100 files per user directory
+    for file_id in range(1, count + 1):
+        name = f'{file_id:06d}_doc.pdf'
+        user_id = file_id % users
+        user_dir = os.path.join(root, str(user_id))
+        rows.append(FileRow(file_id, user_id, name, OLD))
+        if file_id % 50 == 0:
+            expected['lost'].add(file_id)
+            continue
+        if file_id % 40 == 0:
+            expected['missing_on_disk'].add(file_id)
+        else:
+            os.makedirs(user_dir, exist_ok=True)
+            with open(os.path.join(user_dir, name), 'wb') as handle:
+                handle.write(b'%PDF')
+        if file_id % 30 == 0 and file_id % 40 != 0:
+            expected['missing_chunks'].add(file_id)
+        else:
+            # Some older chunks carry the id as a string
+            stored_id = str(file_id) if file_id % 3 == 0 else file_id
+            chunks += [(f'{file_id}_{i}', {'file_id': stored_id}) for i in range(3)]
+
+    for orphan_id in range(count + 1, count + 21):
+        expected['orphan_chunks'].add(orphan_id)
+        chunks += [(f'{orphan_id}_{i}', {'file_id': orphan_id}) for i in range(2)]
+    # The newest settled row sits above the deleted ids
+    newest = count + 21
+    rows.append(FileRow(newest, 0, 'newest.pdf', OLD))
+    os.makedirs(os.path.join(root, '0'), exist_ok=True)
+    with open(os.path.join(root, '0', 'newest.pdf'), 'wb') as handle:
+        handle.write(b'%PDF')
+    chunks.append((f'{newest}_0', {'file_id': newest}))
+    # A row inside the grace window, and chunks of a row whose insert has not committed yet
+    rows.append(FileRow(newest + 1, 0, 'fresh.pdf', time.time()))
+    chunks += [(f'{newest + 2}_{i}', {'file_id': newest + 2}) for i in range(2)]
+    # Chunks written without a file id belong to no row and are not orphans
+    chunks += [(f'loose_{i}', {'source': 'import'}) for i in range(3)]
+
+    for i in range(15):
+        name = f'stray_{i}.pdf'
+        with open(os.path.join(root, name), 'wb') as handle:
+            handle.write(b'%PDF')
+        expected['orphan_files'].add(name)
+    # A known filename in another user's directory is still an orphan
+    stray = os.path.join(str((1 % users) + 1), f'{1:06d}_doc.pdf')
+    os.makedirs(os.path.join(root, os.path.dirname(stray)), exist_ok=True)
+    with open(os.path.join(root, stray), 'wb') as handle:
+        handle.write(b'%PDF')
+    expected['orphan_files'].add(stray)
+
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            os.utime(os.path.join(dirpath, name), (OLD, OLD))
+    # An upload still in flight is not an orphan
+    with open(os.path.join(root, 'in_flight.pdf'), 'wb') as handle:
+        handle.write(b'%PDF')
+    return rows, chunks, expected
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def main():
+    root = tempfile.mkdtemp(prefix='consistency-')
+    try:
+        rows, chunks, expected = build_library(root, FILES)
+        print(f"🧪 {len(rows)} File rows, {len(chunks)} chunks, drift seeded in every store")
+        print("=" * 60)
+
+        files, collection = ListFileSource(rows), ListCollection(chunks)
+        reprocessed = []
+        checker = ConsistencyChecker(files, collection, root, reprocess=reprocessed.append, batch_size=200)
+
+        tracemalloc.start()
+        report = checker.run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"📊 Report-only run: {report.elapsed_seconds:.2f}s, {files.queries} DB queries, "
+              f"{collection.calls} Chroma calls, peak {peak / 1024:.0f} KiB traced")
+        print(f"   {report.counts}")
+
+        ok = True
+        for kind in ('missing_on_disk', 'missing_chunks', 'lost'):
+            ok &= check(f"{kind} rows found", set(report.samples.get(kind, [])) == set(list(sorted(expected[kind]))[:100])
+                        and report.counts[kind] == len(expected[kind]))
+        ok &= check("orphan chunks found (string and int file ids both matched)",
+                    set(report.samples['orphan_chunks']) == expected['orphan_chunks']
+                    and report.counts['orphan_chunks'] == 40)
+        ok &= check("chunks without a file id and chunks of unsettled rows are not orphans",
+                    report.counts['unattributed_chunks'] == 3
+                    and not {'loose_0', FILES + 23} & set(report.samples['orphan_chunks']))
+        ok &= check("orphan files found on their full path, in-flight upload skipped",
+                    set(report.samples['orphan_files']) == expected['orphan_files'])
+        ok &= check("report-only run changed nothing", not reprocessed and len(collection.chunks) == len(chunks))
+
+        start = time.perf_counter()
+        repaired = checker.run(repair=True, repair_rate=200, max_repairs=30)
+        elapsed = time.perf_counter() - start
+        ok &= check("repairs stop at the per-run limit", sum(repaired.repaired.values()) == 30)
+        ok &= check("repairs respect the rate", elapsed >= 29 / 200)
+
+        final = checker.run(repair=True, repair_rate=1000)
+        after = checker.run()
+        ok &= check("a full repair leaves no orphan chunks or files",
+                    after.counts['orphan_chunks'] == 0 and after.counts['orphan_files'] == 0)
+        quarantined = {os.path.relpath(os.path.join(dirpath, name), os.path.join(root, '.orphaned'))
+                       for dirpath, _, names in os.walk(os.path.join(root, '.orphaned')) for name in names}
+        ok &= check("orphan files were quarantined, not deleted", quarantined == expected['orphan_files'])
+        ok &= check("loose chunks and chunks of unsettled rows were kept",
+                    sum(1 for c in collection.chunks if c[1].get('file_id') in (None, FILES + 23)) == 5)
+        ok &= check("rows without chunks were sent back to processing once",
+                    set(reprocessed) == expected['missing_chunks'] and len(reprocessed) == len(set(reprocessed)))
+        ok &= check("rows still without chunks after reprocessing are reported as no_text",
+                    after.counts['missing_chunks'] == 0 and after.counts['no_text'] == len(expected['missing_chunks']))
+        ok &= check("lost rows are only reported", after.counts['lost'] == len(expected['lost'])
+                    and 'lost' not in final.repaired)
+
+        # Reprocessing eventually produced chunks for one of them
+        recovered = min(expected['missing_chunks'])
+        collection.chunks.append((f'{recovered}_0', {'file_id': recovered}))
+        checker.run(repair=True, repair_rate=1000)
+        ok &= check("a row seen with chunks has its reprocess attempt cleared",
+                    recovered not in files.attempted and files.attempted == expected['missing_chunks'] - {recovered})
+
+        # Memory is bounded by the batch, not the library
+        small_root = tempfile.mkdtemp(prefix='consistency-small-')
+        try:
+            small_rows, small_chunks, _ = build_library(small_root, FILES // 5)
+            small_checker = ConsistencyChecker(ListFileSource(small_rows), ListCollection(small_chunks), small_root,
+                                               batch_size=200)
+            tracemalloc.start()
+            small_checker.run()
+            _, small_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        finally:
+            shutil.rmtree(small_root, ignore_errors=True)
+        print(f"📊 Peak traced memory: {small_peak / 1024:.0f} KiB at {FILES // 5} files, "
+              f"{peak / 1024:.0f} KiB at {FILES} files")
+        ok &= check("peak memory does not scale with the library", peak < small_peak * 2)
+        return ok
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Consistency checker test passed!" if success else "❌ Consistency checker test failed!")
+    if not success:
+        sys.exit(1)
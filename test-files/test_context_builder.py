@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test for token-budgeted chat context assembly
+Checks that overlapping windows of the same file are deduplicated, that the
+rerank blends vector similarity with query terms, that the packed context
+stays within the token budget and that citations only cover packed chunks.
+
+    python test-files/test_context_builder.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.context_builder import build_context, deduplicate, estimate_tokens, rerank
+
+LEASE = ('The tenant shall pay the monthly rent of 1200 dollars on the first day of each month '
+         'and the landlord shall maintain the heating system in good working order throughout the lease term')
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def test_deduplicate():
+    print("\n🧪 Overlapping windows")
+    words = LEASE.split()
+    chunks = [
+        {'file_id': 1, 'text': LEASE, 'score': 0.9},
+        # A sliding window over the same text, mostly contained in the first chunk
+        {'file_id': 1, 'text': ' '.join(words[4:]), 'score': 0.8},
+        # Same text in another file is not a duplicate
+        {'file_id': 2, 'text': ' '.join(words[4:]), 'score': 0.7},
+        {'file_id': 1, 'text': 'Pets are not allowed on the premises without written consent', 'score': 0.5},
+    ]
+    kept, dropped = deduplicate(chunks)
+    ok = check("contained window of the same file dropped", dropped == 1 and len(kept) == 3)
+    ok &= check("better-scored chunk kept", kept[0]['text'] == LEASE)
+    ok &= check("other file's copy kept", any(chunk['file_id'] == 2 for chunk in kept))
+    return ok
+
+
+def test_rerank():
+    print("\n🧪 Rerank")
+    chunks = [
+        {'file_id': 1, 'text': 'Quarterly revenue grew in the northern region', 'distance': 0.40},
+        {'file_id': 2, 'text': 'The heating system must be maintained by the landlord', 'distance': 0.45},
+        {'file_id': 3, 'text': 'Unrelated notes about the office party', 'distance': 2.0},
+    ]
+    ranked = rerank('who maintains the heating system', chunks)
+    ok = check("query-term match outranks a slightly closer vector hit", ranked[0]['file_id'] == 2)
+    ok &= check("far, unmatched chunk last", ranked[-1]['file_id'] == 3)
+    ok &= check("scores descending", [c['rank_score'] for c in ranked] == sorted(
+        (c['rank_score'] for c in ranked), reverse=True))
+    ok &= check("empty input", rerank('anything', []) == [])
+    return ok
+
+
+def test_budget_and_citations():
+    print("\n🧪 Budget and citations")
+    chunks = [{'file_id': i, 'filename': f'doc{i}.pdf', 'text': f'heating clause {i} ' + 'x' * 380,
+               'score': 1.0 - i / 100} for i in range(10)]
+    chunks.append({'file_id': 99, 'filename': 'short.pdf', 'text': 'heating short note', 'score': 0.01})
+    budget = 350
+    result = build_context('heating clause', chunks, token_budget=budget)
+
+    print(f"📊 {result.stats}")
+    ok = check("context within budget", result.context_tokens <= budget)
+    ok &= check("context tokens match packed chunks",
+                result.context_tokens == sum(estimate_tokens(c['text']) for c in result.chunks))
+    ok &= check("over-budget chunks counted", result.over_budget_dropped == len(chunks) - len(result.chunks))
+    ok &= check("smaller lower-ranked chunk still packed", any(c['file_id'] == 99 for c in result.chunks))
+    packed_ids = [c['file_id'] for c in result.chunks]
+    ok &= check("one citation per packed chunk", [c['file_id'] for c in result.citations] == packed_ids)
+    ok &= check("every cited source appears in the context",
+                all(f"[{c['source_name']}]" in result.context for c in result.citations))
+    ok &= check("tokens saved reported", result.tokens_saved == result.candidate_tokens - result.context_tokens > 0)
+    return ok
+
+
+def main():
+    print("=" * 60)
+    print("🧪 Context builder test")
+    print("=" * 60)
+    results = [test_deduplicate(), test_rerank(), test_budget_and_citations()]
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Context builder test passed!" if success else "❌ Context builder test failed!")
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test for the background Dropbox / Google Drive import engine
+Imports a batch of files from the local FakeProvider, once sequentially (how
+the external-download endpoints worked) and once through ImportEngine with
+bounded parallelism, injecting transient failures to exercise the retries.
+Also checks that job state lives in the store (another engine sharing it can
+answer polls), that abandoned jobs are reported as interrupted, and how native
+Google files are named on export.
+
+    python test-files/test_external_import.py [files] [concurrency]
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import server.external_import as external_import
+from server.external_import import (FakeProvider, GoogleDriveProvider, ImportEngine, ImportJob, ImportItem,
+                                     InMemoryJobStore, _HttpProvider)
+
+FILES = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+CONCURRENCY = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+FILE_SIZE = 2 * 1024 * 1024
+CHUNK_DELAY = 0.01
+
+
+def make_provider():
+    sizes = {f'id:{i}': FILE_SIZE + i for i in range(FILES)}
+    # Every third file drops its connection once halfway through
+    fail_times = {file_id: 1 for i, file_id in enumerate(sizes) if i % 3 == 0}
+    return FakeProvider(sizes, chunk_delay=CHUNK_DELAY, fail_times=fail_times, chunk_size=128 * 1024)
+
+
+def run_import(concurrency):
+    provider = make_provider()
+    engine = ImportEngine(max_workers=concurrency, max_retries=2, backoff_seconds=0.05)
+    files = [{'id': file_id, 'name': f'report {i}.pdf', 'size': size}
+             for i, (file_id, size) in enumerate(provider.sizes.items())]
+    registered = []
+
+    with tempfile.TemporaryDirectory() as dest_dir:
+        start = time.perf_counter()
+        job_id = engine.start(1, provider, 'token', files, dest_dir,
+                              on_file_done=lambda user_id, item: registered.append(item.file_id))
+
+        peak_active = 0
+        while True:
+            job = engine.get_job(job_id, 1)
+            peak_active = max(peak_active, sum(f['status'] == 'downloading' for f in job['files']))
+            if job['status'] != 'running':
+                break
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+
+        corrupt = [
+            f['name'] for f in job['files']
+            if f['sha256'] != hashlib.sha256(provider.content(f['file_id'])).hexdigest()
+        ]
+        leftovers = [name for name in os.listdir(dest_dir) if name.endswith('.part')]
+
+    return job, elapsed, peak_active, registered, corrupt, leftovers
+
+
+def check_store_and_providers():
+    print("\n🧪 Job store and providers")
+    ok = True
+
+    # Two engines sharing a store stand in for two API workers sharing Redis
+    store = InMemoryJobStore()
+    worker = ImportEngine(max_workers=2, store=store)
+    poller = ImportEngine(max_workers=1, store=store)
+    provider = FakeProvider({'a': 1000, 'b': 2000}, chunk_delay=0.01, chunk_size=100)
+    with tempfile.TemporaryDirectory() as dest_dir:
+        job_id = worker.start(1, provider, 'token', [{'id': 'a', 'name': 'a.txt'}, {'id': 'b', 'name': 'b.txt'}],
+                              dest_dir)
+        seen_running = poller.get_job(job_id, 1)['status'] == 'running'
+        while poller.get_job(job_id, 1)['status'] == 'running':
+            time.sleep(0.01)
+        job = poller.get_job(job_id, 1)
+    shared = seen_running and job['completed'] == 2 and poller.get_job(job_id, 2) is None
+    print(f"{'✅' if shared else '❌'} another worker polls progress from the store")
+    ok &= shared
+    ok &= check_counts(poller.stats(), jobs=1, done=2)
+
+    # A running job nobody has updated for a while lost its worker
+    stale = ImportJob(id='stale', user_id=1, service='fake',
+                      items=[ImportItem('x', 'x.pdf', status='done'), ImportItem('y', 'y.pdf', status='downloading')])
+    stale.updated_at = time.time() - external_import.STALE_JOB_SECONDS - 1
+    store.save(stale)
+    job = poller.get_job('stale', 1)
+    interrupted = job['status'] == 'completed' and job['files'][1]['status'] == 'failed' \
+        and job['files'][1]['error'] == 'import interrupted'
+    print(f"{'✅' if interrupted else '❌'} abandoned job reported as interrupted")
+    ok &= interrupted
+
+    try:
+        _HttpProvider()
+        abstract = False
+    except TypeError:
+        abstract = True
+    print(f"{'✅' if abstract else '❌'} HTTP providers must implement _request")
+    ok &= abstract
+
+    drive = GoogleDriveProvider()
+    names = (drive.stored_name('Budget', 'application/vnd.google-apps.spreadsheet'),
+             drive.stored_name('Plan.docx', 'application/vnd.google-apps.document'),
+             drive.stored_name('scan.pdf', 'application/pdf'))
+    named = names == ('Budget.csv', 'Plan.docx', 'scan.pdf')
+    print(f"{'✅' if named else '❌'} exported Google files get the export extension {names}")
+    return ok and named
+
+
+def check_counts(stats, **expected):
+    matches = all(stats[key] == value for key, value in expected.items())
+    print(f"{'✅' if matches else '❌'} stats from the store {stats}")
+    return matches
+
+
+def main():
+    print(f"🧪 Importing {FILES} files of ~{FILE_SIZE // 1024} KB from the fake provider")
+    print("=" * 60)
+
+    _, sequential, _, _, _, _ = run_import(1)
+    print(f"📊 Sequential:      {sequential:.2f}s")
+
+    job, parallel, peak_active, registered, corrupt, leftovers = run_import(CONCURRENCY)
+    print(f"📊 {CONCURRENCY} concurrent:    {parallel:.2f}s ({sequential / parallel:.1f}x faster)")
+    print(f"   completed={job['completed']} failed={job['failed']} "
+          f"retried={sum(f['attempts'] > 1 for f in job['files'])} peak active={peak_active}")
+
+    ok = True
+    if job['completed'] != FILES or len(registered) != FILES:
+        print("❌ Not every file was imported and registered")
+        ok = False
+    if corrupt:
+        print(f"❌ Hash mismatch for {corrupt}")
+        ok = False
+    if leftovers:
+        print(f"❌ Partial downloads left behind: {leftovers}")
+        ok = False
+    if peak_active > CONCURRENCY:
+        print(f"❌ {peak_active} downloads ran at once, limit is {CONCURRENCY}")
+        ok = False
+    return ok and parallel < sequential and check_store_and_providers()
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Import test passed!" if success else "❌ Import test failed!")
+    if not success:
+        sys.exit(1)
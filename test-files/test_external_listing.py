@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test for cached external-provider listings
+Simulates a user repeatedly opening folders in the ExternalFilePicker against
+the local FakeLister, with files added and removed remotely in between, and
+checks that reopening is served from cache or by a delta fetch while the
+listing stays identical to the provider's, and that paging through a folder
+that changes between pages returns every file that stayed exactly once.
+
+    python test-files/test_external_listing.py
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.external_listing import FakeLister, ListingCache, paginate
+
+FOLDERS = ['', '/Receipts', '/Contracts']
+FILES_PER_FOLDER = 1200
+
+
+def make_file(folder, i):
+    return {'id': f'{folder}/{i}', 'name': f'file_{i:05d}.pdf', 'type': 'file', 'size': 1000 + i}
+
+
+def expected_listing(lister, folder):
+    return sorted(f['id'] for f in lister.folders.get(folder, {}).values())
+
+
+def main():
+    random.seed(3)
+    lister = FakeLister({folder: {f['id']: f for f in (make_file(folder, i) for i in range(FILES_PER_FOLDER))}
+                         for folder in FOLDERS}, page_size=500)
+    cache = ListingCache(ttl_seconds=0.2)
+
+    print(f"🧪 {len(FOLDERS)} folders x {FILES_PER_FOLDER} files, 60 picker opens with remote edits")
+    print("=" * 60)
+
+    ok = True
+    next_id = FILES_PER_FOLDER
+    start = time.perf_counter()
+    for step in range(60):
+        folder = random.choice(FOLDERS)
+        if step % 10 == 5:
+            # Remote edits while the cached listing is still fresh are seen after the TTL
+            lister.put(folder, make_file(folder, next_id))
+            lister.remove(folder, random.choice(list(lister.folders[folder])))
+            next_id += 1
+            time.sleep(0.25)
+
+        files = cache.get_listing(7, lister, 'token', folder)
+        if sorted(f['id'] for f in files) != expected_listing(lister, folder):
+            print(f"❌ Listing for {folder or '/'} diverged from the provider at step {step}")
+            ok = False
+
+        first_page = paginate(files, None, 100)
+        if len(first_page['files']) != 100 or first_page['next_cursor'] is None:
+            print("❌ Pagination returned an unexpected first page")
+            ok = False
+    elapsed = time.perf_counter() - start
+
+    stats = cache.stats()
+    print(f"📊 {stats['hits']} hits, {stats['delta_refreshes']} delta refreshes, {stats['misses']} full listings "
+          f"(hit rate {stats['hit_rate']:.0%}) in {elapsed:.2f}s")
+    print(f"   provider calls: {lister.calls['list_folder']} list pages, {lister.calls['list_changes']} change fetches "
+          f"(uncached: {60 * 3} list pages)")
+
+    if stats['misses'] != len(FOLDERS):
+        print("❌ Folders were relisted instead of refreshed from their cursor")
+        ok = False
+
+    folder = '/Receipts'
+    stayed = set(expected_listing(lister, folder))
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = paginate(cache.get_listing(7, lister, 'token', folder, force_refresh=True), cursor, 100)
+        seen.extend(f['id'] for f in page['files'])
+        cursor, pages = page['next_cursor'], pages + 1
+        if cursor is None:
+            break
+        # Between pages: a file lands before the cursor and one further on is deleted
+        lister.put(folder, {'id': f'{folder}/new{pages}', 'name': f'aaa_{pages}.pdf', 'type': 'file'})
+        gone = sorted(lister.folders[folder])[-pages]
+        lister.remove(folder, gone)
+        stayed.discard(gone)
+    repeated = len(seen) - len(set(seen))
+    missed = stayed - set(seen)
+    print(f"{'✅' if not repeated and not missed else '❌'} Paged {folder} over {pages} refreshes: "
+          f"{repeated} repeated, {len(missed)} skipped")
+    ok = ok and not repeated and not missed
+    return ok
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Listing cache test passed!" if success else "❌ Listing cache test failed!")
+    if not success:
+        sys.exit(1)
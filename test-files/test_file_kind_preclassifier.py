@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test for the local file_kind rules tier
+Checks that filename words match whole tokens (no 'form' in 'information'),
+that a filename hit alone is escalated rather than trusted, and that clear
+receipts and forms are still settled locally.
+
+    python test-files/test_file_kind_preclassifier.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.file_kind_preclassifier import CONFIDENCE_THRESHOLD, rules_classify
+
+RECEIPT_TEXT = """Corner Grocery
+Milk 3.49
+Bread 2.99
+Subtotal 6.48
+Tax 0.52
+Total $7.00
+Visa ****1234
+"""
+FORM_TEXT = """Name: ____________
+Date of birth: ______
+Address: ____________
+Signature: __________
+"""
+POLICY_TEXT = "This policy describes how information is classified and handled across the platform. " * 30
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def confident(filename, text='', mime_type='application/pdf'):
+    kind, confidence = rules_classify(filename, mime_type, text)
+    return kind if confidence >= CONFIDENCE_THRESHOLD else None
+
+
+def main():
+    print("🧪 Rules tier filename matching")
+    print("=" * 60)
+    ok = True
+
+    for name in ('Information Security Policy.pdf', 'Platform performance report.pdf', 'File format notes.pdf',
+                 'billing-overview.pdf', 'border_crossing.pdf', 'Orderly transition plan.pdf'):
+        kind = confident(name)
+        ok &= check(f"{name!r} is not confidently a Receipt/Form", kind not in ('Receipt', 'Form'))
+
+    ok &= check("a plain policy document is a Document",
+                confident('Information Security Policy.pdf', POLICY_TEXT) == 'Document')
+    ok &= check("a receipt filename alone is escalated", confident('receipt.pdf') is None)
+    ok &= check("a form filename alone is escalated", confident('W-9 form.pdf') is None)
+    ok &= check("receipt filename plus receipt text is a Receipt",
+                confident('Receipts_2024-03.jpg', RECEIPT_TEXT, 'image/jpeg') == 'Receipt')
+    ok &= check("W-9 filename plus form fields is a Form", confident('w-9.pdf', FORM_TEXT) == 'Form')
+    ok &= check("plural filename words still count", confident('invoices_march.pdf', RECEIPT_TEXT) == 'Receipt')
+    return ok
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ File kind pre-classifier test passed!" if success else "❌ File kind pre-classifier test failed!")
+    if not success:
+        sys.exit(1)
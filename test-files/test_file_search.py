@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test for ranked file search
+Checks the tsquery built from user input, then with --db times search_files
+against the ILIKE scan it replaces as one user's library grows. The --db run
+needs the backend database with db_scripts/create_file_search_index.py
+applied; its rows are removed afterwards.
+
+    python test-files/test_file_search.py [--db] [user_id]
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.file_search import _like_pattern, build_tsquery
+
+USE_DB = '--db' in sys.argv
+ARGS = [arg for arg in sys.argv[1:] if arg != '--db']
+USER_ID = int(ARGS[0]) if ARGS else 1
+SIZES = (1000, 10000, 50000)
+WORDS = ('invoice', 'lease', 'receipt', 'insurance', 'payslip', 'contract', 'statement', 'tax', 'warranty', 'medical')
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def check_query_builder():
+    ok = True
+    ok &= check("last term becomes a prefix", build_tsquery('lease agre') == 'lease & agre:*')
+    ok &= check("tsquery operators in input are dropped",
+                build_tsquery("a & !b | c:* <-> (d') ") == 'a & b & c & d:*')
+    ok &= check("blank input builds no query", build_tsquery('  -- ') is None and build_tsquery(None) is None)
+    ok &= check("non-ASCII words are kept", build_tsquery('Überweisung') == 'überweisung:*')
+    ok &= check("LIKE wildcards in input are escaped", _like_pattern('50%_off') == '%50\\%\\_off%')
+    return ok
+
+
+def median_ms(fn, runs=20):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def check_latency():
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'manager-francis', 'backend'))
+    from app import app
+    from shared import db, File
+    from sqlalchemy import text
+    from server.file_search import SEARCH_TABLE, index_file_text, register_index_listeners, search_files
+
+    register_index_listeners(File)
+
+    ok = True
+    created = []
+    with app.app_context():
+        try:
+            random.seed(7)
+            without_text = None
+            timings = []
+            for size in SIZES:
+                while len(created) < size:
+                    words = random.sample(WORDS, 3)
+                    file = File(user_id=USER_ID, filename=f'search_test_{len(created)}.pdf',
+                                original_filename=f'search_test_{words[0]}_{len(created)}.pdf')
+                    db.session.add(file)
+                    db.session.flush()
+                    created.append(file.id)
+                    # Every tenth upload yields no text and must still be found by name
+                    if len(created) % 10 == 0:
+                        without_text = (file.id, file.original_filename)
+                    else:
+                        index_file_text(file.id, f'This {words[1]} covers the {words[2]} for unit {len(created)}.')
+                db.session.commit()
+                db.session.execute(text(f'ANALYZE {SEARCH_TABLE}'))
+
+                search_ms = median_ms(lambda: search_files(USER_ID, 'warrant', 1, 20))
+                ilike_ms = median_ms(lambda: db.session.query(File).filter(
+                    File.user_id == USER_ID, File.original_filename.ilike('%warrant%')).limit(20).all())
+                timings.append(search_ms)
+                print(f"📊 {size:6} files: search_files {search_ms:6.1f} ms, ILIKE scan {ilike_ms:6.1f} ms")
+
+            results, _ = search_files(USER_ID, without_text[1], 1, 20)
+            ok &= check("an upload without extracted text is found by name",
+                        any(r['file_id'] == without_text[0] for r in results))
+            # 'insurance' stems to 'insur' in english but is stored unstemmed in the filename vector
+            _, name_total = search_files(USER_ID, 'insurance search', 1, 20)
+            ok &= check("full words match unstemmed filename terms", name_total > 0)
+            results, total = search_files(USER_ID, 'warranty', 1, 20)
+            ok &= check("content-only matches are found",
+                        any(r['matched_in'] == 'content' and r['snippet'] for r in results))
+            ok &= check("filename matches rank above content matches",
+                        results[0]['matched_in'] == 'filename' and total > len(results))
+            ok &= check("latency stays flat as the library grows", timings[-1] < max(timings[0] * 3, 20))
+        finally:
+            for start in range(0, len(created), 1000):
+                db.session.query(File).filter(File.id.in_(created[start:start + 1000])).delete(synchronize_session=False)
+            db.session.commit()
+    return ok
+
+
+def main():
+    print("🧪 Query builder")
+    print("=" * 60)
+    ok = check_query_builder()
+    if USE_DB:
+        print(f"\n🧪 Search latency for user {USER_ID}")
+        print("=" * 60)
+        ok &= check_latency()
+    return ok
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ File search test passed!" if success else "❌ File search test failed!")
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test for search-as-you-type suggestions
+Builds a prefix index over a synthetic library, replays typing sessions
+against it, compares results with a brute-force scan and checks that each
+keystroke is answered in under a millisecond without reloading the library.
+File changes invalidate the owner's index only once their transaction commits.
+
+    python test-files/test_file_suggest.py [files]
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.file_suggest import PENDING_KEY, SuggestIndex, tokenize
+
+FILES = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+WORDS = ('invoice', 'lease', 'agreement', 'receipt', 'insurance', 'payslip', 'contract', 'statement',
+         'tax', 'return', 'warranty', 'medical', 'report', 'assignment', 'syllabus', 'homework',
+         'passport', 'scan', 'bank', 'utility', 'bill', 'electric', 'water', 'school', 'notes')
+KINDS = ('documents', 'receipts', 'forms', None)
+
+
+class FlushSession:
+    """Stands in for a SQLAlchemy session: only .info is used"""
+
+    def __init__(self):
+        self.info = {}
+
+
+def build_library(count):
+    random.seed(11)
+    files = []
+    for file_id in range(1, count + 1):
+        words = random.sample(WORDS, random.randint(1, 3))
+        name = '_'.join(words) + f'_{file_id}.' + random.choice(('pdf', 'jpg', 'docx'))
+        files.append((file_id, name, random.choice(KINDS)))
+    return files
+
+
+def brute_force(files, query):
+    """Every file whose tokens start with each query term"""
+    terms = tokenize(query)
+    return {file_id for file_id, name, kind in files
+            if terms and all(any(t.startswith(term) for t in tokenize(name) + tokenize(kind)) for term in terms)}
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def main():
+    files = build_library(FILES)
+    loads = []
+
+    def loader(user_id):
+        loads.append(user_id)
+        return files
+
+    index = SuggestIndex(loader=loader)
+    print(f"🧪 {FILES} files for one user")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    index.suggest(1, 'x')
+    print(f"📊 First keystroke builds the index in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    # Typing sessions: every prefix of one or two words, as sent per keystroke
+    random.seed(5)
+    queries = []
+    for _ in range(300):
+        phrase = ' '.join(random.sample(WORDS, random.randint(1, 2)))
+        queries += [phrase[:i] for i in range(1, len(phrase) + 1)]
+
+    timings = []
+    ok = True
+    mismatches = 0
+    for query in queries:
+        start = time.perf_counter()
+        results = index.suggest(1, query)
+        timings.append((time.perf_counter() - start) * 1000)
+        expected = brute_force(files, query) if len(timings) % 25 == 0 else None
+        if expected is not None:
+            ids = [r['id'] for r in results]
+            if not set(ids) <= expected or len(ids) != min(8, len(expected)) or len(set(ids)) != len(ids):
+                mismatches += 1
+
+    timings.sort()
+    p50 = statistics.median(timings)
+    p99 = timings[int(len(timings) * 0.99)]
+    print(f"📊 {len(queries)} keystrokes: p50 {p50 * 1000:.0f} µs, p99 {p99 * 1000:.0f} µs, "
+          f"max {timings[-1] * 1000:.0f} µs")
+
+    ok &= check("results match a brute-force scan", mismatches == 0)
+    ok &= check("p99 keystroke under 1 ms", p99 < 1.0)
+    ok &= check("the library was loaded once", loads == [1])
+
+    results = index.suggest(1, 'lea')
+    ok &= check("first-word matches rank first, newest first",
+                tokenize(results[0]['name'])[0].startswith('lea')
+                and [r['id'] for r in results if tokenize(r['name'])[0].startswith('lea')]
+                == sorted([r['id'] for r in results if tokenize(r['name'])[0].startswith('lea')], reverse=True))
+    ok &= check("file kinds are searchable", all(r['kind'] == 'receipts' or 'receipt' in r['name']
+                                                   for r in index.suggest(1, 'receipts')))
+    ok &= check("blank and punctuation-only queries return nothing", index.suggest(1, '  ._ ') == [])
+
+    files.append((FILES + 1, 'Zebra crossing permit.pdf', 'forms'))
+    index.invalidate_user(1)
+    ok &= check("a new upload is suggested after invalidation",
+                [r['id'] for r in index.suggest(1, 'zeb')] == [FILES + 1] and loads == [1, 1])
+
+    # Changes noted at flush time apply on commit and are dropped on rollback
+    session = FlushSession()
+    files.append((FILES + 2, 'Yacht mooring invoice.pdf', 'receipts'))
+    index.note_change(session, 1)
+    ok &= check("a flushed but uncommitted change keeps the index",
+                index.suggest(1, 'yac') == [] and loads == [1, 1])
+    index.discard_changes(session)
+    index.commit_changes(session)
+    ok &= check("a rolled-back change invalidates nothing", index.suggest(1, 'yac') == [] and loads == [1, 1])
+    index.note_change(session, 1)
+    index.commit_changes(session)
+    ok &= check("a committed change invalidates the owner's index",
+                [r['id'] for r in index.suggest(1, 'yac')] == [FILES + 2] and loads == [1, 1, 1]
+                and PENDING_KEY not in session.info)
+
+    # A build that overlaps an invalidation must not be cached
+    racing = SuggestIndex(loader=lambda user_id: (racing.invalidate_user(user_id), files)[1])
+    racing.suggest(1, 'tax')
+    ok &= check("an index built across a change is not cached", racing.stats()['users'] == 0)
+
+    print(f"📊 {index.stats()}")
+    return ok
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ File suggest test passed!" if success else "❌ File suggest test failed!")
+    if not success:
+        sys.exit(1)
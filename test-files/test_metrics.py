@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test for the /metrics subsystem
+Measures the cost of recording a request sample (single thread and 8 threads)
+against a histogram guarded by one shared lock, checks that per-thread shards
+add up exactly, and renders the registry with the default collectors.
+
+    python test-files/test_metrics.py [samples]
+"""
+
+import bisect
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.metrics import REQUEST_BUCKETS, MetricsRegistry, register_default_collectors
+
+SAMPLES = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+THREADS = 8
+
+
+class LockedHistogram:
+    """Baseline: one lock around every update"""
+
+    def __init__(self):
+        self.counts = [0] * (len(REQUEST_BUCKETS) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            self.counts[bisect.bisect_left(REQUEST_BUCKETS, value)] += 1
+            self.sum += value
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def timed_threads(observe, per_thread):
+    def worker():
+        for i in range(per_thread):
+            observe((i % 100) / 1000)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return (time.perf_counter() - start) / (per_thread * THREADS) * 1e6
+
+
+def main():
+    registry = MetricsRegistry()
+    requests = registry.histogram('test_request_duration_seconds', 'Request latency', ('method', 'endpoint', 'status'))
+    failures = registry.counter('test_failures', 'Failures', ('stage',))
+    print(f"🧪 {SAMPLES} samples per run, {THREADS} threads")
+    print("=" * 60)
+
+    child = requests.labels('GET', '/api/v1/mobile/documents', 200)
+    start = time.perf_counter()
+    for i in range(SAMPLES):
+        requests.labels('GET', '/api/v1/mobile/documents', 200).observe((i % 100) / 1000)
+    labelled_us = (time.perf_counter() - start) / SAMPLES * 1e6
+
+    sharded_us = timed_threads(child.observe, SAMPLES // THREADS)
+    locked_us = timed_threads(LockedHistogram().observe, SAMPLES // THREADS)
+    print(f"📊 {labelled_us:.2f} µs per sample including label lookup; with {THREADS} threads "
+          f"{sharded_us:.2f} µs sharded vs {locked_us:.2f} µs with a shared lock")
+
+    ok = True
+    counter = failures.labels('ocr')
+    threads = [threading.Thread(target=lambda: [counter.inc() for _ in range(10000)]) for _ in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ok &= check("per-thread counter shards add up exactly", counter.value() == THREADS * 10000)
+
+    churn = registry.counter('test_churn', 'Short-lived threads').labels()
+    for _ in range(50):
+        t = threading.Thread(target=churn.inc)
+        t.start()
+        t.join()
+    ok &= check("exited threads are folded into the base cell", churn.value() == 50)
+    ok &= check("shards of exited threads are dropped", churn._shards.shard_count() == 0)
+
+    register_default_collectors(target=registry)
+    text = registry.render()
+    expected_count = SAMPLES + (SAMPLES // THREADS) * THREADS
+    ok &= check("histogram count covers every thread",
+                f'test_request_duration_seconds_count{{method="GET",endpoint="/api/v1/mobile/documents",status="200"}} '
+                f'{expected_count}' in text)
+    ok &= check("+Inf bucket equals the count",
+                f'le="+Inf"}} {expected_count}' in text)
+    ok &= check("counters are exposed with _total", 'test_failures_total{stage="ocr"} 80000' in text)
+    ok &= check("default collectors report cache hit rates and queue depths",
+                'grabdocs_answer_cache_hit_rate' in text and 'grabdocs_classification_queue_depth 0' in text
+                and 'grabdocs_external_import_queued' in text)
+    ok &= check("every sample line parses as name{labels} value",
+                all(line.startswith('#') or len(line.rsplit(' ', 1)) == 2 for line in text.splitlines()))
+
+    return ok and sharded_us < locked_us * 2
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Metrics test passed!" if success else "❌ Metrics test failed!")
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Writes-per-message comparison for workspace chat notifications
+Simulates a busy workspace chat against a counting database writer and the
+local push stand-in, first the way messages were fanned out before (one row
+and one push per participant) and then through server/notification_fanout.py.
+Also checks that failed writes and pushes are retried, without writing rows
+or sending delivered push chunks twice, and dropped after the last attempt.
+
+    python test-files/test_notification_fanout.py [members] [messages] [window_ms]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.notification_fanout import EXPO_BATCH_SIZE, ExpoPushSender, NotificationFanout, RecordingPushSender
+
+MEMBERS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+MESSAGES = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+WINDOW_MS = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+CHAT_ID = 1
+
+
+class CountingWriter:
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+
+    def __call__(self, rows):
+        self.statements += 1
+        self.rows += len(rows)
+
+
+class FlakyWriter(CountingWriter):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def __call__(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('database unavailable')
+        super().__call__(rows)
+
+
+class FlakyPushSender(RecordingPushSender):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def send(self, messages):
+        if self.failures:
+            self.failures -= 1
+            raise TimeoutError('push service timed out')
+        super().send(messages)
+
+
+class ChunkFailingSender(ExpoPushSender):
+    """Expo sender whose second chunk fails once; records every delivered message"""
+
+    def __init__(self):
+        super().__init__(url='http://push.invalid')
+        self.delivered = []
+        self.posts = 0
+
+    def _post(self, chunk):
+        self.posts += 1
+        if self.posts == 2:
+            raise TimeoutError('push service timed out')
+        self.delivered.extend(message['to'] for message in chunk)
+
+
+def token_lookup(user_ids):
+    return {user_id: [f'ExponentPushToken[user-{user_id}]'] for user_id in user_ids}
+
+
+def simulate_messages():
+    # Bursty traffic: a few messages per 50 ms tick from random members
+    random.seed(7)
+    for message_id in range(1, MESSAGES + 1):
+        yield message_id, random.randint(1, MEMBERS)
+        if message_id % 5 == 0:
+            time.sleep(0.05)
+
+
+def run_naive():
+    """One INSERT and one push request per participant per message"""
+    statements = push_requests = 0
+    for message_id, sender_id in simulate_messages():
+        recipients = [user_id for user_id in range(1, MEMBERS + 1) if user_id != sender_id]
+        statements += len(recipients)
+        push_requests += len(recipients)
+    return statements, push_requests
+
+
+def run_batched():
+    writer = CountingWriter()
+    sender = RecordingPushSender()
+    fanout = NotificationFanout(token_lookup, push_sender=sender, writer=writer, window_ms=WINDOW_MS)
+    recipients = list(range(1, MEMBERS + 1))
+    for message_id, sender_id in simulate_messages():
+        fanout.enqueue(CHAT_ID, 'General', message_id, sender_id, f'user{sender_id}', 'hello team', recipients)
+    fanout.close()
+    return fanout, writer, sender
+
+
+def run_failures():
+    print("\n🧪 Failed flushes")
+    ok = True
+
+    # Database down for two attempts: rows and pushes are delivered on the third
+    writer, sender = FlakyWriter(2), RecordingPushSender()
+    fanout = NotificationFanout(token_lookup, push_sender=sender, writer=writer, window_ms=20,
+                                retry_base_seconds=0.02)
+    fanout.enqueue(CHAT_ID, 'General', 1, 1, 'user1', 'hello', [1, 2, 3])
+    time.sleep(0.3)
+    stats = fanout.stats.as_dict()
+    print(f"📊 {stats}")
+    ok &= writer.rows == 2 and writer.statements == 1 and len(sender.batches) == 1
+    ok &= stats['errors'] == 2 and stats['retries'] == 2 and fanout.pending_retries == 0
+    print(f"{'✅' if ok else '❌'} write retried with backoff, then delivered once")
+    fanout.close()
+
+    # Push fails after the write: only the push is retried
+    writer, sender = CountingWriter(), FlakyPushSender(1)
+    fanout = NotificationFanout(token_lookup, push_sender=sender, writer=writer, window_ms=20,
+                                retry_base_seconds=0.02)
+    fanout.enqueue(CHAT_ID, 'General', 2, 1, 'user1', 'hello', [1, 2, 3])
+    time.sleep(0.2)
+    fanout.close()
+    push_ok = writer.statements == 1 and writer.rows == 2 and len(sender.batches) == 1
+    print(f"{'✅' if push_ok else '❌'} push retried without writing the rows again")
+    ok &= push_ok
+
+    # One Expo chunk fails: only that chunk is sent again
+    sender = ChunkFailingSender()
+    fanout = NotificationFanout(token_lookup, push_sender=sender, writer=CountingWriter(), window_ms=20,
+                                retry_base_seconds=0.02)
+    recipients = list(range(1, 2 * EXPO_BATCH_SIZE + 52))
+    fanout.enqueue(CHAT_ID, 'General', 4, 1, 'user1', 'hello', recipients)
+    time.sleep(0.3)
+    fanout.close()
+    chunk_ok = (len(sender.delivered) == len(recipients) - 1 and len(set(sender.delivered)) == len(sender.delivered)
+                and sender.posts == 4 and fanout.stats.push_messages == len(recipients) - 1)
+    print(f"{'✅' if chunk_ok else '❌'} only the failed push chunk is resent, no duplicate pushes")
+    ok &= chunk_ok
+
+    # Never recovers: dropped after max_attempts
+    writer = FlakyWriter(100)
+    fanout = NotificationFanout(token_lookup, push_sender=RecordingPushSender(), writer=writer, window_ms=10,
+                                retry_base_seconds=0.01, max_attempts=3)
+    fanout.enqueue(CHAT_ID, 'General', 3, 1, 'user1', 'hello', [1, 2, 3])
+    time.sleep(0.3)
+    stats = fanout.stats.as_dict()
+    fanout.close()
+    drop_ok = stats['errors'] == 3 and stats['dropped_rows'] == 2 and fanout.pending_retries == 0
+    print(f"{'✅' if drop_ok else '❌'} given up after 3 attempts")
+    return ok and drop_ok
+
+
+def main():
+    print(f"🧪 Workspace chat with {MEMBERS} members, {MESSAGES} messages, {WINDOW_MS} ms window")
+    print("=" * 60)
+
+    naive_statements, naive_pushes = run_naive()
+    print(f"📊 Before: {naive_statements / MESSAGES:.1f} DB writes and "
+          f"{naive_pushes / MESSAGES:.1f} push requests per message")
+
+    fanout, writer, sender = run_batched()
+    stats = fanout.stats.as_dict()
+    print(f"📊 After:  {writer.statements / MESSAGES:.3f} DB writes and "
+          f"{sender.requests_sent / MESSAGES:.3f} push requests per message")
+    print(f"   flushes={stats['flushes']} rows={writer.rows} pushes={stats['push_messages']} "
+          f"(max {EXPO_BATCH_SIZE} per request) errors={stats['errors']}")
+
+    expected_rows = naive_statements
+    if writer.rows != expected_rows:
+        print(f"❌ Expected {expected_rows} notification rows, wrote {writer.rows}")
+        return False
+    # Coalescing: at most one push per recipient per flush
+    if stats['push_messages'] > stats['flushes'] * MEMBERS:
+        print("❌ Pushes were not coalesced per recipient")
+        return False
+    if not (writer.statements < naive_statements and sender.requests_sent < naive_pushes):
+        return False
+    return run_failures()
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Fan-out test passed!" if success else "❌ Fan-out test failed!")
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test for the page OCR cache
+Checks that cached text is keyed by language, config, DPI and engine
+version, that concurrent writers of the same page do not collide, and that
+pruning enforces the age and size caps.
+
+    python test-files/test_ocr_cache.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server import parallel_ocr
+from server.parallel_ocr import cache_key, page_hash, prune_cache
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def main():
+    root = Path(tempfile.mkdtemp(prefix='ocr-cache-'))
+    parallel_ocr.OCR_CACHE_DIR = root
+    try:
+        print("🧪 OCR cache keys, writes and pruning")
+        print("=" * 60)
+        ok = True
+
+        digest = page_hash(b'page image bytes')
+        base = cache_key(digest, 'eng', '', 300, '5.3.0')
+        variants = {
+            'language': cache_key(digest, 'deu', '', 300, '5.3.0'),
+            'config': cache_key(digest, 'eng', '--psm 6', 300, '5.3.0'),
+            'dpi': cache_key(digest, 'eng', '', 200, '5.3.0'),
+            'engine version': cache_key(digest, 'eng', '', 300, '4.1.1'),
+        }
+        for label, key in variants.items():
+            ok &= check(f"{label} changes the cache key", key != base)
+        ok &= check("the same inputs give the same key", cache_key(digest, 'eng', '', 300, '5.3.0') == base)
+
+        parallel_ocr._write_cache(base, 'English text')
+        ok &= check("a page cached in one language is not served for another",
+                    parallel_ocr._read_cache(base) == 'English text'
+                    and parallel_ocr._read_cache(variants['language']) is None)
+
+        errors = []
+
+        def writer(n):
+            try:
+                for i in range(50):
+                    parallel_ocr._write_cache(base, f'text from writer {n}')
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        leftovers = list(root.glob('*/*.tmp'))
+        ok &= check("concurrent writers of one page do not collide",
+                    not errors and not leftovers
+                    and parallel_ocr._read_cache(base).startswith('text from writer'))
+
+        old = time.time() - 40 * 86400
+        for i in range(5):
+            key = cache_key(page_hash(f'old {i}'.encode()), version='x')
+            parallel_ocr._write_cache(key, 'x' * 100)
+            os.utime(parallel_ocr._cache_path(key), (old, old))
+        recent = []
+        for i in range(10):
+            key = cache_key(page_hash(f'recent {i}'.encode()), version='x')
+            parallel_ocr._write_cache(key, 'y' * 1000)
+            stamp = time.time() - (10 - i) * 60
+            os.utime(parallel_ocr._cache_path(key), (stamp, stamp))
+            recent.append(key)
+
+        removed = prune_cache(max_bytes=5000, max_age_days=30, cache_dir=root)
+        remaining = [p for p in root.glob('*/*.txt')]
+        ok &= check("entries past the age cap are removed",
+                    all(parallel_ocr._read_cache(cache_key(page_hash(f'old {i}'.encode()), version='x')) is None
+                        for i in range(5)))
+        ok &= check("the size cap keeps the most recently used entries",
+                    sum(p.stat().st_size for p in remaining) <= 5000
+                    and parallel_ocr._read_cache(recent[-1]) is not None
+                    and parallel_ocr._read_cache(recent[0]) is None)
+        print(f"📊 Pruned {removed} entries, {len(remaining)} left")
+        return ok
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ OCR cache test passed!" if success else "❌ OCR cache test failed!")
+    if not success:
+        sys.exit(1)
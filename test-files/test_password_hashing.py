@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test for pinned password hashing with rehash-on-login
+Times hashing with werkzeug's default method against the pinned
+PASSWORD_HASH_METHOD, runs a burst of concurrent logins through the hashing
+pool, and checks that an outdated stored hash is replaced after one
+successful login while wrong passwords and unknown users are refused.
+
+    python test-files/test_password_hashing.py [concurrent_logins]
+"""
+
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from werkzeug.security import generate_password_hash
+
+from server.password_hashing import PASSWORD_HASH_METHOD, PasswordHasher, time_method
+
+LOGINS = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+
+
+class FakeUser:
+    def __init__(self, password_hash):
+        self.password_hash = password_hash
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def main():
+    hasher = PasswordHasher()
+    print(f"🧪 Pinned method {PASSWORD_HASH_METHOD}, {LOGINS} concurrent logins")
+    print("=" * 60)
+
+    default_ms = time_method('pbkdf2:sha256') * 1000
+    pinned_ms = time_method(PASSWORD_HASH_METHOD) * 1000
+    print(f"📊 werkzeug pbkdf2 default: {default_ms:.0f} ms per hash, pinned: {pinned_ms:.0f} ms per hash")
+
+    stored = hasher.hash('correct horse')
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=LOGINS) as request_workers:
+        results = list(request_workers.map(lambda _: hasher.verify(stored, 'correct horse'), range(LOGINS)))
+    burst = time.perf_counter() - start
+    print(f"📊 {LOGINS} concurrent logins verified in {burst * 1000:.0f} ms on {os.cpu_count()} CPU(s)")
+
+    async def event_loop_stays_responsive():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        ok = await hasher.verify_async(stored, 'correct horse')
+        task.cancel()
+        return ok, ticks
+
+    async_ok, ticks = asyncio.run(event_loop_stays_responsive())
+    print(f"📊 event loop ran {ticks} ticks while one verification was in flight")
+
+    ok = True
+    ok &= check("concurrent logins all verify", all(results))
+    ok &= check("async verification works without blocking the loop", async_ok and ticks > 0)
+    ok &= check("wrong password is refused", not hasher.verify(stored, 'wrong'))
+    ok &= check("unknown user is refused", not hasher.verify_and_update(None, 'correct horse'))
+
+    legacy = FakeUser(generate_password_hash('password123', method='pbkdf2:sha256:260000'))
+    ok &= check("legacy hash is flagged for rehash", hasher.needs_rehash(legacy.password_hash))
+    ok &= check("legacy hash still logs in", hasher.verify_and_update(legacy, 'password123'))
+    ok &= check("login upgraded the stored hash",
+                legacy.password_hash.startswith(PASSWORD_HASH_METHOD + '$') and hasher.stats()['rehashes'] == 1)
+    current = legacy.password_hash
+    hasher.verify_and_update(legacy, 'password123')
+    ok &= check("current hashes are left alone", legacy.password_hash == current)
+    ok &= check("rehash is left for the caller's session to commit", 'shared' not in sys.modules)
+    failed = FakeUser(generate_password_hash('password123', method='pbkdf2:sha256:260000'))
+    before = failed.password_hash
+    ok &= check("failed login does not rehash",
+                not hasher.verify_and_update(failed, 'nope') and failed.password_hash == before)
+
+    hasher.shutdown()
+    return ok
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Password hashing test passed!" if success else "❌ Password hashing test failed!")
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test for upload pipeline stage tracing
+Runs simulated uploads through the six pipeline stages with a recording
+writer, then checks the per-file timeline, the one-write-per-upload
+behaviour, failed stages, and that the slowest-stage report points at the
+stage that was made slow.
+
+    python test-files/test_pipeline_trace.py [uploads]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server import metrics
+from server.pipeline_trace import summarize_stages, timeline, trace_file
+
+UPLOADS = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+STAGE_SECONDS = {'store': 0.001, 'ocr': 0.012, 'classify': 0.002, 'chunk': 0.001, 'embed': 0.004, 'index': 0.002}
+
+writes = []
+
+
+def record_rows(rows):
+    writes.append(rows)
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def histogram_count(stage):
+    samples = metrics.pipeline_stage_duration.labels(stage).samples({})
+    return next(value for suffix, _, value in samples if suffix == '_count')
+
+
+def process(file_id, size, fail_embed=False):
+    with trace_file(file_id, writer=record_rows) as trace:
+        for stage, seconds in STAGE_SECONDS.items():
+            with trace.stage(stage, bytes_in=size if stage in ('store', 'ocr') else None) as record:
+                time.sleep(seconds * random.uniform(0.8, 1.2))
+                if stage == 'chunk':
+                    record.chunks = size // 4000 + 1
+                if stage == 'embed' and fail_embed:
+                    raise RuntimeError('embedding service timed out')
+
+
+def main():
+    random.seed(3)
+    print(f"🧪 Tracing {UPLOADS} simulated uploads")
+    print("=" * 60)
+
+    ocr_before = histogram_count('ocr')
+    for file_id in range(1, UPLOADS + 1):
+        process(file_id, random.randint(10_000, 2_000_000))
+    try:
+        process(UPLOADS + 1, 50_000, fail_embed=True)
+    except RuntimeError:
+        pass
+
+    ocr_samples = histogram_count('ocr') - ocr_before
+    embed_failures = metrics.pipeline_stage_failures.labels('embed').value()
+    rows = [row for batch in writes for row in batch]
+    summary = summarize_stages(rows)
+    for stage in summary:
+        print(f"📊 {stage['stage']:9} p50 {stage['p50_ms']:6.1f} ms  p95 {stage['p95_ms']:6.1f} ms  "
+              f"errors {stage['errors']}")
+
+    start = time.perf_counter()
+    for i in range(2000):
+        with trace_file(i, writer=None) as trace:
+            with trace.stage('store'):
+                pass
+    overhead_us = (time.perf_counter() - start) / 2000 * 1e6
+    print(f"📊 {overhead_us:.1f} µs tracing overhead per stage")
+
+    ok = True
+    ok &= check("one trace write per upload", len(writes) == UPLOADS + 1)
+    ok &= check("one row per stage", all(len(batch) == len(STAGE_SECONDS) for batch in writes[:-1]))
+    ok &= check("each traced stage is one histogram sample", ocr_samples == UPLOADS + 1)
+    ok &= check("a failed stage is counted once", embed_failures == 1)
+    ok &= check("OCR is reported as the slowest stage", summary[0]['stage'] == 'ocr')
+
+    failed = writes[-1]
+    ok &= check("failed upload still writes its trace, ending at the failing stage",
+                [r['stage'] for r in failed] == ['store', 'ocr', 'classify', 'chunk', 'embed']
+                and failed[-1]['status'] == 'error' and 'timed out' in failed[-1]['error'])
+
+    file_timeline = timeline(writes[0])
+    offsets = [s['offset_ms'] for s in file_timeline['stages']]
+    ok &= check("timeline is ordered with increasing offsets", offsets == sorted(offsets) and offsets[0] == 0)
+    ok &= check("timeline names the slowest stage and carries chunk counts",
+                file_timeline['slowest_stage'] == 'ocr'
+                and any(s['chunks'] for s in file_timeline['stages'] if s['stage'] == 'chunk'))
+    return ok and overhead_us < 200
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Pipeline trace test passed!" if success else "❌ Pipeline trace test failed!")
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark and checks for the OTP/login rate limiter
+Measures limiter overhead per request (single thread and 8 threads sharing
+the in-memory store) and checks that limits hold per key, that the window
+slides, that Retry-After points at the moment the key is allowed again, that
+rejected attempts are not counted, that one address cannot lock a user out,
+and that only the X-Forwarded-For entry added by a trusted proxy is used.
+
+    python test-files/test_rate_limiter_bench.py [requests]
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.rate_limiter import POLICIES, InMemoryStore, RateLimiter, RateLimitRule, client_ip
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+THREADS = 8
+
+
+class HeaderRequest:
+    def __init__(self, remote_addr, forwarded=None):
+        self.remote_addr = remote_addr
+        self.headers = {'X-Forwarded-For': forwarded} if forwarded else {}
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def keys_for(i):
+    return {'phone': f'+4479{i % 5000:08d}', 'ip': f'10.1.{i % 200}.{i % 250}', 'device': f'device-{i % 3000}'}
+
+
+def bench_single():
+    limiter = RateLimiter(store=InMemoryStore())
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        limiter.check('request_otp', keys_for(i))
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+def bench_threaded():
+    limiter = RateLimiter(store=InMemoryStore())
+    per_thread = REQUESTS // THREADS
+
+    def worker(offset):
+        for i in range(per_thread):
+            limiter.check('login', {'user': f'user{(offset + i) % 4000}', 'ip': f'10.2.0.{i % 250}'})
+
+    threads = [threading.Thread(target=worker, args=(t * per_thread,)) for t in range(THREADS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return (time.perf_counter() - start) / (per_thread * THREADS) * 1e6
+
+
+def main():
+    print(f"🧪 {REQUESTS} limiter checks")
+    print("=" * 60)
+    single_us = bench_single()
+    threaded_us = bench_threaded()
+    print(f"📊 {single_us:.2f} µs per request_otp check (3 keys), "
+          f"{threaded_us:.2f} µs per login check with {THREADS} threads")
+
+    ok = True
+    rule = RateLimitRule('phone', 3, 600)
+    limiter = RateLimiter(store=InMemoryStore(), policies={'request_otp': [rule, RateLimitRule('ip', 10, 600)]})
+    base = 600 * 1000.0  # start of a window
+    results = [limiter.check('request_otp', {'phone': '+15550001', 'ip': '1.1.1.1'}, now=base + i).allowed
+               for i in range(4)]
+    ok &= check("fourth OTP request for one phone is rejected", results == [True, True, True, False])
+    ok &= check("another phone from the same IP is still allowed",
+                limiter.check('request_otp', {'phone': '+15550002', 'ip': '1.1.1.1'}, now=base + 5).allowed)
+
+    blocked = [limiter.check('request_otp', {'phone': f'+1666{i:04d}', 'ip': '2.2.2.2'}, now=base + 10)
+               for i in range(11)]
+    ok &= check("eleventh request from one IP is rejected across phones",
+                all(d.allowed for d in blocked[:10]) and not blocked[10].allowed and blocked[10].rule.key_kind == 'ip')
+
+    # Previous window had 4 hits for this phone; weight decays as the window slides
+    decision = limiter.check('request_otp', {'phone': '+15550001'}, now=base + 600 + 60)
+    ok &= check("previous window still counts early in the next window", not decision.allowed)
+    retry_at = base + 600 + 60 + decision.retry_after
+    ok &= check("allowed again once Retry-After has passed",
+                limiter.check('request_otp', {'phone': '+15550001'}, now=retry_at).allowed)
+    case = RateLimiter(store=InMemoryStore(), policies={'login': [RateLimitRule('user', 1, 60)]})
+    case.check('login', {'user': 'Alice'}, now=0)
+    ok &= check("usernames are matched case-insensitively", not case.check('login', {'user': 'alice'}, now=1).allowed)
+
+    retrying = RateLimiter(store=InMemoryStore(), policies={'request_otp': [rule]})
+    for i in range(3):
+        retrying.check('request_otp', {'phone': '+15550003'}, now=base + i)
+    for second in range(3, 600):
+        retrying.check('request_otp', {'phone': '+15550003'}, now=base + second)
+    ok &= check("retrying while limited does not extend the lockout",
+                retrying.check('request_otp', {'phone': '+15550003'}, now=base + 600 + 400).allowed)
+
+    login = RateLimiter(store=InMemoryStore(), policies={'login': POLICIES['login']})
+    for i in range(15):
+        login.check('login', {'user': 'alice', 'user_ip': 'alice|6.6.6.6', 'ip': '6.6.6.6'}, now=base + i)
+    ok &= check("failed logins from one address do not lock the user out elsewhere",
+                login.check('login', {'user': 'alice', 'user_ip': 'alice|7.7.7.7', 'ip': '7.7.7.7'}, now=base + 20).allowed
+                and not login.check('login', {'user': 'alice', 'user_ip': 'alice|6.6.6.6', 'ip': '6.6.6.6'},
+                                    now=base + 21).allowed)
+
+    spoofed = HeaderRequest('10.0.0.2', '1.2.3.4, 203.0.113.9')
+    ok &= check("the client-supplied X-Forwarded-For entry is ignored",
+                client_ip(spoofed, proxy_hops=1) == '203.0.113.9'
+                and client_ip(HeaderRequest('10.0.0.2', '1.2.3.4, 203.0.113.9, 10.0.0.1'), proxy_hops=2)
+                == '203.0.113.9')
+    ok &= check("without trusted proxies the socket address is used",
+                client_ip(spoofed, proxy_hops=0) == '10.0.0.2'
+                and client_ip(HeaderRequest('10.0.0.2', '203.0.113.9'), proxy_hops=2) == '10.0.0.2')
+
+    return ok and single_us < 100
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Rate limiter test passed!" if success else "❌ Rate limiter test failed!")
+    if not success:
+        sys.exit(1)
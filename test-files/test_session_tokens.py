@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test for signed session tokens and cached user resolution
+Compares per-request authentication cost against a simulated Neon user lookup
+and checks the revoke semantics: /logout ends one session, /devices/revoke-all
+ends every session issued before it, revoked sessions are never refreshed,
+tampered and expired tokens are refused, and a missing secret or a missing
+shared revocation list in production fails safely, when the authenticator is
+built rather than when the module is imported.
+
+    python test-files/test_session_tokens.py [requests]
+"""
+
+import importlib
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.session_tokens import InMemoryRevocations, RedisRevocations, SessionAuthenticator
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+DB_ROUND_TRIP = 0.03  # typical Neon round trip from the app server
+
+db_loads = 0
+
+
+def load_user(user_id):
+    global db_loads
+    db_loads += 1
+    time.sleep(DB_ROUND_TRIP)
+    return {'id': user_id, 'username': f'user{user_id}', 'email': f'user{user_id}@example.com', 'is_active': True}
+
+
+class ExpiringRedis:
+    """Records the expiry each key is set with"""
+
+    def __init__(self):
+        self.ttls = {}
+
+    def set(self, key, value, ex=None):
+        self.ttls[key] = ex
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def main():
+    auth = SessionAuthenticator(secret='test-secret', load_user=load_user, revocations=InMemoryRevocations(),
+                                token_ttl=4)
+    print(f"🧪 Authenticating {REQUESTS} requests from 50 users")
+    print("=" * 60)
+
+    tokens = [auth.issue(user_id, f'device-{user_id}') for user_id in range(1, 51)]
+    for token in tokens:
+        auth.authenticate(token)  # first request per user loads it
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        auth.authenticate(f'Bearer {tokens[i % len(tokens)]}')
+    elapsed = time.perf_counter() - start
+    per_request_us = elapsed / REQUESTS * 1e6
+    print(f"📊 {per_request_us:.1f} µs per cached request ({db_loads} user loads in total); "
+          f"loading the user every time costs ~{DB_ROUND_TRIP * 1000:.0f} ms")
+
+    ok = True
+    phone = auth.issue(7, 'phone')
+    tablet = auth.issue(7, 'tablet')
+    auth.logout(auth.verify(phone))
+    ok &= check("logout revokes that session", auth.authenticate(phone) is None)
+    ok &= check("logout leaves the user's other devices signed in", auth.authenticate(tablet) is not None)
+
+    loads_before = db_loads
+    auth.revoke_all(7)
+    ok &= check("revoke-all rejects earlier tokens", auth.authenticate(tablet) is None)
+    relogin = auth.issue(7, 'phone')
+    ok &= check("a login after revoke-all works", auth.authenticate(relogin) is not None)
+    ok &= check("revoke-all drops the cached user", db_loads == loads_before + 1)
+
+    payload, signature = tokens[0].split('.')
+    ok &= check("tampered signature is refused", auth.authenticate(f'{payload}.{signature[:-2]}AA') is None)
+    ok &= check("token for another secret is refused",
+                SessionAuthenticator(secret='other', load_user=load_user).verify(tokens[0]) is None)
+
+    aging = auth.issue(1)
+    time.sleep(2.1)
+    fresh = auth.issue(8)
+    claims = auth.verify(aging)
+    ok &= check("tokens past half their life get a refreshed token", auth.refreshed_token(claims) is not None)
+    ok &= check("young tokens are not refreshed", auth.refreshed_token(auth.verify(fresh)) is None)
+    leaving, other = auth.issue(2, 'phone'), auth.issue(3, 'phone')
+    auth.logout(claims)
+    ok &= check("no refreshed token for a session logged out during the request", auth.refreshed_token(claims) is None)
+    leaving_claims, other_claims = auth.verify(leaving), auth.verify(other)
+    leaving_claims['iat'] = other_claims['iat'] = time.time() - 3
+    auth.revoke_all(2)
+    ok &= check("no refreshed token after revoke-all", auth.refreshed_token(leaving_claims) is None)
+    ok &= check("other users still refreshed", auth.refreshed_token(other_claims) is not None)
+    time.sleep(2.0)
+    ok &= check("expired tokens are refused", auth.authenticate(aging) is None)
+
+    unsigned = SessionAuthenticator(load_user=load_user, revocations=InMemoryRevocations())
+    unsigned._secret = b''  # whatever SECRET_KEY says
+    ok &= check("no signing secret rejects instead of raising", unsigned.authenticate(tokens[0]) is None)
+
+    os.environ.pop('SESSION_REDIS_URL', None)
+    os.environ['APP_ENV'] = 'production'
+    try:
+        SessionAuthenticator(secret='test-secret', load_user=load_user)
+        refused = False
+    except RuntimeError:
+        refused = True
+    finally:
+        del os.environ['APP_ENV']
+    ok &= check("per-process revocations refused in production", refused)
+
+    os.environ['APP_ENV'] = 'production'
+    try:
+        sys.modules.pop('server.session_tokens', None)
+        importlib.import_module('server.session_tokens')
+        from server.metrics import MetricsRegistry, register_default_collectors
+        register_default_collectors(target=MetricsRegistry())
+        imported = True
+    except RuntimeError:
+        imported = False
+    finally:
+        del os.environ['APP_ENV']
+    ok &= check("importing the module and registering metrics do not build the authenticator", imported)
+
+    client = ExpiringRedis()
+    SessionAuthenticator(secret='test-secret', load_user=load_user, token_ttl=7 * 86400,
+                         revocations=RedisRevocations(token_ttl=7 * 86400, client=client)).revoke_all(1)
+    ok &= check("revoke-all outlives a custom token lifetime", client.ttls['session:not_before:1'] > 7 * 86400)
+
+    return ok and per_request_us < DB_ROUND_TRIP * 1e6 / 10
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Session token test passed!" if success else "❌ Session token test failed!")
+    if not success:
+        sys.exit(1)
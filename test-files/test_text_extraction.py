@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test for fast-path text extraction
+Checks format sniffing and that uploads with no readable text (spreadsheets,
+archives, other binaries) come back as 'unsupported' instead of reaching OCR,
+including UTF-8 text whose sniff window ends inside a multibyte character.
+
+    python test-files/test_text_extraction.py
+"""
+
+import io
+import os
+import sys
+import zipfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from server.text_extraction import TEXT_SNIFF_BYTES, extract_text, sniff_format
+
+
+def zip_bytes(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def main():
+    print("🧪 Format sniffing and unsupported uploads")
+    print("=" * 60)
+    ok = True
+
+    docx = zip_bytes({'word/document.xml': (
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+        '<w:p><w:r><w:t>Lease agreement</w:t></w:r></w:p></w:body></w:document>')})
+    result = extract_text(docx, 'lease.docx')
+    ok &= check("DOCX is read directly", result.extraction_path == 'docx' and result.text == 'Lease agreement')
+
+    xlsx = zip_bytes({'xl/workbook.xml': '<workbook/>', '[Content_Types].xml': '<Types/>'})
+    binary = bytes(range(256)) * 64
+    for label, data, name in (('xlsx', xlsx, 'budget.xlsx'), ('zip', zip_bytes({'a.bin': b'\x00\x01'}), 'a.zip'),
+                              ('binary', binary, 'blob.bin')):
+        result = extract_text(data, name)
+        ok &= check(f"{label} upload is unsupported, not OCR'd",
+                    result.extraction_path == 'unsupported' and result.text == '' and result.pages_ocr == 0)
+
+    # 'é' is two bytes; put one across the sniff boundary
+    text = ('a' * (TEXT_SNIFF_BYTES - 1) + 'é' + ' more text').encode('utf-8')
+    ok &= check("UTF-8 cut mid-character at the sniff window is still text", sniff_format(text, 'notes') == 'text')
+    ok &= check("its full text is decoded", extract_text(text, 'notes').text.endswith('é more text'))
+
+    truncated = 'short é'.encode('utf-8')[:-1]
+    ok &= check("a complete file ending mid-character is not text", sniff_format(truncated, 'x') == 'unknown')
+    return ok
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ Text extraction test passed!" if success else "❌ Text extraction test failed!")
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test for user chat pagination and unread counts
+Pages backwards through a chat with the before_id cursor and checks that
+every message is returned once, in order, with has_more correct; checks page
+size clamping and the grouped unread query.
+
+    python test-files/test_user_chats.py
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import server.user_chats as user_chats
+from server.user_chats import MAX_PAGE_SIZE, paginate_chat_messages, parse_page_args, unread_query
+
+# Ids are global across chats, so one chat's ids have gaps
+MESSAGES = [SimpleNamespace(id=i, chat_id=1 if i % 3 else 2, content=f'm{i}') for i in range(1, 301)]
+
+
+def list_message_window(chat_id, limit, before_id=None):
+    """load_message_window over MESSAGES: the newest `limit` before `before_id`, oldest first"""
+    rows = [m for m in MESSAGES if m.chat_id == chat_id and (before_id is None or m.id < before_id)]
+    return rows[-limit:]
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def test_pagination():
+    print("\n🧪 Cursor pagination")
+    user_chats.load_message_window = list_message_window
+    chat = [m for m in MESSAGES if m.chat_id == 1]
+
+    pages, before_id = [], None
+    while True:
+        page = paginate_chat_messages(1, before_id, limit=30)
+        pages.append(page)
+        if not page['has_more']:
+            break
+        before_id = page['next_before_id']
+
+    seen = [m.id for page in reversed(pages) for m in page['messages']]
+    print(f"📊 {len(chat)} messages in {len(pages)} pages")
+    ok = check("every message once, oldest first", seen == [m.id for m in chat])
+    ok &= check("first page is the newest", pages[0]['messages'][-1].id == chat[-1].id)
+    ok &= check("full pages until the last", all(len(p['messages']) == 30 for p in pages[:-1]))
+    ok &= check("cursor is the first message of the page",
+                all(p['next_before_id'] == p['messages'][0].id for p in pages[:-1]))
+    ok &= check("last page has no cursor", pages[-1]['has_more'] is False and pages[-1]['next_before_id'] is None)
+
+    exact = paginate_chat_messages(1, chat[30].id, limit=30)
+    ok &= check("page ending exactly at the first message has no more", not exact['has_more']
+                and len(exact['messages']) == 30)
+    ok &= check("empty chat", paginate_chat_messages(9)['messages'] == [])
+    return ok
+
+
+def test_page_args():
+    print("\n🧪 Page arguments")
+    ok = check("defaults", parse_page_args({}) == {'limit': 50, 'before_id': None})
+    ok &= check("clamped to MAX_PAGE_SIZE", parse_page_args({'limit': '100000'})['limit'] == MAX_PAGE_SIZE)
+    ok &= check("at least one", parse_page_args({'limit': '0'})['limit'] == 1)
+    ok &= check("garbage ignored", parse_page_args({'limit': 'x', 'before_id': 'y'}) == {'limit': 50, 'before_id': None})
+    ok &= check("cursor parsed", parse_page_args({'before_id': '42'})['before_id'] == 42)
+    return ok
+
+
+def test_unread_query():
+    print("\n🧪 Unread counts")
+    sql, params = unread_query(7)
+    ok = check("one grouped query over unread notifications", 'GROUP BY chat_id' in sql and 'is_read = FALSE' in sql
+               and params == {'user_id': 7})
+    sql, params = unread_query(7, iter([1, 2]))
+    ok &= check("chat ids filter", 'ANY(:chat_ids)' in sql and params['chat_ids'] == [1, 2])
+    ok &= check("no chats means no query", unread_query(7, []) is None)
+    return ok
+
+
+def main():
+    print("=" * 60)
+    print("🧪 User chats test")
+    print("=" * 60)
+    results = [test_pagination(), test_page_args(), test_unread_query()]
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = main()
+    print("\n" + "=" * 60)
+    print("✅ User chats test passed!" if success else "❌ User chats test failed!")
+    if not success:
+        sys.exit(1)